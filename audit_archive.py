@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Audit log archival - old schedule_changes rows move to gzip'd JSON lines segments, one per month
+"""
+
+import os
+import sys
+import gzip
+import json
+import fcntl
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from config import AUDIT_ARCHIVE_DIR, AUDIT_RETENTION_DAYS, AUDIT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'schedule_changes-'
+SEGMENT_SUFFIX = '.jsonl.gz'
+FIELDS = ('id', 'staff_id', 'staff_name', 'action', 'day_of_week', 'old_data', 'new_data', 'changed_by', 'changed_at')
+
+
+class AuditArchive:
+    """Append-only monthly segments of archived audit rows.
+
+    Each archive run appends one gzip member per month it touches, so a
+    segment is never rewritten. Rows come back in the same shape as
+    get_schedule_changes_page: (id, staff_name, action, day_of_week,
+    old_data, new_data, changed_by, changed_at).
+    """
+
+    def __init__(self, directory=AUDIT_ARCHIVE_DIR, cached_months=2):
+        self.directory = directory
+        self.cached_months = cached_months
+        self._cache = OrderedDict()
+
+    def segment_path(self, month):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{month}{SEGMENT_SUFFIX}")
+
+    def months(self):
+        """Months that have a segment, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted((name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)] for name in os.listdir(self.directory)
+                       if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)), reverse=True)
+
+    @contextmanager
+    def locked(self):
+        """Exclusive lock on the archive, so webhook workers never archive the same rows at once"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, rows):
+        """Append rows (dicts with FIELDS) to their month segments and fsync; returns the months touched"""
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(str(row['changed_at'])[:7], []).append(row)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for month, month_rows in by_month.items():
+            payload = ''.join(json.dumps({field: row[field] for field in FIELDS}, default=str) + '\n'
+                              for row in month_rows)
+            with open(self.segment_path(month), 'ab') as segment:
+                with gzip.GzipFile(fileobj=segment, mode='wb') as member:
+                    member.write(payload.encode())
+                segment.flush()
+                os.fsync(segment.fileno())
+            self._cache.pop(month, None)
+        return sorted(by_month)
+
+    def _read_month(self, month):
+        """All rows of one segment, newest first (small LRU cache, invalidated by appends)"""
+        path = self.segment_path(month)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return []
+        cached = self._cache.get(month)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            self._cache.move_to_end(month)
+            return cached[1]
+
+        # A crash between appending and deleting from the database re-archives
+        # the same rows on the next run - keep one copy per id
+        rows = {}
+        with gzip.open(path, 'rt') as segment:
+            for line in segment:
+                if line.strip():
+                    row = json.loads(line)
+                    rows[row['id']] = row
+        ordered = sorted(rows.values(), key=lambda row: (row['changed_at'], row['id']), reverse=True)
+
+        self._cache[month] = ((stat.st_mtime_ns, stat.st_size), ordered)
+        while len(self._cache) > self.cached_months:
+            self._cache.popitem(last=False)
+        return ordered
+
+    def iter_changes(self, staff_id=None, action=None, since=None, until=None, before=None):
+        """Stream archived rows newest first, one month segment at a time.
+
+        Filters and the (changed_at, id) before cursor work as in
+        get_schedule_changes_page. since/until may be datetimes or strings.
+        """
+        since = _as_text(since)
+        until = _as_text(until)
+        before = (_as_text(before[0]), before[1]) if before else None
+        for month in self.months():
+            if since and month < since[:7]:
+                break
+            if before and month > before[0][:7]:
+                continue
+            if until and month > until[:7]:
+                continue
+            for row in self._read_month(month):
+                if before and (row['changed_at'], row['id']) >= before:
+                    continue
+                if since and row['changed_at'] < since:
+                    return
+                if until and row['changed_at'] >= until:
+                    continue
+                if staff_id is not None and row['staff_id'] != staff_id:
+                    continue
+                if action and row['action'] != action:
+                    continue
+                yield (row['id'], row['staff_name'], row['action'], row['day_of_week'],
+                       row['old_data'], row['new_data'], row['changed_by'], row['changed_at'])
+
+    def iter_rows(self, since_month=None):
+        """All archived rows as dicts with FIELDS, oldest first, from since_month on"""
+        for month in reversed(self.months()):
+            if since_month and month < since_month:
+                continue
+            yield from reversed(self._read_month(month))
+
+    def read_page(self, limit, **filters):
+        """Up to limit archived rows, for filling the tail of an audit page"""
+        rows = []
+        for row in self.iter_changes(**filters):
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        return rows
+
+
+def _as_text(value):
+    """changed_at as the 'YYYY-MM-DD HH:MM:SS' text the segments store"""
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def summarize_rows(rows):
+    """Per (month, staff, action) counts for schedule_changes_summary"""
+    summary = {}
+    for row in rows:
+        changed_at = _as_text(row['changed_at'])
+        key = (changed_at[:7], row['staff_id'] or 0, row['action'])
+        entry = summary.get(key)
+        if entry is None:
+            summary[key] = [row['staff_name'], 1, changed_at, changed_at]
+        else:
+            entry[1] += 1
+            entry[2] = min(entry[2], changed_at)
+            entry[3] = max(entry[3], changed_at)
+    return [(month, staff_id, staff_name, action, count, first, last)
+            for (month, staff_id, action), (staff_name, count, first, last) in summary.items()]
+
+
+def archive_old_changes(db, archive, retention_days=AUDIT_RETENTION_DAYS, batch_size=AUDIT_BATCH_SIZE):
+    """Move audit rows older than retention_days from the database to the archive.
+
+    Each batch is appended (and fsynced) to the segments first, then deleted
+    from schedule_changes together with its summary counts in one
+    transaction, so a crash can duplicate rows in a segment (the reader
+    drops them) but never lose any.
+    """
+    # changed_at is the database's CURRENT_TIMESTAMP, which is UTC
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+    archived = 0
+    months = set()
+    with archive.locked():
+        while True:
+            rows = db.get_changes_to_archive(cutoff, batch_size)
+            if not rows:
+                break
+            rows = [dict(zip(FIELDS, row)) for row in rows]
+            months.update(archive.append(rows))
+            db.finish_audit_archive([row['id'] for row in rows], summarize_rows(rows))
+            archived += len(rows)
+    if archived:
+        logger.info(f"📦 Archived {archived} audit rows older than {cutoff} ({', '.join(sorted(months))})")
+    return {'archived': archived, 'months': sorted(months), 'cutoff': cutoff}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from database_factory import get_database_manager
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else AUDIT_RETENTION_DAYS
+    if days <= 0:
+        print("❌ Set AUDIT_RETENTION_DAYS (or pass the age in days) to archive")
+        sys.exit(1)
+    db = get_database_manager()
+    if not hasattr(db, 'get_changes_to_archive'):
+        print(f"❌ {type(db).__name__} has no audit log to archive")
+        sys.exit(1)
+    result = archive_old_changes(db, AuditArchive(), days)
+    print(f"✅ Archived {result['archived']} audit rows older than {result['cutoff']} into {AUDIT_ARCHIVE_DIR}")
@@ -0,0 +1,3 @@
+"""
+Benchmark suite for the staff scheduler bot (run the scripts in this folder directly)
+"""
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Audit archive benchmark - database size before and after archiving, segment compression, and identical audit pages
+"""
+
+import sys
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import open_backend, close_backend, summarize, report_meta, emit_report
+from benchmarks.bench_audit_pages import seed_changes
+from audit_archive import AuditArchive, archive_old_changes
+
+
+def table_stats(db_path):
+    """schedule_changes row count and database file size after VACUUM"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('VACUUM')
+        rows = conn.execute('SELECT COUNT(*) FROM schedule_changes').fetchone()[0]
+    finally:
+        conn.close()
+    return {'schedule_changes_rows': rows, 'db_bytes': os.path.getsize(db_path)}
+
+
+def walk_pages(manager, filters, page_size):
+    """Every id of the audit log for a filter, following next_cursor to the end"""
+    ids, cursor = [], None
+    while True:
+        rows, cursor = manager.get_schedule_changes_page(before=cursor, limit=page_size, **filters)
+        ids.extend(row[0] for row in rows)
+        if cursor is None:
+            return ids
+
+
+def archive_stats(archive):
+    """Compressed and raw bytes of all segments"""
+    compressed = raw = 0
+    for month in archive.months():
+        path = archive.segment_path(month)
+        compressed += os.path.getsize(path)
+        with gzip.open(path, 'rb') as segment:
+            raw += len(segment.read())
+    return {
+        'segments': len(archive.months()),
+        'segment_bytes': compressed,
+        'uncompressed_bytes': raw,
+        'compression_ratio': round(raw / compressed, 2) if compressed else None,
+    }
+
+
+def time_pages(manager, cursors, page_size, repeats):
+    """Page latency from each cursor, with the month cache cold and warm"""
+    results = {}
+    for name, cursor in cursors.items():
+        cold, warm = [], []
+        for _ in range(repeats):
+            manager.audit_archive._cache.clear()
+            started = time.perf_counter()
+            manager.get_schedule_changes_page(before=cursor, limit=page_size)
+            cold.append((time.perf_counter() - started) * 1000.0)
+
+            started = time.perf_counter()
+            manager.get_schedule_changes_page(before=cursor, limit=page_size)
+            warm.append((time.perf_counter() - started) * 1000.0)
+        results[name] = {'cold': summarize(cold), 'warm': summarize(warm)}
+    return results
+
+
+def main():
+    """Seed an old audit log, archive it, check every page is unchanged, emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=100000, help='audit rows to seed')
+    parser.add_argument('--days', type=int, default=365, help='history the rows are spread over, ending now')
+    parser.add_argument('--retention-days', type=int, default=90)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--staff', type=int, default=40)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--walk-page-size', type=int, default=200, help='page size for the before/after comparison')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    manager = open_backend('sqlite')
+    archive_dir = tempfile.mkdtemp(prefix='bench_audit_archive_')
+    manager.audit_archive = AuditArchive(archive_dir)
+    try:
+        with redirect_stdout(sys.stderr):
+            staff_ids = [manager.add_staff(f"Archive Staff {i:03d}") for i in range(args.staff)]
+        print(f"🌱 Seeding {args.rows} audit rows over the last {args.days} days", file=sys.stderr)
+        step_minutes = args.days * 1440.0 / args.rows
+        seed_changes(manager.db_path, staff_ids, args.rows, args.seed,
+                     started=datetime.utcnow() - timedelta(days=args.days), step_minutes=step_minutes)
+
+        filters = {'all': {}, 'staff': {'staff_id': staff_ids[0]}, 'action': {'action': 'CREATE_SCHEDULE'}}
+        before_ids = {name: walk_pages(manager, f, args.walk_page_size) for name, f in filters.items()}
+        before = table_stats(manager.db_path)
+
+        started_at = time.perf_counter()
+        result = archive_old_changes(manager, manager.audit_archive, args.retention_days, args.batch_size)
+        archive_seconds = time.perf_counter() - started_at
+        after = table_stats(manager.db_path)
+
+        after_ids = {name: walk_pages(manager, f, args.walk_page_size) for name, f in filters.items()}
+        mismatched = [name for name in filters if before_ids[name] != after_ids[name]]
+        if mismatched:
+            raise RuntimeError(f"audit pages differ after archiving: {mismatched}")
+
+        summary_total = sum(count for _, _, count in manager.get_audit_summary())
+        staff_summary = sum(count for _, _, count in manager.get_audit_summary(staff_ids[0]))
+        conn = sqlite3.connect(manager.db_path)
+        try:
+            live_staff = conn.execute('SELECT COUNT(*) FROM schedule_changes WHERE staff_id = ?', (staff_ids[0],)).fetchone()[0]
+        finally:
+            conn.close()
+        if summary_total != result['archived'] or staff_summary + live_staff != len(before_ids['staff']):
+            raise RuntimeError("summary counts do not match the archived rows")
+
+        # Cursors: newest page, the page that crosses into the archive, and deep in the archive
+        all_ids = before_ids['all']
+        live = after['schedule_changes_rows']
+        cursors = {'newest': None}
+        walked, cursor = 0, None
+        targets = {'crossing': max(0, live - args.page_size // 2), 'archive_mid': live + result['archived'] // 2,
+                   'archive_oldest': len(all_ids) - args.page_size}
+        for name, target in sorted(targets.items(), key=lambda item: item[1]):
+            while walked < target:
+                rows, cursor = manager.get_schedule_changes_page(before=cursor, limit=min(args.walk_page_size, target - walked))
+                walked += len(rows)
+            cursors[name] = cursor
+        latency = time_pages(manager, cursors, args.page_size, args.repeats)
+        segments = archive_stats(manager.audit_archive)
+    finally:
+        close_backend('sqlite', manager)
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+    report = {
+        'archive': dict(result, seconds=round(archive_seconds, 3), **segments),
+        'before': before,
+        'after': after,
+        'pages_identical': {name: len(ids) for name, ids in before_ids.items()},
+        'summary_rows_counted': summary_total,
+        'page_latency': latency,
+    }
+    print(f"📦 Archived {result['archived']} rows in {archive_seconds:.2f}s: db {before['db_bytes']} -> {after['db_bytes']} bytes, "
+          f"segments {segments['segment_bytes']} bytes ({segments['compression_ratio']}x)", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('audit_archive', params), 'run': report}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Audit write-behind benchmark - save latency with and without the outbox, and no lost audit rows across kill -9
+"""
+
+import sys
+import os
+import time
+import random
+import signal
+import sqlite3
+import argparse
+import threading
+import subprocess
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import open_backend, close_backend, summarize, report_meta, emit_report
+
+SCHEDULE_ACTIONS = ('ADD_SCHEDULE', 'UPDATE_SCHEDULE', 'CREATE_SCHEDULE')
+DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+
+def week_of(week_start, end_time):
+    """A full week for save_week_schedule, weekends off"""
+    return {day: {'is_working': day not in ('Sunday', 'Saturday'), 'start_time': '10:00', 'end_time': end_time,
+                  'date': week_start + timedelta(days=offset)}
+            for offset, day in enumerate(DAYS)}
+
+
+def next_sunday():
+    today = date.today()
+    return today + timedelta(days=(6 - today.weekday()) % 7 or 7)
+
+
+def write_loop(db, rng, week_start, stop_after=None):
+    """Keep changing schedules (and now and then adding staff) until killed or stop_after ops"""
+    staff_ids = [staff_id for staff_id, _ in db.get_all_staff()]
+    ops = 0
+    while stop_after is None or ops < stop_after:
+        ops += 1
+        if not staff_ids or rng.random() < 0.05:
+            staff_id = db.add_staff(f"Crash Staff {len(staff_ids) + 1} {rng.getrandbits(32):08x}")
+            if staff_id:
+                staff_ids.append(staff_id)
+            continue
+        staff_id = rng.choice(staff_ids)
+        end_time = rng.choice(['17:00', '17:30', '18:00', '18:30'])
+        if rng.random() < 0.5:
+            day = rng.randrange(7)
+            db.save_schedule(staff_id, DAYS[day], True, '10:00', end_time, week_start + timedelta(days=day), 'BENCH')
+        else:
+            expected = db.get_staff_schedule_for_week(staff_id, week_start)
+            db.save_week_schedule(staff_id, week_of(week_start, end_time), expected, 'BENCH')
+
+
+def run_child(db_path, seed, drain_interval):
+    """Writer process: bot-like writes plus a background drainer, until the parent kills it"""
+    import database
+    database.DATABASE_PATH = db_path
+    database.AUDIT_WRITE_BEHIND = True
+    with redirect_stdout(sys.stderr):
+        db = database.DatabaseManager()
+
+    def drain():
+        while True:
+            try:
+                db.drain_audit_outbox(limit=50)
+            except Exception:
+                pass
+            time.sleep(drain_interval)
+
+    threading.Thread(target=drain, daemon=True).start()
+    print('ready', flush=True)
+    with redirect_stdout(sys.stderr):
+        write_loop(db, random.Random(seed), next_sunday())
+
+
+def audit_invariants(db_path):
+    """Every committed write must have exactly one audit row.
+
+    Each schedule write bumps the row version by one (new rows start at 1) and
+    logs one schedule action, so SUM(version) must equal the schedule audit rows.
+    Staff are never removed here, so ADD_STAFF rows must equal the staff count.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(SUM(version), 0) FROM schedules')
+        schedule_writes = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM schedule_changes WHERE action IN (?, ?, ?)', SCHEDULE_ACTIONS)
+        schedule_rows = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM staff')
+        staff = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM schedule_changes WHERE action = 'ADD_STAFF'")
+        staff_rows = cursor.fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        'schedule_writes': schedule_writes,
+        'schedule_audit_rows': schedule_rows,
+        'staff': staff,
+        'add_staff_audit_rows': staff_rows,
+        'lost': max(0, schedule_writes - schedule_rows) + max(0, staff - staff_rows),
+        'duplicated': max(0, schedule_rows - schedule_writes) + max(0, staff_rows - staff),
+    }
+
+
+def crash_rounds(args):
+    """Start the writer, kill -9 it at a random moment, restart - repeat, then flush and check"""
+    manager = open_backend('sqlite')
+    manager.audit_write_behind = True
+    rng = random.Random(args.seed)
+    pending_after_kill = []
+    try:
+        for round_index in range(args.rounds):
+            child = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--child', manager.db_path,
+                 '--seed', str(args.seed + round_index), '--drain-interval-ms', str(args.drain_interval_ms)],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+            child.stdout.readline()  # ready
+            time.sleep(rng.uniform(args.min_run_ms, args.max_run_ms) / 1000.0)
+            child.send_signal(signal.SIGKILL)
+            child.wait()
+            pending_after_kill.append(manager.count_audit_outbox())
+
+        # What the restarted bot does first: drain whatever the dead process left behind
+        before = audit_invariants(manager.db_path)
+        recovered = manager.flush_audit_log()
+        after = audit_invariants(manager.db_path)
+    finally:
+        close_backend('sqlite', manager)
+
+    return {
+        'rounds': args.rounds,
+        'outbox_rows_left_by_kill': pending_after_kill,
+        'audit_rows_recovered_on_restart': recovered,
+        'before_restart_flush': before,
+        'after_restart_flush': after,
+    }
+
+
+def time_saves(write_behind, args):
+    """Per-call latency of the interactive save paths, outbox drained in the background"""
+    manager = open_backend('sqlite')
+    manager.audit_write_behind = write_behind
+    stop = threading.Event()
+
+    def drain():
+        while not stop.is_set():
+            manager.drain_audit_outbox()
+            stop.wait(args.flush_interval_ms / 1000.0)
+
+    drainer = threading.Thread(target=drain, daemon=True) if write_behind else None
+    week_start = next_sunday()
+    samples = {'save_schedule': [], 'save_week_schedule': [], 'add_staff': []}
+    try:
+        with redirect_stdout(sys.stderr):
+            staff_ids = [manager.add_staff(f"Latency Staff {i}") for i in range(args.staff)]
+            if drainer:
+                drainer.start()
+            for i in range(args.repeats):
+                staff_id = staff_ids[i % len(staff_ids)]
+                end_time = '17:00' if i % 2 else '18:00'
+
+                started = time.perf_counter()
+                manager.save_schedule(staff_id, DAYS[i % 7], True, '10:00', end_time, week_start + timedelta(days=i % 7), 'BENCH')
+                samples['save_schedule'].append((time.perf_counter() - started) * 1000.0)
+
+                expected = manager.get_staff_schedule_for_week(staff_id, week_start)
+                started = time.perf_counter()
+                manager.save_week_schedule(staff_id, week_of(week_start, '17:30' if i % 2 else '18:30'), expected, 'BENCH')
+                samples['save_week_schedule'].append((time.perf_counter() - started) * 1000.0)
+
+                if i % 10 == 0:
+                    started = time.perf_counter()
+                    manager.add_staff(f"Latency Extra {i}")
+                    samples['add_staff'].append((time.perf_counter() - started) * 1000.0)
+            stop.set()
+            if drainer:
+                drainer.join()
+            flushed = manager.flush_audit_log() if write_behind else 0
+            invariants = audit_invariants(manager.db_path)
+    finally:
+        close_backend('sqlite', manager)
+
+    return {
+        'audit_write_behind': write_behind,
+        'latency': {name: summarize(values) for name, values in samples.items()},
+        'flushed_at_shutdown': flushed,
+        'invariants': invariants,
+    }
+
+
+def main():
+    """Time the save paths in both audit modes, run the crash rounds, emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rounds', type=int, default=10, help='kill -9 / restart cycles')
+    parser.add_argument('--min-run-ms', type=float, default=200.0)
+    parser.add_argument('--max-run-ms', type=float, default=1200.0)
+    parser.add_argument('--drain-interval-ms', type=float, default=20.0, help='drainer pause in the killed writer')
+    parser.add_argument('--flush-interval-ms', type=float, default=2000.0, help='drainer pause while timing saves')
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--staff', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--child', metavar='DB_PATH', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.seed, args.drain_interval_ms / 1000.0)
+        return
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    runs = [time_saves(write_behind, args) for write_behind in (False, True)]
+    for run in runs:
+        latency = run['latency']
+        print(f"📝 write-behind {'on ' if run['audit_write_behind'] else 'off'}: "
+              f"save_schedule p50 {latency['save_schedule'].get('p50_ms')} ms, "
+              f"save_week_schedule p50 {latency['save_week_schedule'].get('p50_ms')} ms", file=sys.stderr)
+
+    crash = crash_rounds(args)
+    after = crash['after_restart_flush']
+    print(f"💥 {args.rounds} kills: {crash['audit_rows_recovered_on_restart']} audit rows recovered on restart, "
+          f"{after['lost']} lost, {after['duplicated']} duplicated", file=sys.stderr)
+
+    params = {k: v for k, v in vars(args).items() if k not in ('output', 'child')}
+    emit_report({'meta': report_meta('audit_write_behind', params), 'runs': runs, 'crash': crash}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Audit log paging benchmark - keyset pages vs LIMIT/OFFSET at increasing depth into schedule_changes
+"""
+
+import sys
+import os
+import time
+import random
+import sqlite3
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import open_backend, close_backend, summarize, report_meta, emit_report
+from benchmarks.load_conversations import parse_int_list
+
+ACTIONS = ['UPDATE_SCHEDULE', 'UPDATE_SCHEDULE', 'UPDATE_SCHEDULE', 'CREATE_SCHEDULE', 'ADD_STAFF']
+DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+
+def seed_changes(db_path, staff_ids, rows, seed, started=datetime(2026, 1, 1), step_minutes=3):
+    """rows audit entries, one every step_minutes or so from started on"""
+    rng = random.Random(seed)
+    batch = []
+    conn = sqlite3.connect(db_path)
+    try:
+        for i in range(rows):
+            changed_at = (started + timedelta(minutes=step_minutes * i + rng.randrange(3))).strftime('%Y-%m-%d %H:%M:%S')
+            batch.append((rng.choice(staff_ids), rng.choice(ACTIONS), rng.choice(DAYS), None,
+                          '{"is_working": true, "start_time": "10:00", "end_time": "18:00"}', 'BENCH', changed_at))
+            if len(batch) == 5000:
+                conn.executemany('''
+                    INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by, changed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', batch)
+                batch = []
+        if batch:
+            conn.executemany('''
+                INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by, changed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+        conn.commit()
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+
+
+def offset_page(db_path, where, params, page_size, offset):
+    """The OFFSET query a naive pager would run for the same page"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f'''
+            SELECT sc.id, s.name, sc.action, sc.day_of_week, sc.old_data, sc.new_data, sc.changed_by, sc.changed_at
+            FROM schedule_changes sc
+            LEFT JOIN staff s ON sc.staff_id = s.id
+            {where}
+            ORDER BY sc.changed_at DESC, sc.id DESC
+            LIMIT ? OFFSET ?
+        ''', params + [page_size, offset]).fetchall()
+    finally:
+        conn.close()
+
+
+def time_depths(manager, filters, args):
+    """Per-page latency at each depth for one filter, both ways"""
+    where, params = '', []
+    if filters.get('staff_id') is not None:
+        where, params = 'WHERE sc.staff_id = ?', [filters['staff_id']]
+    elif filters.get('action'):
+        where, params = 'WHERE sc.action = ?', [filters['action']]
+
+    results = {}
+    for depth in args.depths:
+        # Cursor of the page before this one: last row of the previous page (setup, not timed)
+        cursor = None
+        if depth > 1:
+            previous = offset_page(manager.db_path, where, params, 1, (depth - 1) * args.page_size - 1)
+            if not previous:
+                results[str(depth)] = {'status': 'beyond_history'}
+                continue
+            cursor = (previous[0][7], previous[0][0])
+
+        keyset, offset = [], []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            rows, _ = manager.get_schedule_changes_page(before=cursor, limit=args.page_size, **filters)
+            keyset.append((time.perf_counter() - started) * 1000.0)
+
+            started = time.perf_counter()
+            expected = offset_page(manager.db_path, where, params, args.page_size, (depth - 1) * args.page_size)
+            offset.append((time.perf_counter() - started) * 1000.0)
+
+        if [row[0] for row in rows] != [row[0] for row in expected]:
+            raise RuntimeError(f"keyset page {depth} differs from OFFSET page for {filters}")
+        results[str(depth)] = {'keyset': summarize(keyset), 'offset': summarize(offset)}
+    return results
+
+
+def main():
+    """Seed a large audit log and time pages at each depth"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=200000, help='audit rows to seed')
+    parser.add_argument('--staff', type=int, default=40)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--depths', type=parse_int_list, default=[1, 10, 100, 1000, 10000], help='page numbers to time')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    manager = open_backend('sqlite')
+    try:
+        with redirect_stdout(sys.stderr):
+            staff_ids = [manager.add_staff(f"Audit Staff {i:03d}") for i in range(args.staff)]
+        print(f"🌱 Seeding {args.rows} audit rows", file=sys.stderr)
+        seed_changes(manager.db_path, staff_ids, args.rows, args.seed)
+
+        runs = {}
+        for name, filters in (('all', {}), ('staff', {'staff_id': staff_ids[0]}), ('action', {'action': 'CREATE_SCHEDULE'})):
+            runs[name] = time_depths(manager, filters, args)
+            for depth, result in runs[name].items():
+                if 'keyset' in result:
+                    print(f"   📄 {name:<6} page {depth:>6}: keyset p50 {result['keyset']['p50_ms']} ms, "
+                          f"OFFSET p50 {result['offset']['p50_ms']} ms", file=sys.stderr)
+    finally:
+        close_backend('sqlite', manager)
+
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('audit_pages', params), 'runs': runs}, args.output)
+
+
+if __name__ == "__main__":
+    main()
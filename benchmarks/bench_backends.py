@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Backend benchmark - times the public database manager methods on synthetic data
+"""
+
+import sys
+import os
+import logging
+import argparse
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DAYS_OF_WEEK
+from benchmarks.common import (
+    BACKENDS, BackendUnavailable, open_backend, close_backend,
+    summarize, time_call, report_meta, emit_report
+)
+from benchmarks.synthetic_data import generate_dataset, load_dataset, build_week_payload, FULL_SHIFTS
+
+
+def _bench_reads(manager, dataset, repeat):
+    """Read-path methods, each timed repeat times"""
+    current_week_start = dataset['current_week_start']
+    cases = {
+        'get_all_schedules': lambda: manager.get_all_schedules(),
+        'get_current_week_schedules': lambda: manager.get_current_week_schedules(current_week_start),
+        'get_schedule_history': lambda: manager.get_schedule_history(),
+        'get_recent_activity': lambda: manager.get_recent_activity(7),
+    }
+    results = {}
+    for name, call in cases.items():
+        if not hasattr(manager, name):
+            results[name] = {'status': 'unsupported'}
+            continue
+        samples = []
+        rows = None
+        try:
+            for _ in range(repeat):
+                elapsed, result = time_call(call)
+                samples.append(elapsed)
+                rows = len(result) if hasattr(result, '__len__') else None
+            results[name] = dict(status='ok', rows=rows, **summarize(samples))
+        except Exception as e:
+            results[name] = {'status': 'error', 'error': str(e)}
+    return results
+
+
+def _bench_writes(manager, dataset, staff_ids, repeat):
+    """Write-path methods; every call is a real change, not a no-op"""
+    results = {}
+    current_week_start = dataset['current_week_start']
+
+    # save_schedule: cycle through staff and days of the current week
+    samples = []
+    try:
+        for i in range(repeat):
+            staff_id = staff_ids[i % len(staff_ids)]
+            day_index = i % 7
+            start, end = FULL_SHIFTS[i % len(FULL_SHIFTS)]
+            schedule_date = (current_week_start + timedelta(days=day_index)).strftime('%Y-%m-%d')
+            elapsed, _ = time_call(
+                manager.save_schedule, staff_id, DAYS_OF_WEEK[day_index], True, start, end, schedule_date
+            )
+            samples.append(elapsed)
+        results['save_schedule'] = dict(status='ok', **summarize(samples))
+    except Exception as e:
+        results['save_schedule'] = {'status': 'error', 'error': str(e)}
+
+    # save_bulk_schedules: one full week for every staff member (next week)
+    if not hasattr(manager, 'save_bulk_schedules'):
+        results['save_bulk_schedules'] = {'status': 'unsupported'}
+        return results
+
+    staff_rows = [(staff_id, f"staff {staff_id}") for staff_id in staff_ids]
+    next_week_start = current_week_start + timedelta(days=7)
+    samples = []
+    try:
+        for i in range(max(1, repeat // 4)):
+            payload = build_week_payload(staff_rows, next_week_start, variant=i)
+            elapsed, result = time_call(
+                manager.save_bulk_schedules, payload, next_week_start.strftime('%Y-%m-%d'), 'BENCH'
+            )
+            if isinstance(result, tuple) and not result[0]:
+                raise Exception(f"bulk save failed: {result[2]}")
+            samples.append(elapsed)
+        results['save_bulk_schedules'] = dict(
+            status='ok', cells_per_call=len(staff_ids) * 7, **summarize(samples)
+        )
+    except Exception as e:
+        results['save_bulk_schedules'] = {'status': 'error', 'error': str(e)}
+    return results
+
+
+def run_backend(backend, staff_count, weeks, repeat, seed):
+    """Load a dataset into one backend and time every method"""
+    try:
+        manager = open_backend(backend)
+    except BackendUnavailable as e:
+        return {'status': 'skipped', 'reason': str(e)}
+
+    try:
+        dataset = generate_dataset(staff_count, weeks, seed)
+        elapsed, counts = time_call(load_dataset, manager, dataset, backend)
+        staff_ids = counts.pop('staff_ids')
+        methods = _bench_reads(manager, dataset, repeat)
+        methods.update(_bench_writes(manager, dataset, staff_ids, repeat))
+        return {
+            'status': 'ok',
+            'dataset': dict(counts, load_ms=round(elapsed, 3)),
+            'methods': methods,
+        }
+    finally:
+        close_backend(backend, manager)
+
+
+def parse_int_list(value):
+    """Parse '10,50,200' into [10, 50, 200]"""
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+def main():
+    """Run the benchmark grid and emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help='comma separated: sqlite,mysql,postgres')
+    parser.add_argument('--staff', type=parse_int_list, default=[25], help='staff counts, e.g. 10,50')
+    parser.add_argument('--weeks', type=parse_int_list, default=[12], help='week counts, e.g. 4,52')
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per method')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+
+    runs = []
+    for backend in backends:
+        for staff_count in args.staff:
+            for weeks in args.weeks:
+                print(f"⏱️  {backend}: {staff_count} staff x {weeks} weeks", file=sys.stderr)
+                result = run_backend(backend, staff_count, weeks, args.repeat, args.seed)
+                if result['status'] == 'skipped':
+                    print(f"⚠️  {backend} skipped: {result['reason']}", file=sys.stderr)
+                runs.append(dict(backend=backend, staff=staff_count, weeks=weeks, **result))
+
+    report = {
+        'meta': report_meta('backends', vars(args)),
+        'runs': runs,
+    }
+    emit_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Chat fairness check - a chat with a backlog of updates must not hold up updates from other chats
+"""
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report_meta, emit_report
+from update_processor import PerChatUpdateProcessor
+
+
+def chat_update(chat_id):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), effective_user=None)
+
+
+async def run(args):
+    """Queue backlog updates from chat 1, then one from chat 2; time both"""
+    processor = PerChatUpdateProcessor(args.slots)
+    order, running, most_running = [], {1: 0}, [0]
+
+    async def handle(chat_id, number):
+        if chat_id == 1:
+            running[1] += 1
+            most_running[0] = max(most_running[0], running[1])
+        await asyncio.sleep(args.handler_ms / 1000.0)
+        if chat_id == 1:
+            running[1] -= 1
+        order.append((chat_id, number))
+
+    started = time.perf_counter()
+    async with processor:
+        backlog = [asyncio.create_task(processor.process_update(chat_update(1), handle(1, number)))
+                   for number in range(args.backlog)]
+        await asyncio.sleep(0)
+        other = asyncio.create_task(processor.process_update(chat_update(2), handle(2, 0)))
+        await other
+        other_ms = (time.perf_counter() - started) * 1000.0
+        backlog_done_before_other = sum(1 for chat_id, _ in order if chat_id == 1)
+        await asyncio.gather(*backlog)
+        while processor.active_chats():
+            await asyncio.sleep(args.handler_ms / 1000.0)
+    backlog_ms = (time.perf_counter() - started) * 1000.0
+    in_order = [number for chat_id, number in order if chat_id == 1] == list(range(args.backlog))
+    return {
+        'other_chat_ms': round(other_ms, 1),
+        'backlog_ms': round(backlog_ms, 1),
+        'backlog_done_before_other': backlog_done_before_other,
+        'backlog_slots_used': most_running[0],
+        'backlog_in_order': in_order,
+        'other_not_blocked': backlog_done_before_other < args.backlog and other_ms < args.handler_ms * 3,
+    }
+
+
+def main():
+    """Run the check and emit a JSON report; exits 1 if the second chat waited for the backlog"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--slots', type=int, default=4, help='MAX_CONCURRENT_UPDATES')
+    parser.add_argument('--backlog', type=int, default=50, help='updates queued by the busy chat')
+    parser.add_argument('--handler-ms', type=float, default=20.0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    result = asyncio.run(run(args))
+    print(f"   ⏱️ other chat answered in {result['other_chat_ms']} ms after "
+          f"{result['backlog_done_before_other']} of {args.backlog} backlog updates; "
+          f"backlog used {result['backlog_slots_used']} slot(s), in order: {result['backlog_in_order']}", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('chat_fairness', params), **result}, args.output)
+    if not (result['other_not_blocked'] and result['backlog_in_order'] and result['backlog_slots_used'] == 1):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
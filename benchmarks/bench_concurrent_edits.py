@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Concurrent edit benchmark - two admins edit the same staff week; the second save must be rejected, not lost
+"""
+
+import sys
+import os
+import time
+import asyncio
+import logging
+import argparse
+import warnings
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import open_backend, close_backend, use_backend_for_bot, summarize, report_meta, emit_report
+from benchmarks.synthetic_data import generate_dataset, load_dataset
+from benchmarks.fake_bot_api import FakeBotAPI, FAKE_TOKEN
+from benchmarks.load_conversations import (
+    FIRST_ADMIN_ID, COMPLETION_GROUP, UpdateTracker, SimulatedAdmin, JourneyError, fill_week
+)
+
+
+async def edit_until_save(admin, staff_id=None):
+    """Walk Set Schedule (or the reloaded week) up to the summary with the Save button"""
+    if staff_id is not None:
+        await admin.command('/start', 'start')
+        await admin.click('set_schedule', 'open_set_schedule')
+        if admin.offers('select_week_all_after_next'):
+            await admin.click('select_week_all_after_next', 'pick_week')
+        await admin.click(f'schedule_{staff_id}', 'pick_staff')
+
+    await fill_week(admin)
+    if not admin.offers('save_schedule'):
+        raise JourneyError("summary with Save not reached")
+
+
+async def run_pair(first, second, staff_id, outcome):
+    """Both admins open the same week, first saves, then second saves"""
+    await asyncio.gather(edit_until_save(first, staff_id), edit_until_save(second, staff_id))
+
+    await first.click('save_schedule', 'save_first')
+    first.expect_text('Schedule saved', 'All Staff Scheduled', step='save_first')
+
+    await second.click('save_schedule', 'save_second')
+    if 'Someone else changed' not in second.text:
+        outcome['overwritten'] += 1
+        return
+    outcome['conflicts_detected'] += 1
+
+    # Reload picks up the first admin's version; editing from there saves cleanly
+    await second.click('reload_schedule', 'reload')
+    await edit_until_save(second)
+    await second.click('save_schedule', 'save_after_reload')
+    second.expect_text('Schedule saved', 'All Staff Scheduled', step='save_after_reload')
+    outcome['saved_after_reload'] += 1
+
+
+def time_week_saves(db, staff_ids, week_start, repeats):
+    """Per-day save_schedule calls vs one versioned save_week_schedule, same data"""
+    week = {}
+    for offset, day in enumerate(['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']):
+        week[day] = {'is_working': day not in ('Sunday', 'Saturday'), 'start_time': '10:00', 'end_time': '18:00',
+                     'date': week_start + timedelta(days=offset)}
+
+    per_day, versioned = [], []
+    for i in range(repeats):
+        staff_id = staff_ids[i % len(staff_ids)]
+        # Alternate the end time so every save really changes all working days
+        for data in week.values():
+            data['end_time'] = '18:00' if i % 2 else '17:00'
+        started = time.perf_counter()
+        for day, data in week.items():
+            db.save_schedule(staff_id, day, data['is_working'], data['start_time'] if data['is_working'] else None,
+                             data['end_time'] if data['is_working'] else None, data['date'], 'BENCH')
+        per_day.append((time.perf_counter() - started) * 1000.0)
+
+        for data in week.values():
+            data['end_time'] = '17:30' if i % 2 else '18:30'
+        expected = db.get_staff_schedule_for_week(staff_id, week_start)
+        started = time.perf_counter()
+        db.save_week_schedule(staff_id, week, expected, 'BENCH')
+        versioned.append((time.perf_counter() - started) * 1000.0)
+    return {'per_day_save_schedule': summarize(per_day), 'save_week_schedule': summarize(versioned)}
+
+
+async def run(args, bot_class):
+    manager = open_backend('sqlite')
+    api = FakeBotAPI(latency_ms=args.api_latency_ms)
+    await api.start()
+    tracker = UpdateTracker()
+    samples = {}
+    outcome = {'pairs': args.pairs, 'conflicts_detected': 0, 'overwritten': 0, 'saved_after_reload': 0}
+    failures = []
+    try:
+        use_backend_for_bot(manager)
+        bot = bot_class()
+        dataset = generate_dataset(max(args.staff, args.pairs), args.weeks, args.seed,
+                                   anchor=date.today() + timedelta(days=7))
+        staff_ids = load_dataset(manager, dataset, 'sqlite')['staff_ids']
+
+        application = bot.build_application(token=FAKE_TOKEN, base_url=api.url)
+        from telegram import Update
+        from telegram.ext import TypeHandler
+        application.add_handler(TypeHandler(Update, tracker.on_processed), group=COMPLETION_GROUP)
+        application.add_error_handler(tracker.on_error)
+
+        admin_ids = [FIRST_ADMIN_ID + i for i in range(args.pairs * 2)]
+        import bot_async
+        bot_async.ADMIN_IDS[:] = sorted(set(bot_async.ADMIN_IDS) | set(admin_ids))
+
+        await application.initialize()
+        await application.start()
+        admins = [SimulatedAdmin(admin_id, application, api, tracker, args.step_timeout, samples)
+                  for admin_id in admin_ids]
+
+        async def guarded(index):
+            try:
+                await run_pair(admins[2 * index], admins[2 * index + 1], staff_ids[index], outcome)
+            except JourneyError as e:
+                if len(failures) < 10:
+                    failures.append(str(e))
+
+        await asyncio.gather(*(guarded(index) for index in range(args.pairs)))
+        await application.stop()
+        await application.shutdown()
+
+        week_start = date.today() + timedelta(days=28)
+        week_start -= timedelta(days=(week_start.weekday() + 1) % 7)  # Sunday
+        saves = time_week_saves(bot.db, staff_ids, week_start, args.save_repeats)
+    finally:
+        await api.stop()
+        close_backend('sqlite', manager)
+
+    return {
+        'outcome': outcome,
+        'save_step_latency': {step: summarize(values) for step, values in samples.items()
+                              if step.startswith('save') or step == 'reload'},
+        'week_save_ms': saves,
+        'failures': failures,
+    }
+
+
+def main():
+    """Run the concurrent edit scenario and emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--pairs', type=int, default=5, help='admin pairs, each pair edits one staff member')
+    parser.add_argument('--staff', type=int, default=8)
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--save-repeats', type=int, default=50)
+    parser.add_argument('--api-latency-ms', type=float, default=5.0)
+    parser.add_argument('--step-timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', message='.*per_message.*')
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    async def run_quietly():
+        with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stderr if args.verbose else devnull):
+            from bot_async import StaffSchedulerBot
+            if not args.verbose:
+                logging.getLogger().setLevel(logging.WARNING)
+            return await run(args, StaffSchedulerBot)
+
+    result = asyncio.run(run_quietly())
+    outcome = result['outcome']
+    print(f"🤝 {outcome['conflicts_detected']}/{outcome['pairs']} conflicting saves rejected, "
+          f"{outcome['overwritten']} overwritten, {outcome['saved_after_reload']} saved after reload", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('concurrent_edits', params), 'run': result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Health probe benchmark - probe / and /health latency while admins drive the bot through the webhook
+"""
+
+import sys
+import os
+import time
+import asyncio
+import logging
+import argparse
+import warnings
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import (
+    open_backend, close_backend, use_backend_for_bot, summarize, report_meta, emit_report
+)
+from benchmarks.synthetic_data import generate_dataset, load_dataset
+from benchmarks.fake_bot_api import FakeBotAPI, FAKE_TOKEN
+from benchmarks.load_conversations import (
+    FIRST_ADMIN_ID, COMPLETION_GROUP, JOURNEYS, UpdateTracker, JourneyError
+)
+from benchmarks.bench_workers import WebhookAdmin
+
+
+async def probe(client, url, interval, stop, samples, failures):
+    """GET url every interval seconds until stop is set"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code != 200:
+                failures.append(response.status_code)
+        except Exception as e:
+            failures.append(type(e).__name__)
+        samples.append((time.perf_counter() - started) * 1000.0)
+        await asyncio.sleep(interval)
+
+
+async def probe_phase(client, base_url, interval, duration=None, until=None):
+    """Probe / and /health for duration seconds, or until the until-awaitable finishes"""
+    stop = asyncio.Event()
+    results = {path: ([], []) for path in ('/', '/health')}
+    probes = [asyncio.create_task(probe(client, base_url + path, interval, stop, samples, failures))
+              for path, (samples, failures) in results.items()]
+    if until is not None:
+        await until
+    else:
+        await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*probes)
+    return {path: dict(summarize(samples), failures=len(failures)) for path, (samples, failures) in results.items()}
+
+
+async def run(args, bot_class):
+    import httpx
+
+    manager = open_backend(args.backend)
+    api = FakeBotAPI(latency_ms=args.api_latency_ms)
+    await api.start()
+    tracker = UpdateTracker()
+    samples = {}
+    journey_results = {name: {'completed': 0, 'failed': 0} for name in args.journeys}
+    failures = []
+    try:
+        use_backend_for_bot(manager)
+        bot = bot_class()
+        dataset = generate_dataset(args.staff, args.weeks, args.seed, anchor=date.today() + timedelta(days=7))
+        staff_ids = load_dataset(manager, dataset, args.backend)['staff_ids']
+
+        application = bot.build_application(token=FAKE_TOKEN, base_url=api.url)
+        from telegram import Update
+        from telegram.ext import TypeHandler
+        application.add_handler(TypeHandler(Update, tracker.on_processed), group=COMPLETION_GROUP)
+        application.add_error_handler(tracker.on_error)
+
+        admin_ids = [FIRST_ADMIN_ID + i for i in range(args.admins)]
+        import bot_async
+        bot_async.ADMIN_IDS[:] = sorted(set(bot_async.ADMIN_IDS) | set(admin_ids))
+
+        await application.initialize()
+        await application.start()
+        server = bot.build_web_server(application, '/webhook')
+        port = await server.start('127.0.0.1', 0)
+        base_url = f"http://127.0.0.1:{port}"
+
+        interval = args.probe_interval_ms / 1000.0
+        # Separate clients: probes must not queue behind webhook connections
+        async with httpx.AsyncClient(timeout=30) as probe_client, \
+                httpx.AsyncClient(timeout=args.step_timeout,
+                                  limits=httpx.Limits(max_connections=40, max_keepalive_connections=40)) as client:
+            idle = await probe_phase(probe_client, base_url, interval, duration=args.idle_seconds)
+
+            admins = [WebhookAdmin(admin_id, client, base_url + '/webhook', api, tracker, args.step_timeout, samples)
+                      for admin_id in admin_ids]
+
+            async def run_admin(admin):
+                for name in args.journeys:
+                    try:
+                        await JOURNEYS[name](admin, staff_ids[:args.staff_per_journey])
+                        journey_results[name]['completed'] += 1
+                    except JourneyError as e:
+                        journey_results[name]['failed'] += 1
+                        if len(failures) < 10:
+                            failures.append(f"{name}: {e}")
+
+            started = time.perf_counter()
+            load = asyncio.gather(*(run_admin(admin) for admin in admins))
+            busy = await probe_phase(probe_client, base_url, interval, until=load)
+            wall = time.perf_counter() - started
+
+        await server.stop()
+        await application.stop()
+        await application.shutdown()
+    finally:
+        await api.stop()
+        close_backend(args.backend, manager)
+
+    updates = sum(admin.updates_sent for admin in admins)
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        'admins': args.admins,
+        'wall_s': round(wall, 3),
+        'updates_per_s': round(updates / wall, 2) if wall else None,
+        'journeys': journey_results,
+        'update_latency': summarize(all_samples),
+        'probes_idle': idle,
+        'probes_busy': busy,
+        'failures': failures,
+    }
+
+
+def main():
+    """Run the probe benchmark and emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--admins', type=int, default=20)
+    parser.add_argument('--journeys', default='set_schedule,mirror,pdf',
+                        help=f"comma separated, from: {', '.join(JOURNEYS)}")
+    parser.add_argument('--backend', default='sqlite')
+    parser.add_argument('--staff', type=int, default=8)
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--staff-per-journey', type=int, default=2)
+    parser.add_argument('--api-latency-ms', type=float, default=30.0)
+    parser.add_argument('--probe-interval-ms', type=float, default=100.0)
+    parser.add_argument('--idle-seconds', type=float, default=3.0)
+    parser.add_argument('--step-timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    args.journeys = [name.strip() for name in args.journeys.split(',') if name.strip()]
+    warnings.filterwarnings('ignore', message='.*per_message.*')
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    async def run_quietly():
+        with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stderr if args.verbose else devnull):
+            from bot_async import StaffSchedulerBot
+            if not args.verbose:
+                logging.getLogger().setLevel(logging.WARNING)
+            return await run(args, StaffSchedulerBot)
+
+    result = asyncio.run(run_quietly())
+    busy = result['probes_busy']
+    print(f"🩺 / p95 {result['probes_idle']['/'].get('p95_ms')} ms idle -> {busy['/'].get('p95_ms')} ms busy, "
+          f"/health p95 {busy['/health'].get('p95_ms')} ms busy, "
+          f"{busy['/']['failures'] + busy['/health']['failures']} failed probes", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('health_probes', params), 'run': result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Inline lookup check - every query must give results with unique ids, or Telegram rejects the whole answer
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import summarize, report_meta, emit_report
+from benchmarks.bench_mirror import SHIFTS
+from config import DAYS_OF_WEEK
+from schedule_lookup import WeekIndex, parse_query
+
+# Queries that repeat a time, day or name, next to plain ones
+QUERIES = ['17 17:00', '9 0900 9:00', '17:00 17 fri', 'fri fri', 'mon monday', 'ann ann', 'ann 17 17',
+           '10', 'sat', 'today', 'next', '']
+
+
+def build_index(rng, staff, week_start):
+    """A WeekIndex over random shifts for staff people"""
+    names = [(staff_id, f"{rng.choice(['Ann', 'Bea', 'Cy', 'Dee'])} Staff{staff_id}") for staff_id in range(1, staff + 1)]
+    rows = []
+    for staff_id, name in names:
+        for offset, day in enumerate(DAYS_OF_WEEK):
+            working = rng.random() < 0.7
+            shift = rng.choice(SHIFTS)
+            rows.append((name, staff_id, day, week_start + timedelta(days=offset), working,
+                         shift[0] if working else '', shift[1] if working else ''))
+    return WeekIndex(week_start, names, rows)
+
+
+def main():
+    """Answer each query against a random week, emit a JSON report; exits 1 if any answer repeats a result id"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--staff', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    week_start = date(2030, 1, 6)  # A Sunday
+    index = build_index(random.Random(args.seed), args.staff, week_start)
+    today = week_start + timedelta(days=3)
+    duplicated, timings = {}, []
+    for query in QUERIES:
+        _, days, times, names = parse_query(query, today)
+        started = time.perf_counter()
+        results = index.search(days, times, names, DAYS_OF_WEEK[(today.weekday() + 1) % 7])
+        timings.append((time.perf_counter() - started) * 1000.0)
+        ids = [result[0] for result in results]
+        if len(ids) != len(set(ids)):
+            duplicated[query] = sorted({result_id for result_id in ids if ids.count(result_id) > 1})
+
+    print(f"   🔎 {len(QUERIES)} queries, {len(duplicated)} with repeated result ids", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('inline_lookup', params), 'queries': len(QUERIES), 'search': summarize(timings),
+                 'duplicated_ids': duplicated}, args.output)
+    if duplicated:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Keyboard render cache benchmark - CPU per tap to build a time picker against fetching it prebuilt
+"""
+
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentile, report_meta, emit_report
+from keyboards import (
+    RenderCache, time_picker, end_time_row, time_grid,
+    DAY_START_TIMES, QUARTER_HOURS, TIME_RANGES, PICK_DAY_TIME_TEXT, ALL_SELECTED_TEXT
+)
+
+CANCEL = ((("❌ Cancel", "cancel_time_setting"),),)
+BACK_EDIT = ("🔙 Back to Edit Options", "back_to_edit_selected")
+
+# (name, builder, arguments, text template or None, template fields) - one per picker the bot shows
+PICKERS = [
+    ('time_picker', time_picker, ("start_", "end_", "10:00", "18:00", CANCEL), None, None),
+    ('end_time_row', end_time_row, ("18:00",), None, None),
+    ('day_start_grid', time_grid, (DAY_START_TIMES, "edit_start_Monday_", 3, ("🔙 Back to Day Edit", "back_to_day_edit")),
+     PICK_DAY_TIME_TEXT, {'label': "Start", 'day': "Monday", 'staff_name': "Asal", 'choice': "a start time"}),
+    ('quarter_hour_grid', time_grid, (QUARTER_HOURS, "set_start_all_", 3, BACK_EDIT),
+     ALL_SELECTED_TEXT, {'icon': "🕐", 'label': "Start Time", 'staff_name': "Asal", 'days': "Monday, Tuesday",
+                         'choice': "a start time"}),
+    ('time_range_grid', time_grid, (TIME_RANGES, "set_both_all_", 2, BACK_EDIT), None, None),
+]
+
+
+def per_call_us(func, calls):
+    """Mean microseconds of CPU per call over calls calls"""
+    started = time.process_time()
+    for _ in range(calls):
+        func()
+    return (time.process_time() - started) * 1e6 / calls
+
+
+def summarize_us(samples):
+    return {'count': len(samples), 'p50_us': round(percentile(samples, 50), 2), 'p99_us': round(percentile(samples, 99), 2)}
+
+
+def main():
+    """Time every picker built from scratch and fetched from a RenderCache, emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--calls', type=int, default=2000, help='calls per sample')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    cache = RenderCache()
+    runs = {}
+    for name, build, build_args, template, fields in PICKERS:
+        built, cached = [], []
+        cache.get(build, *build_args)
+        for _ in range(args.repeats):
+            if template:
+                built.append(per_call_us(lambda: (template.format(**fields), build(*build_args)), args.calls))
+                cached.append(per_call_us(lambda: (template.format(**fields), cache.get(build, *build_args)), args.calls))
+            else:
+                built.append(per_call_us(lambda: build(*build_args), args.calls))
+                cached.append(per_call_us(lambda: cache.get(build, *build_args), args.calls))
+        runs[name] = {
+            'buttons': sum(len(row) for row in build(*build_args).inline_keyboard),
+            'built': summarize_us(built),
+            'cached': summarize_us(cached),
+            'saved_us_per_tap': round(percentile(built, 50) - percentile(cached, 50), 2),
+        }
+        print(f"   ⏱️ {name:<18} built p50 {runs[name]['built']['p50_us']} µs, "
+              f"cached p50 {runs[name]['cached']['p50_us']} µs ({runs[name]['buttons']} buttons)", file=sys.stderr)
+
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('keyboards', params), 'runs': runs, 'cache': cache.metrics()}, args.output)
+
+
+if __name__ == "__main__":
+    main()
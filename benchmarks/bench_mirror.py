@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Week mirror benchmark - set-based mirror_week against the per-day bulk save the bot used before
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BackendUnavailable, open_backend, close_backend, summarize, report_meta, emit_report
+from config import DAYS_OF_WEEK
+from validators import ScheduleValidator
+
+SHIFTS = [('09:45', '18:00'), ('10:00', '18:00'), ('11:00', '19:00'), ('13:00', '21:00')]
+
+
+def week_rows(manager, week_start):
+    """{(staff_id, day): (is_working, start, end)} for one week, times normalised"""
+    rows = {}
+    for _, staff_id, day, _, is_working, start_time, end_time in manager.get_current_week_schedules(week_start):
+        rows[(staff_id, day)] = (bool(is_working), ScheduleValidator._format_time_value(start_time) or '',
+                                 ScheduleValidator._format_time_value(end_time) or '')
+    return rows
+
+
+def bulk_data(manager, source_week_start, target_week_start):
+    """The source week as the bot's bulk save takes it (the pre-mirror_week path)"""
+    staff = {}
+    for name, staff_id, day, _, is_working, start_time, end_time in manager.get_current_week_schedules(source_week_start):
+        schedule = staff.setdefault(staff_id, (staff_id, name, {}))[2]
+        schedule[day] = {
+            'is_working': bool(is_working),
+            'start_time': ScheduleValidator._format_time_value(start_time) or '',
+            'end_time': ScheduleValidator._format_time_value(end_time) or '',
+            'date': target_week_start + timedelta(days=DAYS_OF_WEEK.index(day)),
+        }
+    return list(staff.values())
+
+
+def main():
+    """Seed a source week, mirror it onto fresh weeks both ways, check the result, emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--backend', default='sqlite', help='sqlite or mysql')
+    parser.add_argument('--staff', type=int, default=200, help='staff with a source week')
+    parser.add_argument('--new-staff', type=int, default=20, help='staff added after the source week')
+    parser.add_argument('--repeats', type=int, default=10, help='target weeks per path')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    rng = random.Random(args.seed)
+    try:
+        manager = open_backend(args.backend)
+    except BackendUnavailable as e:
+        emit_report({'meta': report_meta('mirror', vars(args)), 'status': 'skipped', 'reason': str(e)}, args.output)
+        return
+
+    source = date(2030, 1, 6)  # A Sunday clear of real data
+    runs = {}
+    try:
+        with redirect_stdout(sys.stderr):
+            staff_ids = [manager.add_staff(f"Mirror Staff {i:04d}") for i in range(args.staff)]
+            schedules = []
+            for staff_id in staff_ids:
+                days = {}
+                for offset, day in enumerate(DAYS_OF_WEEK):
+                    working = rng.random() < 0.7
+                    start, end = rng.choice(SHIFTS)
+                    days[day] = {'is_working': working, 'start_time': start if working else '',
+                                 'end_time': end if working else '', 'date': source + timedelta(days=offset)}
+                schedules.append((staff_id, f"Mirror Staff {staff_id}", days))
+            manager.save_bulk_schedules(schedules, source, 'BENCH')
+            new_ids = [manager.add_staff(f"Mirror New {i:04d}") for i in range(args.new_staff)]
+        expected = week_rows(manager, source)
+        print(f"🌱 {len(expected)} source days for {args.staff} staff, {args.new_staff} new staff", file=sys.stderr)
+
+        samples = {'bulk_save': [], 'mirror_week': [], 'mirror_preview': []}
+        mismatches = 0
+        for repeat in range(args.repeats):
+            bulk_target = source + timedelta(weeks=1 + repeat)
+            mirror_target = source + timedelta(weeks=1 + args.repeats + repeat)
+
+            started = time.perf_counter()
+            with redirect_stdout(sys.stderr):
+                manager.save_bulk_schedules(bulk_data(manager, source, bulk_target), bulk_target, 'BENCH')
+            samples['bulk_save'].append((time.perf_counter() - started) * 1000.0)
+
+            started = time.perf_counter()
+            preview = manager.mirror_week(source, mirror_target, 'BENCH', dry_run=True)
+            samples['mirror_preview'].append((time.perf_counter() - started) * 1000.0)
+
+            started = time.perf_counter()
+            result = manager.mirror_week(source, mirror_target, 'BENCH')
+            samples['mirror_week'].append((time.perf_counter() - started) * 1000.0)
+
+            # Source staff get their week, new staff "Not Set" every day
+            want = dict(expected)
+            want.update({(staff_id, day): (True, '', '') for staff_id in new_ids for day in DAYS_OF_WEEK})
+            if week_rows(manager, mirror_target) != want or preview != result:
+                mismatches += 1
+            if result['added'] != 7 * args.new_staff or result['copied'] != len(expected):
+                mismatches += 1
+
+        runs = {name: summarize(values) for name, values in samples.items()}
+    finally:
+        close_backend(args.backend, manager)
+
+    for name, run in runs.items():
+        print(f"   ⏱️ {name:<15} p50 {run['p50_ms']} ms, p99 {run['p99_ms']} ms", file=sys.stderr)
+    print(f"   {mismatches} mismatches", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('mirror', params), 'source_days': len(expected), 'runs': runs,
+                 'mismatches': mismatches}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Multi-week mirror benchmark - mirror_weeks against one mirror_week per week and the per-day bulk save
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BackendUnavailable, open_backend, close_backend, summarize, report_meta, emit_report
+from benchmarks.bench_mirror import SHIFTS, week_rows, bulk_data
+from config import DAYS_OF_WEEK
+from week_history import reconstruct_week
+
+
+def seed_pattern(manager, staff_ids, pattern, rng):
+    """A different random week for every pattern week"""
+    for week_start in pattern:
+        schedules = []
+        for staff_id in staff_ids:
+            days = {}
+            for offset, day in enumerate(DAYS_OF_WEEK):
+                working = rng.random() < 0.7
+                start, end = rng.choice(SHIFTS)
+                days[day] = {'is_working': working, 'start_time': start if working else '',
+                             'end_time': end if working else '', 'date': week_start + timedelta(days=offset)}
+            schedules.append((staff_id, f"Mirror Staff {staff_id}", days))
+        manager.save_bulk_schedules(schedules, week_start, 'BENCH')
+
+
+def replayed_rows(manager, week_start):
+    """week_rows' shape from the change log instead of the table"""
+    rows = {}
+    for staff_id, days in reconstruct_week(manager, week_start).items():
+        for day, data in days.items():
+            rows[(staff_id, day)] = (data['is_working'], data['start_time'] or '', data['end_time'] or '')
+    return rows
+
+
+def main():
+    """Seed pattern weeks, fill a year ahead three ways, check every week, emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--backend', default='sqlite', help='sqlite or mysql')
+    parser.add_argument('--staff', type=int, default=50)
+    parser.add_argument('--weeks', type=int, default=52, help='weeks filled per run')
+    parser.add_argument('--pattern', type=int, default=2, help='weeks in the rotation (1 repeats one week)')
+    parser.add_argument('--repeats', type=int, default=3, help='runs per path')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    rng = random.Random(args.seed)
+    try:
+        manager = open_backend(args.backend)
+    except BackendUnavailable as e:
+        emit_report({'meta': report_meta('mirror_weeks', vars(args)), 'status': 'skipped', 'reason': str(e)}, args.output)
+        return
+
+    first = date(2030, 1, 6)  # A Sunday clear of real data
+    pattern = [first + timedelta(weeks=k) for k in range(args.pattern)]
+    runs = {}
+    try:
+        with redirect_stdout(sys.stderr):
+            staff_ids = [manager.add_staff(f"Mirror Staff {i:04d}") for i in range(args.staff)]
+            seed_pattern(manager, staff_ids, pattern, rng)
+        expected = [week_rows(manager, week_start) for week_start in pattern]
+        days = args.weeks * 7 * args.staff
+        print(f"🌱 {args.pattern}-week pattern for {args.staff} staff, {days} days per run", file=sys.stderr)
+
+        samples = {'bulk_save': [], 'mirror_week': [], 'mirror_weeks': [], 'mirror_weeks_preview': []}
+        mismatches = 0
+        block = args.weeks + args.pattern  # Each run fills its own weeks, well after the pattern
+        for repeat in range(args.repeats):
+            targets = {}
+            for offset, name in enumerate(['bulk_save', 'mirror_week', 'mirror_weeks']):
+                targets[name] = first + timedelta(weeks=block * (1 + 3 * repeat + offset))
+
+            started = time.perf_counter()
+            with redirect_stdout(sys.stderr):
+                for k in range(args.weeks):
+                    target = targets['bulk_save'] + timedelta(weeks=k)
+                    manager.save_bulk_schedules(bulk_data(manager, pattern[k % args.pattern], target), target, 'BENCH')
+            samples['bulk_save'].append((time.perf_counter() - started) * 1000.0)
+
+            started = time.perf_counter()
+            for k in range(args.weeks):
+                manager.mirror_week(pattern[k % args.pattern], targets['mirror_week'] + timedelta(weeks=k), 'BENCH')
+            samples['mirror_week'].append((time.perf_counter() - started) * 1000.0)
+
+            started = time.perf_counter()
+            preview = manager.mirror_weeks(pattern, targets['mirror_weeks'], args.weeks, 'BENCH', dry_run=True)
+            samples['mirror_weeks_preview'].append((time.perf_counter() - started) * 1000.0)
+
+            started = time.perf_counter()
+            result = manager.mirror_weeks(pattern, targets['mirror_weeks'], args.weeks, 'BENCH')
+            samples['mirror_weeks'].append((time.perf_counter() - started) * 1000.0)
+
+            if preview != result or result['copied'] != days:
+                mismatches += 1
+            # Every week of every path holds its pattern week; the mirrored ones replay from the log too
+            for k in range(args.weeks):
+                want = expected[k % args.pattern]
+                for name, target in targets.items():
+                    week_start = target + timedelta(weeks=k)
+                    if week_rows(manager, week_start) != want:
+                        mismatches += 1
+                if args.backend == 'sqlite' and replayed_rows(manager, targets['mirror_weeks'] + timedelta(weeks=k)) != want:
+                    mismatches += 1
+            if manager.mirror_weeks(pattern, targets['mirror_weeks'], args.weeks, 'BENCH')['copied']:
+                mismatches += 1  # A second run has nothing left to copy
+
+        runs = {name: summarize(values) for name, values in samples.items()}
+        for name, run in runs.items():
+            run['days_per_second'] = round(days / (run['p50_ms'] / 1000.0)) if run['p50_ms'] else None
+    finally:
+        close_backend(args.backend, manager)
+
+    for name, run in runs.items():
+        print(f"   ⏱️ {name:<21} p50 {run['p50_ms']} ms, p99 {run['p99_ms']} ms, {run['days_per_second']} days/s",
+              file=sys.stderr)
+    print(f"   {mismatches} mismatches", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('mirror_weeks', params), 'days_per_run': days, 'runs': runs,
+                 'mismatches': mismatches}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Staff notification benchmark - week save cost with the queue, background fan-out time, coalescing and restart resends
+"""
+
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Bot
+
+from benchmarks.common import BackendUnavailable, open_backend, close_backend, report_meta, emit_report
+from benchmarks.fake_bot_api import FakeBotAPI, FAKE_TOKEN
+from benchmarks.bench_staff_portal import FIRST_USER_ID, seed_weeks
+from config import DAYS_OF_WEEK
+from notifications import StaffNotifier
+from staff_portal import week_start_of
+
+
+async def fan_out(manager, bot, api, rate, current_week_start):
+    """One notifier run, as after a restart: (seconds, messages sent)"""
+    notifier = StaffNotifier(manager, window=0, rate=rate, batch=1000000)
+    sent = api.calls['sendMessage']
+    started = time.perf_counter()
+    await notifier.run(bot, current_week_start)
+    return time.perf_counter() - started, api.calls['sendMessage'] - sent
+
+
+async def run(args, manager):
+    rng = random.Random(args.seed)
+    current_week_start = week_start_of(date.today())
+    week_start = current_week_start + timedelta(days=7)
+    with redirect_stdout(sys.stderr):
+        staff_ids = [manager.add_staff(f"Notify Staff {i:04d}") for i in range(args.staff)]
+        for number, staff_id in enumerate(staff_ids):
+            manager.link_staff_user(staff_id, FIRST_USER_ID + number, 'BENCH')
+        started = time.perf_counter()
+        seed_weeks(manager, rng, staff_ids, week_start, 1)  # One save_bulk_schedules, queue included
+        save_ms = (time.perf_counter() - started) * 1000.0
+
+    api = FakeBotAPI(latency_ms=args.api_latency_ms)
+    await api.start()
+    try:
+        async with Bot(FAKE_TOKEN, base_url=f"{api.url}/bot") as bot:
+            first_seconds, first_sent = await fan_out(manager, bot, api, args.rate, current_week_start)
+            restart_seconds, restart_sent = await fan_out(manager, bot, api, args.rate, current_week_start)
+
+            # Several edits per staff member before the next run: one digest each
+            edited = rng.sample(staff_ids, min(args.edited_staff, len(staff_ids)))
+            with redirect_stdout(sys.stderr):
+                for staff_id in edited:
+                    for _ in range(args.edits_per_staff):
+                        offset = rng.randrange(7)
+                        manager.save_schedule(staff_id, DAYS_OF_WEEK[offset], True, rng.choice(['10:00', '11:00', '12:00']),
+                                              '19:00', week_start + timedelta(days=offset))
+            digest_seconds, digest_sent = await fan_out(manager, bot, api, args.rate, current_week_start)
+    finally:
+        await api.stop()
+
+    return {
+        'save_week_ms': round(save_ms, 1),
+        'first_fan_out': {'sent': first_sent, 'seconds': round(first_seconds, 2),
+                          'expected_seconds': round(first_sent / args.rate, 2)},
+        'after_restart': {'sent': restart_sent, 'seconds': round(restart_seconds, 3)},
+        'digests': {'edited_staff': len(edited), 'edits': len(edited) * args.edits_per_staff, 'sent': digest_sent,
+                    'seconds': round(digest_seconds, 2)},
+    }
+
+
+def main():
+    """Save a week for a linked roster, fan out its notifications through a fake Bot API, emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--backend', default='sqlite', help='sqlite or mysql')
+    parser.add_argument('--staff', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=20.0, help='notifications per second')
+    parser.add_argument('--edited-staff', type=int, default=50)
+    parser.add_argument('--edits-per-staff', type=int, default=4)
+    parser.add_argument('--api-latency-ms', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    try:
+        manager = open_backend(args.backend)
+    except BackendUnavailable as e:
+        emit_report({'meta': report_meta('notifications', vars(args)), 'status': 'skipped', 'reason': str(e)}, args.output)
+        return
+    try:
+        result = asyncio.run(run(args, manager))
+    finally:
+        close_backend(args.backend, manager)
+
+    print(f"   💾 week saved in {result['save_week_ms']} ms", file=sys.stderr)
+    print(f"   📨 fan-out: {result['first_fan_out']['sent']} sent in {result['first_fan_out']['seconds']} s, "
+          f"after restart {result['after_restart']['sent']} sent", file=sys.stderr)
+    print(f"   🔔 {result['digests']['edits']} edits to {result['digests']['edited_staff']} staff: "
+          f"{result['digests']['sent']} digests", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('notifications', params), **result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Redelivery benchmark - every confirm tap is redelivered and double-tapped, with and without update dedup
+"""
+
+import sys
+import os
+import copy
+import time
+import asyncio
+import logging
+import sqlite3
+import argparse
+import warnings
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import open_backend, close_backend, use_backend_for_bot, report_meta, emit_report
+from benchmarks.synthetic_data import generate_dataset, load_dataset
+from benchmarks.fake_bot_api import FakeBotAPI, FAKE_TOKEN, BOT_USER
+from benchmarks.load_conversations import (
+    FIRST_ADMIN_ID, COMPLETION_GROUP, JOURNEYS, UpdateTracker, SimulatedAdmin, JourneyError
+)
+
+CONFIRM_BUTTONS = ('save_schedule', 'confirm_copy_previous')
+
+
+class RedeliveringAdmin(SimulatedAdmin):
+    """Admin whose confirm taps arrive three times: original, redelivery (same update_id), double tap"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.confirms = 0
+        self.screens_kept = 0
+
+    def _put(self, payload):
+        from telegram import Update
+        self.application.update_queue.put_nowait(Update.de_json(payload, self.application.bot))
+        self.updates_sent += 1
+
+    async def _settle(self):
+        """Wait until everything queued for this chat has been handled.
+
+        Dropped duplicates never reach the completion handler, so a harmless
+        chat update is sent behind them - chats are processed in order.
+        """
+        chat = {'id': self.user_id, 'type': 'private', 'first_name': self.user['first_name']}
+        member = {'user': BOT_USER, 'status': 'member'}
+        await self._send({'my_chat_member': {
+            'chat': chat, 'from': self.user, 'date': int(time.time()),
+            'old_chat_member': member, 'new_chat_member': member,
+        }}, 'settle')
+
+    async def click(self, callback_data, step):
+        if callback_data not in CONFIRM_BUTTONS:
+            return await super().click(callback_data, step)
+        if not self.offers(callback_data):
+            raise JourneyError(f"{step}: button '{callback_data}' not offered")
+
+        payload = self.callback_payload(callback_data)
+        double_tap = copy.deepcopy(payload)
+        await self._send(payload, step)
+        screen = self.text
+
+        self._put(payload)  # Telegram redelivers the same update_id
+        double_tap['update_id'] = next(self._update_ids)
+        double_tap['callback_query']['id'] = str(next(self._callback_ids))
+        self._put(double_tap)  # second tap on the same button
+        await self._settle()
+
+        self.confirms += 1
+        if self.text == screen:
+            self.screens_kept += 1
+
+
+def count_rows(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+async def run_once(dedup_window, args, bot_class):
+    """Run every admin's journeys with redelivered confirm taps"""
+    manager = open_backend('sqlite')
+    api = FakeBotAPI(latency_ms=args.api_latency_ms)
+    await api.start()
+    tracker = UpdateTracker()
+    journey_results = {name: {'completed': 0, 'failed': 0} for name in args.journeys}
+    failures = []
+    try:
+        use_backend_for_bot(manager)
+        bot = bot_class()
+        dataset = generate_dataset(args.staff, args.weeks, args.seed, anchor=date.today() + timedelta(days=7))
+        staff_ids = load_dataset(manager, dataset, 'sqlite')['staff_ids']
+
+        # Count the handler runs and database writes the confirm buttons trigger
+        calls = {'save_schedule_handler': 0, 'bulk_copy_handler': 0, 'db_save_schedule': 0, 'db_save_bulk': 0}
+
+        def counted(name, func):
+            def wrapper(*a, **kw):
+                calls[name] += 1
+                return func(*a, **kw)
+
+            async def async_wrapper(*a, **kw):
+                calls[name] += 1
+                return await func(*a, **kw)
+            return async_wrapper if asyncio.iscoroutinefunction(func) else wrapper
+
+        bot.save_schedule = counted('save_schedule_handler', bot.save_schedule)
+        bot.confirm_copy_previous = counted('bulk_copy_handler', bot.confirm_copy_previous)
+        bot.db.save_schedule = counted('db_save_schedule', bot.db.save_schedule)
+        bot.db.save_bulk_schedules = counted('db_save_bulk', bot.db.save_bulk_schedules)
+
+        application = bot.build_application(token=FAKE_TOKEN, base_url=api.url, dedup_window=dedup_window)
+        from telegram import Update
+        from telegram.ext import TypeHandler
+        application.add_handler(TypeHandler(Update, tracker.on_processed), group=COMPLETION_GROUP)
+        application.add_error_handler(tracker.on_error)
+
+        admin_ids = [FIRST_ADMIN_ID + i for i in range(args.admins)]
+        import bot_async
+        bot_async.ADMIN_IDS[:] = sorted(set(bot_async.ADMIN_IDS) | set(admin_ids))
+
+        audit_before = count_rows(manager.db_path, 'schedule_changes')
+        await application.initialize()
+        await application.start()
+        admins = [RedeliveringAdmin(admin_id, application, api, tracker, args.step_timeout, {})
+                  for admin_id in admin_ids]
+
+        async def run_admin(admin):
+            for name in args.journeys:
+                try:
+                    await JOURNEYS[name](admin, staff_ids[:args.staff_per_journey])
+                    journey_results[name]['completed'] += 1
+                except JourneyError as e:
+                    journey_results[name]['failed'] += 1
+                    if len(failures) < 10:
+                        failures.append(f"{name}: {e}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_admin(admin) for admin in admins))
+        wall = time.perf_counter() - started
+        dedup_stats = bot.get_deduplicator(application.bot_data).metrics() if dedup_window else None
+
+        await application.stop()
+        await application.shutdown()
+        audit_rows = count_rows(manager.db_path, 'schedule_changes') - audit_before
+    finally:
+        await api.stop()
+        close_backend('sqlite', manager)
+
+    confirms = sum(admin.confirms for admin in admins)
+    return {
+        'dedup_window': dedup_window,
+        'admins': args.admins,
+        'wall_s': round(wall, 3),
+        'journeys': journey_results,
+        'confirm_taps': confirms,
+        'success_screens_kept': sum(admin.screens_kept for admin in admins),
+        'calls': calls,
+        'audit_rows': audit_rows,
+        'dedup': dedup_stats,
+        'failures': failures,
+    }
+
+
+async def run_all(args):
+    with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stderr if args.verbose else devnull):
+        from bot_async import StaffSchedulerBot
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        runs = []
+        for dedup_window in args.dedup_window:
+            print(f"🔂 dedup window {dedup_window}, {args.admins} admins", file=sys.stderr)
+            result = await run_once(dedup_window, args, StaffSchedulerBot)
+            print(f"   ✅ handler runs {result['calls']['save_schedule_handler'] + result['calls']['bulk_copy_handler']} "
+                  f"for {result['confirm_taps']} confirms, audit rows {result['audit_rows']}, "
+                  f"success screens kept {result['success_screens_kept']}/{result['confirm_taps']}", file=sys.stderr)
+            runs.append(result)
+    return runs
+
+
+def main():
+    """Run with each dedup window and emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--dedup-window', default='5000,0', help='UPDATE_DEDUP_WINDOW values, 0 disables')
+    parser.add_argument('--admins', type=int, default=10)
+    parser.add_argument('--journeys', default='set_schedule,mirror',
+                        help=f"comma separated, from: {', '.join(JOURNEYS)}")
+    parser.add_argument('--staff', type=int, default=8)
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--staff-per-journey', type=int, default=2)
+    parser.add_argument('--api-latency-ms', type=float, default=5.0)
+    parser.add_argument('--step-timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    args.dedup_window = [int(part) for part in args.dedup_window.split(',') if part.strip()]
+    args.journeys = [name.strip() for name in args.journeys.split(',') if name.strip()]
+    warnings.filterwarnings('ignore', message='.*per_message.*')
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    runs = asyncio.run(run_all(args))
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('redelivery', params), 'runs': runs}, args.output)
+
+
+if __name__ == "__main__":
+    main()
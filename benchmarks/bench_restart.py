@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Restart benchmark - admins stop mid-wizard, tap while the bot is down, and the restarted bot resumes them
+"""
+
+import sys
+import os
+import time
+import asyncio
+import logging
+import argparse
+import warnings
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import (
+    BackendUnavailable, open_backend, close_backend, use_backend_for_bot,
+    report_meta, emit_report
+)
+from benchmarks.synthetic_data import generate_dataset, load_dataset
+from benchmarks.fake_bot_api import FakeBotAPI, FAKE_TOKEN
+from benchmarks.load_conversations import (
+    FIRST_ADMIN_ID, COMPLETION_GROUP, UpdateTracker, SimulatedAdmin, JourneyError
+)
+
+
+async def open_off_days_screen(admin, staff_id):
+    """Walk Set Schedule up to the off-days screen and pick some days"""
+    await admin.command('/start', 'start')
+    await admin.click('set_schedule', 'open_set_schedule')
+    if admin.offers('select_week_all_after_next'):
+        await admin.click('select_week_all_after_next', 'pick_week')
+    await admin.click(f'schedule_{staff_id}', 'pick_staff')
+    if admin.offers('edit_existing_schedule'):
+        await admin.click('edit_existing_schedule', 'edit_existing')
+        await admin.click('edit_off_days', 'edit_off_days')
+    else:
+        await admin.click('toggle_off_day_Sunday', 'toggle_off_day')
+        await admin.click('toggle_off_day_Saturday', 'toggle_off_day')
+    if not admin.offers('confirm_off_days'):
+        raise JourneyError("off-days screen not reached")
+
+
+def build(bot_class, api, persistence, tracker):
+    """Fresh bot + Application, as a newly started process would have"""
+    bot = bot_class()
+    application = bot.build_application(token=FAKE_TOKEN, base_url=api.url, persistence=persistence)
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    application.add_handler(TypeHandler(Update, tracker.on_processed), group=COMPLETION_GROUP)
+    application.add_error_handler(tracker.on_error)
+    return application
+
+
+async def run_restart(admin_count, persistence, args, bot_class):
+    """Interrupt admin_count admins mid-wizard, restart, and time the resume"""
+    try:
+        manager = open_backend(args.backend)
+    except BackendUnavailable as e:
+        return {'status': 'skipped', 'reason': str(e)}
+
+    api = FakeBotAPI(latency_ms=args.api_latency_ms)
+    await api.start()
+    try:
+        use_backend_for_bot(manager)
+        dataset = generate_dataset(args.staff, args.weeks, args.seed, anchor=date.today() + timedelta(days=7))
+        staff_ids = load_dataset(manager, dataset, args.backend)['staff_ids']
+
+        import bot_async
+        admin_ids = [FIRST_ADMIN_ID + i for i in range(admin_count)]
+        bot_async.ADMIN_IDS[:] = sorted(set(bot_async.ADMIN_IDS) | set(admin_ids))
+
+        # --- before the restart: everyone is half way through Set Schedule
+        tracker = UpdateTracker()
+        application = build(bot_class, api, persistence, tracker)
+        await application.initialize()
+        await application.start()
+        admins = [SimulatedAdmin(admin_id, application, api, tracker, args.step_timeout, {})
+                  for admin_id in admin_ids]
+        await asyncio.gather(*(open_off_days_screen(admin, staff_ids[i % len(staff_ids)])
+                               for i, admin in enumerate(admins)))
+
+        started = time.perf_counter()
+        await application.stop()
+        await application.shutdown()
+        shutdown_ms = (time.perf_counter() - started) * 1000.0
+
+        # --- while the bot is down every admin taps "Confirm"
+        pending = [api.queue_update(admin.callback_payload('confirm_off_days')) for admin in admins]
+
+        # --- restart: load persisted state, poll, answer the queued taps
+        tracker = UpdateTracker()
+        application = build(bot_class, api, persistence, tracker)
+        waits = [tracker.expect(update_id) for update_id in pending]
+
+        started = time.perf_counter()
+        await application.initialize()
+        initialize_ms = (time.perf_counter() - started) * 1000.0
+        await application.start()
+        await application.updater.start_polling(
+            drop_pending_updates=bot_async.DROP_PENDING_UPDATES, poll_interval=0.0, timeout=1
+        )
+        done, _ = await asyncio.wait(waits, timeout=args.step_timeout)
+        finished = sorted(future.result() - started for future in done)
+
+        resumed = sum(1 for admin in admins if admin.offers('apply_off_days'))
+
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+    finally:
+        await api.stop()
+        close_backend(args.backend, manager)
+
+    return {
+        'status': 'ok',
+        'admins': admin_count,
+        'persistence': persistence,
+        'shutdown_ms': round(shutdown_ms, 3),
+        'initialize_ms': round(initialize_ms, 3),
+        'pending_updates': len(pending),
+        'processed': len(finished),
+        'first_response_ms': round(finished[0] * 1000.0, 3) if finished else None,
+        'all_pending_ms': round(finished[-1] * 1000.0, 3) if finished else None,
+        'resumed': resumed,
+        'lost': admin_count - resumed,
+    }
+
+
+async def run_all(args):
+    """Run each admin count with and without persistence"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stderr if args.verbose else devnull):
+        from bot_async import StaffSchedulerBot
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        runs = []
+        for persistence in args.persistence:
+            for admin_count in args.admins:
+                print(f"🔁 {admin_count} admin(s), persistence {'on' if persistence else 'off'}", file=sys.stderr)
+                result = await run_restart(admin_count, persistence, args, StaffSchedulerBot)
+                if result['status'] == 'ok':
+                    print(f"   ✅ first response {result['first_response_ms']} ms, "
+                          f"resumed {result['resumed']}/{admin_count}", file=sys.stderr)
+                else:
+                    print(f"   ⚠️ skipped: {result['reason']}", file=sys.stderr)
+                runs.append(result)
+    return runs
+
+
+def main():
+    """Run the restart scenarios and emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--admins', default='1,10,50', help='admins interrupted mid-wizard, e.g. 1,10,50')
+    parser.add_argument('--persistence', default='on,off', help='on, off or both')
+    parser.add_argument('--backend', default='sqlite', help='sqlite, mysql or postgres')
+    parser.add_argument('--staff', type=int, default=8)
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--api-latency-ms', type=float, default=30.0)
+    parser.add_argument('--step-timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    args.admins = [int(part) for part in args.admins.split(',') if part.strip()]
+    args.persistence = [part.strip() == 'on' for part in args.persistence.split(',') if part.strip()]
+
+    warnings.filterwarnings('ignore', message='.*per_message.*')
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    runs = asyncio.run(run_all(args))
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('restart', params), 'runs': runs}, args.output)
+
+
+if __name__ == "__main__":
+    main()
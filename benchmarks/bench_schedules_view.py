@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Schedules overview benchmark - one message for the whole roster against keyset pages with cached fragments
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BackendUnavailable, open_backend, close_backend, summarize, report_meta, emit_report
+from benchmarks.bench_mirror import SHIFTS
+from config import DAYS_OF_WEEK
+from schedule_view import FragmentCache, format_staff_fragment, render_page
+
+TELEGRAM_TEXT_LIMIT = 4096
+
+
+def full_overview(manager, week_start):
+    """The whole roster in one text, as the overview was built before paging"""
+    days = {}
+    for _, staff_id, day, _, is_working, start_time, end_time in manager.get_current_week_schedules(week_start):
+        days.setdefault(staff_id, {})[day] = (is_working, start_time, end_time)
+    return "".join(format_staff_fragment(name, days.get(staff_id, {})) for staff_id, name in manager.get_all_staff())
+
+
+def walk_pages(manager, cache, week_start, page_size):
+    """Render every page in order; returns (per-page ms, longest page text)"""
+    timings, longest, cursor = [], 0, None
+    while True:
+        started = time.perf_counter()
+        _, fragments, cursor = render_page(manager, cache, week_start, cursor, page_size)
+        timings.append((time.perf_counter() - started) * 1000.0)
+        longest = max(longest, len("".join(fragments)))
+        if cursor is None:
+            return timings, longest
+
+
+def main():
+    """Seed a week for the roster, time the full message and paged renders, emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--backend', default='sqlite', help='sqlite or mysql')
+    parser.add_argument('--staff', type=int, default=200)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    rng = random.Random(args.seed)
+    try:
+        manager = open_backend(args.backend)
+    except BackendUnavailable as e:
+        emit_report({'meta': report_meta('schedules_view', vars(args)), 'status': 'skipped', 'reason': str(e)}, args.output)
+        return
+
+    week_start = date(2030, 1, 6)  # A Sunday clear of real data
+    runs = {}
+    try:
+        with redirect_stdout(sys.stderr):
+            staff_ids = [manager.add_staff(f"View Staff {i:04d}") for i in range(args.staff)]
+            schedules = []
+            for staff_id in staff_ids:
+                days = {}
+                for offset, day in enumerate(DAYS_OF_WEEK):
+                    working = rng.random() < 0.7
+                    start, end = rng.choice(SHIFTS)
+                    days[day] = {'is_working': working, 'start_time': start if working else '',
+                                 'end_time': end if working else '', 'date': week_start + timedelta(days=offset)}
+                schedules.append((staff_id, f"View Staff {staff_id}", days))
+            manager.save_bulk_schedules(schedules, week_start, 'BENCH')
+
+        samples = {'full_message': [], 'first_page_cold': [], 'last_page_cold': [], 'page_warm': [], 'page_after_write': []}
+        full_length = 0
+        longest_page = 0
+        for repeat in range(args.repeats):
+            started = time.perf_counter()
+            full_length = len(full_overview(manager, week_start))
+            samples['full_message'].append((time.perf_counter() - started) * 1000.0)
+
+            cache = FragmentCache()
+            manager.change_listeners[:] = [cache.invalidate]
+            cold, longest_page = walk_pages(manager, cache, week_start, args.page_size)
+            samples['first_page_cold'].append(cold[0])
+            samples['last_page_cold'].append(cold[-1])
+            warm, _ = walk_pages(manager, cache, week_start, args.page_size)
+            samples['page_warm'].extend(warm)
+
+            # One staff member's write drops only their fragment
+            staff_id = rng.choice(staff_ids)
+            manager.save_schedule(staff_id, 'Monday', True, '10:00', '18:00', week_start + timedelta(days=1))
+            after, _ = walk_pages(manager, cache, week_start, args.page_size)
+            samples['page_after_write'].extend(after)
+        manager.change_listeners[:] = []
+
+        runs = {name: summarize(values) for name, values in samples.items()}
+    finally:
+        close_backend(args.backend, manager)
+
+    for name, run in runs.items():
+        print(f"   ⏱️ {name:<17} p50 {run['p50_ms']} ms, p99 {run['p99_ms']} ms", file=sys.stderr)
+    print(f"   📏 full message {full_length} chars, longest page {longest_page} chars (limit {TELEGRAM_TEXT_LIMIT})",
+          file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('schedules_view', params), 'runs': runs, 'full_message_chars': full_length,
+                 'longest_page_chars': longest_page, 'fits_in_message': longest_page < TELEGRAM_TEXT_LIMIT},
+                args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Staff self-service benchmark - /myshifts and /week answers for a linked roster, cached against read every time
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BackendUnavailable, open_backend, close_backend, summarize, report_meta, emit_report
+from benchmarks.bench_mirror import SHIFTS
+from config import DAYS_OF_WEEK
+from staff_portal import StaffPortal
+
+FIRST_USER_ID = 500000  # Telegram user ids given to the seeded staff
+
+
+def seed_weeks(manager, rng, staff_ids, week_start, weeks):
+    """Random shifts for every staff member over weeks weeks"""
+    for week in range(weeks):
+        start = week_start + timedelta(days=7 * week)
+        schedules = []
+        for staff_id in staff_ids:
+            days = {}
+            for offset, day in enumerate(DAYS_OF_WEEK):
+                working = rng.random() < 0.7
+                shift = rng.choice(SHIFTS)
+                days[day] = {'is_working': working, 'start_time': shift[0] if working else '',
+                             'end_time': shift[1] if working else '', 'date': start + timedelta(days=offset)}
+            schedules.append((staff_id, f"Portal Staff {staff_id}", days))
+        manager.save_bulk_schedules(schedules, start, 'BENCH')
+
+
+def run_queries(manager, portal, rng, staff_ids, today, week_start, queries, write_every):
+    """Answer queries random staff commands, one staff write every write_every; returns per-query ms"""
+    timings = []
+    for number in range(1, queries + 1):
+        user_id = FIRST_USER_ID + rng.randrange(len(staff_ids))
+        kind, day = rng.choice((('myshifts', today), ('week', week_start), ('week', week_start + timedelta(days=7))))
+        started = time.perf_counter()
+        portal.answer(manager, portal.staff_for(manager, user_id), kind, day)
+        timings.append((time.perf_counter() - started) * 1000.0)
+        if write_every and number % write_every == 0:
+            offset = rng.randrange(7)
+            manager.save_schedule(rng.choice(staff_ids), DAYS_OF_WEEK[offset], True, '10:00', '18:00',
+                                  week_start + timedelta(days=offset))
+    return timings
+
+
+def main():
+    """Seed and link a roster, time answers with and without the portal caches, emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--backend', default='sqlite', help='sqlite or mysql')
+    parser.add_argument('--staff', type=int, default=300)
+    parser.add_argument('--queries', type=int, default=3000)
+    parser.add_argument('--write-every', type=int, default=100, help='queries between staff writes (0: none)')
+    parser.add_argument('--flood', type=int, default=100, help='commands one user sends back to back')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    rng = random.Random(args.seed)
+    try:
+        manager = open_backend(args.backend)
+    except BackendUnavailable as e:
+        emit_report({'meta': report_meta('staff_portal', vars(args)), 'status': 'skipped', 'reason': str(e)}, args.output)
+        return
+
+    week_start = date(2030, 1, 6)  # A Sunday clear of real data
+    today = week_start + timedelta(days=3)
+    runs, reads = {}, {}
+    try:
+        with redirect_stdout(sys.stderr):
+            staff_ids = [manager.add_staff(f"Portal Staff {i:04d}") for i in range(args.staff)]
+            seed_weeks(manager, rng, staff_ids, week_start, 2)
+            for number, staff_id in enumerate(staff_ids):
+                manager.link_staff_user(staff_id, FIRST_USER_ID + number, 'BENCH')
+
+            for name, max_age in (('uncached', 0), ('cached', 300)):
+                portal = StaffPortal(max_age=max_age)
+                manager.change_listeners[:] = [portal.invalidate]
+                timings = run_queries(manager, portal, rng, staff_ids, today, week_start, args.queries, args.write_every)
+                runs[name] = summarize(timings)
+                reads[name] = {'link_reads': portal.link_reads, 'answer_builds': portal.answers.misses}
+            manager.change_listeners[:] = []
+
+        # One user sending commands back to back: only the burst gets through
+        portal = StaffPortal()
+        allowed = sum(portal.allow(FIRST_USER_ID)[0] for _ in range(args.flood))
+    finally:
+        close_backend(args.backend, manager)
+
+    for name, run in runs.items():
+        print(f"   ⏱️ {name:<9} p50 {run['p50_ms']} ms, p99 {run['p99_ms']} ms, "
+              f"{reads[name]['link_reads']} link reads, {reads[name]['answer_builds']} answers built", file=sys.stderr)
+    print(f"   🚦 flood: {allowed} of {args.flood} commands allowed", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('staff_portal', params), 'runs': runs, 'reads': reads,
+                 'flood_allowed': allowed}, args.output)
+
+
+if __name__ == "__main__":
+    main()
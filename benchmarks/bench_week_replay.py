@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Week replay benchmark - reconstruct_week at random points in a year of history, with and without snapshots
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import open_backend, close_backend, summarize, report_meta, emit_report
+from audit_archive import AuditArchive, archive_old_changes
+from week_history import reconstruct_week, snapshot_weeks, apply_change, week_start_of
+
+DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+SHIFTS = [('09:45', '18:00'), ('10:00', '18:00'), ('11:00', '19:00'), ('13:00', '21:00')]
+STAMP = '%Y-%m-%d %H:%M:%S'
+
+
+def generate_history(staff_ids, weeks, edits, seed):
+    """Audit events for weeks ending now: each week is created two weeks ahead, then edited.
+
+    Returns the events as schedule_changes rows (without id), oldest first.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    first_week = week_start_of((now - timedelta(weeks=weeks)).date())
+    events = []
+    for week in range(weeks + 2):
+        week_start = first_week + timedelta(weeks=week)
+        opens = datetime.combine(week_start, datetime.min.time()) - timedelta(days=14)
+        for staff_id in staff_ids:
+            current = dict.fromkeys(DAYS)
+            moments = sorted(opens + timedelta(seconds=rng.randrange(21 * 86400)) for _ in range(edits))
+            for step, moment in enumerate([opens + timedelta(seconds=rng.randrange(3600))] * 7 + moments):
+                day = DAYS[step] if step < 7 else rng.choice(DAYS)
+                working = rng.random() < 0.7
+                start, end = rng.choice(SHIFTS)
+                schedule_date = (week_start + timedelta(days=DAYS.index(day))).strftime('%Y-%m-%d')
+                new = {'is_working': working, 'start_time': start if working else '', 'end_time': end if working else '',
+                       'schedule_date': schedule_date}
+                old = current[day]
+                events.append((staff_id, 'UPDATE_SCHEDULE' if old else 'CREATE_SCHEDULE', day,
+                               json.dumps(old) if old else None, json.dumps(new), 'BENCH',
+                               min(moment, now).strftime(STAMP), schedule_date))
+                current[day] = new
+    events.sort(key=lambda event: event[6])
+    return events
+
+
+def insert_events(db_path, events):
+    """Append events to schedule_changes (ids in event order)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executemany('''
+            INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by, changed_at, schedule_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', events)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def brute_force(events, week_start, as_of):
+    """The same week replayed from every event, for checking"""
+    dates = {(week_start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(7)}
+    state = {}
+    for staff_id, action, day, _, new_data, _, changed_at, schedule_date in events:
+        if schedule_date in dates and (as_of is None or changed_at <= as_of):
+            apply_change(state, staff_id, action, day, new_data)
+    return state
+
+
+def time_queries(manager, queries, events):
+    """Reconstruct each (week, as_of); every result is checked against the brute-force replay"""
+    samples, mismatches = [], 0
+    for week_start, as_of in queries:
+        started = time.perf_counter()
+        state = reconstruct_week(manager, week_start, as_of)
+        samples.append((time.perf_counter() - started) * 1000.0)
+        if state != brute_force(events, week_start, as_of):
+            mismatches += 1
+    return {'latency': summarize(samples), 'mismatches': mismatches}
+
+
+def main():
+    """Seed a year of edits, take snapshots as a running bot would, time random reconstructions"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--staff', type=int, default=20)
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--edits', type=int, default=20, help='edits per staff member per week, on top of creating it')
+    parser.add_argument('--snapshot-every', type=int, default=50, help='WEEK_SNAPSHOT_EVERY')
+    parser.add_argument('--snapshot-hours', type=float, default=6.0, help='simulated snapshot job interval')
+    parser.add_argument('--retention-days', type=int, default=180, help='archive older rows for the last pass (0 skips it)')
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    rng = random.Random(args.seed)
+    manager = open_backend('sqlite')
+    archive_dir = tempfile.mkdtemp(prefix='bench_week_replay_')
+    manager.audit_archive = AuditArchive(archive_dir)
+    runs = {}
+    try:
+        with redirect_stdout(sys.stderr):
+            staff_ids = [manager.add_staff(f"Replay Staff {i:03d}") for i in range(args.staff)]
+        events = generate_history(staff_ids, args.weeks, args.edits, args.seed)
+        print(f"🌱 {len(events)} schedule changes over {args.weeks} weeks", file=sys.stderr)
+
+        # Random weeks at random moments, plus "now" for a fifth of them
+        weeks = sorted({week_start_of(event[7]) for event in events})
+        queries = []
+        for _ in range(args.queries):
+            week_start = rng.choice(weeks)
+            moment = rng.choice(events)[6] if rng.random() < 0.8 else None
+            queries.append((week_start, moment))
+
+        # Insert in simulated time, running the snapshot job every --snapshot-hours
+        started_at = time.perf_counter()
+        snapshots = 0
+        step = timedelta(hours=args.snapshot_hours)
+        clock = datetime.strptime(events[0][6], STAMP)
+        index = 0
+        while index < len(events):
+            clock += step
+            until = clock.strftime(STAMP)
+            batch_end = index
+            while batch_end < len(events) and events[batch_end][6] < until:
+                batch_end += 1
+            if batch_end > index:
+                insert_events(manager.db_path, events[index:batch_end])
+                index = batch_end
+                snapshots += snapshot_weeks(manager, args.snapshot_every)
+        seed_seconds = time.perf_counter() - started_at
+        print(f"📸 {snapshots} snapshots taken while seeding ({seed_seconds:.1f}s)", file=sys.stderr)
+
+        runs['with_snapshots'] = time_queries(manager, queries, events)
+
+        conn = sqlite3.connect(manager.db_path)
+        try:
+            saved = conn.execute('SELECT week_start, last_change_id, covers_until, state FROM week_snapshots').fetchall()
+            conn.execute('DELETE FROM week_snapshots')
+            conn.commit()
+        finally:
+            conn.close()
+        runs['without_snapshots'] = time_queries(manager, queries, events)
+
+        if args.retention_days:
+            conn = sqlite3.connect(manager.db_path)
+            try:
+                conn.executemany('INSERT INTO week_snapshots (week_start, last_change_id, covers_until, state) VALUES (?, ?, ?, ?)',
+                                 saved)
+                conn.commit()
+            finally:
+                conn.close()
+            # As the bot's archive job does: snapshot every changed week, then archive
+            snapshot_weeks(manager, 1)
+            archived = archive_old_changes(manager, manager.audit_archive, args.retention_days, 5000)['archived']
+            runs['after_archiving'] = dict(time_queries(manager, queries, events), archived_rows=archived)
+    finally:
+        close_backend('sqlite', manager)
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+    for name, run in runs.items():
+        print(f"   ⏱️ {name:<18} p50 {run['latency']['p50_ms']} ms, p99 {run['latency']['p99_ms']} ms, "
+              f"max {run['latency']['max_ms']} ms, {run['mismatches']} mismatches", file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('week_replay', params), 'changes': len(events), 'snapshots': snapshots,
+                 'runs': runs}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Webhook worker ack check - an update a worker drops as a redelivery must still be acknowledged to the router
+"""
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import open_backend, close_backend, report_meta, emit_report
+from benchmarks.fake_bot_api import FakeBotAPI, FAKE_TOKEN
+from benchmarks.load_conversations import FIRST_ADMIN_ID
+
+FIRST_UPDATE_ID = 700000
+
+
+def message_update(update_id, user_id, text):
+    user = {'id': user_id, 'is_bot': False, 'first_name': f"Admin{user_id}"}
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': int(time.time()), 'text': text,
+        'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']}, 'from': user,
+    }}
+
+
+async def wait_for_acks(acks, count, timeout):
+    deadline = time.monotonic() + timeout
+    while len(acks) < count and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return len(acks) >= count
+
+
+async def run(args):
+    """Send updates through the router, restart its dedup, send them again; count acks and in-flight"""
+    from config import UPDATE_DEDUP_WINDOW
+    from update_dedup import UpdateDeduplicator
+    from webhook_workers import WebhookRouter
+
+    manager = open_backend('sqlite')
+    api = FakeBotAPI(latency_ms=0)
+    await api.start()
+    router = None
+    try:
+        # Worker processes read their configuration from the environment
+        os.environ.update({'DATABASE_PATH': manager.db_path, 'MYSQL_HOST': 'localhost', 'DATABASE_URL': '',
+                           'ADMIN_IDS': str(FIRST_ADMIN_ID)})
+        router = WebhookRouter(1, token=FAKE_TOKEN, base_url=api.url, quiet=not args.verbose)
+        acks = []
+        router.on_processed = lambda update_id, error: acks.append(update_id)
+        await router.start()
+
+        updates = [message_update(FIRST_UPDATE_ID + number, FIRST_ADMIN_ID, '/start') for number in range(args.updates)]
+        for update in updates:
+            router.dispatch(update)
+        first_acked = await wait_for_acks(acks, len(updates), args.timeout)
+
+        # A restarted router forgets what it routed; the worker still remembers and drops the lot
+        router.dedup = UpdateDeduplicator(UPDATE_DEDUP_WINDOW)
+        for update in updates:
+            router.dispatch(update)
+        second_acked = await wait_for_acks(acks, 2 * len(updates), args.timeout)
+        stats = router.metrics()
+    finally:
+        if router:
+            await router.stop()
+        await api.stop()
+        close_backend('sqlite', manager)
+
+    return {
+        'updates': len(updates),
+        'acked_first': first_acked,
+        'acked_redelivered': second_acked,
+        'acks': len(acks),
+        'in_flight': stats['in_flight'],
+        'processed': stats['processed'],
+    }
+
+
+def main():
+    """Run the check and emit a JSON report; exits 1 if a dropped redelivery was never acknowledged"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--updates', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds to wait for the acks of each round')
+    parser.add_argument('--verbose', action='store_true', help='keep worker output')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    result = asyncio.run(run(args))
+    print(f"   📬 {result['acks']} acks for {2 * result['updates']} routed updates, in flight {result['in_flight']}",
+          file=sys.stderr)
+    params = {k: v for k, v in vars(args).items() if k not in ('output', 'verbose')}
+    emit_report({'meta': report_meta('worker_acks', params), **result}, args.output)
+    if not (result['acked_first'] and result['acked_redelivered'] and not any(result['in_flight'])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Webhook worker benchmark - admin journeys posted as webhooks to the multi-process receiver
+"""
+
+import sys
+import os
+import time
+import json
+import asyncio
+import argparse
+import warnings
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import open_backend, close_backend, summarize, report_meta, emit_report
+from benchmarks.synthetic_data import generate_dataset, load_dataset
+from benchmarks.fake_bot_api import FakeBotAPI, FAKE_TOKEN
+from benchmarks.load_conversations import (
+    FIRST_ADMIN_ID, JOURNEYS, UpdateTracker, SimulatedAdmin, JourneyError, parse_int_list
+)
+
+
+class WebhookAdmin(SimulatedAdmin):
+    """SimulatedAdmin that delivers its updates as webhook POSTs"""
+
+    def __init__(self, admin_id, client, webhook_url, api, tracker, step_timeout, samples):
+        super().__init__(admin_id, None, api, tracker, step_timeout, samples)
+        self.client = client
+        self.webhook_url = webhook_url
+
+    async def _send(self, payload, step):
+        update_id = next(self._update_ids)
+        payload['update_id'] = update_id
+        done = self.tracker.expect(update_id)
+
+        started = time.perf_counter()
+        response = await self.client.post(self.webhook_url, content=json.dumps(payload),
+                                          headers={'Content-Type': 'application/json'})
+        self.updates_sent += 1
+        if response.status_code != 200:
+            self.tracker.pending.pop(update_id, None)
+            raise JourneyError(f"{step}: webhook answered {response.status_code}")
+        try:
+            finished = await asyncio.wait_for(done, self.step_timeout)
+        except asyncio.TimeoutError:
+            self.tracker.pending.pop(update_id, None)
+            raise JourneyError(f"{step}: no response within {self.step_timeout}s")
+
+        self.samples.setdefault(step, []).append((finished - started) * 1000.0)
+        error = self.tracker.errors.pop(update_id, None)
+        if error:
+            raise JourneyError(f"{step}: {error}")
+
+
+async def run_workers(worker_count, args):
+    """Start the receiver with worker_count processes and run every admin's journeys"""
+    import httpx
+    from web_server import build_web_server
+    from webhook_workers import WebhookRouter
+
+    manager = open_backend('sqlite')
+    api = FakeBotAPI(latency_ms=args.api_latency_ms)
+    await api.start()
+    tracker = UpdateTracker()
+    samples = {}
+    journey_results = {name: {'completed': 0, 'failed': 0} for name in args.journeys}
+    failures = []
+    router = None
+    server = None
+    try:
+        dataset = generate_dataset(args.staff, args.weeks, args.seed, anchor=date.today() + timedelta(days=7))
+        staff_ids = load_dataset(manager, dataset, 'sqlite')['staff_ids']
+
+        # Worker processes read their configuration from the environment
+        admin_ids = [FIRST_ADMIN_ID + i for i in range(args.admins)]
+        os.environ.update({
+            'DATABASE_PATH': manager.db_path,
+            'MYSQL_HOST': 'localhost',
+            'DATABASE_URL': '',
+            'ADMIN_IDS': ','.join(str(admin_id) for admin_id in admin_ids),
+        })
+
+        router = WebhookRouter(worker_count, token=FAKE_TOKEN, base_url=api.url, quiet=not args.verbose)
+
+        def on_ack(update_id, error):
+            if error:
+                tracker.errors[update_id] = error
+            future = tracker.pending.pop(update_id, None)
+            if future and not future.done():
+                future.set_result(time.perf_counter())
+
+        router.on_processed = on_ack
+        await router.start()
+
+        async def on_update(update):
+            router.dispatch(update)
+
+        server = build_web_server(webhook_path='/webhook', on_update=on_update)
+        port = await server.start('127.0.0.1', 0)
+        webhook_url = f"http://127.0.0.1:{port}/webhook"
+
+        limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+        async with httpx.AsyncClient(limits=limits, timeout=args.step_timeout) as client:
+            admins = [WebhookAdmin(admin_id, client, webhook_url, api, tracker, args.step_timeout, samples)
+                      for admin_id in admin_ids]
+
+            async def run_admin(admin):
+                for name in args.journeys:
+                    try:
+                        await JOURNEYS[name](admin, staff_ids[:args.staff_per_journey])
+                        journey_results[name]['completed'] += 1
+                    except JourneyError as e:
+                        journey_results[name]['failed'] += 1
+                        if len(failures) < 10:
+                            failures.append(f"{name}: {e}")
+
+            started = time.perf_counter()
+            await asyncio.gather(*(run_admin(admin) for admin in admins))
+            wall = time.perf_counter() - started
+        router_stats = router.metrics()
+    finally:
+        if server:
+            await server.stop()
+        if router:
+            await router.stop()
+        await api.stop()
+        close_backend('sqlite', manager)
+
+    updates = sum(admin.updates_sent for admin in admins)
+    journeys_total = sum(r['completed'] + r['failed'] for r in journey_results.values())
+    journeys_failed = sum(r['failed'] for r in journey_results.values())
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        'status': 'ok',
+        'workers': worker_count,
+        'admins': args.admins,
+        'wall_s': round(wall, 3),
+        'updates': updates,
+        'updates_per_s': round(updates / wall, 2) if wall else None,
+        'journeys': journey_results,
+        'error_rate': round(journeys_failed / journeys_total, 4) if journeys_total else 0.0,
+        'latency': summarize(all_samples),
+        'routed_per_worker': router_stats['routed'],
+        'failures': failures,
+    }
+
+
+async def run_all(args):
+    runs = []
+    for worker_count in args.workers:
+        print(f"👷 {worker_count} worker(s), {args.admins} admins: {', '.join(args.journeys)}", file=sys.stderr)
+        result = await run_workers(worker_count, args)
+        print(f"   ✅ {result['updates_per_s']} updates/s, p95 {result['latency'].get('p95_ms')} ms, "
+              f"error rate {result['error_rate']:.1%}", file=sys.stderr)
+        runs.append(result)
+    return runs
+
+
+def main():
+    """Run each worker count and emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--workers', type=parse_int_list, default=[1, 2, 4], help='worker processes, e.g. 1,2,4')
+    parser.add_argument('--admins', type=int, default=20)
+    parser.add_argument('--journeys', default='set_schedule,pdf',
+                        help=f"comma separated, from: {', '.join(JOURNEYS)}")
+    parser.add_argument('--staff', type=int, default=8)
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--staff-per-journey', type=int, default=2)
+    parser.add_argument('--api-latency-ms', type=float, default=30.0)
+    parser.add_argument('--max-connections', type=int, default=40,
+                        help='parallel webhook connections (Telegram max_connections)')
+    parser.add_argument('--step-timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    args.journeys = [name.strip() for name in args.journeys.split(',') if name.strip()]
+    warnings.filterwarnings('ignore', message='.*per_message.*')
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    runs = asyncio.run(run_all(args))
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    params['cpu_count'] = os.cpu_count()
+    emit_report({'meta': report_meta('webhook_workers', params), 'runs': runs}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the benchmark scripts - backend setup, timing and JSON reports
+"""
+
+import sys
+import os
+import json
+import time
+import platform
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+# Add repository root to path
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)
+
+BACKENDS = ['sqlite', 'mysql', 'postgres']
+
+
+class BackendUnavailable(Exception):
+    """Raised when a benchmark backend cannot be reached or is not configured"""
+
+
+def open_backend(name):
+    """Create a database manager for a benchmark run.
+
+    SQLite always runs against a throw-away file. MySQL and PostgreSQL only run
+    when BENCH_MYSQL_DATABASE / BENCH_DATABASE_URL point at a dedicated database,
+    so a benchmark can never truncate production data.
+    """
+    if name == 'sqlite':
+        import database
+        handle, path = tempfile.mkstemp(prefix='bench_', suffix='.db')
+        os.close(handle)
+        database.DATABASE_PATH = path
+        return database.DatabaseManager()
+
+    if name == 'mysql':
+        bench_database = os.getenv('BENCH_MYSQL_DATABASE')
+        if not bench_database:
+            raise BackendUnavailable("BENCH_MYSQL_DATABASE not set")
+        try:
+            import database_mysql
+        except ImportError as e:
+            raise BackendUnavailable(f"mysql-connector not installed: {e}")
+        if bench_database == database_mysql.MYSQL_DATABASE and not os.getenv('BENCH_ALLOW_MAIN_DATABASE'):
+            raise BackendUnavailable("BENCH_MYSQL_DATABASE must differ from MYSQL_DATABASE")
+        database_mysql.MYSQL_DATABASE = bench_database
+        try:
+            with redirect_stdout(sys.stderr):
+                return database_mysql.MySQLManager()
+        except Exception as e:
+            raise BackendUnavailable(f"MySQL not reachable: {e}")
+
+    if name == 'postgres':
+        bench_url = os.getenv('BENCH_DATABASE_URL')
+        if not bench_url:
+            raise BackendUnavailable("BENCH_DATABASE_URL not set")
+        try:
+            import database_postgres
+        except ImportError as e:
+            raise BackendUnavailable(f"psycopg2 not installed: {e}")
+        if bench_url == database_postgres.DATABASE_URL and not os.getenv('BENCH_ALLOW_MAIN_DATABASE'):
+            raise BackendUnavailable("BENCH_DATABASE_URL must differ from DATABASE_URL")
+        database_postgres.DATABASE_URL = bench_url
+        try:
+            return database_postgres.PostgreSQLManager()
+        except Exception as e:
+            raise BackendUnavailable(f"PostgreSQL not reachable: {e}")
+
+    raise BackendUnavailable(f"Unknown backend '{name}'")
+
+
+def use_backend_for_bot(manager):
+    """Make the bot and its start-up data loader use the benchmark manager"""
+    import database_factory
+
+    def factory():
+        return manager
+
+    database_factory.get_database_manager = factory
+    # Modules that already bound the factory with "from database_factory import ..."
+    for module_name in ('bot_async', 'initialize_production_data'):
+        module = sys.modules.get(module_name)
+        if module is not None:
+            module.get_database_manager = factory
+
+
+def close_backend(name, manager):
+    """Release anything a benchmark backend created"""
+    if name == 'sqlite':
+        try:
+            os.remove(manager.db_path)
+        except OSError:
+            pass
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples_ms):
+    """Summary statistics (milliseconds) for a list of timings"""
+    if not samples_ms:
+        return {'count': 0}
+    return {
+        'count': len(samples_ms),
+        'min_ms': round(min(samples_ms), 3),
+        'mean_ms': round(sum(samples_ms) / len(samples_ms), 3),
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'max_ms': round(max(samples_ms), 3),
+    }
+
+
+def time_call(func, *args, **kwargs):
+    """Run func once and return (elapsed_ms, result); manager DEBUG prints go to stderr"""
+    with redirect_stdout(sys.stderr):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000.0
+    return elapsed, result
+
+
+def git_commit():
+    """Current commit hash, or None outside a git checkout"""
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+        )
+        return output.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def report_meta(benchmark, params):
+    """Metadata block shared by every JSON report"""
+    return {
+        'benchmark': benchmark,
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+    }
+
+
+def emit_report(report, output_path=None):
+    """Write a JSON report to a file, or to stdout when no path is given"""
+    text = json.dumps(report, indent=2, default=str)
+    if output_path:
+        with open(output_path, 'w') as f:
+            f.write(text + '\n')
+        print(f"📄 Report written to {output_path}", file=sys.stderr)
+    else:
+        print(text)
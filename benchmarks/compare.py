@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark JSON reports (e.g. before/after a commit)
+"""
+
+import sys
+import json
+import argparse
+
+
+def _index_runs(report):
+    """Map (backend, staff, weeks, method) -> p50 milliseconds"""
+    index = {}
+    for run in report.get('runs', []):
+        for method, stats in (run.get('methods') or {}).items():
+            if stats.get('status') == 'ok' and 'p50_ms' in stats:
+                index[(run['backend'], run.get('staff'), run.get('weeks'), method)] = stats['p50_ms']
+    return index
+
+
+def compare(base, head, threshold):
+    """Return rows of (key, base_ms, head_ms, change_pct, flag)"""
+    base_index = _index_runs(base)
+    head_index = _index_runs(head)
+    rows = []
+    for key in sorted(set(base_index) & set(head_index), key=str):
+        before, after = base_index[key], head_index[key]
+        change = ((after - before) / before * 100.0) if before else 0.0
+        if change > threshold:
+            flag = 'slower'
+        elif change < -threshold:
+            flag = 'faster'
+        else:
+            flag = ''
+        rows.append((key, before, after, change, flag))
+    return rows
+
+
+def main():
+    """Print a p50 comparison table; exit 1 if anything regressed past the threshold"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=20.0, help='percent change to flag')
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"📊 {base['meta'].get('commit')} -> {head['meta'].get('commit')} (p50 ms)")
+    regressed = False
+    for (backend, staff, weeks, method), before, after, change, flag in compare(base, head, args.threshold):
+        marker = {'slower': '🔴', 'faster': '🟢'}.get(flag, '  ')
+        print(f"{marker} {backend:8} {staff}x{weeks:<4} {method:30} {before:10.3f} {after:10.3f} {change:+7.1f}%")
+        regressed = regressed or flag == 'slower'
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
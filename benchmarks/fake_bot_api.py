@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Fake Telegram Bot API - a local HTTP server that answers the Bot API methods the bot uses
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter, deque
+from email.parser import BytesParser
+from email import policy
+from urllib.parse import parse_qsl
+
+FAKE_TOKEN = '123456:FAKE-TOKEN-FOR-LOAD-TESTS'
+BOT_USER = {
+    'id': 123456,
+    'is_bot': True,
+    'first_name': 'Scheduler Bot',
+    'username': 'fake_scheduler_bot',
+    'can_join_groups': False,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False,
+}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 411: 'Length Required', 429: 'Too Many Requests'}
+
+
+class FakeBotAPI:
+    """In-process stand-in for api.telegram.org.
+
+    Keeps the last text and inline keyboard of every message per chat so a
+    load driver can "see" what the bot rendered and pick the next button.
+    Like the real API, editing a message to identical content is rejected
+    with 400 "message is not modified". With chat_limit set, a chat sending
+    more than chat_limit messages/edits per second gets 429 RetryAfter.
+    """
+
+    def __init__(self, latency_ms=0.0, chat_limit=0):
+        self.latency = latency_ms / 1000.0
+        self.chat_limit = chat_limit
+        self._chat_windows = {}
+        self.url = None
+        self.calls = Counter()
+        self.errors = Counter()
+        self.bytes_in = 0
+        self.chats = {}
+        self._server = None
+        self._message_ids = 0
+        self._file_ids = 0
+        self.pending_updates = []
+        self._update_ids = 1000000
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening; port 0 picks a free port"""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        bound_port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{bound_port}"
+        return self.url
+
+    async def stop(self):
+        """Stop listening and close open connections"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def chat(self, chat_id):
+        """State for one chat: messages, the message holding the live keyboard, documents"""
+        return self.chats.setdefault(int(chat_id), {'messages': {}, 'active': None, 'documents': 0})
+
+    def current_message(self, chat_id):
+        """(text, reply_markup) of the message that last received a keyboard"""
+        chat = self.chat(chat_id)
+        message = chat['messages'].get(chat['active'])
+        if not message:
+            return '', None
+        return message['text'], message['reply_markup']
+
+    def queue_update(self, payload):
+        """Queue an update for getUpdates (e.g. a tap made while the bot was down)"""
+        self._update_ids += 1
+        payload = dict(payload, update_id=self._update_ids)
+        self.pending_updates.append(payload)
+        return self._update_ids
+
+    def stats(self):
+        """Counters for the load report"""
+        return {
+            'calls': dict(self.calls),
+            'errors': dict(self.errors),
+            'bytes_in': self.bytes_in,
+        }
+
+    # ------------------------------------------------------------------ HTTP
+
+    async def _handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 keep-alive loop"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    _, path, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if headers.get('transfer-encoding', '').lower() == 'chunked':
+                    status, payload = 411, {'ok': False, 'error_code': 411, 'description': 'Length Required'}
+                    body = b''
+                else:
+                    length = int(headers.get('content-length', 0))
+                    body = await reader.readexactly(length) if length else b''
+                    self.bytes_in += len(body)
+                    status, payload = await self._dispatch(path, headers, body)
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _parse_body(self, headers, body):
+        """Decode urlencoded or multipart parameters; JSON-valued fields are decoded too"""
+        content_type = headers.get('content-type', '')
+        params = {}
+        if content_type.startswith('multipart/form-data'):
+            message = BytesParser(policy=policy.HTTP).parsebytes(
+                b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body
+            )
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                if part.get_filename():
+                    params[name] = {'filename': part.get_filename(), 'size': len(part.get_payload(decode=True) or b'')}
+                else:
+                    params[name] = part.get_content()
+        elif body:
+            params = dict(parse_qsl(body.decode(), keep_blank_values=True))
+
+        for key in ('reply_markup', 'chat_id', 'message_id'):
+            if isinstance(params.get(key), str):
+                try:
+                    params[key] = json.loads(params[key])
+                except ValueError:
+                    pass
+        return params
+
+    async def _dispatch(self, path, headers, body):
+        """Route /bot<token>/<method> to a handler"""
+        method = path.rstrip('/').rsplit('/', 1)[-1].split('?', 1)[0]
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        params = self._parse_body(headers, body)
+        if self._flooded(method, params):
+            self.errors[method] += 1
+            return 429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                         'parameters': {'retry_after': 1}}
+
+        handler = getattr(self, f'_api_{method.lower()}', None)
+        if handler is None:
+            return 200, {'ok': True, 'result': True}
+
+        result = handler(params)
+        if asyncio.iscoroutine(result):
+            result = await result
+        if isinstance(result, tuple):
+            # (status, description) error
+            status, description = result
+            self.errors[method] += 1
+            return status, {'ok': False, 'error_code': status, 'description': description}
+        return 200, {'ok': True, 'result': result}
+
+    def _flooded(self, method, params):
+        """Sliding one-second window of message calls per chat"""
+        if not self.chat_limit or not method.startswith(('send', 'edit')) or params.get('chat_id') is None:
+            return False
+        window = self._chat_windows.setdefault(params['chat_id'], deque())
+        now = time.monotonic()
+        while window and now - window[0] > 1.0:
+            window.popleft()
+        if len(window) >= self.chat_limit:
+            return True
+        window.append(now)
+        return False
+
+    # ------------------------------------------------------------- Bot API
+
+    def _message(self, chat_id, message_id, text, reply_markup=None, **extra):
+        """Serialize a Message the way the Bot API returns it"""
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private', 'first_name': 'Admin'},
+            'from': BOT_USER,
+        }
+        if text is not None:
+            message['text'] = text
+        if reply_markup:
+            message['reply_markup'] = reply_markup
+        message.update(extra)
+        return message
+
+    def _store(self, chat_id, message_id, text, reply_markup):
+        chat = self.chat(chat_id)
+        chat['messages'][message_id] = {'text': text, 'reply_markup': reply_markup}
+        if reply_markup:
+            chat['active'] = message_id
+
+    def _api_getme(self, params):
+        return BOT_USER
+
+    async def _api_getupdates(self, params):
+        offset = int(params.get('offset') or 0)
+        if offset:
+            # Like Telegram: asking for offset N confirms every update before it
+            self.pending_updates = [u for u in self.pending_updates if u['update_id'] >= offset]
+        if not self.pending_updates:
+            await asyncio.sleep(min(float(params.get('timeout') or 0), 0.2))
+        return list(self.pending_updates[:int(params.get('limit') or 100)])
+
+    def _api_deletewebhook(self, params):
+        if str(params.get('drop_pending_updates', '')).lower() == 'true':
+            self.pending_updates = []
+        return True
+
+    def _api_getwebhookinfo(self, params):
+        return {'url': '', 'has_custom_certificate': False, 'pending_update_count': 0}
+
+    def _api_answercallbackquery(self, params):
+        return True
+
+    def _api_sendmessage(self, params):
+        self._message_ids += 1
+        chat_id = params.get('chat_id')
+        self._store(chat_id, self._message_ids, params.get('text', ''), params.get('reply_markup'))
+        return self._message(chat_id, self._message_ids, params.get('text', ''), params.get('reply_markup'))
+
+    def _api_editmessagetext(self, params):
+        chat_id = params.get('chat_id')
+        message_id = params.get('message_id')
+        text = params.get('text', '')
+        reply_markup = params.get('reply_markup')
+        previous = self.chat(chat_id)['messages'].get(message_id)
+        if previous is None:
+            return 400, 'Bad Request: message to edit not found'
+        if previous['text'] == text and previous['reply_markup'] == reply_markup:
+            return 400, ('Bad Request: message is not modified: specified new message content '
+                         'and reply markup are exactly the same as a current content and reply markup of the message')
+        self._store(chat_id, message_id, text, reply_markup)
+        return self._message(chat_id, message_id, text, reply_markup)
+
+    def _api_editmessagereplymarkup(self, params):
+        chat_id = params.get('chat_id')
+        message_id = params.get('message_id')
+        previous = self.chat(chat_id)['messages'].get(message_id)
+        if previous is None:
+            return 400, 'Bad Request: message to edit not found'
+        self._store(chat_id, message_id, previous['text'], params.get('reply_markup'))
+        return self._message(chat_id, message_id, previous['text'], params.get('reply_markup'))
+
+    def _api_senddocument(self, params):
+        self._message_ids += 1
+        self._file_ids += 1
+        chat_id = params.get('chat_id')
+        self.chat(chat_id)['documents'] += 1
+        document = params.get('document') or {}
+        return self._message(
+            chat_id, self._message_ids, None,
+            caption=params.get('caption', ''),
+            document={
+                'file_id': f'fake-file-{self._file_ids}',
+                'file_unique_id': f'fake-unique-{self._file_ids}',
+                'file_name': document.get('filename', 'document.pdf') if isinstance(document, dict) else 'document.pdf',
+                'file_size': document.get('size', 0) if isinstance(document, dict) else 0,
+            }
+        )
+
+
+async def _serve_forever(host, port, latency_ms):
+    """Run the fake API standalone (handy for pointing a real bot process at it)"""
+    api = FakeBotAPI(latency_ms)
+    url = await api.start(host, port)
+    print(f"🤖 Fake Bot API listening on {url} (token {FAKE_TOKEN})", file=sys.stderr)
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await api.stop()
+
+
+def main():
+    """Start a standalone fake Bot API server"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='delay added to every API call')
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve_forever(args.host, args.port, args.latency_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
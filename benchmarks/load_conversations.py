@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Conversation load tester - replays admin journeys through the real ConversationHandler against a fake Bot API
+"""
+
+import sys
+import os
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import warnings
+import itertools
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import (
+    BackendUnavailable, open_backend, close_backend, use_backend_for_bot,
+    summarize, report_meta, emit_report
+)
+from benchmarks.synthetic_data import generate_dataset, load_dataset
+from benchmarks.fake_bot_api import FakeBotAPI, FAKE_TOKEN, BOT_USER
+
+FIRST_ADMIN_ID = 900000000
+COMPLETION_GROUP = 1000  # runs after the ConversationHandler (group 0) has finished
+
+
+class JourneyError(Exception):
+    """A journey could not continue (missing button, handler error, timeout)"""
+
+
+class UpdateTracker:
+    """Resolves a future when the Application has finished processing an update"""
+
+    def __init__(self):
+        self.pending = {}
+        self.errors = {}
+
+    def expect(self, update_id):
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update_id] = future
+        return future
+
+    async def on_processed(self, update, context):
+        future = self.pending.pop(update.update_id, None)
+        if future and not future.done():
+            future.set_result(time.perf_counter())
+
+    async def on_error(self, update, context):
+        if update is not None and hasattr(update, 'update_id'):
+            self.errors[update.update_id] = repr(context.error)
+
+
+class SimulatedAdmin:
+    """One admin in a private chat, tapping buttons the bot actually rendered"""
+
+    _update_ids = itertools.count(1)
+    _callback_ids = itertools.count(1)
+
+    def __init__(self, admin_id, application, api, tracker, step_timeout, samples):
+        self.user_id = admin_id
+        self.application = application
+        self.api = api
+        self.tracker = tracker
+        self.step_timeout = step_timeout
+        self.samples = samples
+        self.updates_sent = 0
+        self.user = {'id': admin_id, 'is_bot': False, 'first_name': f'Admin {admin_id}'}
+
+    @property
+    def text(self):
+        return self.api.current_message(self.user_id)[0] or ''
+
+    def buttons(self):
+        """callback_data of every button on the live keyboard"""
+        _, markup = self.api.current_message(self.user_id)
+        if not markup:
+            return []
+        return [button.get('callback_data') for row in markup.get('inline_keyboard', []) for button in row]
+
+    def offers(self, callback_data):
+        return callback_data in self.buttons()
+
+    async def _send(self, payload, step):
+        from telegram import Update
+
+        update_id = next(self._update_ids)
+        payload['update_id'] = update_id
+        update = Update.de_json(payload, self.application.bot)
+        done = self.tracker.expect(update_id)
+
+        started = time.perf_counter()
+        await self.application.update_queue.put(update)
+        self.updates_sent += 1
+        try:
+            finished = await asyncio.wait_for(done, self.step_timeout)
+        except asyncio.TimeoutError:
+            self.tracker.pending.pop(update_id, None)
+            raise JourneyError(f"{step}: no response within {self.step_timeout}s")
+
+        self.samples.setdefault(step, []).append((finished - started) * 1000.0)
+        error = self.tracker.errors.pop(update_id, None)
+        if error:
+            raise JourneyError(f"{step}: {error}")
+
+    async def command(self, text, step):
+        """Send a /command as a text message"""
+        chat = {'id': self.user_id, 'type': 'private', 'first_name': self.user['first_name']}
+        await self._send({
+            'message': {
+                'message_id': next(self._callback_ids),
+                'date': int(time.time()),
+                'chat': chat,
+                'from': self.user,
+                'text': text,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}],
+            }
+        }, step)
+
+    async def click(self, callback_data, step):
+        """Tap a button on the live keyboard; fails if the bot did not offer it"""
+        if not self.offers(callback_data):
+            raise JourneyError(f"{step}: button '{callback_data}' not offered (have {self.buttons()[:8]})")
+        await self._send(self.callback_payload(callback_data), step)
+
+    def callback_payload(self, callback_data):
+        """Update body for a tap on the live keyboard (without an update_id)"""
+        chat = self.api.chat(self.user_id)
+        return {
+            'callback_query': {
+                'id': str(next(self._callback_ids)),
+                'from': self.user,
+                'chat_instance': str(self.user_id),
+                'data': callback_data,
+                'message': {
+                    'message_id': chat['active'],
+                    'date': int(time.time()),
+                    'chat': {'id': self.user_id, 'type': 'private'},
+                    'from': BOT_USER,
+                    'text': self.text,
+                },
+            }
+        }
+
+    def expect_text(self, *fragments, step):
+        if not any(fragment in self.text for fragment in fragments):
+            raise JourneyError(f"{step}: unexpected screen '{self.text[:80]}'")
+
+
+# --------------------------------------------------------------- journeys
+
+async def journey_set_schedule(admin, staff_ids):
+    """Set Schedule for every staff member in the week after next"""
+    for staff_id in staff_ids:
+        await admin.command('/start', 'start')
+        await admin.click('set_schedule', 'open_set_schedule')
+        if admin.offers('select_week_all_after_next'):
+            await admin.click('select_week_all_after_next', 'pick_week')
+        await admin.click(f'schedule_{staff_id}', 'pick_staff')
+
+        # Admins share staff ids, so a save can lose to another admin's - reload and redo it
+        for _ in range(5):
+            await fill_week(admin)
+            await admin.click('save_schedule', 'save_schedule')
+            if 'Someone else changed' not in admin.text:
+                break
+            await admin.click('reload_schedule', 'reload_schedule')
+        admin.expect_text('Schedule saved', 'All Staff Scheduled', step='save_schedule')
+
+
+async def fill_week(admin):
+    """From a staff member's week (existing or fresh) to the summary with Save"""
+    if admin.offers('edit_existing_schedule'):
+        # Someone already scheduled this person - edit instead
+        await admin.click('edit_existing_schedule', 'edit_existing')
+        await admin.click('edit_off_days', 'edit_off_days')
+    else:
+        await admin.click('toggle_off_day_Sunday', 'toggle_off_day')
+        await admin.click('toggle_off_day_Saturday', 'toggle_off_day')
+    await admin.click('confirm_off_days', 'confirm_off_days')
+    await admin.click('apply_off_days', 'apply_off_days')
+
+    for _ in range(7):
+        if admin.offers('view_complete_schedule') or admin.offers('save_schedule'):
+            break
+        await admin.click('start_10:00', 'pick_start_time')
+        await admin.click('end_18:00', 'pick_end_time')
+        if admin.offers('continue_time_setting'):
+            await admin.click('continue_time_setting', 'next_day')
+    if admin.offers('view_complete_schedule'):
+        await admin.click('view_complete_schedule', 'review')
+
+
+async def journey_mirror_week(admin, staff_ids):
+    """Bulk Schedule -> Mirror Previous Week -> Mirror & Save All"""
+    await admin.command('/start', 'start')
+    await admin.click('bulk_schedule', 'open_bulk_schedule')
+    await admin.click('mirror_previous_week', 'mirror_preview')
+    await admin.click('confirm_copy_previous', 'mirror_confirm')
+    admin.expect_text('Copied Successfully', step='mirror_confirm')
+
+
+async def journey_export_pdf(admin, staff_ids):
+    """Export PDF for the current week (next week once the current one is over)"""
+    await admin.command('/start', 'start')
+    await admin.click('export_pdf', 'open_export_pdf')
+    documents_before = admin.api.chat(admin.user_id)['documents']
+    week = 'export_pdf_current' if admin.offers('export_pdf_current') else 'export_pdf_next'
+    await admin.click(week, 'export_pdf')
+    admin.expect_text('PDF exported successfully', step='export_pdf')
+    if admin.api.chat(admin.user_id)['documents'] <= documents_before:
+        raise JourneyError("export_pdf: no document delivered")
+
+
+async def journey_audit_log(admin, staff_ids):
+    """Audit Log: page back three pages, filter by staff and action, return to the latest"""
+    await admin.command('/start', 'start')
+    await admin.click('audit_log', 'open_audit_log')
+    admin.expect_text('Audit Log', step='open_audit_log')
+    for _ in range(3):
+        if not admin.offers('audit_older'):
+            break
+        await admin.click('audit_older', 'audit_page')
+    await admin.click('audit_staff', 'audit_staff_picker')
+    await admin.click(f'audit_staff_{staff_ids[0]}', 'audit_filter')
+    await admin.click('audit_action', 'audit_filter')
+    await admin.click('audit_log', 'audit_latest')
+    admin.expect_text('Audit Log', step='audit_latest')
+
+
+JOURNEYS = {
+    'set_schedule': journey_set_schedule,
+    'mirror': journey_mirror_week,
+    'pdf': journey_export_pdf,
+    'audit': journey_audit_log,
+}
+
+
+# ------------------------------------------------------------------ driver
+
+async def run_level(admin_count, concurrency, args, bot_class):
+    """Run every journey for admin_count simultaneous admins on a fresh database"""
+    try:
+        manager = open_backend(args.backend)
+    except BackendUnavailable as e:
+        return {'status': 'skipped', 'reason': str(e)}
+
+    api = FakeBotAPI(latency_ms=args.api_latency_ms, chat_limit=args.api_chat_limit)
+    await api.start()
+    tracker = UpdateTracker()
+    samples = {}
+    journey_results = {name: {'completed': 0, 'failed': 0} for name in args.journeys}
+    failures = []
+
+    try:
+        use_backend_for_bot(manager)
+        bot = bot_class()
+        # Anchor on next week so the current and next week are both populated
+        dataset = generate_dataset(args.staff, args.weeks, args.seed, anchor=date.today() + timedelta(days=7))
+        staff_ids = load_dataset(manager, dataset, args.backend)['staff_ids']
+
+        from outbound_queue import OutboundMessageQueue
+        outbound = OutboundMessageQueue(global_rate=args.global_rate, chat_rate=args.chat_rate)
+        application = bot.build_application(token=FAKE_TOKEN, base_url=api.url, max_concurrent_updates=concurrency,
+                                            outbound_queue=outbound)
+        from telegram import Update
+        from telegram.ext import TypeHandler
+        application.add_handler(TypeHandler(Update, tracker.on_processed), group=COMPLETION_GROUP)
+        application.add_error_handler(tracker.on_error)
+
+        admin_ids = [FIRST_ADMIN_ID + i for i in range(admin_count)]
+        import bot_async
+        bot_async.ADMIN_IDS[:] = sorted(set(bot_async.ADMIN_IDS) | set(admin_ids))
+
+        await application.initialize()
+        await application.start()
+
+        admins = [
+            SimulatedAdmin(admin_id, application, api, tracker, args.step_timeout, samples)
+            for admin_id in admin_ids
+        ]
+
+        async def run_admin(admin):
+            for name in args.journeys:
+                try:
+                    await JOURNEYS[name](admin, staff_ids[:args.staff_per_journey])
+                    journey_results[name]['completed'] += 1
+                except JourneyError as e:
+                    journey_results[name]['failed'] += 1
+                    if len(failures) < 10:
+                        failures.append(f"{name}: {e}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_admin(admin) for admin in admins))
+        wall = time.perf_counter() - started
+
+        await application.stop()
+        await application.shutdown()
+    finally:
+        await api.stop()
+        close_backend(args.backend, manager)
+
+    updates = sum(admin.updates_sent for admin in admins)
+    journeys_total = sum(r['completed'] + r['failed'] for r in journey_results.values())
+    journeys_failed = sum(r['failed'] for r in journey_results.values())
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        'status': 'ok',
+        'admins': admin_count,
+        'concurrency': concurrency,
+        'wall_s': round(wall, 3),
+        'updates': updates,
+        'updates_per_s': round(updates / wall, 2) if wall else None,
+        'journeys_per_s': round(journeys_total / wall, 3) if wall else None,
+        'journeys': journey_results,
+        'error_rate': round(journeys_failed / journeys_total, 4) if journeys_total else 0.0,
+        'latency': summarize(all_samples),
+        'steps': {step: summarize(values) for step, values in sorted(samples.items())},
+        'bot_api': api.stats(),
+        'outbound_queue': outbound.metrics(),
+        'failures': failures,
+    }
+
+
+async def run_all(args):
+    """Import the bot once, then run each level on its own fresh database"""
+    # bot_async configures INFO logging and prints DEBUG lines on every tap
+    with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stderr if args.verbose else devnull):
+        from bot_async import StaffSchedulerBot
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        levels = []
+        for concurrency in args.concurrency:
+            for admin_count in args.admins:
+                print(f"👥 {admin_count} admin(s), concurrency {concurrency}: {', '.join(args.journeys)}",
+                      file=sys.stderr)
+                result = await run_level(admin_count, concurrency, args, StaffSchedulerBot)
+                if result['status'] == 'ok':
+                    print(f"   ✅ {result['updates_per_s']} updates/s, p95 {result['latency'].get('p95_ms')} ms, "
+                          f"error rate {result['error_rate']:.1%}", file=sys.stderr)
+                else:
+                    print(f"   ⚠️ skipped: {result['reason']}", file=sys.stderr)
+                levels.append(result)
+    return levels
+
+
+def parse_int_list(value):
+    """Parse '1,10,100' into [1, 10, 100]"""
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+def main():
+    """Run the load levels and emit a JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--admins', type=parse_int_list, default=[1, 10, 50],
+                        help='simultaneous admins per level, e.g. 1,10,100,500')
+    parser.add_argument('--concurrency', type=parse_int_list, default=[1, 32],
+                        help='max concurrent updates to compare; 1 is the old sequential behaviour')
+    parser.add_argument('--journeys', default='set_schedule,mirror,pdf',
+                        help=f"comma separated, from: {', '.join(JOURNEYS)}")
+    parser.add_argument('--backend', default='sqlite', help='sqlite, mysql or postgres')
+    parser.add_argument('--staff', type=int, default=8, help='staff in the synthetic roster')
+    parser.add_argument('--weeks', type=int, default=4, help='weeks of history in the synthetic roster')
+    parser.add_argument('--staff-per-journey', type=int, default=2,
+                        help='staff each admin schedules in the set_schedule journey')
+    parser.add_argument('--api-latency-ms', type=float, default=30.0,
+                        help='simulated Telegram round trip per Bot API call')
+    parser.add_argument('--api-chat-limit', type=int, default=0,
+                        help='fake API answers 429 RetryAfter above this many messages/s per chat (0 = never)')
+    parser.add_argument('--global-rate', type=float, default=0.0,
+                        help='outbound messages/s across chats (0 = unlimited, measures bot capacity)')
+    parser.add_argument('--chat-rate', type=float, default=0.0,
+                        help='outbound messages/s per chat (0 = unlimited)')
+    parser.add_argument('--step-timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help='show bot DEBUG output and INFO logs')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    args.journeys = [name.strip() for name in args.journeys.split(',') if name.strip()]
+    unknown = [name for name in args.journeys if name not in JOURNEYS]
+    if unknown:
+        parser.error(f"unknown journeys: {', '.join(unknown)}")
+
+    warnings.filterwarnings('ignore', message='.*per_message.*')
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    workdir = tempfile.mkdtemp(prefix='load_conversations_')
+    os.chdir(workdir)  # the PDF generator writes into the working directory
+
+    levels = asyncio.run(run_all(args))
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    emit_report({'meta': report_meta('conversations', params), 'levels': levels}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Synthetic dataset generator - N staff x W weeks of schedules with audit history
+"""
+
+import sys
+import os
+import json
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta, date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DAYS_OF_WEEK
+
+FIRST_NAMES = [
+    'Bea', 'Kenza', 'Martina', 'Sofia', 'Amir', 'Leila', 'Noah', 'Maya', 'Omar', 'Chloe',
+    'Yasmin', 'Lucas', 'Ines', 'Theo', 'Nora', 'Sami', 'Elena', 'Jad', 'Rosa', 'Victor'
+]
+
+# Full days inside the MIN_START_TIME / MAX_END_TIME window
+FULL_SHIFTS = [('09:45', '18:00'), ('10:00', '19:00'), ('11:00', '20:00'), ('12:00', '21:00')]
+# The schema stores one interval per day, so split shifts are modelled as a
+# rota that alternates short morning and evening blocks across the week
+MORNING_BLOCKS = [('09:45', '14:00'), ('10:00', '14:00')]
+EVENING_BLOCKS = [('15:30', '21:00'), ('17:00', '21:00')]
+
+PROFILES = ['full_time', 'part_time', 'split_shift']
+
+
+def week_start_for(day):
+    """Sunday that starts the week containing day"""
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+
+def _week_cells(rng, profile, week_start):
+    """Generate the seven day cells for one staff member in one week"""
+    if profile == 'full_time':
+        working_days = set(rng.sample(range(7), 5))
+    elif profile == 'part_time':
+        working_days = set(rng.sample(range(7), 3))
+    else:
+        working_days = set(rng.sample(range(7), 4))
+
+    cells = []
+    for index, day in enumerate(DAYS_OF_WEEK):
+        schedule_date = week_start + timedelta(days=index)
+        if index not in working_days:
+            cells.append((day, schedule_date, False, None, None))
+            continue
+        if rng.random() < 0.02:
+            # "Not Set" - working but no times chosen yet
+            cells.append((day, schedule_date, True, None, None))
+            continue
+        if profile == 'split_shift':
+            start, end = rng.choice(MORNING_BLOCKS if index % 2 == 0 else EVENING_BLOCKS)
+        else:
+            start, end = rng.choice(FULL_SHIFTS)
+        cells.append((day, schedule_date, True, start, end))
+    return cells
+
+
+def generate_dataset(staff_count=25, weeks=12, seed=42, anchor=None, max_edits=2):
+    """Build an in-memory dataset.
+
+    Weeks run backwards from the week containing anchor (default: today), so
+    the current week is always populated. Every cell gets an ADD_SCHEDULE audit
+    entry plus up to max_edits UPDATE_SCHEDULE entries.
+    """
+    rng = random.Random(seed)
+    anchor = anchor or date.today()
+    current_week_start = week_start_for(anchor)
+    first_week_start = current_week_start - timedelta(days=7 * (weeks - 1))
+
+    staff = []
+    for i in range(staff_count):
+        name = f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {i + 1:03d}"
+        staff.append({'name': name, 'profile': PROFILES[i % len(PROFILES)]})
+
+    schedules = []
+    changes = []
+    for week in range(weeks):
+        week_start = first_week_start + timedelta(days=7 * week)
+        for staff_index, member in enumerate(staff):
+            for day, schedule_date, is_working, start, end in _week_cells(rng, member['profile'], week_start):
+                schedules.append({
+                    'staff_index': staff_index,
+                    'day_of_week': day,
+                    'schedule_date': schedule_date,
+                    'is_working': is_working,
+                    'start_time': start,
+                    'end_time': end,
+                })
+
+                # Audit trail: created a few days before the week, edited later
+                changed_at = datetime.combine(week_start, datetime.min.time()) - timedelta(
+                    days=rng.randint(1, 6), minutes=rng.randint(0, 600)
+                )
+                new_data = {
+                    'is_working': is_working,
+                    'start_time': start or '',
+                    'end_time': end or '',
+                    'schedule_date': schedule_date.strftime('%Y-%m-%d'),
+                }
+                changes.append({
+                    'staff_index': staff_index,
+                    'action': 'ADD_SCHEDULE',
+                    'day_of_week': day,
+                    'old_data': None,
+                    'new_data': json.dumps(new_data),
+                    'changed_by': 'ADMIN',
+                    'changed_at': changed_at,
+                })
+                for _ in range(rng.randint(0, max_edits)):
+                    changed_at += timedelta(hours=rng.randint(1, 48))
+                    old_data = new_data
+                    shift = rng.choice(FULL_SHIFTS)
+                    new_data = dict(old_data, start_time=shift[0], end_time=shift[1])
+                    changes.append({
+                        'staff_index': staff_index,
+                        'action': 'UPDATE_SCHEDULE',
+                        'day_of_week': day,
+                        'old_data': json.dumps(old_data),
+                        'new_data': json.dumps(new_data),
+                        'changed_by': 'ADMIN',
+                        'changed_at': changed_at,
+                    })
+
+    changes.sort(key=lambda c: c['changed_at'])
+    return {
+        'staff': staff,
+        'schedules': schedules,
+        'changes': changes,
+        'current_week_start': current_week_start,
+        'first_week_start': first_week_start,
+        'weeks': weeks,
+        'seed': seed,
+    }
+
+
+def _connect(manager, backend):
+    """Open a raw connection through the manager's own configuration"""
+    if backend == 'sqlite':
+        return sqlite3.connect(manager.db_path), '?'
+    return manager.get_connection(), '%s'
+
+
+def load_dataset(manager, dataset, backend):
+    """Replace all staff, schedules and audit rows with the synthetic dataset"""
+    conn, ph = _connect(manager, backend)
+    cursor = conn.cursor()
+    has_audit = backend != 'postgres'  # PostgreSQLManager does not create schedule_changes
+
+    try:
+        if has_audit:
+            cursor.execute('DELETE FROM schedule_changes')
+        cursor.execute('DELETE FROM schedules')
+        cursor.execute('DELETE FROM staff')
+
+        cursor.executemany(
+            f'INSERT INTO staff (name) VALUES ({ph})',
+            [(member['name'],) for member in dataset['staff']]
+        )
+        cursor.execute('SELECT id, name FROM staff')
+        id_by_name = {name: staff_id for staff_id, name in cursor.fetchall()}
+        staff_ids = [id_by_name[member['name']] for member in dataset['staff']]
+
+        cursor.executemany(f'''
+            INSERT INTO schedules (staff_id, day_of_week, schedule_date, is_working, start_time, end_time)
+            VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+        ''', [
+            (staff_ids[row['staff_index']], row['day_of_week'], row['schedule_date'].strftime('%Y-%m-%d'),
+             row['is_working'], row['start_time'], row['end_time'])
+            for row in dataset['schedules']
+        ])
+
+        if has_audit:
+            cursor.executemany(f'''
+                INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by, changed_at)
+                VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+            ''', [
+                (staff_ids[row['staff_index']], row['action'], row['day_of_week'], row['old_data'],
+                 row['new_data'], row['changed_by'], row['changed_at'].strftime('%Y-%m-%d %H:%M:%S'))
+                for row in dataset['changes']
+            ])
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return {
+        'staff': len(staff_ids),
+        'schedules': len(dataset['schedules']),
+        'schedule_changes': len(dataset['changes']) if has_audit else 0,
+        'staff_ids': staff_ids,
+    }
+
+
+def build_week_payload(staff_rows, week_start, variant=0):
+    """Build the save_bulk_schedules payload for every staff member in one week.
+
+    staff_rows is a list of (staff_id, name); variant rotates the shifts so
+    repeated saves are real changes rather than no-ops.
+    """
+    payload = []
+    for position, (staff_id, name) in enumerate(staff_rows):
+        schedule_data = {}
+        for index, day in enumerate(DAYS_OF_WEEK):
+            is_working = (index + position + variant) % 7 not in (0, 1)
+            start, end = FULL_SHIFTS[(index + position + variant) % len(FULL_SHIFTS)]
+            schedule_data[day] = {
+                'date': (week_start + timedelta(days=index)).strftime('%Y-%m-%d'),
+                'is_working': is_working,
+                'start_time': start if is_working else None,
+                'end_time': end if is_working else None,
+            }
+        payload.append((staff_id, name, schedule_data))
+    return payload
+
+
+def main():
+    """Generate a dataset into a SQLite file for manual inspection"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--staff', type=int, default=25)
+    parser.add_argument('--weeks', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='synthetic_scheduler.db', help='SQLite file to create')
+    args = parser.parse_args()
+
+    import database
+    database.DATABASE_PATH = args.output
+    manager = database.DatabaseManager()
+
+    dataset = generate_dataset(args.staff, args.weeks, args.seed)
+    counts = load_dataset(manager, dataset, 'sqlite')
+    print(f"✅ {counts['staff']} staff, {counts['schedules']} schedules, "
+          f"{counts['schedule_changes']} audit rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
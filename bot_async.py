@@ -1,18 +1,56 @@
+import json
 import logging
 import asyncio
+import importlib.util
+import pickle
+import time
 from datetime import datetime, timedelta
 import pytz
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, CallbackQueryHandler,
-    ContextTypes, ConversationHandler, filters
+    Application, CommandHandler, MessageHandler, CallbackQueryHandler, InlineQueryHandler,
+    ContextTypes, ConversationHandler, TypeHandler, ApplicationHandlerStop, filters
 )
 from telegram.constants import ParseMode
 import os
+from urllib.parse import urlsplit
 
-from config import BOT_TOKEN, ADMIN_IDS, DAYS_OF_WEEK
+from telegram.request import HTTPXRequest
+from config import (
+    BOT_TOKEN, ADMIN_IDS, DAYS_OF_WEEK, MAX_CONCURRENT_UPDATES, UPDATE_DEDUP_WINDOW, PORT,
+    WEBHOOK_MAX_CONNECTIONS, WEBHOOK_SECRET_TOKEN, ALLOWED_UPDATES,
+    BOT_API_POOL_SIZE, BOT_API_CONNECT_TIMEOUT, BOT_API_READ_TIMEOUT, BOT_API_WRITE_TIMEOUT,
+    BOT_API_MEDIA_WRITE_TIMEOUT, BOT_API_POOL_TIMEOUT, BOT_API_HTTP2,
+    GET_UPDATES_POOL_SIZE, GET_UPDATES_READ_TIMEOUT,
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_BURST, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_MAX_RETRIES,
+    PERSISTENCE_ENABLED, PERSISTENCE_UPDATE_INTERVAL, DROP_PENDING_UPDATES,
+    SESSION_TIMEOUT_HOURS, SESSION_CLEANUP_INTERVAL_MINUTES, AUDIT_FLUSH_INTERVAL,
+    AUDIT_RETENTION_DAYS, AUDIT_ARCHIVE_INTERVAL_HOURS, WEEK_SNAPSHOT_EVERY, WEEK_SNAPSHOT_INTERVAL_MINUTES,
+    INLINE_CACHE_SECONDS, STAFF_LINK_HOURS, NOTIFY_INTERVAL
+)
+import metrics
+from web_server import build_web_server
 from database_factory import get_database_manager
 from pdf_generator import PDFGenerator
+from update_processor import PerChatUpdateProcessor
+from outbound_queue import OutboundMessageQueue
+from bot_persistence import DatabasePersistence
+from update_dedup import UpdateDeduplicator, idempotency_key
+from callback_codec import (
+    CallbackTokens, is_compact, encode_callback, decode_callback,
+    QUICK_EDIT, VIEW_WEEK, EDIT_STAFF, SET_OFF, EDIT_TIMES, CONFIRM_TIMES
+)
+from schedule_view import FragmentCache, render_page
+from schedule_lookup import WeekIndexCache, lookup
+from staff_portal import StaffPortal, link_code, read_link_code, LINK_PREFIX
+from notifications import StaffNotifier
+from keyboards import (
+    RenderCache, time_picker, end_time_row, time_grid,
+    DAY_START_TIMES, DAY_END_TIMES, QUARTER_HOURS, TIME_RANGES, PICK_DAY_TIME_TEXT, ALL_SELECTED_TEXT
+)
+from week_diff import REMOVED, pack_days, pack_editable, pack_rows, diff_grids, format_diff, changed_schedules
+from audit_archive import archive_old_changes
+from week_history import snapshot_weeks, restore_week, parse_as_of, week_start_of, format_change
 from validators import ScheduleValidator
 
 # Enable logging
@@ -22,16 +60,76 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+LAST_ACTIVE_KEY = '_last_active'  # user_data timestamp used to evict idle sessions
+DEDUP_KEY = '_update_dedup'  # bot_data entry holding the UpdateDeduplicator
+CALLBACK_TOKENS_KEY = '_callback_tokens'  # bot_data entry holding the CallbackTokens table
+AUDIT_VIEW_KEY = 'audit_view'  # user_data entry with the audit log filters and page cursors
+AUDIT_PAGE_SIZE = 10
+AUDIT_PERIODS = [None, 1, 7, 30]  # Days shown by the audit log period filter (None = all time)
+AUDIT_ACTION_LABELS = {
+    None: ("•", "All actions"),
+    'UPDATE_SCHEDULE': ("✏️", "Updated"),
+    'CREATE_SCHEDULE': ("🆕", "Created"),
+    'ADD_SCHEDULE': ("🆕", "Added"),
+    'ADD_STAFF': ("➕", "Staff added"),
+    'REMOVE_STAFF': ("➖", "Staff removed"),
+    'DELETE_SCHEDULE': ("🗑️", "Deleted"),
+    'RESET_SCHEDULES': ("♻️", "All schedules reset"),
+    'MIRROR_WEEK': ("🔁", "Week mirrored"),
+    'LINK_STAFF': ("🔗", "Telegram linked"),
+    'UNLINK_STAFF': ("✂️", "Telegram unlinked"),
+}
+RESTORE_WEEK_KEY = 'restore_week'
+SCHEDULES_VIEW_KEY = 'schedules_view'  # user_data entry with the schedules overview page cursors
+REPEAT_WEEKS_KEY = 'repeat_weeks'  # user_data entry with the pattern length and week count being repeated
+REPEAT_PATTERN_LENGTHS = [1, 2, 3, 4]  # Weeks in a repeated pattern (1 = this week every week)
+REPEAT_WEEK_COUNTS = [4, 8, 13, 26, 52]
+MIRROR_SOURCE_WEEKS = 8  # Recent weeks offered as mirror sources
+DIFF_PREVIEW_LINES = 15  # Changed days listed in a preview before "... and N more"
+RESTORE_PREVIEW_LINES = 40
+
 # Conversation states
-MAIN_MENU, STAFF_MANAGEMENT, ADD_STAFF, REMOVE_STAFF, SCHEDULE_MENU, SCHEDULE_INPUT, BULK_ADD_COUNT, BULK_ADD_NAMES, VIEW_SCHEDULES, BULK_SCHEDULE, WEEKLY_STATS, SCHEDULE_TEMPLATES, SCHEDULE_HISTORY, WEEK_SELECTION, CHECK_ATTENDANCE, OPEN_CLOSE_ATTENDANCE = range(16)
+MAIN_MENU, STAFF_MANAGEMENT, ADD_STAFF, REMOVE_STAFF, SCHEDULE_MENU, SCHEDULE_INPUT, BULK_ADD_COUNT, BULK_ADD_NAMES, VIEW_SCHEDULES, BULK_SCHEDULE, WEEKLY_STATS, SCHEDULE_TEMPLATES, SCHEDULE_HISTORY, WEEK_SELECTION, CHECK_ATTENDANCE, OPEN_CLOSE_ATTENDANCE, AUDIT_LOG = range(17)
 
 class StaffSchedulerBot:
     def __init__(self):
         self.db = get_database_manager()
         self.pdf_gen = PDFGenerator()
         self.user_states = {}  # Store user conversation states
+        self.session_cleanup_stats = {'runs': 0, 'evicted': 0, 'reclaimed_bytes': 0, 'expired_sessions': 0, 'last_run': None}
+        self.audit_stats = {'flushes': 0, 'rows_written': 0, 'errors': 0, 'last_flush': None}
+        self.archive_stats = {'runs': 0, 'archived': 0, 'errors': 0, 'last_run': None}
+        self.snapshot_stats = {'runs': 0, 'snapshots': 0, 'errors': 0}
+        self.update_dedup_window = UPDATE_DEDUP_WINDOW
+        self.dropped_update_hook = None  # Awaited with each update dropped before the handlers (webhook workers ack it)
         self.toronto_tz = pytz.timezone('America/Toronto')
         
+        # Overview fragments, inline lookup indexes and staff answers are dropped on each schedule write
+        if hasattr(self.db, 'change_listeners'):
+            self.view_cache = FragmentCache()
+            self.lookup_cache = WeekIndexCache()
+            self.staff_portal = StaffPortal()
+            self.db.change_listeners.append(self.view_cache.invalidate)
+            self.db.change_listeners.append(self.lookup_cache.invalidate)
+            self.db.change_listeners.append(self.staff_portal.invalidate)
+        else:
+            self.view_cache = FragmentCache(max_age=0)  # No write notifications: never reuse
+            self.lookup_cache = WeekIndexCache(max_age=0)
+            self.staff_portal = StaffPortal(max_age=0)
+        self.render_cache = RenderCache()  # Pickers and menus, prebuilt per selection
+        # Queued by every schedule write (SQLite and MySQL), sent by the send_staff_notifications job
+        self.notifier = StaffNotifier(self.db) if hasattr(self.db, 'get_due_notifications') else None
+        
+        # Compact callbacks by action code: (handler taking the payload, state after it or None for the handler's)
+        self.callback_routes = {
+            QUICK_EDIT: (self.quick_edit_staff, None),
+            VIEW_WEEK: (self.view_week_schedule, SCHEDULE_HISTORY),
+            EDIT_STAFF: (self.show_edit_staff_schedule, BULK_SCHEDULE),
+            SET_OFF: (self.set_staff_off, BULK_SCHEDULE),
+            EDIT_TIMES: (self.edit_staff_times, BULK_SCHEDULE),
+            CONFIRM_TIMES: (self.confirm_times_and_continue, BULK_SCHEDULE),
+        }
+        
         # Initialize production data if needed
         try:
             from initialize_production_data import initialize_production_data
@@ -57,7 +155,8 @@ class StaffSchedulerBot:
             print(f"DEBUG: User {user_id} is NOT authorized")
             logger.info(f"User {user_id} is NOT authorized")
             await update.message.reply_text(
-                "❌ You are not authorized to use this bot. Please contact the administrator."
+                "❌ You are not authorized to use this bot. Please contact the administrator.\n\n"
+                "Staff members can see their shifts with /myshifts and /week once an admin links their account."
             )
             return ConversationHandler.END
         
@@ -89,6 +188,7 @@ class StaffSchedulerBot:
                 InlineKeyboardButton("🔧 Templates", callback_data="schedule_templates")
             ],
             [
+                InlineKeyboardButton("🧾 Audit Log", callback_data="audit_log"),
                 InlineKeyboardButton("🗑️ Reset All Schedules", callback_data="reset_all_schedules")
             ]
         ]
@@ -113,6 +213,9 @@ class StaffSchedulerBot:
         print(f"DEBUG: Button clicked: {query.data}")
         print(f"DEBUG: Is admin? {self.is_admin(user_id)}")
         
+        if is_compact(query.data):
+            return await self.dispatch_callback(update, context)
+        
         if query.data == "staff_management":
             return await self.show_staff_management(update, context)
         elif query.data == "set_schedule":
@@ -130,6 +233,8 @@ class StaffSchedulerBot:
                 return await self.show_week_selection_for_all(update, context)
         elif query.data == "view_current_schedules":
             return await self.view_schedules(update, context)
+        elif query.data in ("schedules_next", "schedules_prev", "schedules_refresh"):
+            return await self.view_schedules(update, context, query.data.replace("schedules_", ""))
         elif query.data == "export_pdf":
             print(f"DEBUG: export_pdf button clicked by user_id: {user_id}")
             return await self.show_pdf_week_selection(update, context)
@@ -147,16 +252,11 @@ class StaffSchedulerBot:
         elif query.data == "schedule_history":
             await self.show_schedule_history(update, context)
             return SCHEDULE_HISTORY
+        elif query.data == "audit_log":
+            context.user_data.pop(AUDIT_VIEW_KEY, None)
+            return await self.show_audit_log(update, context)
         elif query.data == "export_all_schedules":
             return await self.export_pdf(update, context)
-        elif query.data.startswith("view_week_"):
-            week_key = query.data.split("_")[2]
-            return await self.view_week_schedule(update, context, week_key)
-        elif query.data.startswith("quick_edit_"):
-            # Clear context to ensure fresh data
-            context.user_data.clear()
-            staff_name = query.data.split("_", 2)[2]
-            return await self.quick_edit_staff(update, context, staff_name)
         
         return MAIN_MENU
     
@@ -840,30 +940,51 @@ class StaffSchedulerBot:
                 week_start = context.user_data.get('week_start')
                 
                 if week_dates and week_start:
-                    # Check if staff already has a schedule for the selected week
-                    existing_schedule = self.db.get_staff_schedule_for_week(staff_id, week_start)
-                    if existing_schedule:
-                        # Staff has existing schedule for selected week, show it with edit options
-                        schedule_list = []
-                        for day in DAYS_OF_WEEK:
-                            if day in existing_schedule:
-                                day_data = existing_schedule[day]
-                                schedule_list.append((
-                                    day,
-                                    day_data['is_working'],
-                                    day_data['start_time'],
-                                    day_data['end_time']
-                                ))
-                        return await self.show_existing_schedule(update, context, schedule_list)
-                    else:
-                        # No existing schedule for selected week, start fresh
-                        return await self.show_schedule_input_form(update, context)
+                    return await self.open_staff_week(update, context, staff_id, week_start)
                 else:
                     # No week selected, show week selection
                     return await self.show_week_selection(update, context)
         
         return SCHEDULE_MENU
     
+    async def open_staff_week(self, update: Update, context: ContextTypes.DEFAULT_TYPE, staff_id, week_start):
+        """Show a staff member's week: the existing schedule with edit options, or a fresh form.
+        
+        The rows read here, with their versions, are what save_schedule checks
+        against, so edits made meanwhile by another admin are not overwritten.
+        """
+        existing_schedule = self.db.get_staff_schedule_for_week(staff_id, week_start)
+        context.user_data['schedule_versions'] = existing_schedule
+        if not existing_schedule:
+            return await self.show_schedule_input_form(update, context)
+        
+        schedule_list = []
+        for day in DAYS_OF_WEEK:
+            if day in existing_schedule:
+                day_data = existing_schedule[day]
+                schedule_list.append((
+                    day,
+                    day_data['is_working'],
+                    day_data['start_time'],
+                    day_data['end_time']
+                ))
+        return await self.show_existing_schedule(update, context, schedule_list)
+    
+    async def quick_edit_staff(self, update: Update, context: ContextTypes.DEFAULT_TYPE, staff_id):
+        """Open a staff member's current week from the schedules overview"""
+        staff_info = self.db.get_staff_by_id(staff_id)
+        if not staff_info:
+            return await self.view_schedules(update, context, 'refresh')
+        
+        # Clear context to ensure fresh data
+        context.user_data.clear()
+        week_dates, week_start = self.calculate_week_dates()
+        context.user_data['current_staff_id'] = staff_id
+        context.user_data['current_staff_name'] = staff_info[1]
+        context.user_data['week_dates'] = week_dates
+        context.user_data['week_start'] = week_start
+        return await self.open_staff_week(update, context, staff_id, week_start)
+    
     async def show_schedule_input_form(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show schedule input form for a staff member"""
         staff_name = context.user_data.get('current_staff_name', 'Unknown')
@@ -908,12 +1029,15 @@ class StaffSchedulerBot:
         old_staff_name = context.user_data.get('current_staff_name')
         week_dates = context.user_data.get('week_dates', {})
         week_start = context.user_data.get('week_start')
+        schedule_versions = context.user_data.get('schedule_versions')
         
         context.user_data.clear()
         context.user_data['current_staff_id'] = old_staff_id
         context.user_data['current_staff_name'] = old_staff_name
         context.user_data['week_dates'] = week_dates
         context.user_data['week_start'] = week_start
+        if schedule_versions is not None:
+            context.user_data['schedule_versions'] = schedule_versions
         
         print(f"DEBUG: show_existing_schedule - Preserved week context: {week_dates}")
         
@@ -1053,10 +1177,20 @@ class StaffSchedulerBot:
         query = update.callback_query
         await query.answer()
         
+        if is_compact(query.data):
+            return await self.dispatch_callback(update, context)
+        
         if query.data == "back_schedule_menu":
             return await self.show_schedule_menu(update, context)
         elif query.data == "save_schedule":
             return await self.save_schedule(update, context)
+        elif query.data == "reload_schedule":
+            # Another admin saved this week first - start again from their version
+            staff_id = context.user_data.get('current_staff_id')
+            week_start = context.user_data.get('week_start')
+            if staff_id and week_start:
+                return await self.open_staff_week(update, context, staff_id, week_start)
+            return await self.show_schedule_menu(update, context)
         elif query.data == "reset_schedule":
             # Reset all days to Working (On)
             schedule_data = {}
@@ -1256,9 +1390,6 @@ class StaffSchedulerBot:
             return await self.reset_all_schedules(update, context)
         elif query.data == "schedule_history":
             return await self.show_schedule_history(update, context)
-        elif query.data.startswith("view_week_"):
-            week_key = query.data.split("_")[2]
-            return await self.view_week_schedule(update, context, week_key)
         
         return SCHEDULE_INPUT
     
@@ -1296,22 +1427,7 @@ class StaffSchedulerBot:
         text += f"End: {'✅ ' + schedule_data[current_day]['end_time'] if schedule_data[current_day]['end_time'] else '⏰ Not set'}\n\n"
         text += f"Please select the end time:"
         
-        # End time options
-        end_times = ["14:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
-        
-        keyboard = []
-        end_row = []
-        for time in end_times:
-            if time == schedule_data[current_day].get('end_time'):
-                end_row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"end_{time}"))
-            else:
-                end_row.append(InlineKeyboardButton(f"🔺 {time}", callback_data=f"end_{time}"))
-        keyboard.append(end_row)
-        
-        # Action buttons
-        keyboard.append([InlineKeyboardButton("❌ Cancel", callback_data="cancel_time_setting")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(end_time_row, schedule_data[current_day].get('end_time') or '')
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
     
@@ -1405,50 +1521,9 @@ class StaffSchedulerBot:
         text += f"End: {day_data['end_time'] or 'Not set'}\n\n"
         text += f"Please select the remaining time:"
         
-        # Start time options (9:45 AM to 6 PM)
-        start_times = ["09:45", "10:00", "11:00", "12:00", "13:00", "15:00", "15:30", "17:00", "18:00"]
-        end_times = ["14:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
-        
-        keyboard = []
-        
-        # Start Time Section Header
-        keyboard.append([InlineKeyboardButton("🟩 Start Time", callback_data="header_start")])
-        
-        # Start time options (2 per row for better button display)
-        start_rows = []
-        for i in range(0, len(start_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(start_times):
-                    time = start_times[i + j]
-                    if time == day_data['start_time']:
-                        row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"start_{time}"))
-                    else:
-                        row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"start_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # End Time Section Header
-        keyboard.append([InlineKeyboardButton("🔺 End Time", callback_data="header_end")])
-        
-        # End time options (2 per row for better button display)
-        end_rows = []
-        for i in range(0, len(end_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(end_times):
-                    time = end_times[i + j]
-                    if time == day_data['end_time']:
-                        row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"end_{time}"))
-                    else:
-                        row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"end_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # Action buttons
-        keyboard.append([InlineKeyboardButton("❌ Cancel", callback_data="cancel_time_setting")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(
+            time_picker, "start_", "end_", day_data['start_time'], day_data['end_time'], ((("❌ Cancel", "cancel_time_setting"),),)
+        )
         
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
@@ -1560,42 +1635,7 @@ class StaffSchedulerBot:
         text += f"\n*Setting times for:* {current_day} ({current_date_str})\n\n"
         text += f"Please select the start and end times:"
         
-        # Start time options (9:45 AM to 6 PM)
-        start_times = ["09:45", "10:00", "11:00", "12:00", "13:00", "15:00", "15:30", "17:00", "18:00"]
-        end_times = ["14:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
-        
-        keyboard = []
-        
-        # Start Time Section Header
-        keyboard.append([InlineKeyboardButton("🟩 Start Time", callback_data="header_start")])
-        
-        # Start time options (2 per row for better button display)
-        for i in range(0, len(start_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(start_times):
-                    time = start_times[i + j]
-                    row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"start_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # End Time Section Header
-        keyboard.append([InlineKeyboardButton("🔺 End Time", callback_data="header_end")])
-        
-        # End time options (2 per row for better button display)
-        for i in range(0, len(end_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(end_times):
-                    time = end_times[i + j]
-                    row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"end_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # Action buttons
-        keyboard.append([InlineKeyboardButton("❌ Cancel", callback_data="cancel_time_setting")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(time_picker, "start_", "end_", '', '', ((("❌ Cancel", "cancel_time_setting"),),))
         
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
@@ -1766,48 +1806,10 @@ class StaffSchedulerBot:
         text += f"Current times: {day_data['start_time']} - {day_data['end_time']}\n\n"
         text += f"Please select new times:"
         
-        # Start time options (9:45 AM to 6 PM)
-        start_times = ["09:45", "10:00", "11:00", "12:00", "13:00", "15:00", "15:30", "17:00", "18:00"]
-        end_times = ["14:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
-        
-        keyboard = []
-        
-        # Start Time Section Header
-        keyboard.append([InlineKeyboardButton("🟩 Start Time", callback_data="header_start")])
-        
-        # Start time options (2 per row for better button display)
-        for i in range(0, len(start_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(start_times):
-                    time = start_times[i + j]
-                    if time == day_data['start_time']:
-                        row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"edit_start_{day}_{time}"))
-                    else:
-                        row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"edit_start_{day}_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # End Time Section Header
-        keyboard.append([InlineKeyboardButton("🔺 End Time", callback_data="header_end")])
-        
-        # End time options (2 per row for better button display)
-        for i in range(0, len(end_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(end_times):
-                    time = end_times[i + j]
-                    if time == day_data['end_time']:
-                        row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"edit_end_{day}_{time}"))
-                    else:
-                        row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"edit_end_{day}_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # Action buttons
-        keyboard.append([InlineKeyboardButton("🔙 Back", callback_data="back_to_edit_confirmation")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(
+            time_picker, f"edit_start_{day}_", f"edit_end_{day}_", day_data['start_time'], day_data['end_time'],
+            ((("🔙 Back", "back_to_edit_confirmation"),),)
+        )
         
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
@@ -1840,34 +1842,10 @@ class StaffSchedulerBot:
         text += f"⚠️ *Both start and end times must be set when editing*\n\n"
         text += f"*Please select the end time:*"
         
-        # End time options (exactly like original)
-        end_times = ["14:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
-        
-        keyboard = []
-        
-        # End Time Section Header
-        keyboard.append([InlineKeyboardButton("🔺 End Time", callback_data="header_end")])
-        
-        # End time options (2 per row for better button display)
-        for i in range(0, len(end_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(end_times):
-                    time = end_times[i + j]
-                    if time == schedule_data[day].get('end_time'):
-                        row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"edit_end_{day}_{time}"))
-                    else:
-                        row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"edit_end_{day}_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # Add action buttons
-        keyboard.append([
-            InlineKeyboardButton("⏭️ Skip This Day", callback_data="skip_current_day"),
-            InlineKeyboardButton("❌ Cancel", callback_data="cancel_editing_selected")
-        ])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # End time only: both times must be set when editing
+        reply_markup = self.render_cache.get(
+            time_picker, None, f"edit_end_{day}_", '', schedule_data[day].get('end_time') or '', ((("⏭️ Skip This Day", "skip_current_day"), ("❌ Cancel", "cancel_editing_selected")),)
+        )
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
     
@@ -1958,6 +1936,13 @@ class StaffSchedulerBot:
                 else:
                     text += f"⏰ {day}: Not set\n"
             
+            stored = context.user_data.get('schedule_versions')
+            staff_id = context.user_data.get('current_staff_id')
+            if stored is not None and staff_id:
+                diff = diff_grids(pack_days(staff_id, stored), pack_days(staff_id, schedule_data))
+                if diff:
+                    text += f"\n*Unsaved changes:*\n" + "\n".join(format_diff(diff, {staff_id: staff_name}, DIFF_PREVIEW_LINES)) + "\n"
+            
             text += f"\n*Is everything good now, or do you want to edit another day?*"
             
             keyboard = [
@@ -2355,12 +2340,21 @@ class StaffSchedulerBot:
     
     async def save_schedule(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Save the complete schedule for the staff member"""
+        # A second tap on the same Save button (or a redelivery) must not write again
+        dedup = self.get_deduplicator(context.bot_data)
+        save_key = idempotency_key('save_schedule', update)
+        if dedup and not dedup.claim(save_key):
+            logger.info(f"⏭️ Ignoring repeated save_schedule tap ({save_key})")
+            return MAIN_MENU
+        
         staff_id = context.user_data.get('current_staff_id')
         schedule_data = context.user_data.get('schedule_data', {})
         staff_name = context.user_data.get('current_staff_name', 'Unknown')
         
         if not staff_id:
             logger.error("save_schedule called without staff_id in context")
+            if dedup:
+                dedup.release(save_key)
             await update.callback_query.edit_message_text("❌ Error: Staff ID not found.")
             return await self.show_main_menu(update, context)
         
@@ -2372,6 +2366,8 @@ class StaffSchedulerBot:
         if not is_valid:
             error_text = "\n".join(errors)
             logger.warning(f"Schedule validation failed for {staff_name}: {errors}")
+            if dedup:
+                dedup.release(save_key)
             
             # Show detailed error message with option to continue editing
             text = f"❌ *Schedule validation errors for {staff_name}:*\n\n{error_text}\n\n"
@@ -2392,6 +2388,7 @@ class StaffSchedulerBot:
         user_id = update.effective_user.id
         saved_count = 0
         failed_saves = []
+        conflicts = []
         
         try:
             # Create scheduling session for tracking
@@ -2402,39 +2399,23 @@ class StaffSchedulerBot:
                 session_id = self.db.create_scheduling_session(week_start, f"SINGLE_{user_id}")
                 logger.info(f"Created scheduling session {session_id} for {staff_name}")
             
+            week_schedule = {}
             for day_name, day_data in schedule_data.items():
-                if day_name not in ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']:
+                if day_name not in DAYS_OF_WEEK:
                     logger.warning(f"Skipping invalid day: {day_name}")
                     continue
-                
-                try:
-                    schedule_date = day_data.get('date') or week_dates.get(day_name)
-                    is_working = day_data.get('is_working', True)
-                    start_time = day_data.get('start_time', '') if is_working else None
-                    end_time = day_data.get('end_time', '') if is_working else None
-                    
-                    logger.debug(f"Saving {staff_name} {day_name}: working={is_working}, start={start_time}, end={end_time}, date={schedule_date}")
-                    
-                    success = self.db.save_schedule(
-                        staff_id=staff_id,
-                        day_of_week=day_name,
-                        is_working=is_working,
-                        start_time=start_time,
-                        end_time=end_time,
-                        schedule_date=schedule_date,
-                        changed_by=f"USER_{user_id}"
-                    )
-                    
-                    if success:
-                        saved_count += 1
-                        logger.info(f"Successfully saved {day_name} for {staff_name}")
-                    else:
-                        failed_saves.append(day_name)
-                        logger.error(f"Failed to save {day_name} for {staff_name}")
-                        
-                except Exception as e:
-                    logger.error(f"Exception saving {day_name} for {staff_name}: {e}")
-                    failed_saves.append(day_name)
+                week_schedule[day_name] = dict(day_data, date=day_data.get('date') or week_dates.get(day_name))
+            
+            # Rows as they were when the week was opened (read them now for sessions started before versioning)
+            expected = context.user_data.get('schedule_versions')
+            if expected is None:
+                expected = self.db.get_staff_schedule_for_week(staff_id, week_start) if week_start else {}
+            
+            success, saved_count, conflicts = self.db.save_week_schedule(
+                staff_id, week_schedule, expected, changed_by=f"USER_{user_id}"
+            )
+            logger.info(f"Saved {saved_count} days for {staff_name}" if success else
+                        f"Save for {staff_name} rejected - changed by someone else: {conflicts}")
             
             # Complete the session if successful
             if week_start and saved_count > 0 and not failed_saves:
@@ -2447,8 +2428,26 @@ class StaffSchedulerBot:
         
         logger.info(f"Save complete for {staff_name} - {saved_count} successful, {len(failed_saves)} failed")
         
+        if conflicts:
+            if dedup:
+                dedup.release(save_key)
+            text = f"⚠️ *Someone else changed this schedule*\n\n"
+            text += f"Another admin saved {staff_name}'s {', '.join(conflicts)} while you were editing, "
+            text += f"so your changes were not saved.\n\n"
+            text += f"Reload to see the latest version and edit from there."
+            
+            keyboard = [
+                [InlineKeyboardButton("🔄 Reload Latest", callback_data="reload_schedule")],
+                [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+            return SCHEDULE_INPUT
+        
         # Show appropriate success/failure message
         if failed_saves:
+            if dedup:
+                dedup.release(save_key)
             failed_text = ", ".join(failed_saves)
             text = f"⚠️ *Partial Save Failed*\n\n"
             text += f"❌ *Could not save:* {failed_text}\n"
@@ -2472,6 +2471,8 @@ class StaffSchedulerBot:
         # Clear any cached data to ensure fresh data is fetched
         context.user_data.clear()
         logger.info(f"Cleared context data after successful save for {staff_name}")
+        # Persist the idempotency key together with the cleared wizard state
+        await context.application.update_persistence()
         
         # Check if all staff have schedules
         staff_without_schedules = self.db.get_staff_without_complete_schedules()
@@ -2615,18 +2616,33 @@ class StaffSchedulerBot:
             print(f"DEBUG: Error formatting time value '{time_value}' (type: {type(time_value)}): {e}")
             return None
     
-    async def view_schedules(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """View all current schedules"""
+    async def view_schedules(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page_move=None):
+        """View this week's schedules, one page of staff at a time.
+        
+        page_move is 'next', 'prev' or 'refresh' for the paging buttons; without
+        it the overview opens on the first page. Pages use keyset cursors kept in
+        user_data, and each staff member's text comes from the fragment cache.
+        """
         try:
+            view = context.user_data.get(SCHEDULES_VIEW_KEY) if page_move else None
             # Clear any cached data to ensure fresh data is fetched
             context.user_data.clear()
-            logger.info("Fetching current schedules - cleared context for fresh data")
+            view = view or {'cursors': [None], 'next': None}
+            if page_move == 'next' and view['next'] is not None:
+                view['cursors'].append(view['next'])
+            elif page_move == 'prev' and len(view['cursors']) > 1:
+                view['cursors'].pop()
+            context.user_data[SCHEDULES_VIEW_KEY] = view
             
-            # Get all schedules from database
-            schedules = self.db.get_all_schedules()
-            logger.info(f"Retrieved {len(schedules)} schedule records from database")
+            week_dates, week_start = self.calculate_week_dates()
+            staff, fragments, next_cursor = await asyncio.to_thread(
+                render_page, self.db, self.view_cache, week_start, view['cursors'][-1]
+            )
+            view['next'] = next_cursor
+            logger.info(f"Rendered schedules page {len(view['cursors'])} ({len(staff)} staff, "
+                        f"cache {self.view_cache.hits} hits / {self.view_cache.misses} misses)")
             
-            if not schedules:
+            if not staff and len(view['cursors']) == 1:
                 text = "📋 *Current Schedules Overview*\n\n"
                 text += "No schedules found. Create schedules for your staff first."
                 
@@ -2640,69 +2656,27 @@ class StaffSchedulerBot:
                 await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
                 return MAIN_MENU
             
-            # Process schedules
-            staff_schedules = {}
-            
-            for staff_name, day, schedule_date, is_working, start_time, end_time in schedules:
-                if staff_name not in staff_schedules:
-                    staff_schedules[staff_name] = {}
-                
-                # Convert times to proper format
-                formatted_start = self.format_time_for_display(start_time)
-                formatted_end = self.format_time_for_display(end_time)
-                
-                logger.debug(f"Processing {staff_name} {day}: working={is_working}, start={start_time}->{formatted_start}, end={end_time}->{formatted_end}")
-                
-                if is_working and formatted_start and formatted_end:
-                    staff_schedules[staff_name][day] = f"✅ {formatted_start}-{formatted_end}"
-                elif not is_working:
-                    staff_schedules[staff_name][day] = "🔴 OFF"
-                else:
-                    staff_schedules[staff_name][day] = "⏰ Not Set"
-            
-            logger.info(f"Processed schedules for {len(staff_schedules)} staff members")
-            
             # Create schedule text
             text = "📋 *Current Schedules Overview*\n\n"
+            text += f"*Week:* {self.format_date_range(week_dates)} · page {len(view['cursors'])}\n"
             text += f"*Last updated: {datetime.now().strftime('%H:%M:%S')}*\n\n"
+            text += "".join(fragments)
             
-            # Get all staff for comparison
-            all_staff = self.db.get_all_staff()
-            staff_names = [name for _, name in all_staff]
-            
-            for staff_name in staff_names:
-                schedule = staff_schedules.get(staff_name, {})
-                text += f"*{staff_name}:*\n"
-                
-                # Count working days and off days
-                working_days = 0
-                off_days = 0
-                incomplete_days = 0
-                
-                for day in DAYS_OF_WEEK:
-                    day_status = schedule.get(day, "⏰ Not Set")
-                    text += f"  {day}: {day_status}\n"
-                    
-                    if "✅" in day_status:
-                        working_days += 1
-                    elif "🔴" in day_status:
-                        off_days += 1
-                    else:
-                        incomplete_days += 1
-                
-                # Add summary
-                text += f"  📊 *Summary:* {working_days} working, {off_days} off, {incomplete_days} incomplete\n\n"
-            
-            # Add action buttons
+            # Quick edit buttons for the staff on this page
             keyboard = []
-            
-            # Quick edit buttons for each staff
-            for staff_name in staff_names:
-                keyboard.append([InlineKeyboardButton(f"✏️ Edit {staff_name}", callback_data=f"quick_edit_{staff_name}")])
-            
-            # Other options
+            for staff_id, staff_name in staff:
+                keyboard.append([InlineKeyboardButton(f"✏️ Edit {staff_name}", callback_data=self.callback_data(context, QUICK_EDIT, staff_id))])
+            
+            # Paging and other options
+            paging = []
+            if len(view['cursors']) > 1:
+                paging.append(InlineKeyboardButton("◀️ Previous", callback_data="schedules_prev"))
+            if next_cursor is not None:
+                paging.append(InlineKeyboardButton("Next ▶️", callback_data="schedules_next"))
+            if paging:
+                keyboard.append(paging)
             keyboard.append([
-                InlineKeyboardButton("🔄 Refresh", callback_data="view_current_schedules"),
+                InlineKeyboardButton("🔄 Refresh", callback_data="schedules_refresh"),
                 InlineKeyboardButton("📄 Export PDF", callback_data="export_pdf")
             ])
             keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main")])
@@ -2736,6 +2710,20 @@ class StaffSchedulerBot:
             
             return MAIN_MENU
     
+    async def generate_pdf(self, update, schedules, week_dates, date_range, custom_filename=None, all_staff_names=None):
+        """Render a PDF in a worker thread so other chats keep being served.
+        
+        Without a custom filename each chat writes its own file, since exports
+        from different chats can now run at the same time.
+        """
+        if not custom_filename:
+            base, ext = os.path.splitext(self.pdf_gen.filename)
+            custom_filename = f"{base}_{update.effective_chat.id}{ext}"
+        return await asyncio.to_thread(
+            self.pdf_gen.generate_schedule_pdf, schedules, week_dates, date_range,
+            custom_filename, all_staff_names=all_staff_names
+        )
+    
     def prepare_schedules_for_pdf(self, raw_schedules):
         """Convert raw database schedules to PDF-ready format with proper time strings"""
         converted_schedules = []
@@ -2848,14 +2836,14 @@ class StaffSchedulerBot:
             pdf_ready_schedules = self.prepare_schedules_for_pdf(week_schedules)
             
             # Generate PDF with selected week dates and all staff names
-            pdf_filename = self.pdf_gen.generate_schedule_pdf(pdf_ready_schedules, week_dates, date_range, all_staff_names=all_staff_names)
+            pdf_filename = await self.generate_pdf(update, pdf_ready_schedules, week_dates, date_range, all_staff_names=all_staff_names)
             
             # Send PDF
             with open(pdf_filename, 'rb') as pdf_file:
                 await context.bot.send_document(
                     chat_id=update.effective_chat.id,
                     document=pdf_file,
-                    filename=pdf_filename,
+                    filename=self.pdf_gen.filename,
                     caption=f"📄 Weekly Staff Schedule - {date_range}"
                 )
             
@@ -2945,7 +2933,7 @@ class StaffSchedulerBot:
             pdf_ready_schedules = self.prepare_schedules_for_pdf(schedules)
             
             print(f"DEBUG: Calling PDF generator with {len(pdf_ready_schedules)} converted records...")
-            pdf_filename = self.pdf_gen.generate_schedule_pdf(pdf_ready_schedules, week_dates, date_range, all_staff_names=all_staff_names)
+            pdf_filename = await self.generate_pdf(update, pdf_ready_schedules, week_dates, date_range, all_staff_names=all_staff_names)
             print(f"DEBUG: PDF generated successfully: {pdf_filename}")
             
             # Send PDF
@@ -2953,7 +2941,7 @@ class StaffSchedulerBot:
                 await context.bot.send_document(
                     chat_id=update.effective_chat.id,
                     document=pdf_file,
-                    filename=pdf_filename,
+                    filename=self.pdf_gen.filename,
                     caption="📄 Weekly Staff Schedule"
                 )
             
@@ -3011,12 +2999,9 @@ class StaffSchedulerBot:
         import asyncio
         asyncio.run(self.run_async())
     
-    async def run_async(self):
-        """Run the bot (asynchronous version with webhook support)"""
-        application = Application.builder().token(BOT_TOKEN).build()
-        
-        # Create conversation handler
-        conv_handler = ConversationHandler(
+    def build_conversation_handler(self, persistent=False):
+        """Create the admin conversation handler"""
+        return ConversationHandler(
             entry_points=[CommandHandler("start", self.start)],
             states={
                 MAIN_MENU: [
@@ -3068,18 +3053,324 @@ class StaffSchedulerBot:
                 ],
                 OPEN_CLOSE_ATTENDANCE: [
                     CallbackQueryHandler(self.handle_open_close_attendance)
+                ],
+                AUDIT_LOG: [
+                    CallbackQueryHandler(self.handle_audit_log)
                 ]
             },
             fallbacks=[CommandHandler("start", self.start)],
-            per_message=False
+            per_message=False,
+            conversation_timeout=SESSION_TIMEOUT_HOURS * 3600,
+            name="admin_conversation",
+            persistent=persistent
+        )
+    
+    def get_deduplicator(self, bot_data):
+        """The UpdateDeduplicator kept in bot_data (None when UPDATE_DEDUP_WINDOW is 0)"""
+        if not self.update_dedup_window:
+            return None
+        dedup = bot_data.get(DEDUP_KEY)
+        if dedup is None:
+            dedup = bot_data[DEDUP_KEY] = UpdateDeduplicator(self.update_dedup_window)
+        dedup.capacity = self.update_dedup_window
+        return dedup
+    
+    def get_callback_tokens(self, bot_data):
+        """The CallbackTokens table kept in bot_data"""
+        tokens = bot_data.get(CALLBACK_TOKENS_KEY)
+        if tokens is None:
+            tokens = bot_data[CALLBACK_TOKENS_KEY] = CallbackTokens()
+        return tokens
+    
+    def callback_data(self, context: ContextTypes.DEFAULT_TYPE, action, payload):
+        """Compact callback_data for a button carrying payload (a staff name, id or week)"""
+        return encode_callback(action, payload, self.get_callback_tokens(context.bot_data))
+    
+    async def dispatch_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Run a compact callback's handler from callback_routes and return the next state.
+        
+        A button whose token has been pushed out of the table (or that no
+        route knows) brings back the main menu.
+        """
+        query = update.callback_query
+        try:
+            action, payload = decode_callback(query.data, self.get_callback_tokens(context.bot_data))
+            handler, state = self.callback_routes[action]
+        except (KeyError, ValueError) as e:
+            logger.info(f"⌛ Expired or unknown button {query.data}: {e}")
+            return await self.show_main_menu(update, context)
+        result = await handler(update, context, payload)
+        return result if state is None else state
+    
+    async def drop_duplicate_updates(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Stop redelivered updates before they reach the conversation handler"""
+        dedup = self.get_deduplicator(context.bot_data)
+        if dedup and dedup.seen(update.update_id):
+            logger.info(f"⏭️ Dropping redelivered update {update.update_id}")
+            if self.dropped_update_hook:
+                # Stopping here skips every later group, a webhook worker's ack included
+                await self.dropped_update_hook(update, context)
+            raise ApplicationHandlerStop
+    
+    async def touch_session(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Remember when each admin was last active (runs before the conversation handler)"""
+        if update.effective_user and context.user_data is not None:
+            context.user_data[LAST_ACTIVE_KEY] = time.time()
+    
+    async def evict_idle_sessions(self, context: ContextTypes.DEFAULT_TYPE):
+        """JobQueue job: drop wizard state idle longer than SESSION_TIMEOUT_HOURS
+        and expire abandoned IN_PROGRESS scheduling sessions"""
+        application = context.application
+        cutoff = time.time() - SESSION_TIMEOUT_HOURS * 3600
+        evicted = 0
+        reclaimed_bytes = 0
+        
+        for user_id, data in list(application.user_data.items()):
+            last_active = data.get(LAST_ACTIVE_KEY)
+            if last_active is None:
+                # State from before activity tracking (or just cleared) - start its clock now
+                if data:
+                    data[LAST_ACTIVE_KEY] = time.time()
+                continue
+            if last_active >= cutoff:
+                continue
+            try:
+                reclaimed_bytes += len(pickle.dumps(data))
+            except Exception:
+                pass
+            application.drop_user_data(user_id)
+            evicted += 1
+        
+        expired_sessions = 0
+        if hasattr(self.db, 'expire_stale_scheduling_sessions'):
+            try:
+                expired_sessions = await asyncio.to_thread(self.db.expire_stale_scheduling_sessions, SESSION_TIMEOUT_HOURS)
+            except Exception as e:
+                logger.error(f"❌ Error expiring scheduling sessions: {e}")
+        
+        stats = self.session_cleanup_stats
+        stats['runs'] += 1
+        stats['evicted'] += evicted
+        stats['reclaimed_bytes'] += reclaimed_bytes
+        stats['expired_sessions'] += expired_sessions
+        stats['last_run'] = {
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'evicted': evicted,
+            'reclaimed_bytes': reclaimed_bytes,
+            'expired_sessions': expired_sessions,
+            'active_sessions': len(application.user_data),
+        }
+        if evicted or expired_sessions:
+            logger.info(f"🧹 Evicted {evicted} idle sessions ({reclaimed_bytes / 1024:.1f} KB), "
+                        f"expired {expired_sessions} scheduling sessions")
+    
+    async def flush_audit_log(self, context: ContextTypes.DEFAULT_TYPE = None):
+        """JobQueue job and shutdown hook: move AUDIT_WRITE_BEHIND outbox rows to schedule_changes"""
+        if not getattr(self.db, 'audit_write_behind', False):
+            return 0
+        try:
+            written = await asyncio.to_thread(self.db.flush_audit_log)
+        except Exception as e:
+            self.audit_stats['errors'] += 1
+            logger.error(f"❌ Error flushing audit log: {e}")
+            return 0
+        
+        self.audit_stats['flushes'] += 1
+        self.audit_stats['rows_written'] += written
+        if written:
+            self.audit_stats['last_flush'] = datetime.now().isoformat(timespec='seconds')
+        return written
+    
+    async def archive_audit_log(self, context: ContextTypes.DEFAULT_TYPE):
+        """JobQueue job: move audit rows older than AUDIT_RETENTION_DAYS to the archive segments"""
+        try:
+            if hasattr(self.db, 'get_weeks_to_snapshot'):
+                # Snapshot every changed week first, so replays rarely have to read the segments
+                await asyncio.to_thread(snapshot_weeks, self.db, 1)
+            result = await asyncio.to_thread(archive_old_changes, self.db, self.db.audit_archive, AUDIT_RETENTION_DAYS)
+        except Exception as e:
+            self.archive_stats['errors'] += 1
+            logger.error(f"❌ Error archiving audit log: {e}")
+            return
+        
+        self.archive_stats['runs'] += 1
+        self.archive_stats['archived'] += result['archived']
+        self.archive_stats['last_run'] = dict(result, at=datetime.now().isoformat(timespec='seconds'))
+    
+    async def snapshot_weeks(self, context: ContextTypes.DEFAULT_TYPE):
+        """JobQueue job: snapshot weeks with WEEK_SNAPSHOT_EVERY changes since their last snapshot"""
+        try:
+            self.snapshot_stats['snapshots'] += await asyncio.to_thread(snapshot_weeks, self.db, WEEK_SNAPSHOT_EVERY)
+            self.snapshot_stats['runs'] += 1
+        except Exception as e:
+            self.snapshot_stats['errors'] += 1
+            logger.error(f"❌ Error snapshotting weeks: {e}")
+    
+    async def send_staff_notifications(self, context: ContextTypes.DEFAULT_TYPE):
+        """JobQueue job: send linked staff the changes to this and later weeks"""
+        _, week_start = self.calculate_week_dates(datetime.now(self.toronto_tz).date())
+        try:
+            await self.notifier.run(context.bot, week_start)
+        except Exception as e:
+            self.notifier.stats['errors'] += 1
+            logger.error(f"❌ Error sending staff notifications: {e}")
+    
+    def build_request(self, pool_size, read_timeout):
+        """HTTP client for Bot API calls, configured from BOT_API_* settings"""
+        http_version = '1.1'
+        if BOT_API_HTTP2:
+            if importlib.util.find_spec('h2') is not None:
+                http_version = '2'
+            else:
+                logger.warning("⚠️ BOT_API_HTTP2 is set but the h2 package is not installed - using HTTP/1.1")
+        return HTTPXRequest(
+            connection_pool_size=pool_size,
+            connect_timeout=BOT_API_CONNECT_TIMEOUT,
+            read_timeout=read_timeout,
+            write_timeout=BOT_API_WRITE_TIMEOUT,
+            media_write_timeout=BOT_API_MEDIA_WRITE_TIMEOUT,
+            pool_timeout=BOT_API_POOL_TIMEOUT,
+            http_version=http_version,
         )
+    
+    def publish_http_settings(self):
+        """Expose the Bot API client and webhook settings on /metrics"""
+        metrics.set_info('bot_api_http', {
+            'pool_size': BOT_API_POOL_SIZE,
+            'get_updates_pool_size': GET_UPDATES_POOL_SIZE,
+            'connect_timeout': BOT_API_CONNECT_TIMEOUT,
+            'read_timeout': BOT_API_READ_TIMEOUT,
+            'get_updates_read_timeout': GET_UPDATES_READ_TIMEOUT,
+            'write_timeout': BOT_API_WRITE_TIMEOUT,
+            'media_write_timeout': BOT_API_MEDIA_WRITE_TIMEOUT,
+            'pool_timeout': BOT_API_POOL_TIMEOUT,
+            'http2': BOT_API_HTTP2,
+            'max_concurrent_updates': MAX_CONCURRENT_UPDATES,
+        })
+        metrics.set_info('webhook', {
+            'webhook_enabled': bool(os.getenv('WEBHOOK_URL')),  # Not the URL: its path is what guards the webhook
+            'max_connections': WEBHOOK_MAX_CONNECTIONS,
+            'secret_token_set': bool(WEBHOOK_SECRET_TOKEN),
+        })
+    
+    def build_application(self, token=BOT_TOKEN, base_url=None, max_concurrent_updates=MAX_CONCURRENT_UPDATES,
+                          outbound_queue=None, persistence=PERSISTENCE_ENABLED,
+                          dedup_window=UPDATE_DEDUP_WINDOW, instance_name='main'):
+        """Build the Application with all handlers registered.
+        
+        base_url points the bot at a different Bot API server (used by the
+        load tester in benchmarks/ to talk to a local fake Bot API).
+        Updates from different chats run concurrently (up to
+        max_concurrent_updates); updates from one chat stay in order.
+        Outgoing calls go through outbound_queue (built from OUTBOUND_*
+        settings when not given). With persistence, conversation states,
+        user_data and bot_data (including the dedup_window of recent update
+        ids) are kept in the database under instance_name and survive restarts.
+        """
+        builder = Application.builder().token(token)
+        builder = builder.concurrent_updates(PerChatUpdateProcessor(max(1, max_concurrent_updates)))
+        builder = builder.request(self.build_request(BOT_API_POOL_SIZE, BOT_API_READ_TIMEOUT))
+        builder = builder.get_updates_request(self.build_request(GET_UPDATES_POOL_SIZE, GET_UPDATES_READ_TIMEOUT))
+        if outbound_queue is None:
+            outbound_queue = OutboundMessageQueue(
+                OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_BURST, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_MAX_RETRIES
+            )
+        builder = builder.rate_limiter(outbound_queue)
+        if persistence:
+            state_store = DatabasePersistence(self.db, update_interval=PERSISTENCE_UPDATE_INTERVAL,
+                                              instance_name=instance_name)
+            metrics.register_gauge('persistence', state_store.metrics)
+            builder = builder.persistence(state_store)
+        if base_url:
+            builder = builder.base_url(f"{base_url}/bot").base_file_url(f"{base_url}/file/bot")
+        application = builder.build()
+        
+        self.update_dedup_window = dedup_window
+        if dedup_window:
+            application.add_handler(TypeHandler(Update, self.drop_duplicate_updates), group=-2)
+            metrics.register_gauge('update_dedup', lambda: self.get_deduplicator(application.bot_data).metrics())
+        metrics.register_gauge('render_cache', self.render_cache.metrics)
+        metrics.register_gauge('inline_lookup', lambda: {'index_builds': self.lookup_cache.builds})
+        metrics.register_gauge('staff_portal', self.staff_portal.metrics)
+        application.add_handler(TypeHandler(Update, self.touch_session), group=-1)
+        # Ahead of the conversation handler, whose catch-all button handlers would take these taps
+        application.add_handler(CommandHandler("restore_week", self.restore_week_command))
+        # Staff commands are read-only and never enter the admin conversation
+        application.add_handler(CommandHandler("start", self.staff_link_start, filters.Regex(f'^/start {LINK_PREFIX}')))
+        application.add_handler(CommandHandler("myshifts", self.my_shifts_command))
+        application.add_handler(CommandHandler("week", self.staff_week_command))
+        application.add_handler(CommandHandler("link_staff", self.link_staff_command))
+        application.add_handler(CommandHandler("unlink_staff", self.unlink_staff_command))
+        application.add_handler(InlineQueryHandler(self.inline_lookup))
+        application.add_handler(CallbackQueryHandler(self.handle_restore_week, pattern=r'^restore_week_(confirm|cancel)$'))
+        application.add_handler(self.build_conversation_handler(persistent=bool(persistence)))
+        
+        if application.job_queue is not None:
+            application.job_queue.run_repeating(
+                self.evict_idle_sessions,
+                interval=SESSION_CLEANUP_INTERVAL_MINUTES * 60,
+                first=60,
+                name="evict_idle_sessions"
+            )
+            metrics.register_gauge('session_cleanup', lambda: dict(
+                self.session_cleanup_stats, active_sessions=len(application.user_data)
+            ))
+            if getattr(self.db, 'audit_write_behind', False):
+                # The first run also moves rows a crashed previous run left in the outbox
+                application.job_queue.run_repeating(
+                    self.flush_audit_log,
+                    interval=AUDIT_FLUSH_INTERVAL,
+                    first=AUDIT_FLUSH_INTERVAL,
+                    name="flush_audit_log"
+                )
+            if AUDIT_RETENTION_DAYS > 0 and hasattr(self.db, 'get_changes_to_archive'):
+                application.job_queue.run_repeating(
+                    self.archive_audit_log,
+                    interval=AUDIT_ARCHIVE_INTERVAL_HOURS * 3600,
+                    first=300,
+                    name="archive_audit_log"
+                )
+                metrics.register_gauge('audit_archive', lambda: dict(self.archive_stats))
+            if WEEK_SNAPSHOT_EVERY > 0 and hasattr(self.db, 'get_weeks_to_snapshot'):
+                application.job_queue.run_repeating(
+                    self.snapshot_weeks,
+                    interval=WEEK_SNAPSHOT_INTERVAL_MINUTES * 60,
+                    first=WEEK_SNAPSHOT_INTERVAL_MINUTES * 60,
+                    name="snapshot_weeks"
+                )
+                metrics.register_gauge('week_snapshots', lambda: dict(self.snapshot_stats))
+            # One process sends, so webhook workers don't notify a change twice
+            if NOTIFY_INTERVAL > 0 and self.notifier and instance_name in ('main', 'worker-0'):
+                application.job_queue.run_repeating(
+                    self.send_staff_notifications,
+                    interval=NOTIFY_INTERVAL,
+                    first=NOTIFY_INTERVAL,
+                    name="send_staff_notifications"
+                )
+                metrics.register_gauge('staff_notifications', lambda: dict(self.notifier.stats))
+        else:
+            logger.warning("⚠️ JobQueue unavailable (install python-telegram-bot[job-queue]) - idle sessions will not be evicted")
+        if getattr(self.db, 'audit_write_behind', False):
+            metrics.register_gauge('audit_log', lambda: dict(self.audit_stats))
+        return application
+    
+    def build_web_server(self, application, webhook_path=None):
+        """HTTP server on PORT: health checks and /metrics, plus Telegram updates in webhook mode"""
+        async def on_update(data):
+            await application.update_queue.put(Update.de_json(data, application.bot))
         
-        application.add_handler(conv_handler)
+        return build_web_server(self.db, webhook_path, on_update)
+    
+    async def run_async(self):
+        """Run the bot (asynchronous version with webhook support)"""
+        application = self.build_application()
+        self.publish_http_settings()
+        web_server = None
         
         try:
             # Clear any existing webhook to prevent conflicts
             try:
-                await application.bot.delete_webhook(drop_pending_updates=True)
+                await application.bot.delete_webhook(drop_pending_updates=DROP_PENDING_UPDATES)
                 logger.info("✅ Cleared existing webhook")
             except Exception as e:
                 logger.info(f"ℹ️ No webhook to clear: {e}")
@@ -3096,18 +3387,21 @@ class StaffSchedulerBot:
                 logger.info(f"🌐 Production mode - Webhook URL: {webhook_url}")
                 
                 try:
-                    # Set webhook
-                    await application.bot.set_webhook(url=webhook_url)
-                    logger.info("✅ Webhook set successfully")
+                    # One server on PORT for the webhook, / and /health
+                    webhook_path = urlsplit(webhook_url).path or '/'
+                    web_server = self.build_web_server(application, webhook_path)
+                    await web_server.start('0.0.0.0', PORT)
+                    logger.info(f"🌐 Web server started on port {PORT} (webhook path {webhook_path})")
                     
-                    # Start webhook server
-                    await application.updater.start_webhook(
-                        listen="0.0.0.0",
-                        port=int(os.getenv('PORT', 8000)),
-                        webhook_url=webhook_url,
-                        drop_pending_updates=True
+                    # Set webhook
+                    await application.bot.set_webhook(
+                        url=webhook_url,
+                        max_connections=WEBHOOK_MAX_CONNECTIONS,
+                        secret_token=WEBHOOK_SECRET_TOKEN,
+                        drop_pending_updates=DROP_PENDING_UPDATES,
+                        allowed_updates=ALLOWED_UPDATES
                     )
-                    logger.info("🌐 Webhook server started")
+                    logger.info(f"✅ Webhook set successfully (max_connections={WEBHOOK_MAX_CONNECTIONS})")
                     
                     # Keep running until interrupted
                     await self._keep_running()
@@ -3124,8 +3418,8 @@ class StaffSchedulerBot:
                     
                     # Use polling as fallback
                     await application.updater.start_polling(
-                        drop_pending_updates=True,
-                        allowed_updates=['message', 'callback_query']
+                        drop_pending_updates=DROP_PENDING_UPDATES,
+                        allowed_updates=ALLOWED_UPDATES
                     )
                     logger.info("🔧 Polling started as fallback")
                     
@@ -3135,10 +3429,19 @@ class StaffSchedulerBot:
                 # Development mode with polling
                 logger.info("🔧 Development mode - Using polling")
                 
+                # Health checks stay available while polling
+                try:
+                    web_server = self.build_web_server(application)
+                    await web_server.start('0.0.0.0', PORT)
+                    logger.info(f"🌐 Health check server started on port {PORT}")
+                except OSError as e:
+                    web_server = None
+                    logger.warning(f"⚠️ Health check server not started: {e}")
+                
                 # Start polling
                 await application.updater.start_polling(
-                    drop_pending_updates=True,
-                    allowed_updates=['message', 'callback_query']
+                    drop_pending_updates=DROP_PENDING_UPDATES,
+                    allowed_updates=ALLOWED_UPDATES
                 )
                 logger.info("✅ Polling started successfully")
                 
@@ -3152,9 +3455,13 @@ class StaffSchedulerBot:
             # Ensure proper cleanup
             try:
                 logger.info("🔄 Stopping bot...")
-                await application.updater.stop()
+                if web_server is not None:
+                    await web_server.stop()
+                if application.updater.running:
+                    await application.updater.stop()
                 await application.stop()
                 await application.shutdown()
+                await self.flush_audit_log()
                 logger.info("✅ Bot shutdown completed")
             except Exception as shutdown_error:
                 logger.error(f"⚠️ Error during shutdown: {shutdown_error}")
@@ -3212,28 +3519,11 @@ class StaffSchedulerBot:
             await update.callback_query.answer("❌ No day selected for editing")
             return await self.show_edit_options(update, context)
         
-        text = f"🕐 *Select Start Time for {day}*\n\n"
-        text += f"Staff: {staff_name}\n"
-        text += f"Day: {day}\n\n"
-        text += f"*Choose a start time:*"
+        text = PICK_DAY_TIME_TEXT.format(label="Start", day=day, staff_name=staff_name, choice="a start time")
         
-        # Create simpler time picker keyboard
-        keyboard = []
-        start_times = ["09:45", "10:00", "10:30", "11:00", "11:30", "12:00", "12:30", "13:00", "13:30", "14:00", "15:00", "15:30", "17:00", "18:00"]
-        
-        # Create rows of 3 time slots each for better button display
-        for i in range(0, len(start_times), 3):
-            row = []
-            for j in range(3):
-                if i + j < len(start_times):
-                    time_slot = start_times[i + j]
-                    row.append(InlineKeyboardButton(f"🕐 {time_slot}", callback_data=f"edit_start_{day}_{time_slot}"))
-            keyboard.append(row)
-        
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to Day Edit", callback_data="back_to_day_edit")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(
+            time_grid, DAY_START_TIMES, f"edit_start_{day}_", 3, ("🔙 Back to Day Edit", "back_to_day_edit")
+        )
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
     
@@ -3247,28 +3537,11 @@ class StaffSchedulerBot:
             await update.callback_query.answer("❌ No day selected for editing")
             return await self.show_edit_options(update, context)
         
-        text = f"🕐 *Select End Time for {day}*\n\n"
-        text += f"Staff: {staff_name}\n"
-        text += f"Day: {day}\n\n"
-        text += f"*Choose an end time:*"
-        
-        # Create simpler time picker keyboard
-        keyboard = []
-        end_times = ["17:00", "17:30", "18:00", "18:30", "19:00", "19:30", "20:00", "20:30", "21:00"]
-        
-        # Create rows of 3 time slots each for better button display
-        for i in range(0, len(end_times), 3):
-            row = []
-            for j in range(3):
-                if i + j < len(end_times):
-                    time_slot = end_times[i + j]
-                    row.append(InlineKeyboardButton(f"🕐 {time_slot}", callback_data=f"edit_end_{day}_{time_slot}"))
-            keyboard.append(row)
+        text = PICK_DAY_TIME_TEXT.format(label="End", day=day, staff_name=staff_name, choice="an end time")
         
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to Day Edit", callback_data="back_to_day_edit")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(
+            time_grid, DAY_END_TIMES, f"edit_end_{day}_", 3, ("🔙 Back to Day Edit", "back_to_day_edit")
+        )
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
     
@@ -3315,52 +3588,10 @@ class StaffSchedulerBot:
         text += f"Progress: {len(context.user_data.get('selected_days_for_edit', [])) - len(remaining_days) + 1}/{len(context.user_data.get('selected_days_for_edit', []))}\n\n"
         text += f"*Please select the start and end times:*"
         
-        # Create time picker keyboard with structured layout
-        keyboard = []
-        
-        # Start time options (exactly like original: 9:45 AM to 6 PM)
-        start_times = ["09:45", "10:00", "11:00", "12:00", "13:00", "15:00", "15:30", "17:00", "18:00"]
-        end_times = ["14:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
-        
-        # Start Time Section Header
-        keyboard.append([InlineKeyboardButton("🟩 Start Time", callback_data="header_start")])
-        
-        # Start time options (2 per row for better button display)
-        for i in range(0, len(start_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(start_times):
-                    time = start_times[i + j]
-                    if time == day_data['start_time']:
-                        row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"edit_start_{current_day}_{time}"))
-                    else:
-                        row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"edit_start_{current_day}_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # End Time Section Header
-        keyboard.append([InlineKeyboardButton("🔺 End Time", callback_data="header_end")])
-        
-        # End time options (2 per row for better button display)
-        for i in range(0, len(end_times), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(end_times):
-                    time = end_times[i + j]
-                    if time == day_data['end_time']:
-                        row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"edit_end_{current_day}_{time}"))
-                    else:
-                        row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"edit_end_{current_day}_{time}"))
-            if row:
-                keyboard.append(row)
-        
-        # Add action buttons
-        keyboard.append([
-            InlineKeyboardButton("⏭️ Skip This Day", callback_data="skip_current_day"),
-            InlineKeyboardButton("❌ Cancel", callback_data="cancel_editing_selected")
-        ])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(
+            time_picker, f"edit_start_{current_day}_", f"edit_end_{current_day}_",
+            day_data['start_time'], day_data['end_time'], ((("⏭️ Skip This Day", "skip_current_day"), ("❌ Cancel", "cancel_editing_selected")),)
+        )
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
     
@@ -3369,34 +3600,13 @@ class StaffSchedulerBot:
         selected_days = context.user_data.get('selected_days_for_edit', [])
         staff_name = context.user_data.get('current_staff_name', 'Unknown')
         
-        text = f"🕐 *Set Start Time for All Selected Days*\n\n"
-        text += f"Staff: {staff_name}\n"
-        text += f"Days: {', '.join(selected_days)}\n\n"
-        text += f"*Choose a start time that will apply to all selected days:*"
-        
-        # Create time picker keyboard
-        keyboard = []
-        time_slots = [
-            "09:45", "10:00", "10:15", "10:30", "10:45", "11:00", "11:15", "11:30", "11:45",
-            "12:00", "12:15", "12:30", "12:45", "13:00", "13:15", "13:30", "13:45", "14:00",
-            "14:15", "14:30", "14:45", "15:00", "15:15", "15:30", "15:45", "16:00", "16:15",
-            "16:30", "16:45", "17:00", "17:15", "17:30", "17:45", "18:00", "18:15", "18:30",
-            "18:45", "19:00", "19:15", "19:30", "19:45", "20:00", "20:15", "20:30", "20:45", "21:00"
-        ]
-        
-        # Create rows of 3 time slots each for better button display
-        for i in range(0, len(time_slots), 3):
-            row = []
-            for j in range(3):
-                if i + j < len(time_slots):
-                    time_slot = time_slots[i + j]
-                    row.append(InlineKeyboardButton(f"🕐 {time_slot}", callback_data=f"set_start_all_{time_slot}"))
-            keyboard.append(row)
-        
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to Edit Options", callback_data="back_to_edit_selected")])
+        text = ALL_SELECTED_TEXT.format(
+            icon="🕐", label="Start Time", staff_name=staff_name, days=', '.join(selected_days), choice="a start time"
+        )
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(
+            time_grid, QUARTER_HOURS, "set_start_all_", 3, ("🔙 Back to Edit Options", "back_to_edit_selected")
+        )
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
     
@@ -3405,34 +3615,13 @@ class StaffSchedulerBot:
         selected_days = context.user_data.get('selected_days_for_edit', [])
         staff_name = context.user_data.get('current_staff_name', 'Unknown')
         
-        text = f"🕐 *Set End Time for All Selected Days*\n\n"
-        text += f"Staff: {staff_name}\n"
-        text += f"Days: {', '.join(selected_days)}\n\n"
-        text += f"*Choose an end time that will apply to all selected days:*"
-        
-        # Create time picker keyboard
-        keyboard = []
-        time_slots = [
-            "09:45", "10:00", "10:15", "10:30", "10:45", "11:00", "11:15", "11:30", "11:45",
-            "12:00", "12:15", "12:30", "12:45", "13:00", "13:15", "13:30", "13:45", "14:00",
-            "14:15", "14:30", "14:45", "15:00", "15:15", "15:30", "15:45", "16:00", "16:15",
-            "16:30", "16:45", "17:00", "17:15", "17:30", "17:45", "18:00", "18:15", "18:30",
-            "18:45", "19:00", "19:15", "19:30", "19:45", "20:00", "20:15", "20:30", "20:45", "21:00"
-        ]
-        
-        # Create rows of 3 time slots each for better button display
-        for i in range(0, len(time_slots), 3):
-            row = []
-            for j in range(3):
-                if i + j < len(time_slots):
-                    time_slot = time_slots[i + j]
-                    row.append(InlineKeyboardButton(f"🕐 {time_slot}", callback_data=f"set_end_all_{time_slot}"))
-            keyboard.append(row)
-        
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to Edit Options", callback_data="back_to_edit_selected")])
+        text = ALL_SELECTED_TEXT.format(
+            icon="🕐", label="End Time", staff_name=staff_name, days=', '.join(selected_days), choice="an end time"
+        )
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(
+            time_grid, QUARTER_HOURS, "set_end_all_", 3, ("🔙 Back to Edit Options", "back_to_edit_selected")
+        )
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
     
@@ -3441,32 +3630,13 @@ class StaffSchedulerBot:
         selected_days = context.user_data.get('selected_days_for_edit', [])
         staff_name = context.user_data.get('current_staff_name', 'Unknown')
         
-        text = f"⏰ *Set Both Times for All Selected Days*\n\n"
-        text += f"Staff: {staff_name}\n"
-        text += f"Days: {', '.join(selected_days)}\n\n"
-        text += f"*Choose a time range that will apply to all selected days:*"
-        
-        # Create time range picker keyboard
-        keyboard = []
-        time_ranges = [
-            "09:45 - 18:00", "10:00 - 18:00", "10:00 - 19:00", "10:00 - 20:00",
-            "11:00 - 19:00", "11:00 - 20:00", "12:00 - 20:00", "12:00 - 21:00",
-            "13:00 - 21:00", "14:00 - 21:00"
-        ]
-        
-        # Create rows of 2 time ranges each
-        for i in range(0, len(time_ranges), 2):
-            row = []
-            for j in range(2):
-                if i + j < len(time_ranges):
-                    time_range = time_ranges[i + j]
-                    row.append(InlineKeyboardButton(f"🕐 {time_range}", callback_data=f"set_both_all_{time_range}"))
-            keyboard.append(row)
-        
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to Edit Options", callback_data="back_to_edit_selected")])
+        text = ALL_SELECTED_TEXT.format(
+            icon="⏰", label="Both Times", staff_name=staff_name, days=', '.join(selected_days), choice="a time range"
+        )
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self.render_cache.get(
+            time_grid, TIME_RANGES, "set_both_all_", 2, ("🔙 Back to Edit Options", "back_to_edit_selected")
+        )
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return SCHEDULE_INPUT
     
@@ -3788,7 +3958,7 @@ class StaffSchedulerBot:
             text += f"   👥 {staff_count} staff members\n\n"
             
             # Add button for this week
-            keyboard.append([InlineKeyboardButton(f"📅 {date_range}", callback_data=f"view_week_{week_key}")])
+            keyboard.append([InlineKeyboardButton(f"📅 {date_range}", callback_data=self.callback_data(context, VIEW_WEEK, datetime.strptime(week_key, '%Y-%m-%d').date()))])
         
         # Add back button
         keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main")])
@@ -3799,9 +3969,10 @@ class StaffSchedulerBot:
         await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return MAIN_MENU
     
-    async def view_week_schedule(self, update: Update, context: ContextTypes.DEFAULT_TYPE, week_key):
+    async def view_week_schedule(self, update: Update, context: ContextTypes.DEFAULT_TYPE, week_start):
         """View and export a specific week's schedule"""
         week_schedules = self.db.get_schedule_history()
+        week_key = week_start.strftime('%Y-%m-%d')
         
         if week_key not in week_schedules:
             keyboard = [[InlineKeyboardButton("🔙 Back to History", callback_data="schedule_history")]]
@@ -3924,7 +4095,7 @@ class StaffSchedulerBot:
             historical_filename = f"schedule_{date_range.replace(' ', '_').replace(',', '')}_{timestamp}.pdf"
             
             print(f"DEBUG: Calling PDF generator for historical data...")
-            pdf_filename = self.pdf_gen.generate_schedule_pdf(pdf_ready_schedules, week_dates, date_range, historical_filename, all_staff_names=all_staff_names)
+            pdf_filename = await self.generate_pdf(update, pdf_ready_schedules, week_dates, date_range, historical_filename, all_staff_names=all_staff_names)
             print(f"DEBUG: Historical PDF generated successfully: {pdf_filename}")
             
             # Send PDF
@@ -3969,11 +4140,13 @@ class StaffSchedulerBot:
         text = "🔄 *Bulk Scheduling Options*\n\n"
         text += "Choose how you want to schedule your team:\n\n"
         text += "• *Mirror Previous Week*: Copy schedules from previous week\n"
-        text += "• *Mirror Current Week*: Copy current week to next week"
+        text += "• *Mirror Current Week*: Copy current week to next week\n"
+        text += "• *Repeat Weeks Ahead*: Repeat this week (or a 2-4 week rotation) for the coming weeks"
         
         keyboard = [
             [InlineKeyboardButton("🔄 Mirror Previous Week", callback_data="mirror_previous_week")],
             [InlineKeyboardButton("🔄 Mirror Current Week", callback_data="mirror_current_week")],
+            [InlineKeyboardButton("🔁 Repeat Weeks Ahead", callback_data="repeat_weeks")],
             [InlineKeyboardButton("📅 Schedule All Staff (Fresh)", callback_data="schedule_all_fresh")],
             [InlineKeyboardButton("📊 Apply Template", callback_data="apply_template")],
             [InlineKeyboardButton("⚡ Quick Schedule (Same Times)", callback_data="quick_schedule")],
@@ -3984,27 +4157,245 @@ class StaffSchedulerBot:
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return MAIN_MENU
     
-    async def mirror_previous_week(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Mirror schedules from previous week (or current/next week if no previous week data exists)"""
+    @staticmethod
+    def format_mirror_summary(result, preview=False):
+        """Added/removed/copied lines for a mirror preview or result"""
+        text = ""
+        if result['added_staff']:
+            text += f"➕ *New staff (Not Set):* {', '.join(result['added_staff'])}\n"
+        if result['removed_staff']:
+            text += f"❌ *Removed staff (skipped):* {', '.join(result['removed_staff'])}\n"
+        verb = "to copy" if preview else "copied"
+        text += f"📋 {result['copied']} days {verb}, {result['added']} Not Set, {result['unchanged']} already up to date\n"
+        return text
+    
+    async def preview_mirror(self, source_week_start, target_week_start):
+        """Dry run of the mirror for the preview text ('' on backends without mirror_week)"""
+        if not hasattr(self.db, 'mirror_week'):
+            return ""
+        result = await asyncio.to_thread(self.db.mirror_week, source_week_start, target_week_start, dry_run=True)
+        return "\n" + self.format_mirror_summary(result, preview=True)
+    
+    async def preview_week_changes(self, source_week_start, target_week_start, staff_schedules):
+        """Compact list of the days a mirror changes in the target week, from one diff query
+        (working/off counts per staff on backends without diff_weeks)
+        """
+        if not hasattr(self.db, 'diff_weeks'):
+            text = ""
+            for staff_name, data in staff_schedules.items():
+                working_days = sum(1 for day_data in data['schedule'].values() if day_data.get('is_working', True))
+                text += f"*{staff_name}:* {working_days} working, {7 - working_days} off\n"
+            return text
+        
+        diff = await asyncio.to_thread(self.db.diff_weeks, source_week_start, target_week_start)
+        kept = sum(1 for cell in diff if cell[2] == REMOVED)
+        diff = [cell for cell in diff if cell[2] != REMOVED]  # Mirroring never deletes target days
+        if not diff:
+            text = "*Changes:* none, the target week already matches\n"
+        else:
+            names = {data['staff_id']: staff_name for staff_name, data in staff_schedules.items()}
+            text = f"*Changes ({len(diff)} days):*\n" + "\n".join(format_diff(diff, names, DIFF_PREVIEW_LINES)) + "\n"
+        if kept:
+            text += f"📌 {kept} days only in the target week are kept\n"
+        return text
+    
+    async def save_mirrored_week(self, context, schedules_data, week_start, changed_by):
+        """Write a confirmed mirror: one set-based copy in the database when the backend
+        has mirror_week, otherwise the previewed schedules one day at a time.
+        
+        Returns (success, saved_count, failed_saves, summary_text).
+        """
+        source_week_start = context.user_data.get('mirror_source_week')
+        if source_week_start and hasattr(self.db, 'mirror_week'):
+            result = await asyncio.to_thread(self.db.mirror_week, source_week_start, week_start, changed_by)
+            return True, result['copied'] + result['added'], [], self.format_mirror_summary(result)
+        success, saved_count, failed_saves = self.db.save_bulk_schedules(schedules_data, week_start, changed_by)
+        return success, saved_count, failed_saves, ""
+    
+    def repeat_plan(self, context: ContextTypes.DEFAULT_TYPE):
+        """(pattern weeks, first target week, week count) for the repeat being set up:
+        the last pattern-length weeks up to this one, repeated from next week on
+        """
+        choice = context.user_data.get(REPEAT_WEEKS_KEY, {})
+        pattern_length = choice.get('pattern', 1)
+        _, current_week_start = self.calculate_week_dates()
+        pattern = [current_week_start - timedelta(weeks=pattern_length - 1 - i) for i in range(pattern_length)]
+        return pattern, current_week_start + timedelta(weeks=1), choice.get('weeks', REPEAT_WEEK_COUNTS[0])
+    
+    async def show_repeat_weeks_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Pick what to repeat: this week, or a rotation of the last 2-4 weeks"""
+        back = [InlineKeyboardButton("🔙 Back to Bulk Menu", callback_data="bulk_schedule")]
+        if not hasattr(self.db, 'mirror_weeks'):
+            await update.callback_query.edit_message_text(
+                "❌ Repeating weeks is not available with this database.",
+                reply_markup=InlineKeyboardMarkup([back])
+            )
+            return
+        
+        text = "🔁 *Repeat Weeks Ahead*\n\n"
+        text += "Choose the schedule to repeat from next week on:\n\n"
+        text += "• *This week*: every coming week gets this week's shifts\n"
+        text += "• *Rotation*: the last 2-4 weeks (ending with this one) repeat in turn"
+        keyboard = [[InlineKeyboardButton("📅 This week", callback_data="repeat_pattern_1")]]
+        keyboard.append([InlineKeyboardButton(f"🔄 {length}-week rotation", callback_data=f"repeat_pattern_{length}")
+                         for length in REPEAT_PATTERN_LENGTHS[1:]])
+        keyboard.append(back)
+        await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard),
+                                                      parse_mode=ParseMode.MARKDOWN)
+    
+    async def show_repeat_week_counts(self, update: Update, context: ContextTypes.DEFAULT_TYPE, pattern_length):
+        """Pick how many weeks ahead to fill"""
+        if pattern_length not in REPEAT_PATTERN_LENGTHS:
+            pattern_length = 1
+        context.user_data[REPEAT_WEEKS_KEY] = {'pattern': pattern_length}
+        pattern, _, _ = self.repeat_plan(context)
+        
+        text = "🔁 *Repeat Weeks Ahead*\n\n"
+        if pattern_length == 1:
+            text += f"Repeating the week of {pattern[0].strftime('%b %d')}.\n\n"
+        else:
+            text += f"Rotating {pattern_length} weeks: {', '.join(week.strftime('%b %d') for week in pattern)}.\n\n"
+        text += "How many weeks ahead should be filled?"
+        keyboard = [[InlineKeyboardButton(f"{weeks} weeks", callback_data=f"repeat_count_{weeks}")
+                     for weeks in REPEAT_WEEK_COUNTS]]
+        keyboard.append([InlineKeyboardButton("🔙 Back", callback_data="repeat_weeks")])
+        await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard),
+                                                      parse_mode=ParseMode.MARKDOWN)
+    
+    async def preview_repeat_weeks(self, update: Update, context: ContextTypes.DEFAULT_TYPE, weeks):
+        """Dry run of the repeat: what every coming week would get, before anything is written"""
+        choice = context.user_data.setdefault(REPEAT_WEEKS_KEY, {'pattern': 1})
+        choice['weeks'] = weeks if weeks in REPEAT_WEEK_COUNTS else REPEAT_WEEK_COUNTS[0]
+        pattern, target_week_start, weeks = self.repeat_plan(context)
+        choice.pop('previewed', None)
+        try:
+            result = await asyncio.to_thread(self.db.mirror_weeks, pattern, target_week_start, weeks, dry_run=True)
+        except Exception as e:
+            logger.error(f"Error previewing repeated weeks: {e}")
+            await update.callback_query.edit_message_text(
+                f"❌ Error previewing the repeat: {str(e)}",
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="repeat_weeks")]])
+            )
+            return
+        
+        last_week = target_week_start + timedelta(weeks=weeks - 1, days=6)
+        text = "🔁 *Repeat Weeks Ahead - Preview*\n\n"
+        text += f"*Weeks:* {target_week_start.strftime('%b %d')} - {last_week.strftime('%b %d, %Y')} ({weeks} weeks)\n"
+        text += f"*Pattern:* {', '.join(week.strftime('%b %d') for week in pattern)}\n\n"
+        text += self.format_mirror_summary(result, preview=True)
+        busy = [week for week in result['weeks'] if week['copied'] + week['added']]
+        if len(busy) < weeks:
+            text += f"✅ {weeks - len(busy)} weeks already match the pattern\n"
+        text += "\nExisting shifts in these weeks will be replaced."
+        # Confirm writes exactly these weeks, even if a new week has begun since
+        choice['previewed'] = (pattern, target_week_start, weeks)
+        
+        keyboard = [
+            [InlineKeyboardButton("✅ Repeat & Save", callback_data="confirm_repeat_weeks")],
+            [InlineKeyboardButton("🔙 Back", callback_data=f"repeat_pattern_{len(pattern)}")]
+        ]
+        await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard),
+                                                      parse_mode=ParseMode.MARKDOWN)
+    
+    async def confirm_repeat_weeks(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Write the weeks shown in the preview, as previewed, in one transaction"""
+        # A second tap on "Repeat & Save" (or a redelivery) must not run the write again
+        dedup = self.get_deduplicator(context.bot_data)
+        repeat_key = idempotency_key('confirm_repeat_weeks', update)
+        if dedup and not dedup.claim(repeat_key):
+            logger.info(f"⏭️ Ignoring repeated confirm_repeat_weeks tap ({repeat_key})")
+            return
+        
+        back = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back to Bulk Menu", callback_data="bulk_schedule")]])
+        previewed = context.user_data.get(REPEAT_WEEKS_KEY, {}).get('previewed')
+        if not previewed:
+            if dedup:
+                dedup.release(repeat_key)
+            await update.callback_query.edit_message_text("❌ No repeat found. Please try again.", reply_markup=back)
+            return
+        
+        pattern, target_week_start, weeks = previewed
+        await update.callback_query.edit_message_text(
+            f"⏳ *Repeating Schedules...*\n\nFilling {weeks} weeks, please wait.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        try:
+            result = await asyncio.to_thread(self.db.mirror_weeks, pattern, target_week_start, weeks,
+                                              f"BULK_REPEAT_{update.effective_user.id}")
+        except Exception as e:
+            if dedup:
+                dedup.release(repeat_key)
+            logger.error(f"Error repeating weeks: {e}")
+            await update.callback_query.edit_message_text(f"❌ Error repeating weeks: {str(e)}", reply_markup=back)
+            return
+        
+        context.user_data.pop(REPEAT_WEEKS_KEY, None)
+        text = "✅ *Weeks Repeated Successfully!*\n\n"
+        text += f"*Weeks:* {weeks} from {target_week_start.strftime('%b %d, %Y')}\n"
+        text += self.format_mirror_summary(result)
+        keyboard = [
+            [InlineKeyboardButton("📋 View Schedules", callback_data="view_schedules")],
+            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main")]
+        ]
+        await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard),
+                                                      parse_mode=ParseMode.MARKDOWN)
+    
+    @staticmethod
+    def source_week_label(source_week_start, week_start):
+        """'previous week', 'current week', 'next week' or 'week of Oct 04'"""
+        labels = {-7: "previous week", 0: "current week", 7: "next week"}
+        return labels.get((source_week_start - week_start).days, f"week of {source_week_start.strftime('%b %d')}")
+    
+    async def find_mirror_source(self, week_start):
+        """Closest week with schedules to mirror into week_start: the latest one up to the
+        previous week, else the first one from this week on (None if there are none)
+        """
+        if not hasattr(self.db, 'find_nearest_populated_week'):
+            for candidate in (week_start - timedelta(days=7), week_start, week_start + timedelta(days=7)):
+                if self.db.get_current_week_schedules(candidate):
+                    return candidate
+            return None
+        source_week_start = await asyncio.to_thread(
+            self.db.find_nearest_populated_week, week_start - timedelta(days=7), 'back')
+        if source_week_start is None:
+            source_week_start = await asyncio.to_thread(self.db.find_nearest_populated_week, week_start, 'forward')
+        return source_week_start
+    
+    async def show_mirror_source_weeks(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Recent weeks with schedules, to pick the one mirrored into this week"""
+        _, week_start = self.calculate_week_dates()
+        populated = await asyncio.to_thread(self.db.get_populated_weeks, week_start + timedelta(days=7), MIRROR_SOURCE_WEEKS)
+        keyboard = []
+        for source_week_start, staff_count in populated:
+            if source_week_start == week_start:
+                continue  # The target week itself
+            week_end = source_week_start + timedelta(days=6)
+            label = f"📅 {source_week_start.strftime('%b %d')} - {week_end.strftime('%b %d')} ({staff_count} staff)"
+            keyboard.append([InlineKeyboardButton(label, callback_data=f"mirror_from_{source_week_start.isoformat()}")])
+        keyboard.append([InlineKeyboardButton("🔙 Back", callback_data="mirror_previous_week")])
+        
+        text = "📅 *Choose Source Week*\n\n"
+        if len(keyboard) > 1:
+            text += f"Weeks with schedules in the last {MIRROR_SOURCE_WEEKS} weeks. Pick the one to mirror into this week:"
+        else:
+            text += f"No other week has schedules in the last {MIRROR_SOURCE_WEEKS} weeks."
+        await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard),
+                                                      parse_mode=ParseMode.MARKDOWN)
+    
+    async def mirror_previous_week(self, update: Update, context: ContextTypes.DEFAULT_TYPE, source_week_start=None):
+        """Mirror schedules from the closest earlier week with data (or a chosen source week)"""
         try:
             # Calculate current and previous week dates
             week_dates, week_start = self.calculate_week_dates()
             date_range = self.format_date_range(week_dates)
             
-            # First try to get previous week's schedules
-            previous_schedules = self.db.get_previous_week_schedules(week_start)
-            source_week_type = "previous week"
-            
-            # If no previous week schedules, try current week schedules
-            if not previous_schedules:
-                previous_schedules = self.db.get_current_week_schedules(week_start)
-                source_week_type = "current week"
-            
-            # If still no schedules, try next week schedules
-            if not previous_schedules:
-                next_week_start = week_start + timedelta(days=7)
-                previous_schedules = self.db.get_current_week_schedules(next_week_start)
-                source_week_type = "next week"
+            # One indexed lookup for the source week, then a single fetch of it
+            if source_week_start is None:
+                source_week_start = await self.find_mirror_source(week_start)
+            previous_schedules = []
+            if source_week_start is not None:
+                previous_schedules = await asyncio.to_thread(self.db.get_current_week_schedules, source_week_start)
+                source_week_type = self.source_week_label(source_week_start, week_start)
             
             if not previous_schedules:
                 text = "❌ *No Previous Week Found*\n\n"
@@ -4040,6 +4431,7 @@ class StaffSchedulerBot:
             context.user_data['bulk_schedule_data'] = staff_schedules
             context.user_data['week_dates'] = week_dates
             context.user_data['week_start'] = week_start
+            context.user_data['mirror_source_week'] = source_week_start
             
             # Show preview
             text = f"🔄 *Preview: Mirror from {source_week_type.title()}*\n\n"
@@ -4047,12 +4439,8 @@ class StaffSchedulerBot:
             text += f"*Source:* {source_week_type}\n\n"
             text += f"Found schedules for {len(staff_schedules)} staff members:\n\n"
             
-            for staff_name, data in staff_schedules.items():
-                schedule = data['schedule']
-                working_days = sum(1 for day_data in schedule.values() if day_data.get('is_working', True))
-                off_days = 7 - working_days
-                text += f"*{staff_name}:* {working_days} working, {off_days} off\n"
-            
+            text += await self.preview_week_changes(source_week_start, week_start, staff_schedules)
+            text += await self.preview_mirror(source_week_start, week_start)
             text += f"\nWould you like to proceed with mirroring these schedules?"
             
             keyboard = [
@@ -4060,6 +4448,8 @@ class StaffSchedulerBot:
                 [InlineKeyboardButton("✏️ Mirror & Edit First", callback_data="copy_and_edit")],
                 [InlineKeyboardButton("🔙 Back to Bulk Menu", callback_data="bulk_schedule")]
             ]
+            if hasattr(self.db, 'get_populated_weeks'):
+                keyboard.insert(2, [InlineKeyboardButton("📅 Choose Source Week", callback_data="mirror_pick_source")])
             reply_markup = InlineKeyboardMarkup(keyboard)
             await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
             return MAIN_MENU
@@ -4074,11 +4464,20 @@ class StaffSchedulerBot:
     
     async def confirm_copy_previous(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Confirm and save copied schedules from previous week"""
+        # A second tap on "Mirror & Save All" (or a redelivery) must not run the bulk write again
+        dedup = self.get_deduplicator(context.bot_data)
+        copy_key = idempotency_key('confirm_copy_previous', update)
+        if dedup and not dedup.claim(copy_key):
+            logger.info(f"⏭️ Ignoring repeated confirm_copy_previous tap ({copy_key})")
+            return MAIN_MENU
+        
         try:
             bulk_schedule_data = context.user_data.get('bulk_schedule_data', {})
             week_start = context.user_data.get('week_start')
             
             if not bulk_schedule_data or not week_start:
+                if dedup:
+                    dedup.release(copy_key)
                 await update.callback_query.edit_message_text(
                     "❌ No schedule data found. Please try again.",
                     reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="bulk_schedule")]])
@@ -4105,7 +4504,8 @@ class StaffSchedulerBot:
             session_id = self.db.create_scheduling_session(week_start, f"BULK_COPY_{update.effective_user.id}")
             
             # Save all schedules atomically
-            success, saved_count, failed_saves = self.db.save_bulk_schedules(schedules_data, week_start, f"BULK_COPY_{update.effective_user.id}")
+            success, saved_count, failed_saves, mirror_summary = await self.save_mirrored_week(
+                context, schedules_data, week_start, f"BULK_COPY_{update.effective_user.id}")
             
             if success:
                 # Complete the session
@@ -4113,13 +4513,15 @@ class StaffSchedulerBot:
                 
                 # Clear context
                 context.user_data.clear()
+                await context.application.update_persistence()
                 
                 date_range = self.format_date_range(context.user_data.get('week_dates', {}))
                 
                 text = f"✅ *Schedules Copied Successfully!*\n\n"
                 text += f"*Week:* {date_range}\n"
                 text += f"*Saved:* {saved_count} total day schedules\n"
-                text += f"*Staff:* {len(schedules_data)} people\n\n"
+                text += f"*Staff:* {len(schedules_data)} people\n"
+                text += f"{mirror_summary}\n"
                 
                 # Add conflict warnings if any
                 if conflicts:
@@ -4146,6 +4548,8 @@ class StaffSchedulerBot:
                     [InlineKeyboardButton("🏠 Main Menu", callback_data="back_main")]
                 ]
             else:
+                if dedup:
+                    dedup.release(copy_key)
                 text = f"⚠️ *Partial Copy Completed*\n\n"
                 text += f"*Saved:* {saved_count} day schedules\n"
                 text += f"*Failed:* {len(failed_saves)} operations\n\n"
@@ -4168,6 +4572,8 @@ class StaffSchedulerBot:
             
         except Exception as e:
             logger.error(f"Error confirming mirror previous: {e}")
+            if dedup:
+                dedup.release(copy_key)
             await update.callback_query.edit_message_text(
                 f"❌ Error saving schedules: {str(e)}\n\nPlease try again or contact administrator.",
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="bulk_schedule")]])
@@ -4338,6 +4744,9 @@ class StaffSchedulerBot:
         query = update.callback_query
         await query.answer()
         
+        if is_compact(query.data):
+            return await self.dispatch_callback(update, context)
+        
         if query.data == "bulk_schedule":
             await self.show_bulk_schedule_menu(update, context)
             return BULK_SCHEDULE
@@ -4347,6 +4756,13 @@ class StaffSchedulerBot:
         elif query.data == "mirror_current_week":
             await self.mirror_current_week(update, context)
             return BULK_SCHEDULE
+        elif query.data == "mirror_pick_source":
+            await self.show_mirror_source_weeks(update, context)
+            return BULK_SCHEDULE
+        elif query.data.startswith("mirror_from_"):
+            source_week_start = datetime.strptime(query.data.replace("mirror_from_", ""), '%Y-%m-%d').date()
+            await self.mirror_previous_week(update, context, source_week_start)
+            return BULK_SCHEDULE
         elif query.data == "confirm_copy_previous":
             await self.confirm_copy_previous(update, context)
             return BULK_SCHEDULE
@@ -4363,18 +4779,6 @@ class StaffSchedulerBot:
             day = query.data.replace("edit_day_", "")
             await self.show_edit_staff_selection(update, context, day)
             return BULK_SCHEDULE
-        elif query.data.startswith("edit_staff_"):
-            staff_name = query.data.replace("edit_staff_", "")
-            await self.show_edit_staff_schedule(update, context, staff_name)
-            return BULK_SCHEDULE
-        elif query.data.startswith("set_off_"):
-            staff_name = query.data.replace("set_off_", "")
-            await self.set_staff_off(update, context, staff_name)
-            return BULK_SCHEDULE
-        elif query.data.startswith("edit_times_"):
-            staff_name = query.data.replace("edit_times_", "")
-            await self.edit_staff_times(update, context, staff_name)
-            return BULK_SCHEDULE
         elif query.data.startswith("edit_start_"):
             time = query.data.replace("edit_start_", "")
             await self.handle_edit_start_time(update, context, time)
@@ -4383,10 +4787,6 @@ class StaffSchedulerBot:
             time = query.data.replace("edit_end_", "")
             await self.handle_edit_end_time(update, context, time)
             return BULK_SCHEDULE
-        elif query.data.startswith("confirm_times_"):
-            staff_name = query.data.replace("confirm_times_", "")
-            await self.confirm_times_and_continue(update, context, staff_name)
-            return BULK_SCHEDULE
         elif query.data == "save_and_continue":
             await self.save_and_continue_edit(update, context)
             return BULK_SCHEDULE
@@ -4396,6 +4796,18 @@ class StaffSchedulerBot:
         elif query.data == "quick_schedule":
             await self.quick_schedule(update, context)
             return BULK_SCHEDULE
+        elif query.data == "repeat_weeks":
+            await self.show_repeat_weeks_menu(update, context)
+            return BULK_SCHEDULE
+        elif query.data.startswith("repeat_pattern_"):
+            await self.show_repeat_week_counts(update, context, int(query.data.replace("repeat_pattern_", "")))
+            return BULK_SCHEDULE
+        elif query.data.startswith("repeat_count_"):
+            await self.preview_repeat_weeks(update, context, int(query.data.replace("repeat_count_", "")))
+            return BULK_SCHEDULE
+        elif query.data == "confirm_repeat_weeks":
+            await self.confirm_repeat_weeks(update, context)
+            return BULK_SCHEDULE
         elif query.data == "back_main":
             return await self.show_main_menu(update, context)
         
@@ -4434,18 +4846,390 @@ class StaffSchedulerBot:
         query = update.callback_query
         await query.answer()
         
+        if is_compact(query.data):
+            return await self.dispatch_callback(update, context)
+        
         if query.data == "schedule_history":
             await self.show_schedule_history(update, context)
             return SCHEDULE_HISTORY
         elif query.data == "back_main":
             return await self.show_main_menu(update, context)
-        elif query.data.startswith("view_week_"):
-            week_key = query.data.split("_")[2]
-            await self.view_week_schedule(update, context, week_key)
-            return SCHEDULE_HISTORY
         
         return SCHEDULE_HISTORY
 
+    def audit_view(self, context: ContextTypes.DEFAULT_TYPE):
+        """Filters and page cursors of the audit log screen, kept in user_data"""
+        view = context.user_data.get(AUDIT_VIEW_KEY)
+        if view is None:
+            view = context.user_data[AUDIT_VIEW_KEY] = {
+                'staff_id': None, 'action': None, 'period_days': None, 'cursors': [None], 'next': None
+            }
+        return view
+    
+    def format_audit_entry(self, row):
+        """One audit log line: when, what, who"""
+        change_id, staff_name, action, day_of_week, old_data, new_data, changed_by, changed_at = row
+        icon, label = AUDIT_ACTION_LABELS.get(action, ("•", action))
+        when = str(changed_at)[:16]
+        
+        def parse(value):
+            if not value:
+                return None
+            try:
+                return json.loads(value)
+            except (TypeError, ValueError):
+                return value  # SQLite stores staff names as plain text
+        
+        def shift(data):
+            if not isinstance(data, dict):
+                return ""
+            if not data.get('is_working'):
+                return "Off"
+            return f"{str(data.get('start_time') or '')[:5]}-{str(data.get('end_time') or '')[:5]}"
+        
+        old, new = parse(old_data), parse(new_data)
+        if action in ('ADD_STAFF', 'REMOVE_STAFF'):
+            value = new if action == 'ADD_STAFF' else old
+            name = value.get('name') if isinstance(value, dict) else value
+            detail = name or staff_name or "Unknown"
+        elif action == 'RESET_SCHEDULES':
+            detail = "every staff member, every week"
+        elif action == 'MIRROR_WEEK' and isinstance(new, dict):
+            detail = (f"week of {str(new.get('schedule_date'))[5:10]} from {str(new.get('source_week'))[5:10]}: "
+                      f"{new.get('copied', 0)} copied, {new.get('added', 0)} Not Set")
+        else:
+            detail = f"{staff_name or 'Removed staff'} · {day_of_week or ''} {shift(new)}"
+            dated = new if isinstance(new, dict) else old
+            if isinstance(dated, dict) and dated.get('schedule_date'):
+                detail += f" ({str(dated['schedule_date'])[5:10]})"
+            if isinstance(old, dict):
+                detail += f", was {shift(old)}"
+        return f"{icon} `{when}` {label}: {detail} · by {changed_by or 'ADMIN'}"
+    
+    async def show_audit_log(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Audit log browser: one keyset page of schedule_changes with filter buttons"""
+        query = update.callback_query
+        view = self.audit_view(context)
+        since = None
+        if view['period_days']:
+            # changed_at comes from the database's CURRENT_TIMESTAMP, which is UTC
+            since = datetime.utcnow() - timedelta(days=view['period_days'])
+        
+        rows, next_cursor = await asyncio.to_thread(
+            self.db.get_schedule_changes_page,
+            staff_id=view['staff_id'], action=view['action'], since=since,
+            before=view['cursors'][-1], limit=AUDIT_PAGE_SIZE
+        )
+        view['next'] = next_cursor
+        
+        page = len(view['cursors'])
+        text = f"🧾 *Audit Log* (page {page})\n\n"
+        if rows:
+            text += "\n".join(self.format_audit_entry(row) for row in rows)
+        else:
+            text += "No changes match these filters."
+        if next_cursor is None and hasattr(self.db, 'get_audit_summary'):
+            # Last page: summary counts of what has been archived
+            summary = await asyncio.to_thread(self.db.get_audit_summary, view['staff_id'])
+            if summary:
+                months = sorted({month for month, _, _ in summary})
+                total = sum(count for _, _, count in summary)
+                text += f"\n\n📦 {total} changes archived ({months[0]} to {months[-1]})"
+        
+        staff_label = "All staff"
+        if view['staff_id'] is not None:
+            staff = self.db.get_staff_by_id(view['staff_id'])
+            staff_label = staff[1] if staff else "Removed staff"
+        action_label = AUDIT_ACTION_LABELS[view['action']][1] if view['action'] else "All actions"
+        period_label = f"Last {view['period_days']} days" if view['period_days'] else "All time"
+        
+        keyboard = []
+        nav = []
+        if page > 1:
+            nav.append(InlineKeyboardButton("⬅️ Newer", callback_data="audit_newer"))
+        if next_cursor is not None:
+            nav.append(InlineKeyboardButton("Older ➡️", callback_data="audit_older"))
+        if nav:
+            keyboard.append(nav)
+        keyboard.append([
+            InlineKeyboardButton(f"👤 {staff_label}", callback_data="audit_staff"),
+            InlineKeyboardButton(f"🏷️ {action_label}", callback_data="audit_action")
+        ])
+        keyboard.append([
+            InlineKeyboardButton(f"📆 {period_label}", callback_data="audit_period"),
+            InlineKeyboardButton("🔄 Latest", callback_data="audit_log")
+        ])
+        keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main")])
+        
+        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.MARKDOWN)
+        return AUDIT_LOG
+    
+    async def show_audit_staff_filter(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Pick the staff member whose changes the audit log shows"""
+        staff_list = self.db.get_all_staff()
+        keyboard = [[InlineKeyboardButton("👥 All staff", callback_data="audit_staff_all")]]
+        for i in range(0, len(staff_list), 2):
+            keyboard.append([InlineKeyboardButton(name, callback_data=f"audit_staff_{staff_id}")
+                             for staff_id, name in staff_list[i:i + 2]])
+        keyboard.append([InlineKeyboardButton("🔙 Back to Audit Log", callback_data="audit_back")])
+        
+        await update.callback_query.edit_message_text(
+            "🧾 *Audit Log*\n\nShow changes for:",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return AUDIT_LOG
+    
+    async def handle_audit_log(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle audit log paging and filter callbacks"""
+        query = update.callback_query
+        await query.answer()
+        view = self.audit_view(context)
+        
+        if query.data == "back_main":
+            context.user_data.pop(AUDIT_VIEW_KEY, None)
+            return await self.show_main_menu(update, context)
+        elif query.data == "audit_older":
+            if view['next'] is not None:
+                view['cursors'].append(view['next'])
+        elif query.data == "audit_newer":
+            if len(view['cursors']) > 1:
+                view['cursors'].pop()
+        elif query.data == "audit_staff":
+            return await self.show_audit_staff_filter(update, context)
+        elif query.data.startswith("audit_staff_"):
+            value = query.data[len("audit_staff_"):]
+            view['staff_id'] = None if value == "all" else int(value)
+            view['cursors'] = [None]
+        elif query.data == "audit_action":
+            actions = list(AUDIT_ACTION_LABELS)
+            view['action'] = actions[(actions.index(view['action']) + 1) % len(actions)]
+            view['cursors'] = [None]
+        elif query.data == "audit_period":
+            view['period_days'] = AUDIT_PERIODS[(AUDIT_PERIODS.index(view['period_days']) + 1) % len(AUDIT_PERIODS)]
+            view['cursors'] = [None]
+        elif query.data == "audit_log":
+            view['cursors'] = [None]
+        
+        return await self.show_audit_log(update, context)
+    
+    async def inline_lookup(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Answer @bot queries - a day ('fri'), a staff name ('Bea') or a time ('17:00') - from the week index.
+        
+        Answers carry cache_time, so Telegram serves repeats of a query
+        without asking the bot; is_personal keeps them to the admin who asked.
+        """
+        query = update.inline_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer([], cache_time=INLINE_CACHE_SECONDS, is_personal=True)
+            return
+        
+        today = datetime.now(self.toronto_tz).date()
+        _, week_start = self.calculate_week_dates(today)
+        try:
+            found = await asyncio.to_thread(lookup, self.lookup_cache, self.db, query.query, today, week_start)
+        except Exception as e:
+            logger.error(f"❌ Inline lookup '{query.query}' failed: {e}")
+            found = []
+        
+        results = [
+            InlineQueryResultArticle(
+                id=result_id, title=title, description=description,
+                input_message_content=InputTextMessageContent(text, parse_mode=ParseMode.MARKDOWN)
+            )
+            for result_id, title, description, text in found
+        ]
+        await query.answer(results, cache_time=INLINE_CACHE_SECONDS, is_personal=True)
+    
+    def find_staff_by_name(self, name):
+        """(staff_id, name) of the staff member called name (any case), or None"""
+        wanted = name.strip().lower()
+        return next((staff for staff in self.db.get_all_staff() if staff[1].lower() == wanted), None)
+    
+    async def link_staff_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/link_staff <staff name>: a link that connects the staff member's Telegram account"""
+        if not self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ You don't have permission to use this bot.")
+            return
+        if not context.args:
+            await update.message.reply_text(
+                "🔗 Usage: /link_staff <staff name>\n\n"
+                "Send the link to the staff member. Opening it lets them use /myshifts and /week."
+            )
+            return
+        
+        staff = await asyncio.to_thread(self.find_staff_by_name, ' '.join(context.args))
+        if not staff:
+            await update.message.reply_text(f"❌ No staff member called '{' '.join(context.args)}'.")
+            return
+        
+        code = link_code(staff[0], BOT_TOKEN, time.time() + STAFF_LINK_HOURS * 3600)
+        await update.message.reply_text(
+            f"🔗 Link for {staff[1]} (valid for {STAFF_LINK_HOURS} hours):\n\n"
+            f"https://t.me/{context.bot.username}?start={code}\n\n"
+            f"It works once: opening it links their Telegram account, replacing any account linked before."
+        )
+    
+    async def unlink_staff_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/unlink_staff <staff name>: stop a staff member's Telegram account seeing their shifts"""
+        if not self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ You don't have permission to use this bot.")
+            return
+        if not context.args:
+            await update.message.reply_text("✂️ Usage: /unlink_staff <staff name>")
+            return
+        
+        staff = await asyncio.to_thread(self.find_staff_by_name, ' '.join(context.args))
+        if not staff:
+            await update.message.reply_text(f"❌ No staff member called '{' '.join(context.args)}'.")
+            return
+        removed = await asyncio.to_thread(self.db.unlink_staff_user, staff[0], f"USER_{update.effective_user.id}")
+        await update.message.reply_text(
+            f"✅ {staff[1]} is no longer linked." if removed else f"ℹ️ {staff[1]} had no linked account."
+        )
+    
+    async def staff_link_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/start link-...: a staff member opened the link an admin sent them"""
+        user_id = update.effective_user.id
+        allowed, warn = self.staff_portal.allow(user_id)
+        if not allowed:
+            if warn:
+                await update.message.reply_text("⏳ Too many requests - please wait a moment and try again.")
+            return
+        
+        code = context.args[0] if context.args else ''
+        staff_id = read_link_code(code, BOT_TOKEN, time.time())
+        staff = staff_id and await asyncio.to_thread(self.db.get_staff_by_id, staff_id)
+        if not staff:
+            await update.message.reply_text("❌ This link is invalid or has expired. Please ask an admin for a new one.")
+            return
+        
+        if not await asyncio.to_thread(self.db.link_staff_user, staff[0], user_id, f"USER_{user_id}", code):
+            logger.warning(f"⚠️ Telegram user {user_id} opened a link already used for staff '{staff[1]}'")
+            await update.message.reply_text("❌ This link has already been used. Please ask an admin for a new one.")
+            return
+        self.staff_portal.remember(user_id, tuple(staff))
+        logger.info(f"🔗 Telegram user {user_id} linked to staff '{staff[1]}'")
+        await update.message.reply_text(
+            f"✅ Hi {staff[1]}, your account is linked.\n\n"
+            f"/myshifts - your upcoming shifts\n"
+            f"/week - this week's schedule (/week next for next week)"
+        )
+    
+    async def staff_answer(self, update: Update, kind, day):
+        """Reply with a linked staff member's cached answer, within their rate limit"""
+        user_id = update.effective_user.id
+        allowed, warn = self.staff_portal.allow(user_id)
+        if not allowed:
+            if warn:
+                await update.message.reply_text("⏳ Too many requests - please wait a moment and try again.")
+            return
+        
+        try:
+            staff = await asyncio.to_thread(self.staff_portal.staff_for, self.db, user_id)
+            if not staff:
+                await update.message.reply_text(
+                    "❌ Your account is not linked to a staff member. Please ask an admin for a link."
+                )
+                return
+            text = await asyncio.to_thread(self.staff_portal.answer, self.db, staff, kind, day)
+        except Exception as e:
+            logger.error(f"❌ Staff {kind} answer for user {user_id} failed: {e}")
+            await update.message.reply_text("❌ Could not load your schedule. Please try again later.")
+            return
+        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+    
+    async def my_shifts_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/myshifts: a linked staff member's shifts from today to the end of next week"""
+        await self.staff_answer(update, 'myshifts', datetime.now(self.toronto_tz).date())
+    
+    async def staff_week_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/week [next]: a linked staff member's whole week"""
+        _, week_start = self.calculate_week_dates(datetime.now(self.toronto_tz).date())
+        if context.args and context.args[0].lower() in ('next', 'nextweek'):
+            week_start += timedelta(days=7)
+        await self.staff_answer(update, 'week', week_start)
+    
+    async def restore_week_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/restore_week <date in week> <YYYY-MM-DD [HH:MM]>: preview putting a week back the way it was"""
+        if not self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ You don't have permission to use this bot.")
+            return
+        if not hasattr(self.db, 'restore_week_schedules'):
+            await update.message.reply_text("❌ Restoring a week needs the change log (SQLite or MySQL database).")
+            return
+        if len(context.args) < 2:
+            await update.message.reply_text(
+                "♻️ Usage: /restore_week <any date in the week> <as of>\n\n"
+                "Example: /restore_week 2026-09-14 2026-09-20 12:00\n"
+                "Times are Toronto time; a bare date means the end of that day."
+            )
+            return
+        
+        try:
+            week_start = week_start_of(context.args[0])
+            as_of_text = ' '.join(context.args[1:])
+            as_of = parse_as_of(as_of_text)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+        
+        changes, skipped = await asyncio.to_thread(
+            restore_week, self.db, week_start, as_of, f"RESTORE_{update.effective_user.id}", True
+        )
+        names = dict(await asyncio.to_thread(self.db.get_all_staff))
+        text = f"♻️ Restore week of {week_start.strftime('%b %d, %Y')} as of {as_of_text}\n\n"
+        if skipped:
+            text += f"⚠️ {len(skipped)} staff removed since then are skipped.\n\n"
+        if not changes:
+            text += "Nothing to change - the week already looks like that."
+            await update.message.reply_text(text)
+            return
+        
+        text += f"{len(changes)} days will change:\n"
+        text += "\n".join(format_change(change, names) for change in changes[:RESTORE_PREVIEW_LINES])
+        if len(changes) > RESTORE_PREVIEW_LINES:
+            text += f"\n… and {len(changes) - RESTORE_PREVIEW_LINES} more"
+        context.user_data[RESTORE_WEEK_KEY] = {
+            'week_start': week_start.isoformat(), 'as_of': as_of, 'as_of_text': as_of_text
+        }
+        await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("✅ Restore", callback_data="restore_week_confirm"),
+            InlineKeyboardButton("❌ Cancel", callback_data="restore_week_cancel"),
+        ]]))
+    
+    async def handle_restore_week(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Restore / Cancel buttons under a /restore_week preview"""
+        query = update.callback_query
+        await query.answer()
+        if not self.is_admin(update.effective_user.id):
+            return
+        
+        # Popped so a second tap (or a redelivery) cannot restore twice
+        pending = context.user_data.pop(RESTORE_WEEK_KEY, None)
+        if query.data == 'restore_week_cancel':
+            await query.edit_message_text("❌ Restore cancelled.")
+            return
+        if not pending:
+            await query.edit_message_text("❌ Nothing to restore - run /restore_week again.")
+            return
+        
+        week_start = datetime.strptime(pending['week_start'], '%Y-%m-%d').date()
+        try:
+            changes, skipped = await asyncio.to_thread(
+                restore_week, self.db, week_start, pending['as_of'], f"RESTORE_{update.effective_user.id}"
+            )
+        except Exception as e:
+            logger.error(f"❌ Error restoring week {week_start}: {e}")
+            await query.edit_message_text(f"❌ Error restoring the week: {e}")
+            return
+        
+        logger.info(f"♻️ Week {week_start} restored as of {pending['as_of']} UTC: {len(changes)} days changed")
+        await query.edit_message_text(
+            f"✅ Week of {week_start.strftime('%b %d, %Y')} restored as of {pending['as_of_text']}: "
+            f"{len(changes)} days changed."
+        )
+    
     async def handle_week_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle week selection callbacks"""
         query = update.callback_query
@@ -4512,25 +5296,10 @@ class StaffSchedulerBot:
             context.user_data['week_dates'] = week_dates
             context.user_data['week_start'] = week_start
             
-            # Check if staff already has a schedule for this week
+            # Show the staff member's existing schedule for this week, or start fresh
             staff_id = context.user_data.get('current_staff_id')
             if staff_id:
-                existing_schedule = self.db.get_staff_schedule_for_week(staff_id, week_start)
-                if existing_schedule:
-                    # Convert to the format expected by show_existing_schedule
-                    schedule_list = []
-                    for day in DAYS_OF_WEEK:
-                        if day in existing_schedule:
-                            day_data = existing_schedule[day]
-                            schedule_list.append((
-                                day,
-                                day_data['is_working'],
-                                day_data['start_time'],
-                                day_data['end_time']
-                            ))
-                    return await self.show_existing_schedule(update, context, schedule_list)
-            
-            # No existing schedule, start fresh
+                return await self.open_staff_week(update, context, staff_id, week_start)
             return await self.show_schedule_input_form(update, context)
         
         return await self.show_schedule_menu(update, context)
@@ -4600,17 +5369,17 @@ class StaffSchedulerBot:
         await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
         return WEEK_SELECTION
 
-    async def show_week_selection_for_all(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show week selection options for all staff scheduling"""
+    def build_week_menu(self, today, for_all):
+        """Body and keyboard of the choose-week menu on a given day, without its title line.
+        
+        for_all is the whole-team menu (Set Schedule), otherwise the one
+        opened for a single staff member. Built once a day through render_cache.
+        """
         # Calculate three week options
-        current_week_dates, current_week_start = self.calculate_week_dates()
+        current_week_dates, current_week_start = self.calculate_week_dates(today)
         next_week_dates, next_week_start = self.calculate_week_dates(current_week_start + timedelta(days=7))
         week_after_next_dates, week_after_next_start = self.calculate_week_dates(current_week_start + timedelta(days=14))
         
-        # Get current date in Toronto timezone
-        toronto_tz = pytz.timezone('America/Toronto')
-        today = datetime.now(toronto_tz).date()
-        
         # Format date ranges
         current_range = self.format_date_range(current_week_dates)
         next_range = self.format_date_range(next_week_dates)
@@ -4625,8 +5394,7 @@ class StaffSchedulerBot:
             else:
                 current_week_remaining_days.append(day)
         
-        text = f"📅 *Choose Week for Scheduling*\n\n"
-        text += f"Select which 7-day period you want to schedule:\n\n"
+        text = f"Select which 7-day period you want to schedule:\n\n"
         
         # Current week option
         if current_week_remaining_days:
@@ -4645,17 +5413,27 @@ class StaffSchedulerBot:
         text += f"\n📅 *Week After Next ({week_after_next_range})*\n"
         text += f"   ✅ Full week available\n"
         
+        prefix = "select_week_all_" if for_all else "select_week_"
         keyboard = []
         
         # Add current week button only if there are remaining days
         if current_week_remaining_days:
-            keyboard.append([InlineKeyboardButton(f"🔄 Current Week ({current_range})", callback_data="select_week_all_current")])
+            keyboard.append([InlineKeyboardButton(f"🔄 Current Week ({current_range})", callback_data=f"{prefix}current")])
         
-        keyboard.append([InlineKeyboardButton(f"📅 Next Week ({next_range})", callback_data="select_week_all_next")])
-        keyboard.append([InlineKeyboardButton(f"📅 Week After Next ({week_after_next_range})", callback_data="select_week_all_after_next")])
-        keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main")])
+        keyboard.append([InlineKeyboardButton(f"📅 Next Week ({next_range})", callback_data=f"{prefix}next")])
+        keyboard.append([InlineKeyboardButton(f"📅 Week After Next ({week_after_next_range})", callback_data=f"{prefix}after_next")])
+        if for_all:
+            keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main")])
+        else:
+            keyboard.append([InlineKeyboardButton("🔙 Back to Staff List", callback_data="back_schedule_menu")])
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        return text, InlineKeyboardMarkup(keyboard)
+    
+    async def show_week_selection_for_all(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show week selection options for all staff scheduling"""
+        today = datetime.now(self.toronto_tz).date()
+        body, reply_markup = self.render_cache.get(self.build_week_menu, today, True)
+        text = f"📅 *Choose Week for Scheduling*\n\n" + body
         
         query = update.callback_query
         await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
@@ -4664,61 +5442,9 @@ class StaffSchedulerBot:
     async def show_week_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show week selection options before starting schedule"""
         staff_name = context.user_data.get('current_staff_name', 'Unknown')
-        
-        # Calculate three week options
-        current_week_dates, current_week_start = self.calculate_week_dates()
-        next_week_dates, next_week_start = self.calculate_week_dates(current_week_start + timedelta(days=7))
-        week_after_next_dates, week_after_next_start = self.calculate_week_dates(current_week_start + timedelta(days=14))
-        
-        # Get current date in Toronto timezone
-        toronto_tz = pytz.timezone('America/Toronto')
-        today = datetime.now(toronto_tz).date()
-        
-        # Format date ranges
-        current_range = self.format_date_range(current_week_dates)
-        next_range = self.format_date_range(next_week_dates)
-        week_after_next_range = self.format_date_range(week_after_next_dates)
-        
-        # Check which days in current week are in the past
-        current_week_past_days = []
-        current_week_remaining_days = []
-        for day, date in current_week_dates.items():
-            if date < today:
-                current_week_past_days.append(day)
-            else:
-                current_week_remaining_days.append(day)
-        
-        text = f"📅 *Choose Week for {staff_name}*\n\n"
-        text += f"Select which 7-day period you want to schedule:\n\n"
-        
-        # Current week option
-        if current_week_remaining_days:
-            text += f"🔄 *Current Week ({current_range})*\n"
-            if current_week_past_days:
-                text += f"   ⚠️ {len(current_week_past_days)} days completed, {len(current_week_remaining_days)} days remaining\n"
-            else:
-                text += f"   ✅ Full week available\n"
-        else:
-            text += f"❌ *Current Week ({current_range})*\n"
-            text += f"   ⏰ All days in the past\n"
-        
-        text += f"\n📅 *Next Week ({next_range})*\n"
-        text += f"   ✅ Full week available\n"
-        
-        text += f"\n📅 *Week After Next ({week_after_next_range})*\n"
-        text += f"   ✅ Full week available\n"
-        
-        keyboard = []
-        
-        # Add current week button only if there are remaining days
-        if current_week_remaining_days:
-            keyboard.append([InlineKeyboardButton(f"🔄 Current Week ({current_range})", callback_data="select_week_current")])
-        
-        keyboard.append([InlineKeyboardButton(f"📅 Next Week ({next_range})", callback_data="select_week_next")])
-        keyboard.append([InlineKeyboardButton(f"📅 Week After Next ({week_after_next_range})", callback_data="select_week_after_next")])
-        keyboard.append([InlineKeyboardButton("🔙 Back to Staff List", callback_data="back_schedule_menu")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        today = datetime.now(self.toronto_tz).date()
+        body, reply_markup = self.render_cache.get(self.build_week_menu, today, False)
+        text = f"📅 *Choose Week for {staff_name}*\n\n" + body
         
         query = update.callback_query
         await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
@@ -4776,6 +5502,7 @@ class StaffSchedulerBot:
             context.user_data['bulk_schedule_data'] = staff_schedules
             context.user_data['week_dates'] = next_week_dates
             context.user_data['week_start'] = next_week_start
+            context.user_data['mirror_source_week'] = current_week_start
             
             # Show preview
             text = f"🔄 *Preview: Mirror Current Week to Next Week*\n\n"
@@ -4783,12 +5510,8 @@ class StaffSchedulerBot:
             text += f"*To Week:* {next_date_range}\n\n"
             text += f"Found schedules for {len(staff_schedules)} staff members:\n\n"
             
-            for staff_name, data in staff_schedules.items():
-                schedule = data['schedule']
-                working_days = sum(1 for day_data in schedule.values() if day_data.get('is_working', True))
-                off_days = 7 - working_days
-                text += f"*{staff_name}:* {working_days} working, {off_days} off\n"
-            
+            text += await self.preview_week_changes(current_week_start, next_week_start, staff_schedules)
+            text += await self.preview_mirror(current_week_start, next_week_start)
             text += f"\nWould you like to proceed with mirroring these schedules to next week?"
             
             keyboard = [
@@ -4841,7 +5564,8 @@ class StaffSchedulerBot:
             session_id = self.db.create_scheduling_session(week_start, f"BULK_COPY_CURRENT_{update.effective_user.id}")
             
             # Save all schedules atomically
-            success, saved_count, failed_saves = self.db.save_bulk_schedules(schedules_data, week_start, f"BULK_COPY_CURRENT_{update.effective_user.id}")
+            success, saved_count, failed_saves, mirror_summary = await self.save_mirrored_week(
+                context, schedules_data, week_start, f"BULK_COPY_CURRENT_{update.effective_user.id}")
             
             if success:
                 # Complete the session
@@ -4850,7 +5574,8 @@ class StaffSchedulerBot:
                 # Show success message
                 text = "✅ *Schedules Copied Successfully!*\n\n"
                 text += f"📅 *Next Week:* {self.format_date_range(context.user_data.get('week_dates', {}))}\n"
-                text += f"👥 *Staff Scheduled:* {saved_count}\n\n"
+                text += f"👥 *Staff Scheduled:* {saved_count}\n"
+                text += f"{mirror_summary}\n"
                 
                 if warnings:
                     text += "⚠️ *Warnings:*\n"
@@ -5042,7 +5767,7 @@ class StaffSchedulerBot:
                     time_display = "Off"
                 
                 button_text = f"{staff_name}: {time_display}"
-                keyboard.append([InlineKeyboardButton(button_text, callback_data=f"edit_staff_{staff_name}")])
+                keyboard.append([InlineKeyboardButton(button_text, callback_data=self.callback_data(context, EDIT_STAFF, staff_name))])
             
             # Add navigation buttons
             keyboard.append([
@@ -5095,8 +5820,8 @@ class StaffSchedulerBot:
             text += "What would you like to do?"
             
             keyboard = [
-                [InlineKeyboardButton("🚫 Set Off", callback_data=f"set_off_{staff_name}")],
-                [InlineKeyboardButton("⏰ Edit Times", callback_data=f"edit_times_{staff_name}")],
+                [InlineKeyboardButton("🚫 Set Off", callback_data=self.callback_data(context, SET_OFF, staff_name))],
+                [InlineKeyboardButton("⏰ Edit Times", callback_data=self.callback_data(context, EDIT_TIMES, staff_name))],
                 [InlineKeyboardButton("✅ Keep Current", callback_data="save_and_continue")],
                 [
                     InlineKeyboardButton("🔙 Back to Staff", callback_data=f"edit_day_{day}"),
@@ -5175,52 +5900,12 @@ class StaffSchedulerBot:
             text += f"*Current:* {current_start}-{current_end}\n\n"
             text += "Select new start and end times:"
             
-            # Time options (same as regular schedule interface)
-            start_times = ["09:45", "10:00", "11:00", "12:00", "13:00", "15:00", "15:30", "17:00", "18:00"]
-            end_times = ["14:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
-            
-            keyboard = []
-            
-            # Start Time Section Header
-            keyboard.append([InlineKeyboardButton("🟩 Start Time", callback_data="header_start")])
-            
-            # Start time options (2 per row for better button display)
-            for i in range(0, len(start_times), 2):
-                row = []
-                for j in range(2):
-                    if i + j < len(start_times):
-                        time = start_times[i + j]
-                        if time == current_start:
-                            row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"edit_start_{time}"))
-                        else:
-                            row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"edit_start_{time}"))
-                if row:
-                    keyboard.append(row)
-            
-            # End Time Section Header
-            keyboard.append([InlineKeyboardButton("🔺 End Time", callback_data="header_end")])
-            
-            # End time options (2 per row for better button display)
-            for i in range(0, len(end_times), 2):
-                row = []
-                for j in range(2):
-                    if i + j < len(end_times):
-                        time = end_times[i + j]
-                        if time == current_end:
-                            row.append(InlineKeyboardButton(f"✅ {time}", callback_data=f"edit_end_{time}"))
-                        else:
-                            row.append(InlineKeyboardButton(f"🕐 {time}", callback_data=f"edit_end_{time}"))
-                if row:
-                    keyboard.append(row)
-            
-            # Action buttons
-            keyboard.append([
-                InlineKeyboardButton("✅ Confirm Times", callback_data=f"confirm_times_{staff_name}"),
-                InlineKeyboardButton("🔙 Back to Options", callback_data=f"edit_staff_{staff_name}")
-            ])
-            keyboard.append([InlineKeyboardButton("🚫 Cancel", callback_data="bulk_schedule")])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            # Prebuilt per selection; the buttons of one staff member always carry the same tokens
+            reply_markup = self.render_cache.get(time_picker, "edit_start_", "edit_end_", current_start, current_end, (
+                (("✅ Confirm Times", self.callback_data(context, CONFIRM_TIMES, staff_name)),
+                 ("🔙 Back to Options", self.callback_data(context, EDIT_STAFF, staff_name))),
+                (("🚫 Cancel", "bulk_schedule"),)
+            ))
             await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
             
         except Exception as e:
@@ -5349,39 +6034,36 @@ class StaffSchedulerBot:
             week_start = context.user_data.get('edit_week_start')
             edit_mode = context.user_data.get('edit_mode', 'previous_week')
             
-            if not editable_schedules or not week_dates:
+            if not editable_schedules or not week_dates or not week_start:
                 await update.callback_query.edit_message_text(
                     "❌ Error: No schedule data to save.",
                     reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="bulk_schedule")]])
                 )
                 return MAIN_MENU
             
-            # Save all schedules to the target week
+            # Diff the edited week against the target week, then write only the days that differ
+            target_week = await asyncio.to_thread(self.db.get_current_week_schedules, week_start)
+            diff = [cell for cell in diff_grids(pack_rows(target_week), pack_editable(editable_schedules))
+                    if cell[2] != REMOVED]
+            schedules_data = changed_schedules(editable_schedules, diff)
             saved_count = 0
             failed_saves = []
-            
-            for staff_name, staff_data in editable_schedules.items():
-                staff_id = staff_data.get('staff_id')
-                schedule = staff_data.get('schedule', {})
-                
-                for day, day_schedule in schedule.items():
-                    try:
-                        is_working = day_schedule.get('is_working', False)
-                        start_time = day_schedule.get('start_time', '')
-                        end_time = day_schedule.get('end_time', '')
-                        schedule_date = day_schedule.get('date')
-                        
-                        if schedule_date:
-                            self.db.save_schedule(staff_id, day, is_working, start_time, end_time, schedule_date)
-                            saved_count += 1
-                    except Exception as e:
-                        failed_saves.append((staff_name, str(e)))
+            if schedules_data:
+                success, saved_count, failed = self.db.save_bulk_schedules(
+                    schedules_data, week_start, f"BULK_EDIT_{update.effective_user.id}")
+                if not success:
+                    failed_saves = [tuple(failure.split(": ", 1)) if ": " in failure else (failure, "")
+                                    for failure in failed] or [("All staff", "bulk save rolled back")]
+                    saved_count = 0
             
             # Show results
             if not failed_saves:
+                names = {data['staff_id']: staff_name for staff_name, data in editable_schedules.items()}
                 text = f"✅ *Mirroring Complete!*\n\n"
-                text += f"Successfully saved {saved_count} schedules to the target week.\n\n"
-                text += f"All edited schedules have been applied."
+                text += f"Saved {saved_count} changed days to the target week.\n"
+                if diff:
+                    text += "\n" + "\n".join(format_diff(diff, names, DIFF_PREVIEW_LINES)) + "\n"
+                text += f"\nAll edited schedules have been applied."
                 
                 keyboard = [
                     [InlineKeyboardButton("📊 View Schedules", callback_data="view_schedules")],
@@ -0,0 +1,161 @@
+"""
+Database-backed persistence for conversation states, per-admin user_data and bot_data
+"""
+
+import json
+import pickle
+import asyncio
+import logging
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+USER_DATA_KIND = 'user_data'
+BOT_DATA_KIND = 'bot_data'
+CONVERSATION_KIND_PREFIX = 'conversation:'
+
+
+class DatabasePersistence(BasePersistence):
+    """Store ConversationHandler states, user_data and bot_data in the bot_state table.
+
+    Works with any database manager that has load_bot_state/save_bot_state,
+    so it follows the configured backend (SQLite file locally, MySQL or
+    PostgreSQL in production). Writes are write-behind: PTB hands over the
+    changes every update_interval seconds and they are written as one batch.
+    bot_data is stored under instance_name, so webhook worker processes
+    sharing one database keep separate copies.
+    """
+
+    def __init__(self, db, update_interval=10, instance_name='main'):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.db = db
+        self.instance_name = instance_name
+        self._last_bot_data = None
+        self._pending = {}
+        self._flush_task = None
+        self._write_lock = asyncio.Lock()
+        self.batches_written = 0
+        self.rows_written = 0
+
+    # ------------------------------------------------------------ loading
+
+    async def get_user_data(self):
+        """All persisted user_data, keyed by Telegram user id"""
+        rows = await asyncio.to_thread(self.db.load_bot_state, USER_DATA_KIND)
+        user_data = {}
+        for state_key, data in rows.items():
+            try:
+                user_data[int(state_key)] = pickle.loads(data)
+            except Exception as e:
+                logger.warning(f"⚠️ Skipping unreadable user_data for {state_key}: {e}")
+        return user_data
+
+    async def get_conversations(self, name):
+        """Persisted states of one ConversationHandler"""
+        rows = await asyncio.to_thread(self.db.load_bot_state, CONVERSATION_KIND_PREFIX + name)
+        conversations = {}
+        for state_key, data in rows.items():
+            try:
+                conversations[tuple(json.loads(state_key))] = pickle.loads(data)
+            except Exception as e:
+                logger.warning(f"⚠️ Skipping unreadable conversation state {state_key}: {e}")
+        return conversations
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        """Persisted bot_data of this instance"""
+        rows = await asyncio.to_thread(self.db.load_bot_state, BOT_DATA_KIND)
+        data = rows.get(self.instance_name)
+        if data is None:
+            return {}
+        try:
+            self._last_bot_data = data
+            return pickle.loads(data)
+        except Exception as e:
+            logger.warning(f"⚠️ Skipping unreadable bot_data: {e}")
+            return {}
+
+    async def get_callback_data(self):
+        return None
+
+    # ------------------------------------------------------------ write-behind
+
+    def _stage(self, kind, state_key, data):
+        """Queue a row for the next batch and make sure a flush is scheduled"""
+        self._pending[(kind, state_key)] = data
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_batch())
+
+    async def _flush_batch(self):
+        """Write everything staged so far in one transaction"""
+        # Let the rest of this persistence run stage its rows first
+        await asyncio.sleep(0)
+        async with self._write_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            items = [(kind, state_key, data) for (kind, state_key), data in batch.items()]
+            saved = await asyncio.to_thread(self.db.save_bot_state, items)
+            if saved:
+                self.batches_written += 1
+                self.rows_written += len(items)
+            else:
+                # Keep the rows for the next run unless newer values arrived meanwhile
+                for key, data in batch.items():
+                    self._pending.setdefault(key, data)
+
+    async def update_user_data(self, user_id, data):
+        self._stage(USER_DATA_KIND, str(user_id), pickle.dumps(data))
+
+    async def drop_user_data(self, user_id):
+        self._stage(USER_DATA_KIND, str(user_id), None)
+
+    async def update_conversation(self, name, key, new_state):
+        data = None if new_state is None else pickle.dumps(new_state)
+        self._stage(CONVERSATION_KIND_PREFIX + name, json.dumps(list(key)), data)
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def update_bot_data(self, data):
+        # PTB hands over bot_data on every run - only write it when it changed
+        pickled = pickle.dumps(data)
+        if pickled != self._last_bot_data:
+            self._last_bot_data = pickled
+            self._stage(BOT_DATA_KIND, self.instance_name, pickled)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        """Write any staged rows (called by PTB on shutdown)"""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush_batch()
+
+    def metrics(self):
+        """Write-behind counters for /metrics"""
+        return {
+            'pending_rows': len(self._pending),
+            'batches_written': self.batches_written,
+            'rows_written': self.rows_written,
+            'update_interval': self.update_interval,
+        }
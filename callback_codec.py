@@ -0,0 +1,104 @@
+"""
+Compact callback_data - two-character action codes with packed payloads and a server-side token table
+"""
+
+import base64
+import hashlib
+from datetime import date
+from collections import OrderedDict
+
+CALLBACK_PREFIX = '~'  # No plain callback_data starts with this
+MAX_CALLBACK_BYTES = 64  # Telegram's limit on callback_data
+
+# Action codes, routed by StaffSchedulerBot.callback_routes
+QUICK_EDIT = 'qe'
+VIEW_WEEK = 'vw'
+EDIT_STAFF = 'es'
+SET_OFF = 'so'
+EDIT_TIMES = 'et'
+CONFIRM_TIMES = 'ct'
+
+_INT, _DATE, _TOKEN = 'i', 'd', 't'
+
+
+def _pack(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _unpack(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _pack_int(value):
+    return _pack(value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+
+
+class CallbackTokens:
+    """Payloads that do not fit in callback_data (staff names, free text), by short token.
+
+    Kept in bot_data next to the UpdateDeduplicator, so with persistence the
+    buttons of recent messages keep working after a restart; webhook workers
+    send each chat to one process, so a chat always finds its tokens. A token
+    is a digest of its payload: redrawing a keyboard reuses the same tokens
+    instead of growing the table.
+    """
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self._payloads = OrderedDict()
+
+    def token(self, payload):
+        """The token for payload, remembered until capacity newer ones push it out"""
+        token = _pack(hashlib.blake2b(repr(payload).encode(), digest_size=9).digest())
+        self._payloads[token] = payload
+        self._payloads.move_to_end(token)
+        while len(self._payloads) > self.capacity:
+            self._payloads.popitem(last=False)
+        return token
+
+    def resolve(self, token):
+        """The payload behind token; KeyError once it has been pushed out"""
+        return self._payloads[token]
+
+    def __len__(self):
+        return len(self._payloads)
+
+
+def is_compact(data):
+    """True for callback_data made by encode_callback"""
+    return bool(data) and data.startswith(CALLBACK_PREFIX)
+
+
+def encode_callback(action, payload, tokens):
+    """'~' + action code + payload: ints and dates packed inline, anything else as a token"""
+    if type(payload) is int and payload >= 0:
+        data = f"{CALLBACK_PREFIX}{action}{_INT}{_pack_int(payload)}"
+    elif type(payload) is date:
+        data = f"{CALLBACK_PREFIX}{action}{_DATE}{_pack_int(payload.toordinal())}"
+    else:
+        data = f"{CALLBACK_PREFIX}{action}{_TOKEN}{tokens.token(payload)}"
+    if len(data.encode()) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"Callback action '{action}' is too long for callback_data")
+    return data
+
+
+def decode_callback(data, tokens):
+    """(action, payload) from encode_callback's output.
+
+    Raises ValueError for data it did not make and KeyError for a token no
+    longer in the table.
+    """
+    if not is_compact(data) or len(data) < 5:
+        raise ValueError(f"Not a compact callback: {data!r}")
+    action, kind, body = data[1:3], data[3], data[4:]
+    if kind == _TOKEN:
+        return action, tokens.resolve(body)
+    try:
+        value = int.from_bytes(_unpack(body), 'big')
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Malformed callback payload: {data!r}") from e
+    if kind == _INT:
+        return action, value
+    if kind == _DATE:
+        return action, date.fromordinal(value)
+    raise ValueError(f"Unknown callback payload kind: {data!r}")
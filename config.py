@@ -9,6 +9,30 @@ BOT_TOKEN = os.getenv('BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
 # Webhook Configuration (for production)
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Set this in production (e.g., Railway)
 PORT = int(os.getenv('PORT', 8000))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))  # Parallel webhook deliveries from Telegram (1-100)
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')  # Optional: checked against X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 1))  # >1: route webhook updates by chat to this many bot processes
+HTTP_KEEP_ALIVE_TIMEOUT = float(os.getenv('HTTP_KEEP_ALIVE_TIMEOUT', 75))  # Idle seconds before a connection to PORT is closed
+HTTP_REQUEST_TIMEOUT = float(os.getenv('HTTP_REQUEST_TIMEOUT', 10))  # Seconds a client has to send a full request
+ALLOWED_UPDATES = ['message', 'callback_query', 'inline_query']  # Update types every webhook and polling registration asks for
+
+# Bot API HTTP Client Configuration
+BOT_API_POOL_SIZE = int(os.getenv('BOT_API_POOL_SIZE', 64))  # Connections for outgoing Bot API calls
+BOT_API_CONNECT_TIMEOUT = float(os.getenv('BOT_API_CONNECT_TIMEOUT', 5.0))
+BOT_API_READ_TIMEOUT = float(os.getenv('BOT_API_READ_TIMEOUT', 10.0))
+BOT_API_WRITE_TIMEOUT = float(os.getenv('BOT_API_WRITE_TIMEOUT', 10.0))
+BOT_API_MEDIA_WRITE_TIMEOUT = float(os.getenv('BOT_API_MEDIA_WRITE_TIMEOUT', 30.0))  # PDF uploads
+BOT_API_POOL_TIMEOUT = float(os.getenv('BOT_API_POOL_TIMEOUT', 5.0))  # Wait for a free connection
+BOT_API_HTTP2 = os.getenv('BOT_API_HTTP2', 'false').lower() == 'true'  # Needs the h2 package
+GET_UPDATES_POOL_SIZE = int(os.getenv('GET_UPDATES_POOL_SIZE', 2))  # Separate pool so polling never waits on replies
+GET_UPDATES_READ_TIMEOUT = float(os.getenv('GET_UPDATES_READ_TIMEOUT', 5.0))  # On top of the long-poll timeout
+
+# Outgoing Message Queue Configuration (0 disables a limit)
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', 30))  # Messages/edits per second across all chats
+OUTBOUND_GLOBAL_BURST = int(os.getenv('OUTBOUND_GLOBAL_BURST', 30))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', 3))  # Messages/edits per second in one chat
+OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', 10))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', 3))  # RetryAfter retries before giving up
 
 # Admin Configuration
 ADMIN_IDS_STR = os.getenv('ADMIN_IDS', '')
@@ -21,6 +45,37 @@ if ADMIN_IDS_STR:
         except ValueError:
             print(f"Warning: Invalid admin ID '{admin_id}'")
 
+# Update Processing Configuration
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', 32))  # Updates handled at once (same chat stays ordered)
+UPDATE_DEDUP_WINDOW = int(os.getenv('UPDATE_DEDUP_WINDOW', 5000))  # Recent update ids remembered to drop redeliveries (0 disables)
+
+# Persistence Configuration
+PERSISTENCE_ENABLED = os.getenv('PERSISTENCE_ENABLED', 'true').lower() == 'true'  # Keep wizard state across restarts
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', 10))  # Seconds between write-behind batches
+DROP_PENDING_UPDATES = os.getenv('DROP_PENDING_UPDATES', 'false').lower() == 'true'  # Discard updates queued while down
+
+# Audit Log Configuration
+AUDIT_WRITE_BEHIND = os.getenv('AUDIT_WRITE_BEHIND', 'false').lower() == 'true'  # Log changes to an outbox, copy to schedule_changes in the background
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 2))  # Seconds between background audit flushes
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))  # Outbox rows moved (or rows archived) per transaction
+AUDIT_RETENTION_DAYS = int(os.getenv('AUDIT_RETENTION_DAYS', 0))  # Archive audit rows older than this (0 keeps everything in the database)
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', 'audit_archive')  # Monthly gzip'd JSON lines segments (use a persistent volume)
+AUDIT_ARCHIVE_INTERVAL_HOURS = float(os.getenv('AUDIT_ARCHIVE_INTERVAL_HOURS', 24))  # How often old audit rows are archived
+WEEK_SNAPSHOT_EVERY = int(os.getenv('WEEK_SNAPSHOT_EVERY', 50))  # Changes to a week before its state is snapshotted for replay (0 disables)
+WEEK_SNAPSHOT_INTERVAL_MINUTES = float(os.getenv('WEEK_SNAPSHOT_INTERVAL_MINUTES', 60))  # How often weeks are checked for snapshots
+SCHEDULES_PAGE_SIZE = int(os.getenv('SCHEDULES_PAGE_SIZE', 10))  # Staff per page of the schedules overview
+SCHEDULE_VIEW_CACHE_SECONDS = float(os.getenv('SCHEDULE_VIEW_CACHE_SECONDS', 60))  # Longest a cached overview fragment is reused (writes from other processes)
+INLINE_CACHE_SECONDS = int(os.getenv('INLINE_CACHE_SECONDS', 30))  # cache_time of inline answers: Telegram repeats them without asking the bot
+INLINE_RESULTS_LIMIT = int(os.getenv('INLINE_RESULTS_LIMIT', 20))  # Results per inline answer (Telegram allows 50)
+STAFF_CACHE_SECONDS = float(os.getenv('STAFF_CACHE_SECONDS', 300))  # Longest a staff member's /myshifts or /week answer is reused (writes from other processes)
+STAFF_RATE = float(os.getenv('STAFF_RATE', 0.2))  # Staff commands per second per user once the burst is used up (0 disables the limit)
+STAFF_BURST = int(os.getenv('STAFF_BURST', 5))  # Staff commands a user can send back to back
+STAFF_LINK_HOURS = int(os.getenv('STAFF_LINK_HOURS', 72))  # How long a /link_staff link can be used
+NOTIFY_INTERVAL = float(os.getenv('NOTIFY_INTERVAL', 30))  # Seconds between staff notification runs (0 disables notifications)
+NOTIFY_WINDOW_SECONDS = int(os.getenv('NOTIFY_WINDOW_SECONDS', 300))  # Quiet time after a week's last edit before its staff are notified
+NOTIFY_RATE = float(os.getenv('NOTIFY_RATE', 5))  # Staff notifications sent per second, leaving room for admin traffic
+NOTIFY_BATCH = int(os.getenv('NOTIFY_BATCH', 200))  # Most notifications sent per run
+
 # Time Constraints
 MIN_START_TIME = "09:45"
 MAX_END_TIME = "21:00"
@@ -36,6 +91,7 @@ LOG_FILE = os.getenv('LOG_FILE')  # Optional: set to enable file logging
 # Scheduling Configuration
 MAX_BULK_OPERATIONS = int(os.getenv('MAX_BULK_OPERATIONS', 50))  # Prevent abuse
 SESSION_TIMEOUT_HOURS = int(os.getenv('SESSION_TIMEOUT_HOURS', 24))  # Auto-cleanup old sessions
+SESSION_CLEANUP_INTERVAL_MINUTES = int(os.getenv('SESSION_CLEANUP_INTERVAL_MINUTES', 30))  # How often idle sessions are evicted
 CONFLICT_WARNING_THRESHOLD = float(os.getenv('CONFLICT_WARNING_THRESHOLD', 0.5))  # 50% staff off = warning
 
 # Database Configuration
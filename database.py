@@ -1,15 +1,29 @@
 import sqlite3
 import json
 import logging
+import threading
 from datetime import datetime, timedelta
-from config import DATABASE_PATH
+from config import DATABASE_PATH, DAYS_OF_WEEK, AUDIT_WRITE_BEHIND, AUDIT_BATCH_SIZE, STAFF_LINK_HOURS
+from validators import ScheduleValidator
+from audit_archive import AuditArchive
+from week_diff import diff_rows
+from notifications import changed_weeks
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Mirror plans: a mirrored day m and the target week's row t for the same staff/day/date
+MIRROR_SAME_ROW = 't.staff_id = m.staff_id AND t.day_of_week = m.day_of_week AND t.schedule_date = m.schedule_date'
+MIRROR_UNCHANGED = ("t.is_working = m.is_working AND COALESCE(t.start_time, '') = COALESCE(m.start_time, '') "
+                    "AND COALESCE(t.end_time, '') = COALESCE(m.end_time, '')")
+
 class DatabaseManager:
     def __init__(self):
         self.db_path = DATABASE_PATH
+        self.audit_write_behind = AUDIT_WRITE_BEHIND
+        self.audit_archive = AuditArchive()
+        self.change_listeners = []  # Called after each commit with the staff ids it changed (None: possibly anyone)
+        self._uncommitted = threading.local()  # Per thread: (cursor, staff ids its open transaction changed)
         self.init_database()
     
     def init_database(self):
@@ -38,6 +52,7 @@ class DatabaseManager:
                 end_time TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                version INTEGER NOT NULL DEFAULT 1,
                 FOREIGN KEY (staff_id) REFERENCES staff (id),
                 UNIQUE(staff_id, day_of_week, schedule_date)
             )
@@ -54,16 +69,140 @@ class DatabaseManager:
                 new_data TEXT,
                 changed_by TEXT,
                 changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                schedule_date DATE,
+                FOREIGN KEY (staff_id) REFERENCES staff (id)
+            )
+        ''')
+        
+        # Audit outbox: with AUDIT_WRITE_BEHIND a transaction records its changes
+        # here as one row, and drain_audit_outbox moves them to schedule_changes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS audit_outbox (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Per month/staff/action counts of audit rows moved to the archive
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schedule_changes_summary (
+                month TEXT NOT NULL,
+                staff_id INTEGER NOT NULL,
+                staff_name TEXT,
+                action TEXT NOT NULL,
+                change_count INTEGER NOT NULL,
+                first_changed_at TIMESTAMP,
+                last_changed_at TIMESTAMP,
+                PRIMARY KEY (month, staff_id, action)
+            )
+        ''')
+        
+        # Replay snapshots: a week's schedules after every change up to last_change_id
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS week_snapshots (
+                id INTEGER PRIMARY KEY,
+                week_start DATE NOT NULL,
+                last_change_id INTEGER NOT NULL,
+                covers_until TIMESTAMP,
+                state TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Scheduling sessions table for tracking bulk operations
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduling_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                week_start_date DATE NOT NULL,
+                status TEXT DEFAULT 'IN_PROGRESS',
+                created_by TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                completed_at TIMESTAMP,
+                notes TEXT
+            )
+        ''')
+        
+        # Persisted bot state (conversation states, per-admin wizard data)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bot_state (
+                kind TEXT NOT NULL,
+                state_key TEXT NOT NULL,
+                data BLOB,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (kind, state_key)
+            )
+        ''')
+        
+        # Telegram accounts linked to staff members, for the read-only staff commands
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS staff_links (
+                telegram_user_id INTEGER PRIMARY KEY,
+                staff_id INTEGER UNIQUE NOT NULL,
+                linked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (staff_id) REFERENCES staff (id)
             )
         ''')
         
+        # Link codes already redeemed, each bound to the account that used it first
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS staff_link_codes (
+                code TEXT PRIMARY KEY,
+                telegram_user_id INTEGER NOT NULL,
+                redeemed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Staff notification queue: a row per staff member and week, due while pending > 0
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS staff_notifications (
+                staff_id INTEGER NOT NULL,
+                week_start DATE NOT NULL,
+                pending INTEGER NOT NULL DEFAULT 0,
+                changed_at TIMESTAMP,
+                sent_state TEXT,
+                sent_at TIMESTAMP,
+                PRIMARY KEY (staff_id, week_start)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_staff_notifications_due ON staff_notifications(pending, changed_at)')
+        # Only linked staff are queued; drop rows older databases kept for the rest
+        cursor.execute('DELETE FROM staff_notifications WHERE staff_id NOT IN (SELECT staff_id FROM staff_links)')
+        
         # Add date column if it doesn't exist (for existing databases)
         try:
             cursor.execute('ALTER TABLE schedules ADD COLUMN schedule_date DATE')
         except sqlite3.OperationalError:
             pass  # Column already exists
         
+        # Row version for optimistic concurrency (bumped on every write)
+        try:
+            cursor.execute('ALTER TABLE schedules ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
+        # Date of the schedule an audit row changed, so a week's changes can be replayed
+        try:
+            cursor.execute('ALTER TABLE schedule_changes ADD COLUMN schedule_date DATE')
+            cursor.execute('''
+                UPDATE schedule_changes
+                SET schedule_date = NULLIF(json_extract(COALESCE(new_data, old_data), '$.schedule_date'), '')
+                WHERE action IN ('ADD_SCHEDULE', 'UPDATE_SCHEDULE', 'CREATE_SCHEDULE')
+                  AND json_valid(COALESCE(new_data, old_data))
+            ''')
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
+        # Week reads and mirrors select schedules by date range
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_schedules_date ON schedules(schedule_date)')
+        
+        # Audit log indexes for keyset pages ordered by (changed_at, id), overall, per staff and per action
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_schedule_changes_time ON schedule_changes(changed_at, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_schedule_changes_staff_time ON schedule_changes(staff_id, changed_at, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_schedule_changes_action_time ON schedule_changes(action, changed_at, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_schedule_changes_schedule_date ON schedule_changes(schedule_date, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_week_snapshots_week ON week_snapshots(week_start, last_change_id)')
+        
         conn.commit()
         conn.close()
         logger.info("Database initialized successfully")
@@ -77,12 +216,10 @@ class DatabaseManager:
             staff_id = cursor.lastrowid
             
             # Log the staff addition
-            cursor.execute('''
-                INSERT INTO schedule_changes (staff_id, action, new_data, changed_by)
-                VALUES (?, 'ADD_STAFF', ?, 'ADMIN')
-            ''', (staff_id, name))
+            self._log_changes(cursor, [(staff_id, 'ADD_STAFF', None, None, name, 'ADMIN')])
             
             conn.commit()
+            self._notify_committed(cursor)
             conn.close()
             logger.info(f"Staff member '{name}' added with ID {staff_id}")
             return staff_id
@@ -101,18 +238,18 @@ class DatabaseManager:
         staff_name = staff_name[0] if staff_name else "Unknown"
         
         # Log the staff removal
-        cursor.execute('''
-            INSERT INTO schedule_changes (staff_id, action, old_data, changed_by)
-            VALUES (?, 'REMOVE_STAFF', ?, 'ADMIN')
-        ''', (staff_id, staff_name))
+        self._log_changes(cursor, [(staff_id, 'REMOVE_STAFF', None, staff_name, None, 'ADMIN')])
         
-        # Remove schedules first
+        # Remove schedules, the Telegram link and queued notifications first
         cursor.execute('DELETE FROM schedules WHERE staff_id = ?', (staff_id,))
+        cursor.execute('DELETE FROM staff_links WHERE staff_id = ?', (staff_id,))
+        cursor.execute('DELETE FROM staff_notifications WHERE staff_id = ?', (staff_id,))
         
         # Remove staff
         cursor.execute('DELETE FROM staff WHERE id = ?', (staff_id,))
         
         conn.commit()
+        self._notify_committed(cursor)
         conn.close()
         logger.info(f"Staff member '{staff_name}' (ID: {staff_id}) removed")
     
@@ -125,6 +262,41 @@ class DatabaseManager:
         conn.close()
         return staff
     
+    def get_staff_page(self, after=None, limit=10):
+        """One page of staff by name with keyset pagination: (rows, next_cursor).
+        
+        after is the cursor returned with the previous page (the last name on it;
+        names are unique), so every page is one range scan of the name index.
+        next_cursor is None on the last page.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        if after is None:
+            cursor.execute('SELECT id, name FROM staff ORDER BY name LIMIT ?', (limit + 1,))
+        else:
+            cursor.execute('SELECT id, name FROM staff WHERE name > ? ORDER BY name LIMIT ?', (after, limit + 1))
+        rows = cursor.fetchall()
+        conn.close()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1][1]
+        return rows, None
+    
+    def get_week_schedules_for_staff(self, staff_ids, week_start):
+        """(staff_id, day_of_week, is_working, start_time, end_time) rows of one week for some staff"""
+        if not staff_ids:
+            return []
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT staff_id, day_of_week, is_working, start_time, end_time
+            FROM schedules
+            WHERE staff_id IN ({', '.join('?' * len(staff_ids))}) AND schedule_date BETWEEN ? AND ?
+        ''', list(staff_ids) + [week_start.strftime('%Y-%m-%d'), (week_start + timedelta(days=6)).strftime('%Y-%m-%d')])
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
     def get_staff_by_id(self, staff_id):
         """Get staff member by ID"""
         conn = sqlite3.connect(self.db_path)
@@ -134,8 +306,99 @@ class DatabaseManager:
         conn.close()
         return staff
     
+    def link_staff_user(self, staff_id, telegram_user_id, changed_by="STAFF", code=None):
+        """Link a Telegram account to a staff member, replacing either one's previous link.
+        
+        code, the link code redeemed, is bound to the first account that uses
+        it: False, with nothing changed, if another account already has.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        if code is not None:
+            # Codes redeemed longer ago than a link lasts have expired anyway
+            cursor.execute("DELETE FROM staff_link_codes WHERE redeemed_at < datetime('now', ?)", (f'-{STAFF_LINK_HOURS} hours',))
+            cursor.execute('INSERT OR IGNORE INTO staff_link_codes (code, telegram_user_id) VALUES (?, ?)', (code, telegram_user_id))
+            cursor.execute('SELECT telegram_user_id FROM staff_link_codes WHERE code = ?', (code,))
+            if cursor.fetchone()[0] != telegram_user_id:
+                conn.rollback()
+                conn.close()
+                logger.warning(f"Link code for staff member {staff_id} reused by Telegram user {telegram_user_id}")
+                return False
+        cursor.execute('DELETE FROM staff_links WHERE telegram_user_id = ? OR staff_id = ?', (telegram_user_id, staff_id))
+        # A new account has been sent nothing yet; an old one is no longer notified
+        cursor.execute('DELETE FROM staff_notifications WHERE staff_id NOT IN (SELECT staff_id FROM staff_links)')
+        cursor.execute('INSERT INTO staff_links (telegram_user_id, staff_id) VALUES (?, ?)', (telegram_user_id, staff_id))
+        self._log_changes(cursor, [(staff_id, 'LINK_STAFF', None, None, {'telegram_user_id': telegram_user_id}, changed_by)])
+        conn.commit()
+        self._notify_committed(cursor)
+        conn.close()
+        logger.info(f"Staff member {staff_id} linked to Telegram user {telegram_user_id}")
+        return True
+    
+    def unlink_staff_user(self, staff_id, changed_by="ADMIN"):
+        """Remove a staff member's Telegram link: True if there was one"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT telegram_user_id FROM staff_links WHERE staff_id = ?', (staff_id,))
+        link = cursor.fetchone()
+        if link:
+            cursor.execute('DELETE FROM staff_links WHERE staff_id = ?', (staff_id,))
+            cursor.execute('DELETE FROM staff_notifications WHERE staff_id = ?', (staff_id,))
+            self._log_changes(cursor, [(staff_id, 'UNLINK_STAFF', None, {'telegram_user_id': link[0]}, None, changed_by)])
+        conn.commit()
+        self._notify_committed(cursor)
+        conn.close()
+        return link is not None
+    
+    def get_linked_staff(self, telegram_user_id):
+        """(staff_id, name) of the staff member a Telegram account is linked to, or None"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT s.id, s.name FROM staff_links l JOIN staff s ON s.id = l.staff_id
+            WHERE l.telegram_user_id = ?
+        ''', (telegram_user_id,))
+        staff = cursor.fetchone()
+        conn.close()
+        return staff
+    
+    def get_due_notifications(self, window_seconds, min_week, limit):
+        """Linked staff weeks from min_week on, unchanged for window_seconds and not yet notified:
+        [(staff_id, name, telegram_user_id, week_start, pending, sent_state)]"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT n.staff_id, s.name, l.telegram_user_id, n.week_start, n.pending, n.sent_state
+            FROM staff_notifications n
+            JOIN staff_links l ON l.staff_id = n.staff_id
+            JOIN staff s ON s.id = n.staff_id
+            WHERE n.pending > 0 AND n.changed_at <= datetime('now', ?) AND n.week_start >= ?
+            ORDER BY n.changed_at
+            LIMIT ?
+        ''', (f'-{int(window_seconds)} seconds', min_week.strftime('%Y-%m-%d'), limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def finish_notification(self, staff_id, week_start, pending, sent_state=None):
+        """Record a delivered (or skipped) notification; changes made since it was read stay pending"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE staff_notifications
+            SET pending = MAX(pending - ?, 0), sent_state = COALESCE(?, sent_state),
+                sent_at = CASE WHEN ? IS NULL THEN sent_at ELSE CURRENT_TIMESTAMP END
+            WHERE staff_id = ? AND week_start = ?
+        ''', (pending, sent_state, sent_state, staff_id, week_start.strftime('%Y-%m-%d')))
+        conn.commit()
+        conn.close()
+    
     def save_schedule(self, staff_id, day_of_week, is_working, start_time=None, end_time=None, schedule_date=None, changed_by="ADMIN"):
         """Save or update a schedule for a staff member"""
+        # The bot passes datetime.date objects; store and log them as ISO strings
+        if hasattr(schedule_date, 'strftime'):
+            schedule_date = schedule_date.strftime('%Y-%m-%d')
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -143,8 +406,8 @@ class DatabaseManager:
         cursor.execute('''
             SELECT is_working, start_time, end_time 
             FROM schedules 
-            WHERE staff_id = ? AND day_of_week = ?
-        ''', (staff_id, day_of_week))
+            WHERE staff_id = ? AND day_of_week = ? AND schedule_date IS ?
+        ''', (staff_id, day_of_week, schedule_date))
         existing = cursor.fetchone()
         
         # Prepare new data for logging
@@ -169,17 +432,18 @@ class DatabaseManager:
         
         cursor.execute('''
             INSERT OR REPLACE INTO schedules 
-            (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (staff_id, day_of_week, schedule_date, is_working, start_time, end_time))
+            (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at, version)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, COALESCE((
+                SELECT version FROM schedules WHERE staff_id = ? AND day_of_week = ? AND schedule_date IS ?
+            ), 0) + 1)
+        ''', (staff_id, day_of_week, schedule_date, is_working, start_time, end_time,
+              staff_id, day_of_week, schedule_date))
         
         # Log the schedule change
-        cursor.execute('''
-            INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (staff_id, action, day_of_week, json.dumps(old_data) if old_data else None, json.dumps(new_data), changed_by))
+        self._log_changes(cursor, [(staff_id, action, day_of_week, old_data, new_data, changed_by)])
         
         conn.commit()
+        self._notify_committed(cursor)
         conn.close()
         
         # Get staff name for logging
@@ -190,6 +454,8 @@ class DatabaseManager:
             logger.info(f"Schedule updated for '{staff_name}' on {day_of_week}")
         else:
             logger.info(f"Schedule added for '{staff_name}' on {day_of_week}")
+        
+        return True
     
     def get_staff_schedule(self, staff_id):
         """Get complete schedule for a staff member"""
@@ -285,6 +551,82 @@ class DatabaseManager:
             conn.close()
             raise Exception(f"Error getting current week schedules: {e}")
     
+    def find_nearest_populated_week(self, anchor, direction='back'):
+        """Sunday of the closest week with schedules, at or before anchor's week ('back')
+        or at or after it ('forward'); None when there is none.
+        
+        A single MIN/MAX on idx_schedules_date, instead of fetching whole weeks to test them.
+        """
+        if direction not in ('back', 'forward'):
+            raise ValueError(f"Unknown direction '{direction}' (use 'back' or 'forward')")
+        week_start = anchor - timedelta(days=(anchor.weekday() + 1) % 7)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        if direction == 'back':
+            cursor.execute('SELECT MAX(schedule_date) FROM schedules WHERE schedule_date < ?',
+                           ((week_start + timedelta(days=7)).strftime('%Y-%m-%d'),))
+        else:
+            cursor.execute('SELECT MIN(schedule_date) FROM schedules WHERE schedule_date >= ?',
+                           (week_start.strftime('%Y-%m-%d'),))
+        found = cursor.fetchone()[0]
+        conn.close()
+        if not found:
+            return None
+        found = datetime.strptime(found, '%Y-%m-%d').date()
+        return found - timedelta(days=(found.weekday() + 1) % 7)
+    
+    def get_populated_weeks(self, anchor, weeks=8):
+        """[(week_start, staff_count)] for the weeks with schedules among the `weeks` weeks
+        up to and including anchor's week, newest first
+        """
+        week_start = anchor - timedelta(days=(anchor.weekday() + 1) % 7)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT date(schedule_date, '-' || strftime('%w', schedule_date) || ' days') AS week_start,
+                   COUNT(DISTINCT staff_id)
+            FROM schedules
+            WHERE schedule_date >= ? AND schedule_date < ?
+            GROUP BY week_start
+            ORDER BY week_start DESC
+        ''', ((week_start - timedelta(weeks=weeks - 1)).strftime('%Y-%m-%d'),
+              (week_start + timedelta(days=7)).strftime('%Y-%m-%d')))
+        populated = [(datetime.strptime(week, '%Y-%m-%d').date(), staff_count) for week, staff_count in cursor.fetchall()]
+        conn.close()
+        return populated
+    
+    def diff_weeks(self, source_week_start, target_week_start):
+        """Days that differ between two weeks, from one joined query.
+        
+        Returns diff_grids' [(staff_id, day, kind, old, new)]: ADDED where only the
+        source week has the day, REMOVED where only the target week does, CHANGED
+        where both do with different values. Removed staff are left out.
+        """
+        shift = f"{(target_week_start - source_week_start).days:+d} days"
+        back = f"{(source_week_start - target_week_start).days:+d} days"
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT s.staff_id, s.day_of_week, s.is_working, s.start_time, s.end_time,
+                   t.id, t.is_working, t.start_time, t.end_time
+            FROM schedules s
+            JOIN staff st ON st.id = s.staff_id
+            LEFT JOIN schedules t ON t.staff_id = s.staff_id AND t.day_of_week = s.day_of_week
+                                 AND t.schedule_date = date(s.schedule_date, ?)
+            WHERE s.schedule_date BETWEEN ? AND ?
+            UNION ALL
+            SELECT t.staff_id, t.day_of_week, NULL, NULL, NULL, t.id, t.is_working, t.start_time, t.end_time
+            FROM schedules t
+            JOIN staff st ON st.id = t.staff_id
+            WHERE t.schedule_date BETWEEN ? AND ?
+              AND NOT EXISTS (SELECT 1 FROM schedules s WHERE s.staff_id = t.staff_id AND s.day_of_week = t.day_of_week
+                              AND s.schedule_date = date(t.schedule_date, ?))
+        ''', (shift, source_week_start.strftime('%Y-%m-%d'), (source_week_start + timedelta(days=6)).strftime('%Y-%m-%d'),
+              target_week_start.strftime('%Y-%m-%d'), (target_week_start + timedelta(days=6)).strftime('%Y-%m-%d'), back))
+        rows = cursor.fetchall()
+        conn.close()
+        return diff_rows(rows)
+    
     def get_all_schedules(self):
         """Get all schedules for all staff"""
         conn = sqlite3.connect(self.db_path)
@@ -345,8 +687,10 @@ class DatabaseManager:
         
         # Clear all schedules
         cursor.execute('DELETE FROM schedules')
+        self._log_changes(cursor, [(None, 'RESET_SCHEDULES', None, None, None, 'ADMIN')])
         
         conn.commit()
+        self._notify_committed(cursor)
         conn.close()
         
         return True 
@@ -425,7 +769,7 @@ class DatabaseManager:
         week_end = week_start + timedelta(days=6)
         
         cursor.execute('''
-            SELECT day_of_week, schedule_date, is_working, start_time, end_time
+            SELECT day_of_week, schedule_date, is_working, start_time, end_time, version
             FROM schedules
             WHERE staff_id = ? AND schedule_date BETWEEN ? AND ?
             ORDER BY 
@@ -445,12 +789,13 @@ class DatabaseManager:
         
         # Convert to dictionary format
         schedule_dict = {}
-        for day, schedule_date, is_working, start_time, end_time in schedules:
+        for day, schedule_date, is_working, start_time, end_time, version in schedules:
             schedule_dict[day] = {
                 'schedule_date': schedule_date,
                 'is_working': is_working,
                 'start_time': start_time,
-                'end_time': end_time
+                'end_time': end_time,
+                'version': version
             }
         
         return schedule_dict
@@ -525,6 +870,8 @@ class DatabaseManager:
     
     def get_schedule_changes(self, staff_id=None, limit=50):
         """Get recent schedule changes for tracking modifications"""
+        if self.audit_write_behind:
+            self.flush_audit_log()  # Include changes still waiting in the outbox
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -550,6 +897,480 @@ class DatabaseManager:
         conn.close()
         return changes
     
+    def get_schedule_changes_page(self, staff_id=None, action=None, since=None, until=None, before=None, limit=20):
+        """One page of the audit log, newest first, with keyset pagination.
+        
+        before is the cursor returned with the previous page: (changed_at, id)
+        of its last row. Each page is an index range scan from the cursor, so
+        its cost does not depend on how deep into the history it is. since and
+        until limit changed_at. Returns (rows, next_cursor); next_cursor is None
+        on the last page.
+        """
+        if self.audit_write_behind and before is None:
+            self.flush_audit_log()  # Include changes still waiting in the outbox
+        
+        conditions, params = [], []
+        if staff_id is not None:
+            conditions.append('sc.staff_id = ?')
+            params.append(staff_id)
+        if action:
+            conditions.append('sc.action = ?')
+            params.append(action)
+        if since is not None:
+            conditions.append('sc.changed_at >= ?')
+            params.append(since.strftime('%Y-%m-%d %H:%M:%S') if hasattr(since, 'strftime') else since)
+        if until is not None:
+            conditions.append('sc.changed_at < ?')
+            params.append(until.strftime('%Y-%m-%d %H:%M:%S') if hasattr(until, 'strftime') else until)
+        if before is not None:
+            changed_at, change_id = before
+            # Leading changed_at <= ? keeps this an index range condition
+            conditions.append('sc.changed_at <= ? AND (sc.changed_at < ? OR sc.id < ?)')
+            params.extend([changed_at, changed_at, change_id])
+        
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT sc.id, s.name, sc.action, sc.day_of_week, sc.old_data, sc.new_data, sc.changed_by, sc.changed_at
+            FROM schedule_changes sc
+            LEFT JOIN staff s ON sc.staff_id = s.id
+            {where}
+            ORDER BY sc.changed_at DESC, sc.id DESC
+            LIMIT ?
+        ''', params + [limit + 1])
+        rows = cursor.fetchall()
+        conn.close()
+        
+        if len(rows) <= limit:
+            # Older rows may have been archived - continue from the last row in the segments
+            rows += self.audit_archive.read_page(
+                limit + 1 - len(rows), staff_id=staff_id, action=action, since=since, until=until,
+                before=(rows[-1][7], rows[-1][0]) if rows else before
+            )
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, (rows[-1][7], rows[-1][0])
+        return rows, None
+    
+    def get_changes_to_archive(self, cutoff, limit):
+        """Oldest audit rows changed before cutoff, with the staff name as it is now"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT sc.id, sc.staff_id, s.name, sc.action, sc.day_of_week, sc.old_data, sc.new_data, sc.changed_by, sc.changed_at
+            FROM schedule_changes sc
+            LEFT JOIN staff s ON sc.staff_id = s.id
+            WHERE sc.changed_at < ?
+            ORDER BY sc.changed_at, sc.id
+            LIMIT ?
+        ''', (cutoff, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def finish_audit_archive(self, change_ids, summary):
+        """Delete archived audit rows and add their counts to schedule_changes_summary, in one transaction"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('''
+                INSERT INTO schedule_changes_summary
+                (month, staff_id, staff_name, action, change_count, first_changed_at, last_changed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (month, staff_id, action) DO UPDATE SET
+                    staff_name = COALESCE(excluded.staff_name, staff_name),
+                    change_count = change_count + excluded.change_count,
+                    first_changed_at = MIN(first_changed_at, excluded.first_changed_at),
+                    last_changed_at = MAX(last_changed_at, excluded.last_changed_at)
+            ''', summary)
+            for start in range(0, len(change_ids), 500):
+                chunk = change_ids[start:start + 500]
+                cursor.execute('DELETE FROM schedule_changes WHERE id IN ({})'.format(', '.join('?' * len(chunk))), chunk)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def get_audit_summary(self, staff_id=None):
+        """Archived audit counts per month and action: (month, action, count), newest month first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT month, action, SUM(change_count)
+            FROM schedule_changes_summary
+            WHERE ? IS NULL OR staff_id = ?
+            GROUP BY month, action
+            ORDER BY month DESC, action
+        ''', (staff_id, staff_id))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def get_week_changes(self, week_start, after_id=0, as_of=None):
+        """Audit rows that shaped a week, oldest first: its schedule changes plus
+        staff removals and resets, as (id, staff_id, action, day_of_week, new_data, changed_at)
+        
+        Only rows after after_id (a snapshot's last change) and, with as_of,
+        changed at or before it.
+        """
+        week_end = week_start + timedelta(days=6)
+        time_filter = 'AND changed_at <= ?' if as_of else ''
+        time_params = [as_of] if as_of else []
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, staff_id, action, day_of_week, new_data, changed_at
+            FROM schedule_changes
+            WHERE schedule_date BETWEEN ? AND ? AND id > ? {time_filter}
+            UNION ALL
+            SELECT id, staff_id, action, day_of_week, new_data, changed_at
+            FROM schedule_changes
+            WHERE action IN ('REMOVE_STAFF', 'RESET_SCHEDULES') AND id > ? {time_filter}
+        ''', [week_start.strftime('%Y-%m-%d'), week_end.strftime('%Y-%m-%d'), after_id] + time_params + [after_id] + time_params)
+        # Sorted here: an ORDER BY id makes SQLite walk the whole table by rowid
+        rows = sorted(cursor.fetchall())
+        conn.close()
+        return rows
+    
+    def get_week_snapshot(self, week_start, as_of=None):
+        """Latest snapshot of a week usable for as_of: (last_change_id, covers_until, state) or None"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT last_change_id, covers_until, state
+            FROM week_snapshots
+            WHERE week_start = ? {'AND covers_until <= ?' if as_of else ''}
+            ORDER BY last_change_id DESC
+            LIMIT 1
+        ''', [week_start.strftime('%Y-%m-%d')] + ([as_of] if as_of else []))
+        row = cursor.fetchone()
+        conn.close()
+        return row
+    
+    def save_week_snapshot(self, week_start, last_change_id, covers_until, state):
+        """Store a week's replayed state as of audit row last_change_id"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO week_snapshots (week_start, last_change_id, covers_until, state)
+            VALUES (?, ?, ?, ?)
+        ''', (week_start.strftime('%Y-%m-%d'), last_change_id, covers_until, json.dumps(state)))
+        conn.commit()
+        conn.close()
+    
+    def get_weeks_to_snapshot(self, min_changes):
+        """Week starts with at least min_changes schedule changes since their latest snapshot"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        # Weeks from the distinct dates (cheap on the schedule_date index), then an index
+        # range count per week of the changes after its latest snapshot
+        cursor.execute('''
+            SELECT w.week_start
+            FROM (
+                SELECT DISTINCT date(schedule_date, '-' || strftime('%w', schedule_date) || ' days') AS week_start
+                FROM (SELECT DISTINCT schedule_date FROM schedule_changes WHERE schedule_date IS NOT NULL)
+            ) w
+            WHERE (
+                SELECT COUNT(*)
+                FROM schedule_changes sc
+                WHERE sc.schedule_date BETWEEN w.week_start AND date(w.week_start, '+6 days')
+                  AND sc.id > COALESCE((SELECT MAX(last_change_id) FROM week_snapshots s WHERE s.week_start = w.week_start), 0)
+            ) >= ?
+        ''', (min_changes,))
+        weeks = [datetime.strptime(row[0], '%Y-%m-%d').date() for row in cursor.fetchall()]
+        conn.close()
+        return weeks
+    
+    def restore_week_schedules(self, week_start, target, changed_by="RESTORE", dry_run=False):
+        """Make a week's schedules match target ({staff_id: {day: {is_working, start_time, end_time}}})
+        in one transaction.
+        
+        Days missing from target are deleted, every write is logged like an
+        edit. Staff removed since are skipped. Returns (changes, skipped_staff_ids);
+        with dry_run nothing is written and changes is what would be.
+        """
+        dates = {day: (week_start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset, day in enumerate(DAYS_OF_WEEK)}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT id FROM staff')
+            staff_ids = {row[0] for row in cursor.fetchall()}
+            cursor.execute('''
+                SELECT staff_id, day_of_week, is_working, start_time, end_time
+                FROM schedules
+                WHERE schedule_date BETWEEN ? AND ?
+            ''', (dates['Sunday'], dates['Saturday']))
+            current = {}
+            for staff_id, day_of_week, is_working, start_time, end_time in cursor.fetchall():
+                current.setdefault(staff_id, {})[day_of_week] = {
+                    'is_working': bool(is_working), 'start_time': start_time, 'end_time': end_time
+                }
+            
+            changes, skipped = [], []
+            for staff_id in sorted(set(current) | set(target)):
+                if staff_id not in staff_ids:
+                    skipped.append(staff_id)
+                    continue
+                for day_of_week in DAYS_OF_WEEK:
+                    want = target.get(staff_id, {}).get(day_of_week)
+                    have = current.get(staff_id, {}).get(day_of_week)
+                    if want is None and have is None:
+                        continue
+                    if want and have and ScheduleValidator.day_unchanged(have, want['is_working'], want['start_time'], want['end_time']):
+                        continue
+                    
+                    schedule_date = dates[day_of_week]
+                    old_data = dict(have, schedule_date=schedule_date) if have else None
+                    new_data = dict(want, schedule_date=schedule_date) if want else None
+                    if want is None:
+                        action = 'DELETE_SCHEDULE'
+                        if not dry_run:
+                            cursor.execute('''
+                                DELETE FROM schedules WHERE staff_id = ? AND day_of_week = ? AND schedule_date = ?
+                            ''', (staff_id, day_of_week, schedule_date))
+                    else:
+                        action = 'UPDATE_SCHEDULE' if have else 'CREATE_SCHEDULE'
+                        if not dry_run:
+                            cursor.execute('''
+                                INSERT OR REPLACE INTO schedules
+                                (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at, version)
+                                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, COALESCE((
+                                    SELECT version FROM schedules WHERE staff_id = ? AND day_of_week = ? AND schedule_date = ?
+                                ), 0) + 1)
+                            ''', (staff_id, day_of_week, schedule_date, want['is_working'],
+                                  want['start_time'] if want['is_working'] else None,
+                                  want['end_time'] if want['is_working'] else None,
+                                  staff_id, day_of_week, schedule_date))
+                    changes.append((staff_id, action, day_of_week, old_data, new_data, changed_by))
+            
+            if dry_run:
+                conn.rollback()
+            else:
+                self._log_changes(cursor, changes)
+                conn.commit()
+                self._notify_committed(cursor)
+            return changes, skipped
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _mirror_query(self, plan):
+        """The 'mirrored' CTE for a plan of (source_week_start, target_week_start) pairs:
+        every day the plan copies or fills with "Not Set", and its parameters.
+        """
+        for source_week_start, target_week_start in plan:
+            if (target_week_start - source_week_start).days % 7:
+                raise ValueError(f"Cannot mirror {source_week_start} onto {target_week_start}: not whole weeks apart")
+        query = '''
+            WITH plan (target_start, source_start, source_end, shift) AS (VALUES {}),
+            week_days (day_of_week, day_offset) AS (VALUES {}),
+            mirrored AS (
+                SELECT p.target_start, s.staff_id, s.day_of_week, date(s.schedule_date, p.shift) AS schedule_date,
+                       s.is_working, s.start_time, s.end_time, 0 AS not_set
+                FROM plan p
+                JOIN schedules s ON s.schedule_date BETWEEN p.source_start AND p.source_end
+                JOIN staff st ON st.id = s.staff_id
+                UNION ALL
+                SELECT p.target_start, st.id, d.day_of_week, date(p.target_start, '+' || d.day_offset || ' days'), 1, '', '', 1
+                FROM plan p
+                CROSS JOIN staff st
+                CROSS JOIN week_days d
+                WHERE NOT EXISTS (SELECT 1 FROM schedules s WHERE s.staff_id = st.id
+                                  AND s.schedule_date BETWEEN p.source_start AND p.source_end)
+                  AND NOT EXISTS (SELECT 1 FROM schedules t WHERE t.staff_id = st.id AND t.day_of_week = d.day_of_week
+                                  AND t.schedule_date = date(p.target_start, '+' || d.day_offset || ' days'))
+            )
+        '''.format(', '.join(['(?, ?, ?, ?)'] * len(plan)), ', '.join(['(?, ?)'] * len(DAYS_OF_WEEK)))
+        params = []
+        for source_week_start, target_week_start in plan:
+            params += [target_week_start.strftime('%Y-%m-%d'), source_week_start.strftime('%Y-%m-%d'),
+                       (source_week_start + timedelta(days=6)).strftime('%Y-%m-%d'),
+                       f"{(target_week_start - source_week_start).days:+d} days"]
+        for offset, day in enumerate(DAYS_OF_WEEK):
+            params += [day, offset]
+        return query, params
+    
+    def _read_mirror(self, cursor, plan):
+        """Every day a mirror plan would write, plus the roster and the staff removed since.
+        
+        Rows are (target_week_start, staff_id, day_of_week, schedule_date, is_working,
+        start_time, end_time, not_set, target_id, old_is_working, old_start, old_end,
+        unchanged) - one per mirrored day, target_id None where the target has no row.
+        """
+        query, params = self._mirror_query(plan)
+        cursor.execute(query + f'''
+            SELECT m.target_start, m.staff_id, m.day_of_week, m.schedule_date, m.is_working, m.start_time, m.end_time,
+                   m.not_set, t.id, t.is_working, t.start_time, t.end_time, CASE WHEN {MIRROR_UNCHANGED} THEN 1 ELSE 0 END
+            FROM mirrored m
+            LEFT JOIN schedules t ON {MIRROR_SAME_ROW}
+        ''', params)
+        rows = cursor.fetchall()
+        
+        cursor.execute('SELECT id, name FROM staff ORDER BY name')
+        roster = cursor.fetchall()
+        sources = sorted(source for source, _ in plan)
+        cursor.execute('''
+            SELECT r.staff_id, r.old_data
+            FROM schedule_changes r
+            WHERE r.action = 'REMOVE_STAFF'
+              AND r.staff_id NOT IN (SELECT id FROM staff)
+              AND EXISTS (SELECT 1 FROM schedule_changes sc WHERE sc.staff_id = r.staff_id AND sc.schedule_date BETWEEN ? AND ?)
+        ''', (sources[0].strftime('%Y-%m-%d'), (sources[-1] + timedelta(days=6)).strftime('%Y-%m-%d')))
+        removed = sorted({old_data or f"Staff {staff_id}" for staff_id, old_data in cursor.fetchall()})
+        return rows, roster, removed
+    
+    def _write_mirror(self, cursor, plan):
+        """Write every changed day of a mirror plan with a single INSERT ... SELECT"""
+        query, params = self._mirror_query(plan)
+        cursor.execute(query + f'''
+            INSERT INTO schedules
+            (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at, version)
+            SELECT m.staff_id, m.day_of_week, m.schedule_date, m.is_working, m.start_time, m.end_time, CURRENT_TIMESTAMP, 1
+            FROM mirrored m
+            WHERE NOT EXISTS (SELECT 1 FROM schedules t WHERE {MIRROR_SAME_ROW} AND {MIRROR_UNCHANGED})
+            ON CONFLICT (staff_id, day_of_week, schedule_date) DO UPDATE SET
+                is_working = excluded.is_working, start_time = excluded.start_time, end_time = excluded.end_time,
+                updated_at = CURRENT_TIMESTAMP, version = schedules.version + 1
+        ''', params)
+    
+    def mirror_week(self, source_week_start, target_week_start, changed_by="MIRROR", dry_run=False):
+        """Copy one week's schedules onto another week in one transaction.
+        
+        Staff on the roster get their source days, dates shifted by whole weeks,
+        and staff with nothing in the source week get "Not Set" for each target
+        day they have no row for - both in a single INSERT ... SELECT. Removed
+        staff are skipped and target days that already match are left alone.
+        Returns a summary for the preview; with dry_run nothing is written.
+        """
+        if self.audit_write_behind:
+            self.flush_audit_log()  # Removed staff are found from the change log
+        plan = [(source_week_start, target_week_start)]
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            rows, roster, removed = self._read_mirror(cursor, plan)
+            
+            changes, copied, added, unchanged, source_staff = [], 0, 0, 0, set()
+            for (_, staff_id, day_of_week, schedule_date, is_working, start_time, end_time, not_set,
+                 target_id, old_working, old_start, old_end, same) in rows:
+                if not not_set:
+                    source_staff.add(staff_id)
+                if target_id and same:
+                    unchanged += 1
+                    continue
+                if not_set:
+                    added += 1
+                else:
+                    copied += 1
+                new_data = {'is_working': bool(is_working), 'start_time': start_time or '',
+                            'end_time': end_time or '', 'schedule_date': schedule_date}
+                old_data = None
+                if target_id:
+                    old_data = {'is_working': bool(old_working), 'start_time': old_start or '',
+                                'end_time': old_end or '', 'schedule_date': schedule_date}
+                changes.append((staff_id, 'UPDATE_SCHEDULE' if target_id else 'CREATE_SCHEDULE', day_of_week,
+                                old_data, new_data, changed_by))
+            
+            if changes and not dry_run:
+                self._write_mirror(cursor, plan)
+                self._log_changes(cursor, changes)
+                conn.commit()
+                self._notify_committed(cursor)
+                logger.info(f"Mirrored week {source_week_start} to {target_week_start}: "
+                            f"{copied} copied, {added} not set, {unchanged} unchanged")
+            else:
+                conn.rollback()
+            
+            return {
+                'copied': copied,
+                'added': added,
+                'unchanged': unchanged,
+                'existing_staff': [name for staff_id, name in roster if staff_id in source_staff],
+                'added_staff': [name for staff_id, name in roster if staff_id not in source_staff],
+                'removed_staff': removed,
+            }
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def mirror_weeks(self, pattern, target_week_start, weeks, changed_by="MIRROR", dry_run=False):
+        """Fill the next weeks from a repeating pattern of source weeks in one transaction.
+        
+        Target week k (target_week_start plus k weeks) gets pattern[k % len(pattern)],
+        so one pattern week repeats it and 2-4 weeks rotate. All weeks are written
+        with a single INSERT ... SELECT, with the same rules as mirror_week, and
+        logged as one MIRROR_WEEK audit row per week holding the days it wrote.
+        Returns totals and a per-week summary; with dry_run nothing is written.
+        """
+        if self.audit_write_behind:
+            self.flush_audit_log()
+        plan = [(pattern[k % len(pattern)], target_week_start + timedelta(weeks=k)) for k in range(weeks)]
+        targets = {target.strftime('%Y-%m-%d'): (source, target) for source, target in plan}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            rows, roster, removed = self._read_mirror(cursor, plan)
+            
+            summary = {key: {'source_week': source, 'target_week': target, 'copied': 0, 'added': 0, 'unchanged': 0}
+                       for key, (source, target) in targets.items()}
+            written = {key: {} for key in targets}
+            source_staff = {source: set() for source in pattern}
+            for (target_start, staff_id, day_of_week, _, is_working, start_time, end_time, not_set,
+                 target_id, _, _, _, same) in rows:
+                week = summary[target_start]
+                if not not_set:
+                    source_staff[week['source_week']].add(staff_id)
+                if target_id and same:
+                    week['unchanged'] += 1
+                    continue
+                week['added' if not_set else 'copied'] += 1
+                written[target_start].setdefault(str(staff_id), {})[day_of_week] = [
+                    bool(is_working), start_time or '', end_time or '']
+            
+            weeks_summary = [summary[key] for key in sorted(summary)]
+            if any(written.values()) and not dry_run:
+                self._write_mirror(cursor, plan)
+                self._log_changes(cursor, [
+                    (None, 'MIRROR_WEEK', None, None,
+                     {'source_week': summary[key]['source_week'].strftime('%Y-%m-%d'), 'schedule_date': key,
+                      'copied': summary[key]['copied'], 'added': summary[key]['added'], 'days': written[key]},
+                     changed_by)
+                    for key in sorted(written) if written[key]
+                ])
+                conn.commit()
+                self._notify_committed(cursor)
+                logger.info(f"Mirrored {len(pattern)}-week pattern onto {weeks} weeks from {target_week_start}: "
+                            f"{sum(week['copied'] for week in weeks_summary)} copied, "
+                            f"{sum(week['added'] for week in weeks_summary)} not set")
+            else:
+                conn.rollback()
+            
+            missing = {staff_id for staff_id, _ in roster if any(staff_id not in staff for staff in source_staff.values())}
+            return {
+                'weeks': weeks_summary,
+                'copied': sum(week['copied'] for week in weeks_summary),
+                'added': sum(week['added'] for week in weeks_summary),
+                'unchanged': sum(week['unchanged'] for week in weeks_summary),
+                'existing_staff': [name for staff_id, name in roster if staff_id not in missing],
+                'added_staff': [name for staff_id, name in roster if staff_id in missing],
+                'removed_staff': removed,
+            }
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
     def get_staff_complete_schedule_status(self):
         """Get status of which staff have complete schedules"""
         conn = sqlite3.connect(self.db_path)
@@ -575,6 +1396,8 @@ class DatabaseManager:
     
     def get_recent_activity(self, days=7):
         """Get recent activity for dashboard"""
+        if self.audit_write_behind:
+            self.flush_audit_log()  # Include changes still waiting in the outbox
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -590,4 +1413,449 @@ class DatabaseManager:
         
         recent_changes = cursor.fetchall()
         conn.close()
-        return recent_changes 
\ No newline at end of file
+        return recent_changes 
+
+    def save_bulk_schedules(self, schedules_data, week_start_date, changed_by="ADMIN"):
+        """Save multiple staff schedules atomically in a single transaction"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        saved_count = 0
+        failed_saves = []
+        
+        try:
+            logger.info(f"Starting bulk schedule save for week {week_start_date}")
+            
+            for staff_id, staff_name, schedule_data in schedules_data:
+                try:
+                    for day_name, day_data in schedule_data.items():
+                        is_working = day_data.get('is_working', True)
+                        self._save_single_day(
+                            cursor, staff_id, day_name, is_working,
+                            day_data.get('start_time', '') if is_working else None,
+                            day_data.get('end_time', '') if is_working else None,
+                            day_data.get('date'), changed_by
+                        )
+                        saved_count += 1
+                except Exception as e:
+                    logger.error(f"Error saving schedule for {staff_name}: {e}")
+                    failed_saves.append(f"{staff_name}: {str(e)}")
+                    raise
+            
+            conn.commit()
+            self._notify_committed(cursor)
+            logger.info(f"Bulk save completed successfully. Saved {saved_count} total day schedules")
+            return True, saved_count, []
+            
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Bulk save failed, rolled back all changes: {e}")
+            return False, saved_count, failed_saves
+        finally:
+            conn.close()
+    
+    def save_week_schedule(self, staff_id, schedule_data, expected, changed_by="ADMIN"):
+        """Save one staff member's week in a single transaction, without overwriting
+        changes made since the caller read it.
+        
+        expected is the week as returned by get_staff_schedule_for_week when the
+        admin opened it (a day missing from it had no row). Each changed day is
+        written with a conditional UPDATE on its version (or an INSERT that only
+        happens if the row is still missing), so no per-day read is needed.
+        Returns (success, saved_count, conflicts); on conflicts nothing is written
+        and conflicts lists the days someone else changed.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        saved_count = 0
+        conflicts = []
+        changes = []
+        
+        try:
+            for day_of_week, day_data in schedule_data.items():
+                is_working = day_data.get('is_working', True)
+                start_time = day_data.get('start_time', '') if is_working else None
+                end_time = day_data.get('end_time', '') if is_working else None
+                schedule_date = day_data.get('date')
+                if hasattr(schedule_date, 'strftime'):
+                    schedule_date = schedule_date.strftime('%Y-%m-%d')
+                
+                stored = expected.get(day_of_week)
+                if stored and ScheduleValidator.day_unchanged(stored, is_working, start_time, end_time):
+                    saved_count += 1
+                    continue  # Nothing to write
+                
+                if stored:
+                    cursor.execute('''
+                        UPDATE schedules
+                        SET is_working = ?, start_time = ?, end_time = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+                        WHERE staff_id = ? AND day_of_week = ? AND schedule_date IS ? AND version = ?
+                    ''', (is_working, start_time, end_time, staff_id, day_of_week, schedule_date, stored['version']))
+                else:
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO schedules
+                        (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at, version)
+                        SELECT ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, 1
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM schedules WHERE staff_id = ? AND day_of_week = ? AND schedule_date IS ?
+                        )
+                    ''', (staff_id, day_of_week, schedule_date, is_working, start_time, end_time,
+                          staff_id, day_of_week, schedule_date))
+                
+                if cursor.rowcount == 0:
+                    conflicts.append(day_of_week)
+                    continue
+                
+                new_data = {
+                    'is_working': bool(is_working),
+                    'start_time': start_time or '',
+                    'end_time': end_time or '',
+                    'schedule_date': schedule_date or ''
+                }
+                old_data = None
+                if stored:
+                    old_data = {
+                        'is_working': bool(stored['is_working']),
+                        'start_time': stored['start_time'] or '',
+                        'end_time': stored['end_time'] or '',
+                        'schedule_date': schedule_date or ''
+                    }
+                changes.append((staff_id, 'UPDATE_SCHEDULE' if stored else 'CREATE_SCHEDULE', day_of_week,
+                                old_data, new_data, changed_by))
+                saved_count += 1
+            
+            if conflicts:
+                conn.rollback()
+                logger.warning(f"Week save for staff {staff_id} rejected, changed meanwhile: {', '.join(conflicts)}")
+                return False, 0, conflicts
+            
+            self._log_changes(cursor, changes)
+            conn.commit()
+            self._notify_committed(cursor)
+            return True, saved_count, []
+        
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _save_single_day(self, cursor, staff_id, day_of_week, is_working, start_time=None, end_time=None, schedule_date=None, changed_by="ADMIN"):
+        """Internal method to save a single day within a transaction"""
+        if hasattr(schedule_date, 'strftime'):
+            schedule_date = schedule_date.strftime('%Y-%m-%d')
+        
+        cursor.execute('''
+            SELECT is_working, start_time, end_time
+            FROM schedules
+            WHERE staff_id = ? AND day_of_week = ? AND schedule_date IS ?
+        ''', (staff_id, day_of_week, schedule_date))
+        existing = cursor.fetchone()
+        
+        if existing and (bool(existing[0]) == bool(is_working) and
+                         (existing[1] or '') == (start_time or '') and
+                         (existing[2] or '') == (end_time or '')):
+            return True  # Nothing changed
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO schedules 
+            (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at, version)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, COALESCE((
+                SELECT version FROM schedules WHERE staff_id = ? AND day_of_week = ? AND schedule_date IS ?
+            ), 0) + 1)
+        ''', (staff_id, day_of_week, schedule_date, is_working, start_time, end_time,
+              staff_id, day_of_week, schedule_date))
+        
+        new_data = {
+            'is_working': bool(is_working),
+            'start_time': start_time or '',
+            'end_time': end_time or '',
+            'schedule_date': schedule_date or ''
+        }
+        if existing:
+            old_data = {
+                'is_working': bool(existing[0]),
+                'start_time': existing[1] or '',
+                'end_time': existing[2] or '',
+                'schedule_date': schedule_date or ''
+            }
+            action = 'UPDATE_SCHEDULE'
+        else:
+            old_data = None
+            action = 'CREATE_SCHEDULE'
+        
+        self._log_changes(cursor, [(staff_id, action, day_of_week, old_data, new_data, changed_by)])
+        return True
+    
+    def create_scheduling_session(self, week_start_date, created_by="ADMIN"):
+        """Create a new scheduling session for tracking"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO scheduling_sessions (week_start_date, status, created_by)
+            VALUES (?, 'IN_PROGRESS', ?)
+        ''', (str(week_start_date), created_by))
+        session_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        
+        logger.info(f"Created scheduling session {session_id} for week {week_start_date}")
+        return session_id
+    
+    def complete_scheduling_session(self, session_id):
+        """Mark a scheduling session as complete"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE scheduling_sessions 
+            SET status = 'COMPLETED', completed_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (session_id,))
+        conn.commit()
+        conn.close()
+        
+        logger.info(f"Completed scheduling session {session_id}")
+    
+    def expire_stale_scheduling_sessions(self, max_age_hours):
+        """Mark IN_PROGRESS sessions older than max_age_hours as FAILED; returns how many"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE scheduling_sessions
+            SET status = 'FAILED', completed_at = CURRENT_TIMESTAMP, notes = 'Expired: abandoned session'
+            WHERE status = 'IN_PROGRESS' AND created_at < datetime('now', ?)
+        ''', (f'-{int(max_age_hours)} hours',))
+        expired = cursor.rowcount
+        conn.commit()
+        conn.close()
+        
+        if expired:
+            logger.info(f"Expired {expired} abandoned scheduling sessions")
+        return expired
+    
+    def detect_schedule_conflicts(self, schedules_data, week_start_date):
+        """Detect potential scheduling conflicts (e.g., too many people off same day)"""
+        conflicts = []
+        warnings = []
+        
+        day_off_counts = {day: 0 for day in ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']}
+        total_staff = len(schedules_data)
+        
+        for staff_id, staff_name, schedule_data in schedules_data:
+            for day_name, day_data in schedule_data.items():
+                if not day_data.get('is_working', True):
+                    day_off_counts[day_name] += 1
+        
+        # Check for critical conflicts (more than 50% off same day)
+        critical_threshold = max(1, total_staff // 2)
+        for day, off_count in day_off_counts.items():
+            if off_count > critical_threshold:
+                conflicts.append(f"⚠️ CRITICAL: {off_count}/{total_staff} staff are OFF on {day}")
+            elif off_count == total_staff:
+                conflicts.append(f"🚨 SEVERE: ALL staff are OFF on {day}")
+            elif off_count >= total_staff - 1:
+                warnings.append(f"⚠️ WARNING: Only 1 person working on {day}")
+        
+        # Check for individual staff with too many consecutive off days
+        for staff_id, staff_name, schedule_data in schedules_data:
+            consecutive_off = 0
+            max_consecutive = 0
+            total_off = 0
+            
+            for day in ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']:
+                day_data = schedule_data.get(day, {'is_working': True})
+                if not day_data.get('is_working', True):
+                    consecutive_off += 1
+                    total_off += 1
+                    max_consecutive = max(max_consecutive, consecutive_off)
+                else:
+                    consecutive_off = 0
+            
+            if max_consecutive >= 4:
+                warnings.append(f"📅 {staff_name} has {max_consecutive} consecutive days off")
+            if total_off >= 5:
+                warnings.append(f"📊 {staff_name} is working only {7-total_off} days this week")
+        
+        return conflicts, warnings
+    
+    def get_weekly_coverage_stats(self, week_start_date):
+        """Get coverage statistics for a specific week"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        week_end_date = week_start_date + timedelta(days=6)
+        
+        cursor.execute('''
+            SELECT 
+                day_of_week,
+                COUNT(*) as total_staff,
+                SUM(CASE WHEN is_working THEN 1 ELSE 0 END) as working_staff,
+                SUM(CASE WHEN is_working THEN 0 ELSE 1 END) as off_staff
+            FROM schedules s
+            JOIN staff st ON s.staff_id = st.id
+            WHERE s.schedule_date BETWEEN ? AND ?
+            GROUP BY day_of_week
+            ORDER BY 
+                CASE day_of_week
+                    WHEN 'Sunday' THEN 1
+                    WHEN 'Monday' THEN 2
+                    WHEN 'Tuesday' THEN 3
+                    WHEN 'Wednesday' THEN 4
+                    WHEN 'Thursday' THEN 5
+                    WHEN 'Friday' THEN 6
+                    WHEN 'Saturday' THEN 7
+                END
+        ''', (week_start_date.strftime('%Y-%m-%d'), week_end_date.strftime('%Y-%m-%d')))
+        
+        stats = cursor.fetchall()
+        conn.close()
+        return stats
+    
+    @staticmethod
+    def _audit_value(value):
+        """old_data/new_data column value: dicts as JSON, names as plain text"""
+        return json.dumps(value) if isinstance(value, dict) else value
+    
+    @staticmethod
+    def _audit_date(old_data, new_data):
+        """schedule_date column value: the date of the schedule a change touched"""
+        data = new_data if isinstance(new_data, dict) else old_data
+        return (data.get('schedule_date') or None) if isinstance(data, dict) else None
+    
+    def _uncommitted_ids(self, cursor):
+        """Staff ids changed so far in cursor's transaction; a new cursor starts afresh"""
+        pending = getattr(self._uncommitted, 'changes', None)
+        if pending is None or pending[0] is not cursor:
+            pending = self._uncommitted.changes = (cursor, set())
+        return pending[1]
+    
+    def _notify_committed(self, cursor):
+        """Tell change_listeners which staff cursor's just-committed transaction changed"""
+        pending = getattr(self._uncommitted, 'changes', None)
+        self._uncommitted.changes = None
+        if pending is None or pending[0] is not cursor or not pending[1]:
+            return
+        staff_ids = pending[1]
+        for listener in self.change_listeners:
+            listener(None if None in staff_ids else staff_ids)
+    
+    def _log_changes(self, cursor, changes):
+        """Record (staff_id, action, day_of_week, old_data, new_data, changed_by) audit
+        rows as part of the caller's transaction.
+        
+        Normally they go straight into schedule_changes. With AUDIT_WRITE_BEHIND
+        the whole list is written as one audit_outbox row instead; it commits (or
+        rolls back) with the change itself, so a crash cannot lose it. The staff
+        weeks touched are marked pending in staff_notifications the same way,
+        for linked staff only - nobody else could be sent them. change_listeners hear of them once the caller commits - see
+        _notify_committed - and never if it rolls back.
+        """
+        if not changes:
+            return
+        self._uncommitted_ids(cursor).update(change[0] for change in changes)
+        cursor.executemany('''
+            INSERT INTO staff_notifications (staff_id, week_start, pending, changed_at)
+            SELECT staff_id, ?, 1, CURRENT_TIMESTAMP FROM staff_links WHERE staff_id = ?
+            ON CONFLICT (staff_id, week_start) DO UPDATE SET pending = pending + 1, changed_at = CURRENT_TIMESTAMP
+        ''', [(week_start, staff_id) for staff_id, week_start in sorted(changed_weeks(changes))])
+        if self.audit_write_behind:
+            cursor.execute('INSERT INTO audit_outbox (payload) VALUES (?)', (json.dumps(changes),))
+            return
+        cursor.executemany('''
+            INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by, schedule_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(staff_id, action, day_of_week, self._audit_value(old_data), self._audit_value(new_data), changed_by,
+               self._audit_date(old_data, new_data))
+              for staff_id, action, day_of_week, old_data, new_data, changed_by in changes])
+    
+    def drain_audit_outbox(self, limit=AUDIT_BATCH_SIZE):
+        """Move up to limit outbox rows into schedule_changes in one transaction.
+        
+        Audit rows keep the time of the original change. The outbox rows are
+        deleted in the same transaction, so each change is logged exactly once
+        even if the process dies mid-drain. Returns the number of audit rows written.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            # Take the write lock first so concurrent drainers (webhook workers) never copy the same rows
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT id, payload, created_at FROM audit_outbox ORDER BY id LIMIT ?', (limit,))
+            outbox = cursor.fetchall()
+            if not outbox:
+                conn.rollback()
+                return 0
+        
+            rows = []
+            for _, payload, created_at in outbox:
+                for staff_id, action, day_of_week, old_data, new_data, changed_by in json.loads(payload):
+                    rows.append((staff_id, action, day_of_week, self._audit_value(old_data),
+                                 self._audit_value(new_data), changed_by, created_at,
+                                 self._audit_date(old_data, new_data)))
+        
+            # Multi-row INSERTs, kept under SQLite's default limit of 999 bound parameters
+            for start in range(0, len(rows), 100):
+                chunk = rows[start:start + 100]
+                cursor.execute(
+                    'INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by, changed_at, schedule_date) '
+                    'VALUES ' + ', '.join(['(?, ?, ?, ?, ?, ?, ?, ?)'] * len(chunk)),
+                    [value for row in chunk for value in row]
+                )
+            cursor.execute('DELETE FROM audit_outbox WHERE id IN ({})'.format(', '.join('?' * len(outbox))),
+                           [row[0] for row in outbox])
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error draining audit outbox: {e}")
+            raise
+        finally:
+            conn.close()
+    
+    def flush_audit_log(self):
+        """Drain the audit outbox until it is empty; returns the audit rows written"""
+        total = 0
+        while True:
+            written = self.drain_audit_outbox()
+            if not written:
+                return total
+            total += written
+    
+    def count_audit_outbox(self):
+        """Outbox rows not yet moved to schedule_changes"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM audit_outbox')
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+        
+    def load_bot_state(self, kind):
+        """Load persisted bot state rows of one kind as {state_key: data}"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT state_key, data FROM bot_state WHERE kind = ?', (kind,))
+        rows = cursor.fetchall()
+        conn.close()
+        return {state_key: bytes(data) for state_key, data in rows if data is not None}
+    
+    def save_bot_state(self, items):
+        """Write a batch of (kind, state_key, data) rows in one transaction; data None deletes"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            for kind, state_key, data in items:
+                if data is None:
+                    cursor.execute('DELETE FROM bot_state WHERE kind = ? AND state_key = ?', (kind, state_key))
+                else:
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO bot_state (kind, state_key, data, updated_at)
+                        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ''', (kind, state_key, sqlite3.Binary(data)))
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error saving bot state: {e}")
+            return False
+        finally:
+            conn.close()
@@ -3,12 +3,21 @@ import mysql.connector
 from mysql.connector import Error, pooling
 import json
 import logging
+import threading
 from datetime import datetime, timedelta
-from config import MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE
+from config import MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE, DAYS_OF_WEEK, AUDIT_WRITE_BEHIND, AUDIT_BATCH_SIZE, STAFF_LINK_HOURS
+from validators import ScheduleValidator
+from audit_archive import AuditArchive
+from week_diff import diff_rows
+from notifications import changed_weeks
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Mirror plans: a mirrored day m and the target week's row t for the same staff/day/date
+MIRROR_SAME_ROW = 't.staff_id = m.staff_id AND t.day_of_week = m.day_of_week AND t.schedule_date = m.schedule_date'
+MIRROR_UNCHANGED = 't.is_working = m.is_working AND t.start_time <=> m.start_time AND t.end_time <=> m.end_time'
+
 class MySQLManager:
     def __init__(self):
         # Create connection pool for better performance
@@ -26,6 +35,11 @@ class MySQLManager:
             'charset': 'utf8mb4'
         }
         
+        self.audit_write_behind = AUDIT_WRITE_BEHIND
+        self.audit_archive = AuditArchive()
+        self.change_listeners = []  # Called after each commit with the staff ids it changed (None: possibly anyone)
+        self._uncommitted = threading.local()  # Per thread: (cursor, staff ids its open transaction changed)
+        
         try:
             self.connection_pool = pooling.MySQLConnectionPool(**self.pool_config)
             logger.info("MySQL connection pool created successfully")
@@ -77,6 +91,7 @@ class MySQLManager:
                     end_time TIME,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    version INT NOT NULL DEFAULT 1,
                     FOREIGN KEY (staff_id) REFERENCES staff (id) ON DELETE CASCADE,
                     UNIQUE KEY unique_schedule (staff_id, day_of_week, schedule_date)
                 )
@@ -95,12 +110,68 @@ class MySQLManager:
                     new_data TEXT,
                     changed_by VARCHAR(255),
                     changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    schedule_date DATE NULL,
                     FOREIGN KEY (staff_id) REFERENCES staff (id) ON DELETE CASCADE
                 )
             ''')
             try: cursor.fetchall()
             except: pass
             
+            # Date of the schedule an audit row changed, so a week's changes can be replayed
+            try:
+                cursor.execute("ALTER TABLE schedule_changes ADD COLUMN schedule_date DATE NULL")
+                cursor.execute('''
+                    UPDATE schedule_changes
+                    SET schedule_date = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(COALESCE(new_data, old_data), '$.schedule_date')), '')
+                    WHERE action IN ('ADD_SCHEDULE', 'UPDATE_SCHEDULE', 'CREATE_SCHEDULE')
+                      AND JSON_VALID(COALESCE(new_data, old_data))
+                ''')
+            except mysql.connector.Error as e:
+                if e.errno != 1060:  # Duplicate column name
+                    logger.error(f"Error adding schedule_date to schedule_changes: {e}")
+            
+            # Audit outbox: with AUDIT_WRITE_BEHIND a transaction records its changes
+            # here as one row, and drain_audit_outbox moves them to schedule_changes
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audit_outbox (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    payload LONGTEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            try: cursor.fetchall()
+            except: pass
+            
+            # Per month/staff/action counts of audit rows moved to the archive
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schedule_changes_summary (
+                    month CHAR(7) NOT NULL,
+                    staff_id INT NOT NULL,
+                    staff_name VARCHAR(255),
+                    action VARCHAR(50) NOT NULL,
+                    change_count INT NOT NULL,
+                    first_changed_at TIMESTAMP NULL,
+                    last_changed_at TIMESTAMP NULL,
+                    PRIMARY KEY (month, staff_id, action)
+                )
+            ''')
+            try: cursor.fetchall()
+            except: pass
+            
+            # Replay snapshots: a week's schedules after every change up to last_change_id
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS week_snapshots (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    week_start DATE NOT NULL,
+                    last_change_id INT NOT NULL,
+                    covers_until TIMESTAMP NULL,
+                    state LONGTEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            try: cursor.fetchall()
+            except: pass
+            
             # Scheduling sessions table for tracking bulk operations
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS scheduling_sessions (
@@ -131,6 +202,60 @@ class MySQLManager:
             try: cursor.fetchall()
             except: pass
             
+            # Persisted bot state (conversation states, per-admin wizard data)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS bot_state (
+                    kind VARCHAR(64) NOT NULL,
+                    state_key VARCHAR(255) NOT NULL,
+                    data LONGBLOB,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    PRIMARY KEY (kind, state_key)
+                )
+            ''')
+            try: cursor.fetchall()
+            except: pass
+            
+            # Telegram accounts linked to staff members, for the read-only staff commands
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS staff_links (
+                    telegram_user_id BIGINT PRIMARY KEY,
+                    staff_id INT UNIQUE NOT NULL,
+                    linked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (staff_id) REFERENCES staff (id) ON DELETE CASCADE
+                )
+            ''')
+            try: cursor.fetchall()
+            except: pass
+            
+            # Link codes already redeemed, each bound to the account that used it first
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS staff_link_codes (
+                    code VARCHAR(64) PRIMARY KEY,
+                    telegram_user_id BIGINT NOT NULL,
+                    redeemed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            try: cursor.fetchall()
+            except: pass
+            
+            # Staff notification queue: a row per staff member and week, due while pending > 0
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS staff_notifications (
+                    staff_id INT NOT NULL,
+                    week_start DATE NOT NULL,
+                    pending INT NOT NULL DEFAULT 0,
+                    changed_at TIMESTAMP NULL,
+                    sent_state TEXT,
+                    sent_at TIMESTAMP NULL,
+                    PRIMARY KEY (staff_id, week_start),
+                    FOREIGN KEY (staff_id) REFERENCES staff (id) ON DELETE CASCADE
+                )
+            ''')
+            try: cursor.fetchall()
+            except: pass
+            # Only linked staff are queued; drop rows older databases kept for the rest
+            cursor.execute('DELETE FROM staff_notifications WHERE staff_id NOT IN (SELECT staff_id FROM staff_links)')
+            
             # Create indexes for better performance (using try-except for existing indexes)
             indexes = [
                 "CREATE INDEX idx_schedules_staff_id ON schedules(staff_id)",
@@ -139,6 +264,12 @@ class MySQLManager:
                 "CREATE INDEX idx_schedules_week ON schedules(staff_id, schedule_date)",
                 "CREATE INDEX idx_schedule_changes_staff ON schedule_changes(staff_id)",
                 "CREATE INDEX idx_schedule_changes_date ON schedule_changes(changed_at)",
+                "CREATE INDEX idx_schedule_changes_time ON schedule_changes(changed_at, id)",
+                "CREATE INDEX idx_schedule_changes_staff_time ON schedule_changes(staff_id, changed_at, id)",
+                "CREATE INDEX idx_schedule_changes_action_time ON schedule_changes(action, changed_at, id)",
+                "CREATE INDEX idx_schedule_changes_schedule_date ON schedule_changes(schedule_date, id)",
+                "CREATE INDEX idx_week_snapshots_week ON week_snapshots(week_start, last_change_id)",
+                "CREATE INDEX idx_staff_notifications_due ON staff_notifications(pending, changed_at)",
                 "CREATE INDEX idx_sessions_week ON scheduling_sessions(week_start_date)",
                 "CREATE INDEX idx_templates_active ON schedule_templates(is_active)"
             ]
@@ -154,6 +285,15 @@ class MySQLManager:
                     else:
                         logger.error(f"Error creating index: {e}")
             
+            # Row version for optimistic concurrency (bumped on every write)
+            try:
+                cursor.execute("ALTER TABLE schedules ADD COLUMN version INT NOT NULL DEFAULT 1")
+                try: cursor.fetchall()
+                except: pass
+            except mysql.connector.Error as e:
+                if e.errno != 1060:  # Duplicate column name
+                    logger.error(f"Error adding version column: {e}")
+            
             cursor.execute("COMMIT")
             try: cursor.fetchall()
             except: pass
@@ -188,17 +328,10 @@ class MySQLManager:
             staff_id = cursor.lastrowid
             
             # Log the staff addition
-            cursor.execute('''
-                INSERT INTO schedule_changes (staff_id, action, new_data, changed_by)
-                VALUES (%s, %s, %s, %s)
-            ''', (staff_id, 'ADD_STAFF', json.dumps({'name': name}), 'ADMIN'))
-            # Consume any results from INSERT
-            try:
-                cursor.fetchall()
-            except:
-                pass
+            self._log_changes(cursor, [(staff_id, 'ADD_STAFF', None, None, {'name': name}, 'ADMIN')])
             
             conn.commit()
+            self._notify_committed(cursor)
             logger.info(f"Staff member '{name}' added with ID {staff_id}")
             return staff_id
             
@@ -235,15 +368,7 @@ class MySQLManager:
             staff_name = staff_record[0]
             
             # Log the staff removal
-            cursor.execute('''
-                INSERT INTO schedule_changes (staff_id, action, old_data, changed_by)
-                VALUES (%s, %s, %s, %s)
-            ''', (staff_id, 'REMOVE_STAFF', json.dumps({'name': staff_name}), 'ADMIN'))
-            # Consume any results from INSERT
-            try:
-                cursor.fetchall()
-            except:
-                pass
+            self._log_changes(cursor, [(staff_id, 'REMOVE_STAFF', None, {'name': staff_name}, None, 'ADMIN')])
             
             # Remove staff (schedules will be removed by CASCADE)
             cursor.execute('DELETE FROM staff WHERE id = %s', (staff_id,))
@@ -254,6 +379,7 @@ class MySQLManager:
                 pass
             
             conn.commit()
+            self._notify_committed(cursor)
             logger.info(f"Staff member '{staff_name}' with ID {staff_id} removed")
             print(f"SUCCESS: Staff member '{staff_name}' removed")
             
@@ -290,6 +416,57 @@ class MySQLManager:
             cursor.close()
             conn.close()
     
+    def get_staff_page(self, after=None, limit=10):
+        """One page of staff by name with keyset pagination: (rows, next_cursor).
+        
+        after is the cursor returned with the previous page (the last name on it;
+        names are unique), so every page is one range scan of the name index.
+        next_cursor is None on the last page.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            if after is None:
+                cursor.execute('SELECT id, name FROM staff ORDER BY name LIMIT %s', (limit + 1,))
+            else:
+                cursor.execute('SELECT id, name FROM staff WHERE name > %s ORDER BY name LIMIT %s', (after, limit + 1))
+            rows = cursor.fetchall()
+            conn.commit()  # Commit the read transaction
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error fetching staff page: {e}")
+            raise Exception(f"Error fetching staff page: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1][1]
+        return rows, None
+    
+    def get_week_schedules_for_staff(self, staff_ids, week_start):
+        """(staff_id, day_of_week, is_working, start_time, end_time) rows of one week for some staff"""
+        if not staff_ids:
+            return []
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'''
+                SELECT staff_id, day_of_week, is_working, start_time, end_time
+                FROM schedules
+                WHERE staff_id IN ({', '.join(['%s'] * len(staff_ids))}) AND schedule_date BETWEEN %s AND %s
+            ''', list(staff_ids) + [week_start, week_start + timedelta(days=6)])
+            rows = cursor.fetchall()
+            conn.commit()  # Commit the read transaction
+            return rows
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error fetching week schedules for staff: {e}")
+            raise Exception(f"Error fetching week schedules for staff: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
     def get_staff_by_id(self, staff_id):
         """Get staff member by ID with proper transaction handling"""
         conn = self.get_connection()
@@ -312,6 +489,130 @@ class MySQLManager:
             cursor.close()
             conn.close()
     
+    def link_staff_user(self, staff_id, telegram_user_id, changed_by="STAFF", code=None):
+        """Link a Telegram account to a staff member, replacing either one's previous link.
+        
+        code, the link code redeemed, is bound to the first account that uses
+        it: False, with nothing changed, if another account already has.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            if code is not None:
+                # Codes redeemed longer ago than a link lasts have expired anyway
+                cursor.execute('DELETE FROM staff_link_codes WHERE redeemed_at < NOW() - INTERVAL %s HOUR', (STAFF_LINK_HOURS,))
+                cursor.execute('INSERT IGNORE INTO staff_link_codes (code, telegram_user_id) VALUES (%s, %s)', (code, telegram_user_id))
+                cursor.execute('SELECT telegram_user_id FROM staff_link_codes WHERE code = %s FOR UPDATE', (code,))
+                if cursor.fetchone()[0] != telegram_user_id:
+                    conn.rollback()
+                    logger.warning(f"Link code for staff member {staff_id} reused by Telegram user {telegram_user_id}")
+                    return False
+            cursor.execute('DELETE FROM staff_links WHERE telegram_user_id = %s OR staff_id = %s', (telegram_user_id, staff_id))
+            # A new account has been sent nothing yet; an old one is no longer notified
+            cursor.execute('DELETE FROM staff_notifications WHERE staff_id NOT IN (SELECT staff_id FROM staff_links)')
+            cursor.execute('INSERT INTO staff_links (telegram_user_id, staff_id) VALUES (%s, %s)', (telegram_user_id, staff_id))
+            self._log_changes(cursor, [(staff_id, 'LINK_STAFF', None, None, {'telegram_user_id': telegram_user_id}, changed_by)])
+            conn.commit()
+            self._notify_committed(cursor)
+            logger.info(f"Staff member {staff_id} linked to Telegram user {telegram_user_id}")
+            return True
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error linking staff {staff_id}: {e}")
+            raise Exception(f"Error linking staff {staff_id}: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def unlink_staff_user(self, staff_id, changed_by="ADMIN"):
+        """Remove a staff member's Telegram link: True if there was one"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT telegram_user_id FROM staff_links WHERE staff_id = %s', (staff_id,))
+            links = cursor.fetchall()
+            link = links[0] if links else None
+            if link:
+                cursor.execute('DELETE FROM staff_links WHERE staff_id = %s', (staff_id,))
+                cursor.execute('DELETE FROM staff_notifications WHERE staff_id = %s', (staff_id,))
+                self._log_changes(cursor, [(staff_id, 'UNLINK_STAFF', None, {'telegram_user_id': link[0]}, None, changed_by)])
+            conn.commit()
+            self._notify_committed(cursor)
+            return link is not None
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error unlinking staff {staff_id}: {e}")
+            raise Exception(f"Error unlinking staff {staff_id}: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_linked_staff(self, telegram_user_id):
+        """(staff_id, name) of the staff member a Telegram account is linked to, or None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT s.id, s.name FROM staff_links l JOIN staff s ON s.id = l.staff_id
+                WHERE l.telegram_user_id = %s
+            ''', (telegram_user_id,))
+            staff = cursor.fetchone()
+            conn.commit()  # Commit the read transaction
+            return staff
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error fetching linked staff: {e}")
+            raise Exception(f"Error fetching linked staff: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_due_notifications(self, window_seconds, min_week, limit):
+        """Linked staff weeks from min_week on, unchanged for window_seconds and not yet notified:
+        [(staff_id, name, telegram_user_id, week_start, pending, sent_state)]"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT n.staff_id, s.name, l.telegram_user_id, n.week_start, n.pending, n.sent_state
+                FROM staff_notifications n
+                JOIN staff_links l ON l.staff_id = n.staff_id
+                JOIN staff s ON s.id = n.staff_id
+                WHERE n.pending > 0 AND n.changed_at <= CURRENT_TIMESTAMP - INTERVAL %s SECOND AND n.week_start >= %s
+                ORDER BY n.changed_at
+                LIMIT %s
+            ''', (int(window_seconds), min_week, limit))
+            rows = cursor.fetchall()
+            conn.commit()  # Commit the read transaction
+            return rows
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error fetching due notifications: {e}")
+            raise Exception(f"Error fetching due notifications: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def finish_notification(self, staff_id, week_start, pending, sent_state=None):
+        """Record a delivered (or skipped) notification; changes made since it was read stay pending"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                UPDATE staff_notifications
+                SET pending = GREATEST(pending - %s, 0), sent_state = COALESCE(%s, sent_state),
+                    sent_at = CASE WHEN %s IS NULL THEN sent_at ELSE CURRENT_TIMESTAMP END
+                WHERE staff_id = %s AND week_start = %s
+            ''', (pending, sent_state, sent_state, staff_id, week_start))
+            conn.commit()
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error finishing notification for staff {staff_id}: {e}")
+            raise Exception(f"Error finishing notification for staff {staff_id}: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
     def save_schedule(self, staff_id, day_of_week, is_working, start_time=None, end_time=None, schedule_date=None, changed_by="ADMIN"):
         """Save or update a schedule for a staff member with proper transaction management and verification"""
         conn = self.get_connection()
@@ -416,28 +717,23 @@ class MySQLManager:
                 action = 'ADD_SCHEDULE'
                 print(f"DEBUG: Will ADD new schedule")
             
-            # Use REPLACE INTO to ensure data is saved
-            print(f"DEBUG: Executing REPLACE INTO with data: staff_id={staff_id}, day={day_of_week}, date={schedule_date}, working={is_working}, start={start_time}, end={end_time}")
+            # Upsert and bump the row version so concurrent editors notice the change
+            print(f"DEBUG: Executing upsert with data: staff_id={staff_id}, day={day_of_week}, date={schedule_date}, working={is_working}, start={start_time}, end={end_time}")
             cursor.execute('''
-                REPLACE INTO schedules 
+                INSERT INTO schedules 
                 (staff_id, day_of_week, schedule_date, is_working, start_time, end_time)
                 VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE schedule_date = VALUES(schedule_date), is_working = VALUES(is_working),
+                    start_time = VALUES(start_time), end_time = VALUES(end_time), version = version + 1
             ''', (staff_id, day_of_week, schedule_date, is_working, start_time, end_time))
             try:
                 cursor.fetchall()
             except:
                 pass
-            print(f"DEBUG: REPLACE INTO executed successfully")
+            print(f"DEBUG: Upsert executed successfully")
             
             # Log the schedule change
-            cursor.execute('''
-                INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (staff_id, action, day_of_week, json.dumps(old_data) if old_data else None, json.dumps(new_data), changed_by))
-            try:
-                cursor.fetchall()
-            except:
-                pass
+            self._log_changes(cursor, [(staff_id, action, day_of_week, old_data, new_data, changed_by)])
             print(f"DEBUG: Change log inserted")
             
             # Explicitly commit the transaction
@@ -448,6 +744,7 @@ class MySQLManager:
             except:
                 pass
             print(f"DEBUG: Transaction committed successfully")
+            self._notify_committed(cursor)
             
             # VERIFICATION: Read back the data to confirm it was saved
             print(f"DEBUG: Verifying save by reading back data...")
@@ -734,6 +1031,8 @@ class MySQLManager:
     
     def get_schedule_changes(self, staff_id=None, limit=50):
         """Get schedule change history with optional staff filter"""
+        if self.audit_write_behind:
+            self.flush_audit_log()  # Include changes still waiting in the outbox
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -761,6 +1060,516 @@ class MySQLManager:
         conn.close()
         return changes
     
+    def get_schedule_changes_page(self, staff_id=None, action=None, since=None, until=None, before=None, limit=20):
+        """One page of the audit log, newest first, with keyset pagination.
+        
+        before is the cursor returned with the previous page: (changed_at, id)
+        of its last row. Each page is an index range scan from the cursor, so
+        its cost does not depend on how deep into the history it is. since and
+        until limit changed_at. Returns (rows, next_cursor); next_cursor is None
+        on the last page.
+        """
+        if self.audit_write_behind and before is None:
+            self.flush_audit_log()  # Include changes still waiting in the outbox
+        
+        conditions, params = [], []
+        if staff_id is not None:
+            conditions.append('sc.staff_id = %s')
+            params.append(staff_id)
+        if action:
+            conditions.append('sc.action = %s')
+            params.append(action)
+        if since is not None:
+            conditions.append('sc.changed_at >= %s')
+            params.append(since)
+        if until is not None:
+            conditions.append('sc.changed_at < %s')
+            params.append(until)
+        if before is not None:
+            changed_at, change_id = before
+            # Leading changed_at <= %s keeps this an index range condition
+            conditions.append('sc.changed_at <= %s AND (sc.changed_at < %s OR sc.id < %s)')
+            params.extend([changed_at, changed_at, change_id])
+        
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'''
+                SELECT sc.id, s.name, sc.action, sc.day_of_week,
+                       sc.old_data, sc.new_data, sc.changed_by, sc.changed_at
+                FROM schedule_changes sc
+                LEFT JOIN staff s ON sc.staff_id = s.id
+                {where}
+                ORDER BY sc.changed_at DESC, sc.id DESC
+                LIMIT %s
+            ''', params + [limit + 1])
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        
+        if len(rows) <= limit:
+            # Older rows may have been archived - continue from the last row in the segments
+            rows += self.audit_archive.read_page(
+                limit + 1 - len(rows), staff_id=staff_id, action=action, since=since, until=until,
+                before=(rows[-1][7], rows[-1][0]) if rows else before
+            )
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, (rows[-1][7], rows[-1][0])
+        return rows, None
+    
+    def get_changes_to_archive(self, cutoff, limit):
+        """Oldest audit rows changed before cutoff, with the staff name as it is now"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT sc.id, sc.staff_id, s.name, sc.action, sc.day_of_week,
+                       sc.old_data, sc.new_data, sc.changed_by, sc.changed_at
+                FROM schedule_changes sc
+                LEFT JOIN staff s ON sc.staff_id = s.id
+                WHERE sc.changed_at < %s
+                ORDER BY sc.changed_at, sc.id
+                LIMIT %s
+            ''', (cutoff, limit))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def finish_audit_archive(self, change_ids, summary):
+        """Delete archived audit rows and add their counts to schedule_changes_summary, in one transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('''
+                INSERT INTO schedule_changes_summary
+                (month, staff_id, staff_name, action, change_count, first_changed_at, last_changed_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    staff_name = COALESCE(VALUES(staff_name), staff_name),
+                    change_count = change_count + VALUES(change_count),
+                    first_changed_at = LEAST(first_changed_at, VALUES(first_changed_at)),
+                    last_changed_at = GREATEST(last_changed_at, VALUES(last_changed_at))
+            ''', summary)
+            for start in range(0, len(change_ids), 500):
+                chunk = change_ids[start:start + 500]
+                cursor.execute('DELETE FROM schedule_changes WHERE id IN ({})'.format(', '.join(['%s'] * len(chunk))), chunk)
+            conn.commit()
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error finishing audit archive batch: {e}")
+            raise Exception(f"Error finishing audit archive batch: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_audit_summary(self, staff_id=None):
+        """Archived audit counts per month and action: (month, action, count), newest month first"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT month, action, SUM(change_count)
+                FROM schedule_changes_summary
+                WHERE %s IS NULL OR staff_id = %s
+                GROUP BY month, action
+                ORDER BY month DESC, action
+            ''', (staff_id, staff_id))
+            return [(month, action, int(count)) for month, action, count in cursor.fetchall()]
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_week_changes(self, week_start, after_id=0, as_of=None):
+        """Audit rows that shaped a week, oldest first: its schedule changes plus
+        staff removals, as (id, staff_id, action, day_of_week, new_data, changed_at)
+        
+        Only rows after after_id (a snapshot's last change) and, with as_of,
+        changed at or before it.
+        """
+        week_end = week_start + timedelta(days=6)
+        time_filter = 'AND changed_at <= %s' if as_of else ''
+        time_params = [as_of] if as_of else []
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'''
+                SELECT id, staff_id, action, day_of_week, new_data, changed_at
+                FROM schedule_changes
+                WHERE schedule_date BETWEEN %s AND %s AND id > %s {time_filter}
+                UNION ALL
+                SELECT id, staff_id, action, day_of_week, new_data, changed_at
+                FROM schedule_changes
+                WHERE action IN ('REMOVE_STAFF', 'RESET_SCHEDULES') AND id > %s {time_filter}
+            ''', [week_start, week_end, after_id] + time_params + [after_id] + time_params)
+            return sorted(cursor.fetchall())
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_week_snapshot(self, week_start, as_of=None):
+        """Latest snapshot of a week usable for as_of: (last_change_id, covers_until, state) or None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'''
+                SELECT last_change_id, covers_until, state
+                FROM week_snapshots
+                WHERE week_start = %s {'AND covers_until <= %s' if as_of else ''}
+                ORDER BY last_change_id DESC
+                LIMIT 1
+            ''', [week_start] + ([as_of] if as_of else []))
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def save_week_snapshot(self, week_start, last_change_id, covers_until, state):
+        """Store a week's replayed state as of audit row last_change_id"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO week_snapshots (week_start, last_change_id, covers_until, state)
+                VALUES (%s, %s, %s, %s)
+            ''', (week_start, last_change_id, covers_until, json.dumps(state)))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_weeks_to_snapshot(self, min_changes):
+        """Week starts with at least min_changes schedule changes since their latest snapshot"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            # Weeks from the distinct dates (cheap on the schedule_date index), then an index
+            # range count per week of the changes after its latest snapshot
+            cursor.execute('''
+                SELECT w.week_start
+                FROM (
+                    SELECT DISTINCT DATE_SUB(d.schedule_date, INTERVAL DAYOFWEEK(d.schedule_date) - 1 DAY) AS week_start
+                    FROM (SELECT DISTINCT schedule_date FROM schedule_changes WHERE schedule_date IS NOT NULL) d
+                ) w
+                WHERE (
+                    SELECT COUNT(*)
+                    FROM schedule_changes sc
+                    WHERE sc.schedule_date BETWEEN w.week_start AND DATE_ADD(w.week_start, INTERVAL 6 DAY)
+                      AND sc.id > COALESCE((SELECT MAX(last_change_id) FROM week_snapshots s WHERE s.week_start = w.week_start), 0)
+                ) >= %s
+            ''', (min_changes,))
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def restore_week_schedules(self, week_start, target, changed_by="RESTORE", dry_run=False):
+        """Make a week's schedules match target ({staff_id: {day: {is_working, start_time, end_time}}})
+        in one transaction.
+        
+        Days missing from target are deleted, every write is logged like an
+        edit. Staff removed since are skipped. Returns (changes, skipped_staff_ids);
+        with dry_run nothing is written and changes is what would be.
+        """
+        dates = {day: week_start + timedelta(days=offset) for offset, day in enumerate(DAYS_OF_WEEK)}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("START TRANSACTION")
+            cursor.execute('SELECT id FROM staff')
+            staff_ids = {row[0] for row in cursor.fetchall()}
+            cursor.execute('''
+                SELECT staff_id, day_of_week, is_working, start_time, end_time
+                FROM schedules
+                WHERE schedule_date BETWEEN %s AND %s
+                FOR UPDATE
+            ''', (dates['Sunday'], dates['Saturday']))
+            current = {}
+            for staff_id, day_of_week, is_working, start_time, end_time in cursor.fetchall():
+                current.setdefault(staff_id, {})[day_of_week] = {
+                    'is_working': bool(is_working),
+                    'start_time': ScheduleValidator._format_time_value(start_time),
+                    'end_time': ScheduleValidator._format_time_value(end_time)
+                }
+            
+            changes, skipped = [], []
+            for staff_id in sorted(set(current) | set(target)):
+                if staff_id not in staff_ids:
+                    skipped.append(staff_id)
+                    continue
+                for day_of_week in DAYS_OF_WEEK:
+                    want = target.get(staff_id, {}).get(day_of_week)
+                    have = current.get(staff_id, {}).get(day_of_week)
+                    if want is None and have is None:
+                        continue
+                    if want and have and ScheduleValidator.day_unchanged(have, want['is_working'], want['start_time'], want['end_time']):
+                        continue
+                    
+                    schedule_date = dates[day_of_week]
+                    old_data = dict(have, schedule_date=str(schedule_date)) if have else None
+                    new_data = dict(want, schedule_date=str(schedule_date)) if want else None
+                    if want is None:
+                        action = 'DELETE_SCHEDULE'
+                        if not dry_run:
+                            cursor.execute('''
+                                DELETE FROM schedules WHERE staff_id = %s AND day_of_week = %s AND schedule_date = %s
+                            ''', (staff_id, day_of_week, schedule_date))
+                    else:
+                        action = 'UPDATE_SCHEDULE' if have else 'CREATE_SCHEDULE'
+                        if not dry_run:
+                            cursor.execute('''
+                                INSERT INTO schedules
+                                (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at)
+                                VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                                ON DUPLICATE KEY UPDATE is_working = VALUES(is_working), start_time = VALUES(start_time),
+                                    end_time = VALUES(end_time), updated_at = NOW(), version = version + 1
+                            ''', (staff_id, day_of_week, schedule_date, want['is_working'],
+                                  want['start_time'] if want['is_working'] else None,
+                                  want['end_time'] if want['is_working'] else None))
+                    changes.append((staff_id, action, day_of_week, old_data, new_data, changed_by))
+            
+            if dry_run:
+                conn.rollback()
+            else:
+                self._log_changes(cursor, changes)
+                conn.commit()
+                self._notify_committed(cursor)
+            return changes, skipped
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error restoring week {week_start}: {e}")
+            raise Exception(f"Error restoring week {week_start}: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def _mirror_query(self, plan):
+        """The mirrored-days derived table 'm' for a plan of (source_week_start, target_week_start)
+        pairs: every day the plan copies or fills with "Not Set", and its parameters.
+        """
+        for source_week_start, target_week_start in plan:
+            if (target_week_start - source_week_start).days % 7:
+                raise ValueError(f"Cannot mirror {source_week_start} onto {target_week_start}: not whole weeks apart")
+        plan_rows = ' UNION ALL '.join(
+            ['SELECT CAST(%s AS DATE) AS target_start, CAST(%s AS DATE) AS source_start, CAST(%s AS DATE) AS source_end, %s AS shift']
+            + ['SELECT CAST(%s AS DATE), CAST(%s AS DATE), CAST(%s AS DATE), %s'] * (len(plan) - 1))
+        day_rows = ' UNION ALL '.join(['SELECT %s AS day_of_week, %s AS day_offset'] + ['SELECT %s, %s'] * (len(DAYS_OF_WEEK) - 1))
+        query = '''
+            (
+                SELECT p.target_start, s.staff_id, s.day_of_week, DATE_ADD(s.schedule_date, INTERVAL p.shift DAY) AS schedule_date,
+                       s.is_working, s.start_time, s.end_time, 0 AS not_set
+                FROM ({plan}) p
+                JOIN schedules s ON s.schedule_date BETWEEN p.source_start AND p.source_end
+                JOIN staff st ON st.id = s.staff_id
+                UNION ALL
+                SELECT p.target_start, st.id, d.day_of_week, DATE_ADD(p.target_start, INTERVAL d.day_offset DAY), 1, '', '', 1
+                FROM ({plan}) p
+                CROSS JOIN staff st
+                CROSS JOIN ({days}) d
+                WHERE NOT EXISTS (SELECT 1 FROM schedules s WHERE s.staff_id = st.id
+                                  AND s.schedule_date BETWEEN p.source_start AND p.source_end)
+                  AND NOT EXISTS (SELECT 1 FROM schedules t WHERE t.staff_id = st.id AND t.day_of_week = d.day_of_week
+                                  AND t.schedule_date = DATE_ADD(p.target_start, INTERVAL d.day_offset DAY))
+            ) m
+        '''.format(plan=plan_rows, days=day_rows)
+        plan_params = []
+        for source_week_start, target_week_start in plan:
+            plan_params += [target_week_start, source_week_start, source_week_start + timedelta(days=6),
+                            (target_week_start - source_week_start).days]
+        day_params = [value for offset, day in enumerate(DAYS_OF_WEEK) for value in (day, offset)]
+        return query, plan_params + plan_params + day_params
+    
+    def _read_mirror(self, cursor, plan):
+        """Every day a mirror plan would write, plus the roster and the staff removed since.
+        
+        Rows are (target_week_start, staff_id, day_of_week, schedule_date, is_working,
+        start_time, end_time, not_set, target_id, old_is_working, old_start, old_end,
+        unchanged) - one per mirrored day, target_id None where the target has no row.
+        """
+        query, params = self._mirror_query(plan)
+        cursor.execute(f'''
+            SELECT m.target_start, m.staff_id, m.day_of_week, m.schedule_date, m.is_working, m.start_time, m.end_time,
+                   m.not_set, t.id, t.is_working, t.start_time, t.end_time, CASE WHEN {MIRROR_UNCHANGED} THEN 1 ELSE 0 END
+            FROM {query}
+            LEFT JOIN schedules t ON {MIRROR_SAME_ROW}
+            FOR UPDATE
+        ''', params)
+        rows = cursor.fetchall()
+        
+        cursor.execute('SELECT id, name FROM staff ORDER BY name')
+        roster = cursor.fetchall()
+        sources = sorted(source for source, _ in plan)
+        cursor.execute('''
+            SELECT r.staff_id, r.old_data
+            FROM schedule_changes r
+            WHERE r.action = 'REMOVE_STAFF'
+              AND r.staff_id NOT IN (SELECT id FROM staff)
+              AND EXISTS (SELECT 1 FROM schedule_changes sc WHERE sc.staff_id = r.staff_id AND sc.schedule_date BETWEEN %s AND %s)
+        ''', (sources[0], sources[-1] + timedelta(days=6)))
+        removed = set()
+        for staff_id, old_data in cursor.fetchall():
+            try:
+                removed.add(json.loads(old_data)['name'])
+            except (TypeError, ValueError, KeyError):
+                removed.add(f"Staff {staff_id}")
+        return rows, roster, sorted(removed)
+    
+    def _write_mirror(self, cursor, plan):
+        """Write every changed day of a mirror plan with a single INSERT ... SELECT"""
+        query, params = self._mirror_query(plan)
+        cursor.execute(f'''
+            INSERT INTO schedules
+            (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at)
+            SELECT m.staff_id, m.day_of_week, m.schedule_date, m.is_working, m.start_time, m.end_time, NOW()
+            FROM {query}
+            WHERE NOT EXISTS (SELECT 1 FROM schedules t WHERE {MIRROR_SAME_ROW} AND {MIRROR_UNCHANGED})
+            ON DUPLICATE KEY UPDATE is_working = VALUES(is_working), start_time = VALUES(start_time),
+                end_time = VALUES(end_time), updated_at = NOW(), version = version + 1
+        ''', params)
+    
+    def mirror_week(self, source_week_start, target_week_start, changed_by="MIRROR", dry_run=False):
+        """Copy one week's schedules onto another week in one transaction.
+        
+        Staff on the roster get their source days, dates shifted by whole weeks,
+        and staff with nothing in the source week get "Not Set" for each target
+        day they have no row for - both in a single INSERT ... SELECT. Removed
+        staff are skipped and target days that already match are left alone.
+        Returns a summary for the preview; with dry_run nothing is written.
+        """
+        if self.audit_write_behind:
+            self.flush_audit_log()  # Removed staff are found from the change log
+        plan = [(source_week_start, target_week_start)]
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("START TRANSACTION")
+            rows, roster, removed = self._read_mirror(cursor, plan)
+            
+            changes, copied, added, unchanged, source_staff = [], 0, 0, 0, set()
+            for (_, staff_id, day_of_week, schedule_date, is_working, start_time, end_time, not_set,
+                 target_id, old_working, old_start, old_end, same) in rows:
+                if not not_set:
+                    source_staff.add(staff_id)
+                if target_id and same:
+                    unchanged += 1
+                    continue
+                if not_set:
+                    added += 1
+                else:
+                    copied += 1
+                new_data = {'is_working': bool(is_working),
+                            'start_time': ScheduleValidator._format_time_value(start_time) or '',
+                            'end_time': ScheduleValidator._format_time_value(end_time) or '',
+                            'schedule_date': str(schedule_date)}
+                old_data = None
+                if target_id:
+                    old_data = {'is_working': bool(old_working),
+                                'start_time': ScheduleValidator._format_time_value(old_start) or '',
+                                'end_time': ScheduleValidator._format_time_value(old_end) or '',
+                                'schedule_date': str(schedule_date)}
+                changes.append((staff_id, 'UPDATE_SCHEDULE' if target_id else 'CREATE_SCHEDULE', day_of_week,
+                                old_data, new_data, changed_by))
+            
+            if changes and not dry_run:
+                self._write_mirror(cursor, plan)
+                self._log_changes(cursor, changes)
+                conn.commit()
+                self._notify_committed(cursor)
+                logger.info(f"Mirrored week {source_week_start} to {target_week_start}: "
+                            f"{copied} copied, {added} not set, {unchanged} unchanged")
+            else:
+                conn.rollback()
+            
+            return {
+                'copied': copied,
+                'added': added,
+                'unchanged': unchanged,
+                'existing_staff': [name for staff_id, name in roster if staff_id in source_staff],
+                'added_staff': [name for staff_id, name in roster if staff_id not in source_staff],
+                'removed_staff': removed,
+            }
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error mirroring week {source_week_start} to {target_week_start}: {e}")
+            raise Exception(f"Error mirroring week {source_week_start} to {target_week_start}: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def mirror_weeks(self, pattern, target_week_start, weeks, changed_by="MIRROR", dry_run=False):
+        """Fill the next weeks from a repeating pattern of source weeks in one transaction.
+        
+        Target week k (target_week_start plus k weeks) gets pattern[k % len(pattern)],
+        so one pattern week repeats it and 2-4 weeks rotate. All weeks are written
+        with a single INSERT ... SELECT, with the same rules as mirror_week, and
+        logged as one MIRROR_WEEK audit row per week holding the days it wrote.
+        Returns totals and a per-week summary; with dry_run nothing is written.
+        """
+        if self.audit_write_behind:
+            self.flush_audit_log()
+        plan = [(pattern[k % len(pattern)], target_week_start + timedelta(weeks=k)) for k in range(weeks)]
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("START TRANSACTION")
+            rows, roster, removed = self._read_mirror(cursor, plan)
+            
+            summary = {target: {'source_week': source, 'target_week': target, 'copied': 0, 'added': 0, 'unchanged': 0}
+                       for source, target in plan}
+            written = {target: {} for _, target in plan}
+            source_staff = {source: set() for source in pattern}
+            for (target_start, staff_id, day_of_week, _, is_working, start_time, end_time, not_set,
+                 target_id, _, _, _, same) in rows:
+                week = summary[target_start]
+                if not not_set:
+                    source_staff[week['source_week']].add(staff_id)
+                if target_id and same:
+                    week['unchanged'] += 1
+                    continue
+                week['added' if not_set else 'copied'] += 1
+                written[target_start].setdefault(str(staff_id), {})[day_of_week] = [
+                    bool(is_working), ScheduleValidator._format_time_value(start_time) or '',
+                    ScheduleValidator._format_time_value(end_time) or '']
+            
+            weeks_summary = [summary[target] for target in sorted(summary)]
+            if any(written.values()) and not dry_run:
+                self._write_mirror(cursor, plan)
+                self._log_changes(cursor, [
+                    (None, 'MIRROR_WEEK', None, None,
+                     {'source_week': str(summary[target]['source_week']), 'schedule_date': str(target),
+                      'copied': summary[target]['copied'], 'added': summary[target]['added'], 'days': written[target]},
+                     changed_by)
+                    for target in sorted(written) if written[target]
+                ])
+                conn.commit()
+                self._notify_committed(cursor)
+                logger.info(f"Mirrored {len(pattern)}-week pattern onto {weeks} weeks from {target_week_start}: "
+                            f"{sum(week['copied'] for week in weeks_summary)} copied, "
+                            f"{sum(week['added'] for week in weeks_summary)} not set")
+            else:
+                conn.rollback()
+            
+            missing = {staff_id for staff_id, _ in roster if any(staff_id not in staff for staff in source_staff.values())}
+            return {
+                'weeks': weeks_summary,
+                'copied': sum(week['copied'] for week in weeks_summary),
+                'added': sum(week['added'] for week in weeks_summary),
+                'unchanged': sum(week['unchanged'] for week in weeks_summary),
+                'existing_staff': [name for staff_id, name in roster if staff_id not in missing],
+                'added_staff': [name for staff_id, name in roster if staff_id in missing],
+                'removed_staff': removed,
+            }
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error mirroring weeks from {target_week_start}: {e}")
+            raise Exception(f"Error mirroring weeks from {target_week_start}: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
     def get_latest_schedule_for_staff(self, staff_id):
         """Get the most recent schedule for a staff member (what's currently active)"""
         conn = self.get_connection()
@@ -809,6 +1618,8 @@ class MySQLManager:
     
     def get_recent_activity(self, days=7):
         """Get recent activity for dashboard"""
+        if self.audit_write_behind:
+            self.flush_audit_log()  # Include changes still waiting in the outbox
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -869,6 +1680,7 @@ class MySQLManager:
             cursor.execute("COMMIT")
             try: cursor.fetchall()
             except: pass
+            self._notify_committed(cursor)
             
             logger.info(f"Bulk save completed successfully. Saved {saved_count} total day schedules")
             return True, saved_count, []
@@ -889,6 +1701,108 @@ class MySQLManager:
             cursor.close()
             conn.close()
     
+    def save_week_schedule(self, staff_id, schedule_data, expected, changed_by="ADMIN"):
+        """Save one staff member's week in a single transaction, without overwriting
+        changes made since the caller read it.
+        
+        expected is the week as returned by get_staff_schedule_for_week when the
+        admin opened it (a day missing from it had no row). Each changed day is
+        written with a conditional UPDATE on its version (or an INSERT that only
+        happens if the row is still missing), so no per-day read is needed.
+        Returns (success, saved_count, conflicts); on conflicts nothing is written
+        and conflicts lists the days someone else changed.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        saved_count = 0
+        conflicts = []
+        changes = []
+        
+        try:
+            cursor.execute("START TRANSACTION")
+            try: cursor.fetchall()
+            except: pass
+            
+            for day_of_week, day_data in schedule_data.items():
+                is_working = day_data.get('is_working', True)
+                start_time = day_data.get('start_time', '') if is_working else None
+                end_time = day_data.get('end_time', '') if is_working else None
+                schedule_date = day_data.get('date')
+                
+                stored = expected.get(day_of_week)
+                if stored and ScheduleValidator.day_unchanged(stored, is_working, start_time, end_time):
+                    saved_count += 1
+                    continue  # Nothing to write
+                
+                try:
+                    if stored:
+                        cursor.execute('''
+                            UPDATE schedules
+                            SET is_working = %s, start_time = %s, end_time = %s, version = version + 1
+                            WHERE staff_id = %s AND day_of_week = %s AND schedule_date = %s AND version = %s
+                        ''', (is_working, start_time, end_time, staff_id, day_of_week, schedule_date, stored['version']))
+                    else:
+                        cursor.execute('''
+                            INSERT INTO schedules (staff_id, day_of_week, schedule_date, is_working, start_time, end_time)
+                            SELECT %s, %s, %s, %s, %s, %s FROM DUAL
+                            WHERE NOT EXISTS (
+                                SELECT 1 FROM schedules WHERE staff_id = %s AND day_of_week = %s AND schedule_date = %s
+                            )
+                        ''', (staff_id, day_of_week, schedule_date, is_working, start_time, end_time,
+                              staff_id, day_of_week, schedule_date))
+                    written = cursor.rowcount
+                except mysql.connector.IntegrityError:
+                    written = 0  # Inserted by someone else in the meantime
+                
+                if written == 0:
+                    conflicts.append(day_of_week)
+                    continue
+                
+                new_data = {
+                    'is_working': bool(is_working),
+                    'start_time': str(start_time or ''),
+                    'end_time': str(end_time or ''),
+                    'schedule_date': str(schedule_date or '')
+                }
+                old_data = None
+                if stored:
+                    old_data = {
+                        'is_working': bool(stored['is_working']),
+                        'start_time': str(stored['start_time'] or ''),
+                        'end_time': str(stored['end_time'] or ''),
+                        'schedule_date': str(schedule_date or '')
+                    }
+                changes.append((staff_id, 'UPDATE_SCHEDULE' if stored else 'CREATE_SCHEDULE', day_of_week,
+                                old_data, new_data, changed_by))
+                saved_count += 1
+            
+            if conflicts:
+                cursor.execute("ROLLBACK")
+                try: cursor.fetchall()
+                except: pass
+                logger.warning(f"Week save for staff {staff_id} rejected, changed meanwhile: {', '.join(conflicts)}")
+                return False, 0, conflicts
+            
+            self._log_changes(cursor, changes)
+            cursor.execute("COMMIT")
+            try: cursor.fetchall()
+            except: pass
+            self._notify_committed(cursor)
+            return True, saved_count, []
+            
+        except Exception as e:
+            try:
+                cursor.execute("ROLLBACK")
+                cursor.fetchall()
+            except:
+                pass
+            conn.rollback()
+            logger.error(f"Error saving week schedule for staff {staff_id}: {e}")
+            raise Exception(f"Error saving week schedule: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
     def _save_single_day(self, cursor, staff_id, day_of_week, is_working, start_time=None, end_time=None, schedule_date=None, changed_by="ADMIN"):
         """Internal method to save a single day within a transaction"""
         # Input validation
@@ -931,11 +1845,13 @@ class MySQLManager:
                 str(existing_end or '') == str(end_time or '')):
                 has_changes = False
         
-        # Use REPLACE INTO for MySQL (equivalent to INSERT OR REPLACE)
+        # Upsert and bump the row version so concurrent editors notice the change
         cursor.execute('''
-            REPLACE INTO schedules 
+            INSERT INTO schedules 
             (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, updated_at)
             VALUES (%s, %s, %s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE schedule_date = VALUES(schedule_date), is_working = VALUES(is_working),
+                start_time = VALUES(start_time), end_time = VALUES(end_time), updated_at = NOW(), version = version + 1
         ''', (staff_id, day_of_week, schedule_date, is_working, start_time, end_time))
         try: cursor.fetchall()
         except: pass
@@ -957,13 +1873,7 @@ class MySQLManager:
                     'schedule_date': str(schedule_date or '')
                 }
                 
-                cursor.execute('''
-                    INSERT INTO schedule_changes 
-                    (staff_id, action, day_of_week, old_data, new_data, changed_by, changed_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                ''', (staff_id, 'UPDATE_SCHEDULE', day_of_week, json.dumps(old_data), json.dumps(new_data), changed_by))
-                try: cursor.fetchall()
-                except: pass
+                self._log_changes(cursor, [(staff_id, 'UPDATE_SCHEDULE', day_of_week, old_data, new_data, changed_by)])
             else:
                 # New schedule
                 new_data = {
@@ -973,13 +1883,7 @@ class MySQLManager:
                     'schedule_date': str(schedule_date or '')
                 }
                 
-                cursor.execute('''
-                    INSERT INTO schedule_changes 
-                    (staff_id, action, day_of_week, old_data, new_data, changed_by, changed_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                ''', (staff_id, 'CREATE_SCHEDULE', day_of_week, None, json.dumps(new_data), changed_by))
-                try: cursor.fetchall()
-                except: pass
+                self._log_changes(cursor, [(staff_id, 'CREATE_SCHEDULE', day_of_week, None, new_data, changed_by)])
         
         return True
     
@@ -1112,6 +2016,32 @@ class MySQLManager:
             cursor.close()
             conn.close() 
 
+    def expire_stale_scheduling_sessions(self, max_age_hours):
+        """Mark IN_PROGRESS sessions older than max_age_hours as FAILED; returns how many"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE scheduling_sessions
+                SET status = 'FAILED', completed_at = NOW(), notes = 'Expired: abandoned session'
+                WHERE status = 'IN_PROGRESS' AND created_at < NOW() - INTERVAL %s HOUR
+            ''', (max_age_hours,))
+            expired = cursor.rowcount
+            conn.commit()
+            
+            if expired:
+                logger.info(f"Expired {expired} abandoned scheduling sessions")
+            return expired
+            
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error expiring scheduling sessions: {e}")
+            raise Exception(f"Error expiring scheduling sessions: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
     def detect_schedule_conflicts(self, schedules_data, week_start_date):
         """Detect potential scheduling conflicts (e.g., too many people off same day)"""
         conflicts = []
@@ -1265,7 +2195,7 @@ class MySQLManager:
             week_end = week_start + timedelta(days=6)
             
             cursor.execute('''
-                SELECT day_of_week, schedule_date, is_working, start_time, end_time
+                SELECT day_of_week, schedule_date, is_working, start_time, end_time, version
                 FROM schedules
                 WHERE staff_id = %s AND schedule_date BETWEEN %s AND %s
                 ORDER BY 
@@ -1290,12 +2220,13 @@ class MySQLManager:
             
             # Convert to dictionary format
             schedule_dict = {}
-            for day, schedule_date, is_working, start_time, end_time in schedules:
+            for day, schedule_date, is_working, start_time, end_time, version in schedules:
                 schedule_dict[day] = {
                     'schedule_date': schedule_date,
                     'is_working': is_working,
                     'start_time': start_time,
-                    'end_time': end_time
+                    'end_time': end_time,
+                    'version': version
                 }
             
             return schedule_dict
@@ -1419,4 +2350,254 @@ class MySQLManager:
             raise Exception(f"Error getting current week schedules: {e}")
         finally:
             cursor.close()
-            conn.close() 
\ No newline at end of file
+            conn.close() 
+    
+    def find_nearest_populated_week(self, anchor, direction='back'):
+        """Sunday of the closest week with schedules, at or before anchor's week ('back')
+        or at or after it ('forward'); None when there is none.
+        
+        A single MIN/MAX on idx_schedules_date, instead of fetching whole weeks to test them.
+        """
+        if direction not in ('back', 'forward'):
+            raise ValueError(f"Unknown direction '{direction}' (use 'back' or 'forward')")
+        week_start = anchor - timedelta(days=(anchor.weekday() + 1) % 7)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            if direction == 'back':
+                cursor.execute('SELECT MAX(schedule_date) FROM schedules WHERE schedule_date < %s',
+                               (week_start + timedelta(days=7),))
+            else:
+                cursor.execute('SELECT MIN(schedule_date) FROM schedules WHERE schedule_date >= %s', (week_start,))
+            found = cursor.fetchone()[0]
+            if not found:
+                return None
+            return found - timedelta(days=(found.weekday() + 1) % 7)
+        except Error as e:
+            logger.error(f"Error finding nearest populated week: {e}")
+            raise Exception(f"Error finding nearest populated week: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_populated_weeks(self, anchor, weeks=8):
+        """[(week_start, staff_count)] for the weeks with schedules among the `weeks` weeks
+        up to and including anchor's week, newest first
+        """
+        week_start = anchor - timedelta(days=(anchor.weekday() + 1) % 7)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT DATE_SUB(schedule_date, INTERVAL DAYOFWEEK(schedule_date) - 1 DAY) AS week_start,
+                       COUNT(DISTINCT staff_id)
+                FROM schedules
+                WHERE schedule_date >= %s AND schedule_date < %s
+                GROUP BY week_start
+                ORDER BY week_start DESC
+            ''', (week_start - timedelta(weeks=weeks - 1), week_start + timedelta(days=7)))
+            return cursor.fetchall()
+        except Error as e:
+            logger.error(f"Error getting populated weeks: {e}")
+            raise Exception(f"Error getting populated weeks: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def diff_weeks(self, source_week_start, target_week_start):
+        """Days that differ between two weeks, from one joined query.
+        
+        Returns diff_grids' [(staff_id, day, kind, old, new)]: ADDED where only the
+        source week has the day, REMOVED where only the target week does, CHANGED
+        where both do with different values. Removed staff are left out.
+        """
+        shift = (target_week_start - source_week_start).days
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT s.staff_id, s.day_of_week, s.is_working, s.start_time, s.end_time,
+                       t.id, t.is_working, t.start_time, t.end_time
+                FROM schedules s
+                JOIN staff st ON st.id = s.staff_id
+                LEFT JOIN schedules t ON t.staff_id = s.staff_id AND t.day_of_week = s.day_of_week
+                                     AND t.schedule_date = DATE_ADD(s.schedule_date, INTERVAL %s DAY)
+                WHERE s.schedule_date BETWEEN %s AND %s
+                UNION ALL
+                SELECT t.staff_id, t.day_of_week, NULL, NULL, NULL, t.id, t.is_working, t.start_time, t.end_time
+                FROM schedules t
+                JOIN staff st ON st.id = t.staff_id
+                WHERE t.schedule_date BETWEEN %s AND %s
+                  AND NOT EXISTS (SELECT 1 FROM schedules s WHERE s.staff_id = t.staff_id AND s.day_of_week = t.day_of_week
+                                  AND s.schedule_date = DATE_ADD(t.schedule_date, INTERVAL %s DAY))
+            ''', (shift, source_week_start, source_week_start + timedelta(days=6),
+                  target_week_start, target_week_start + timedelta(days=6), -shift))
+            return diff_rows(cursor.fetchall())
+        except Error as e:
+            logger.error(f"Error diffing week {source_week_start} against {target_week_start}: {e}")
+            raise Exception(f"Error diffing week {source_week_start} against {target_week_start}: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    @staticmethod
+    def _audit_value(value):
+        """old_data/new_data column value as stored in schedule_changes"""
+        return json.dumps(value) if value else None
+    
+    @staticmethod
+    def _audit_date(old_data, new_data):
+        """schedule_date column value: the date of the schedule a change touched"""
+        data = new_data or old_data
+        return (data.get('schedule_date') or None) if isinstance(data, dict) else None
+    
+    def _uncommitted_ids(self, cursor):
+        """Staff ids changed so far in cursor's transaction; a new cursor starts afresh"""
+        pending = getattr(self._uncommitted, 'changes', None)
+        if pending is None or pending[0] is not cursor:
+            pending = self._uncommitted.changes = (cursor, set())
+        return pending[1]
+    
+    def _notify_committed(self, cursor):
+        """Tell change_listeners which staff cursor's just-committed transaction changed"""
+        pending = getattr(self._uncommitted, 'changes', None)
+        self._uncommitted.changes = None
+        if pending is None or pending[0] is not cursor or not pending[1]:
+            return
+        staff_ids = pending[1]
+        for listener in self.change_listeners:
+            listener(None if None in staff_ids else staff_ids)
+    
+    def _log_changes(self, cursor, changes):
+        """Record (staff_id, action, day_of_week, old_data, new_data, changed_by) audit
+        rows as part of the caller's transaction.
+        
+        Normally they go straight into schedule_changes. With AUDIT_WRITE_BEHIND
+        the whole list is written as one audit_outbox row instead; it commits (or
+        rolls back) with the change itself, so a crash cannot lose it. The staff
+        weeks touched are marked pending in staff_notifications the same way,
+        for linked staff only - nobody else could be sent them. change_listeners hear of them once the caller commits - see
+        _notify_committed - and never if it rolls back.
+        """
+        if not changes:
+            return
+        self._uncommitted_ids(cursor).update(change[0] for change in changes)
+        weeks = sorted(changed_weeks(changes))
+        if weeks:
+            cursor.executemany('''
+                INSERT INTO staff_notifications (staff_id, week_start, pending, changed_at)
+                SELECT l.staff_id, %s, 1, CURRENT_TIMESTAMP FROM staff_links l WHERE l.staff_id = %s
+                ON DUPLICATE KEY UPDATE pending = staff_notifications.pending + 1, changed_at = CURRENT_TIMESTAMP
+            ''', [(week_start, staff_id) for staff_id, week_start in weeks])
+        if self.audit_write_behind:
+            cursor.execute('INSERT INTO audit_outbox (payload) VALUES (%s)', (json.dumps(changes),))
+            return
+        # executemany sends INSERT ... VALUES as one multi-row statement
+        cursor.executemany('''
+            INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by, schedule_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ''', [(staff_id, action, day_of_week, self._audit_value(old_data), self._audit_value(new_data), changed_by,
+               self._audit_date(old_data, new_data))
+              for staff_id, action, day_of_week, old_data, new_data, changed_by in changes])
+    
+    def drain_audit_outbox(self, limit=AUDIT_BATCH_SIZE):
+        """Move up to limit outbox rows into schedule_changes in one transaction.
+        
+        Audit rows keep the time of the original change. The outbox rows are
+        deleted in the same transaction, so each change is logged exactly once
+        even if the process dies mid-drain. Returns the number of audit rows written.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            # SKIP LOCKED: concurrent drainers (webhook workers) take disjoint rows
+            cursor.execute('''
+                SELECT id, payload, created_at FROM audit_outbox
+                ORDER BY id LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ''', (limit,))
+            outbox = cursor.fetchall()
+            if not outbox:
+                conn.rollback()
+                return 0
+            
+            rows = []
+            for _, payload, created_at in outbox:
+                for staff_id, action, day_of_week, old_data, new_data, changed_by in json.loads(payload):
+                    rows.append((staff_id, action, day_of_week, self._audit_value(old_data),
+                                 self._audit_value(new_data), changed_by, created_at,
+                                 self._audit_date(old_data, new_data)))
+            
+            cursor.executemany('''
+                INSERT INTO schedule_changes (staff_id, action, day_of_week, old_data, new_data, changed_by, changed_at, schedule_date)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ''', rows)
+            cursor.execute('DELETE FROM audit_outbox WHERE id IN ({})'.format(', '.join(['%s'] * len(outbox))),
+                           [row[0] for row in outbox])
+            conn.commit()
+            return len(rows)
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error draining audit outbox: {e}")
+            raise Exception(f"Error draining audit outbox: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def flush_audit_log(self):
+        """Drain the audit outbox until it is empty; returns the audit rows written"""
+        total = 0
+        while True:
+            written = self.drain_audit_outbox()
+            if not written:
+                return total
+            total += written
+    
+    def count_audit_outbox(self):
+        """Outbox rows not yet moved to schedule_changes"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT COUNT(*) FROM audit_outbox')
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def load_bot_state(self, kind):
+        """Load persisted bot state rows of one kind as {state_key: data}"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT state_key, data FROM bot_state WHERE kind = %s', (kind,))
+            return {state_key: bytes(data) for state_key, data in cursor.fetchall() if data is not None}
+        except Error as e:
+            logger.error(f"Error loading bot state: {e}")
+            raise Exception(f"Error loading bot state: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def save_bot_state(self, items):
+        """Write a batch of (kind, state_key, data) rows in one transaction; data None deletes"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            upserts = [(kind, state_key, data) for kind, state_key, data in items if data is not None]
+            deletes = [(kind, state_key) for kind, state_key, data in items if data is None]
+            if upserts:
+                cursor.executemany('''
+                    INSERT INTO bot_state (kind, state_key, data) VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE data = VALUES(data), updated_at = CURRENT_TIMESTAMP
+                ''', upserts)
+            if deletes:
+                cursor.executemany('DELETE FROM bot_state WHERE kind = %s AND state_key = %s', deletes)
+            conn.commit()
+            return True
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error saving bot state: {e}")
+            return False
+        finally:
+            cursor.close()
+            conn.close()
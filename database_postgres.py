@@ -3,7 +3,7 @@ import psycopg2
 import json
 from datetime import datetime, timedelta
 from psycopg2.extras import RealDictCursor
-from config import DATABASE_URL
+from config import DATABASE_URL, STAFF_LINK_HOURS
 
 class PostgreSQLManager:
     def __init__(self):
@@ -40,9 +40,41 @@ class PostgreSQLManager:
                 end_time TIME,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                version INTEGER NOT NULL DEFAULT 1,
                 UNIQUE(staff_id, day_of_week, schedule_date)
             )
         ''')
+        # Row version for optimistic concurrency (bumped on every write)
+        cursor.execute('ALTER TABLE schedules ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1')
+        
+        # Persisted bot state (conversation states, per-admin wizard data)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bot_state (
+                kind VARCHAR(64) NOT NULL,
+                state_key VARCHAR(255) NOT NULL,
+                data BYTEA,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (kind, state_key)
+            )
+        ''')
+        
+        # Telegram accounts linked to staff members, for the read-only staff commands
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS staff_links (
+                telegram_user_id BIGINT PRIMARY KEY,
+                staff_id INTEGER UNIQUE NOT NULL REFERENCES staff(id) ON DELETE CASCADE,
+                linked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Link codes already redeemed, each bound to the account that used it first
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS staff_link_codes (
+                code VARCHAR(64) PRIMARY KEY,
+                telegram_user_id BIGINT NOT NULL,
+                redeemed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
         
         # Create indexes for better performance
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_schedules_staff_id ON schedules(staff_id)')
@@ -85,6 +117,36 @@ class PostgreSQLManager:
         conn.close()
         return staff
     
+    def get_staff_page(self, after=None, limit=10):
+        """One page of staff by name with keyset pagination: (rows, next_cursor)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if after is None:
+            cursor.execute('SELECT id, name FROM staff ORDER BY name LIMIT %s', (limit + 1,))
+        else:
+            cursor.execute('SELECT id, name FROM staff WHERE name > %s ORDER BY name LIMIT %s', (after, limit + 1))
+        rows = cursor.fetchall()
+        conn.close()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1][1]
+        return rows, None
+    
+    def get_week_schedules_for_staff(self, staff_ids, week_start):
+        """(staff_id, day_of_week, is_working, start_time, end_time) rows of one week for some staff"""
+        if not staff_ids:
+            return []
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT staff_id, day_of_week, is_working, start_time, end_time
+            FROM schedules
+            WHERE staff_id = ANY(%s) AND schedule_date BETWEEN %s AND %s
+        ''', (list(staff_ids), week_start, week_start + timedelta(days=6)))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
     def get_staff_by_id(self, staff_id):
         """Get staff member by ID"""
         conn = self.get_connection()
@@ -94,6 +156,51 @@ class PostgreSQLManager:
         conn.close()
         return staff
     
+    def link_staff_user(self, staff_id, telegram_user_id, changed_by="STAFF", code=None):
+        """Link a Telegram account to a staff member, replacing either one's previous link.
+        
+        code, the link code redeemed, is bound to the first account that uses
+        it: False, with nothing changed, if another account already has.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if code is not None:
+            # Codes redeemed longer ago than a link lasts have expired anyway
+            cursor.execute("DELETE FROM staff_link_codes WHERE redeemed_at < NOW() - %s * INTERVAL '1 hour'", (STAFF_LINK_HOURS,))
+            cursor.execute('INSERT INTO staff_link_codes (code, telegram_user_id) VALUES (%s, %s) ON CONFLICT (code) DO NOTHING', (code, telegram_user_id))
+            cursor.execute('SELECT telegram_user_id FROM staff_link_codes WHERE code = %s', (code,))
+            if cursor.fetchone()[0] != telegram_user_id:
+                conn.rollback()
+                conn.close()
+                return False
+        cursor.execute('DELETE FROM staff_links WHERE telegram_user_id = %s OR staff_id = %s', (telegram_user_id, staff_id))
+        cursor.execute('INSERT INTO staff_links (telegram_user_id, staff_id) VALUES (%s, %s)', (telegram_user_id, staff_id))
+        conn.commit()
+        conn.close()
+        return True
+    
+    def unlink_staff_user(self, staff_id, changed_by="ADMIN"):
+        """Remove a staff member's Telegram link: True if there was one"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM staff_links WHERE staff_id = %s', (staff_id,))
+        removed = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return removed
+    
+    def get_linked_staff(self, telegram_user_id):
+        """(staff_id, name) of the staff member a Telegram account is linked to, or None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT s.id, s.name FROM staff_links l JOIN staff s ON s.id = l.staff_id
+            WHERE l.telegram_user_id = %s
+        ''', (telegram_user_id,))
+        staff = cursor.fetchone()
+        conn.close()
+        return staff
+    
     def save_schedule(self, staff_id, day_of_week, is_working, start_time=None, end_time=None, schedule_date=None):
         """Save or update a schedule for a staff member"""
         conn = self.get_connection()
@@ -108,7 +215,8 @@ class PostgreSQLManager:
                 is_working = EXCLUDED.is_working,
                 start_time = EXCLUDED.start_time,
                 end_time = EXCLUDED.end_time,
-                updated_at = CURRENT_TIMESTAMP
+                updated_at = CURRENT_TIMESTAMP,
+                version = schedules.version + 1
         ''', (staff_id, day_of_week, schedule_date, is_working, start_time, end_time))
         
         conn.commit()
@@ -284,6 +392,38 @@ class PostgreSQLManager:
             conn.close()
             raise Exception(f"Error getting current week schedules: {e}")
     
+    def load_bot_state(self, kind):
+        """Load persisted bot state rows of one kind as {state_key: data}"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT state_key, data FROM bot_state WHERE kind = %s', (kind,))
+        rows = cursor.fetchall()
+        conn.close()
+        return {state_key: bytes(data) for state_key, data in rows if data is not None}
+    
+    def save_bot_state(self, items):
+        """Write a batch of (kind, state_key, data) rows in one transaction; data None deletes"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            for kind, state_key, data in items:
+                if data is None:
+                    cursor.execute('DELETE FROM bot_state WHERE kind = %s AND state_key = %s', (kind, state_key))
+                else:
+                    cursor.execute('''
+                        INSERT INTO bot_state (kind, state_key, data, updated_at)
+                        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                        ON CONFLICT (kind, state_key) DO UPDATE SET data = EXCLUDED.data, updated_at = CURRENT_TIMESTAMP
+                    ''', (kind, state_key, psycopg2.Binary(data)))
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Error saving bot state: {e}")
+            return False
+        finally:
+            conn.close()
+    
     def migrate_from_sqlite(self, sqlite_db_path):
         """Migrate data from SQLite to PostgreSQL"""
         import sqlite3
@@ -0,0 +1,168 @@
+"""
+Small asyncio HTTP/1.1 server with keep-alive and request timeouts
+"""
+
+import json
+import asyncio
+import logging
+from urllib.parse import urlsplit, parse_qsl
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: 'OK', 204: 'No Content', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 408: 'Request Timeout', 413: 'Payload Too Large', 414: 'URI Too Long',
+    500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+class Request:
+    """One parsed HTTP request"""
+
+    def __init__(self, method, target, headers, body):
+        self.method = method
+        parts = urlsplit(target)
+        self.path = parts.path or '/'
+        self.query = dict(parse_qsl(parts.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b'null')
+
+
+class Response:
+    """Status, body and content type of a reply"""
+
+    def __init__(self, status=200, body=b'', content_type='text/plain; charset=utf-8'):
+        self.status = status
+        self.body = body if isinstance(body, bytes) else str(body).encode()
+        self.content_type = content_type
+
+
+def json_response(data, status=200):
+    """Response with a JSON body"""
+    return Response(status, json.dumps(data, default=str).encode(), 'application/json')
+
+
+class HTTPServer:
+    """Route (method, path) to async handlers that take a Request and return a Response.
+
+    Connections are kept alive between requests; an idle connection is closed
+    after keep_alive_timeout and a request that takes longer than
+    request_timeout to arrive is answered with 408. A request line longer
+    than the stream reader's limit gets 414 and the connection is closed.
+    """
+
+    def __init__(self, keep_alive_timeout=75.0, request_timeout=10.0, max_body_size=1024 * 1024):
+        self.keep_alive_timeout = keep_alive_timeout
+        self.request_timeout = request_timeout
+        self.max_body_size = max_body_size
+        self.routes = {}
+        self.requests_served = 0
+        self.open_connections = 0
+        self._server = None
+
+    def route(self, method, path, handler):
+        """Register handler for method + exact path"""
+        self.routes[(method.upper(), path)] = handler
+
+    async def start(self, host='0.0.0.0', port=8000):
+        """Start listening; returns the bound port (port 0 picks a free one)"""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop accepting connections"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader, request_line):
+        """Read the headers and body that follow request_line"""
+        try:
+            method, target, version = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise ValueError('malformed request line')
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            raise ValueError('chunked bodies are not supported')
+        length = int(headers.get('content-length') or 0)
+        if length > self.max_body_size:
+            raise OverflowError
+        body = await reader.readexactly(length) if length else b''
+        request = Request(method.upper(), target, headers, body)
+        request.keep_alive = (
+            version.strip().upper() == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        )
+        return request
+
+    async def _dispatch(self, request):
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self.routes):
+                return Response(405, 'Method Not Allowed')
+            return Response(404, 'Not Found')
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error(f"❌ Error handling {request.method} {request.path}: {e}", exc_info=True)
+            return Response(500, 'Internal Server Error')
+
+    def _write(self, writer, response, keep_alive):
+        writer.write(
+            f"HTTP/1.1 {response.status} {REASONS.get(response.status, 'OK')}\r\n"
+            f"Content-Type: {response.content_type}\r\n"
+            f"Content-Length: {len(response.body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"Keep-Alive: timeout={int(self.keep_alive_timeout)}\r\n\r\n".encode() + response.body
+        )
+
+    async def _handle_connection(self, reader, writer):
+        self.open_connections += 1
+        try:
+            while True:
+                # Wait (up to keep_alive_timeout) for the next request to start
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.keep_alive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except (ValueError, asyncio.LimitOverrunError):
+                    # Request line longer than the reader's limit
+                    self._write(writer, Response(414, 'URI Too Long'), False)
+                    break
+                if not request_line:
+                    break
+                # The rest of the request must arrive within request_timeout
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader, request_line), self.request_timeout)
+                except asyncio.TimeoutError:
+                    self._write(writer, Response(408, 'Request Timeout'), False)
+                    break
+                except OverflowError:
+                    self._write(writer, Response(413, 'Payload Too Large'), False)
+                    break
+                except (ValueError, asyncio.IncompleteReadError):
+                    self._write(writer, Response(400, 'Bad Request'), False)
+                    break
+
+                response = await self._dispatch(request)
+                self.requests_served += 1
+                self._write(writer, response, request.keep_alive)
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.open_connections -= 1
+            writer.close()
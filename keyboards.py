@@ -0,0 +1,105 @@
+"""
+Prebuilt keyboards - time pickers and menus built once per kind and selection, and message templates
+"""
+
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Time options of the step-by-step pickers (9:45 AM to 6 PM starts)
+PICKER_START_TIMES = ("09:45", "10:00", "11:00", "12:00", "13:00", "15:00", "15:30", "17:00", "18:00")
+PICKER_END_TIMES = ("14:00", "17:00", "18:00", "19:00", "20:00", "21:00")
+
+# Single-day start/end pickers of the day edit view
+DAY_START_TIMES = ("09:45", "10:00", "10:30", "11:00", "11:30", "12:00", "12:30", "13:00", "13:30", "14:00", "15:00",
+                   "15:30", "17:00", "18:00")
+DAY_END_TIMES = ("17:00", "17:30", "18:00", "18:30", "19:00", "19:30", "20:00", "20:30", "21:00")
+
+# Quarter hours for the "all selected days" pickers, and their ready-made ranges
+QUARTER_HOURS = tuple(f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in range(9 * 60 + 45, 21 * 60 + 1, 15))
+TIME_RANGES = (
+    "09:45 - 18:00", "10:00 - 18:00", "10:00 - 19:00", "10:00 - 20:00",
+    "11:00 - 19:00", "11:00 - 20:00", "12:00 - 20:00", "12:00 - 21:00",
+    "13:00 - 21:00", "14:00 - 21:00"
+)
+
+# Message templates, filled with str.format
+PICK_DAY_TIME_TEXT = "🕐 *Select {label} Time for {day}*\n\nStaff: {staff_name}\nDay: {day}\n\n*Choose {choice}:*"
+ALL_SELECTED_TEXT = (
+    "{icon} *Set {label} for All Selected Days*\n\n"
+    "Staff: {staff_name}\nDays: {days}\n\n"
+    "*Choose {choice} that will apply to all selected days:*"
+)
+
+
+def _rows(buttons, columns):
+    return [buttons[i:i + columns] for i in range(0, len(buttons), columns)]
+
+
+def _footer(footer):
+    return [[InlineKeyboardButton(text, callback_data=data) for text, data in row] for row in footer]
+
+
+def _time_section(header, header_data, times, prefix, selected):
+    buttons = [InlineKeyboardButton(f"{'✅' if time == selected else '🕐'} {time}", callback_data=f"{prefix}{time}")
+               for time in times]
+    return [[InlineKeyboardButton(header, callback_data=header_data)]] + _rows(buttons, 2)
+
+
+def time_picker(start_prefix, end_prefix, start_selected='', end_selected='', footer=()):
+    """Start and end time sections, two times per row, then footer rows of (text, callback_data).
+
+    start_prefix None leaves out the start section (end time still to pick).
+    """
+    keyboard = []
+    if start_prefix is not None:
+        keyboard += _time_section("🟩 Start Time", "header_start", PICKER_START_TIMES, start_prefix, start_selected)
+    keyboard += _time_section("🔺 End Time", "header_end", PICKER_END_TIMES, end_prefix, end_selected)
+    return InlineKeyboardMarkup(keyboard + _footer(footer))
+
+
+def end_time_row(selected=''):
+    """One row of end times, the chosen one ticked, and Cancel"""
+    row = [InlineKeyboardButton(f"{'✅' if time == selected else '🔺'} {time}", callback_data=f"end_{time}")
+           for time in PICKER_END_TIMES]
+    return InlineKeyboardMarkup([row, [InlineKeyboardButton("❌ Cancel", callback_data="cancel_time_setting")]])
+
+
+def time_grid(times, prefix, columns, back):
+    """A grid of 🕐 buttons calling prefix + time, then a back button (text, callback_data)"""
+    buttons = [InlineKeyboardButton(f"🕐 {time}", callback_data=f"{prefix}{time}") for time in times]
+    return InlineKeyboardMarkup(_rows(buttons, columns) + _footer(((back,),)))
+
+
+class RenderCache:
+    """Built keyboards and texts by builder and arguments, least recently used dropped first.
+
+    InlineKeyboardMarkup is immutable, so the markup built for one tap can go
+    out with every later tap that asks for the same builder and arguments.
+    Builders only see what is passed in - never user_data - so a cached
+    result is always the one they would build again.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, build, *args):
+        """build(*args), built on the first call with these arguments"""
+        key = (build, args)
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = self._entries[key] = build(*args)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def metrics(self):
+        """Size and counters for /metrics"""
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
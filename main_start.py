@@ -7,57 +7,14 @@ import os
 import sys
 import asyncio
 import logging
-import threading
-import time
 from datetime import datetime
 from dotenv import load_dotenv
-from flask import Flask, jsonify
 from bot_async import StaffSchedulerBot
 from database_factory import get_database_manager
 
 # Load environment variables
 load_dotenv()
 
-# Global flag to control the Flask server
-flask_app_running = False
-
-# Create Flask app for Railway health checks
-app = Flask(__name__)
-
-@app.route('/')
-def health_check():
-    """Health check endpoint for Railway"""
-    return jsonify({
-        "status": "healthy",
-        "service": "Staff Scheduler Bot v2.0",
-        "timestamp": time.time(),
-        "features": ["bulk_scheduling", "webhooks", "connection_pooling", "templates"]
-    })
-
-@app.route('/health')
-def detailed_health():
-    """Detailed health check"""
-    try:
-        # Test database connection
-        db = get_database_manager()
-        staff_count = len(db.get_all_staff())
-        
-        return jsonify({
-            "status": "healthy",
-            "service": "Staff Scheduler Bot v2.0",
-            "database": "connected",
-            "staff_count": staff_count,
-            "timestamp": time.time()
-        })
-    except Exception as e:
-        return jsonify({
-            "status": "unhealthy",
-            "service": "Staff Scheduler Bot v2.0",
-            "database": "error",
-            "error": str(e),
-            "timestamp": time.time()
-        }), 500
-
 def setup_logging():
     """Configure production logging"""
     log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
@@ -76,7 +33,6 @@ def setup_logging():
     logging.getLogger('httpx').setLevel(logging.WARNING)
     logging.getLogger('telegram').setLevel(logging.WARNING)
     logging.getLogger('mysql.connector').setLevel(logging.WARNING)
-    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # Flask logs
 
 def check_environment():
     """Validate environment configuration"""
@@ -161,21 +117,6 @@ def cleanup_duplicate_records():
         # Don't fail startup due to cleanup issues
         pass
 
-def run_health_server():
-    """Run Flask health check server for Railway in background"""
-    global flask_app_running
-    try:
-        port = int(os.getenv('PORT', 8000))
-        logger = logging.getLogger(__name__)
-        logger.info(f"🌐 Starting health check server on port {port}")
-        flask_app_running = True
-        app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
-    except Exception as e:
-        logger = logging.getLogger(__name__)
-        logger.error(f"❌ Health server error: {e}")
-    finally:
-        flask_app_running = False
-
 async def start_bot():
     """Start the bot with error handling"""
     logger = logging.getLogger(__name__)
@@ -211,12 +152,22 @@ def main():
     # ONE-TIME: Clean up duplicate records
     cleanup_duplicate_records()
     
-    # Start health check server in background thread (for Railway monitoring)
-    health_thread = threading.Thread(target=run_health_server, daemon=True)
-    health_thread.start()
-    logger.info("🌐 Health check server started in background thread")
+    # Multi-process webhook mode: the receiver serves health checks itself
+    webhook_workers = int(os.getenv('WEBHOOK_WORKERS', 1))
+    if os.getenv('WEBHOOK_URL') and webhook_workers > 1:
+        from webhook_workers import run_webhook_workers
+        logger.info(f"👷 Starting webhook receiver with {webhook_workers} worker processes")
+        try:
+            asyncio.run(run_webhook_workers(webhook_workers, os.getenv('WEBHOOK_URL')))
+            sys.exit(0)
+        except KeyboardInterrupt:
+            sys.exit(0)
+        except Exception as e:
+            logger.error(f"💥 Unhandled exception: {e}")
+            sys.exit(1)
     
-    # Run bot in main thread (required for asyncio signal handling)
+    # Run bot in main thread (required for asyncio signal handling);
+    # it serves the webhook and health checks on PORT itself
     try:
         success = asyncio.run(start_bot())
         sys.exit(0 if success else 1)
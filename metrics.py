@@ -0,0 +1,49 @@
+"""
+Process-wide metrics registry read by the /metrics endpoint
+"""
+
+import threading
+import time
+
+_lock = threading.Lock()
+_info = {}
+_gauges = {}
+_started_at = time.time()
+
+
+def set_info(name, values):
+    """Publish static settings (e.g. the HTTP client configuration) under name"""
+    with _lock:
+        _info[name] = dict(values)
+
+
+def register_gauge(name, read):
+    """Register a zero-argument callable that returns the current value of name"""
+    with _lock:
+        _gauges[name] = read
+
+
+def unregister_gauge(name):
+    """Remove a gauge (e.g. when the component that owns it shuts down)"""
+    with _lock:
+        _gauges.pop(name, None)
+
+
+def snapshot():
+    """Current values of all info blocks and gauges as a JSON-ready dict"""
+    with _lock:
+        info = {name: dict(values) for name, values in _info.items()}
+        gauges = dict(_gauges)
+
+    values = {}
+    for name, read in gauges.items():
+        try:
+            values[name] = read()
+        except Exception as e:
+            values[name] = f"error: {e}"
+
+    return {
+        'uptime_seconds': round(time.time() - _started_at, 1),
+        'info': info,
+        'gauges': values,
+    }
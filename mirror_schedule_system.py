@@ -48,25 +48,9 @@ class ScheduleMirror:
     
     def get_week_schedules(self, week_start):
         """Get all schedules for a specific week"""
-        week_dates = self.get_week_dates(week_start)
-        week_end = week_start + timedelta(days=6)
-        
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT s.staff_id, st.name, s.day_of_week, s.schedule_date, 
-                   s.is_working, s.start_time, s.end_time
-            FROM schedules s
-            JOIN staff st ON s.staff_id = st.id
-            WHERE s.schedule_date >= ? AND s.schedule_date <= ?
-            ORDER BY s.schedule_date, st.name
-        """, (week_start.strftime('%Y-%m-%d'), week_end.strftime('%Y-%m-%d')))
-        
-        schedules = cursor.fetchall()
-        conn.close()
-        
-        return schedules
+        schedules = self.db.get_current_week_schedules(week_start)
+        return [(staff_id, name, day, schedule_date, is_working, start_time, end_time)
+                for name, staff_id, day, schedule_date, is_working, start_time, end_time in schedules]
     
     def display_week_schedules(self, week_start, week_name):
         """Display schedules for a week"""
@@ -111,81 +95,32 @@ class ScheduleMirror:
     
     def mirror_week_schedules(self, source_week_start, target_week_start, week_name):
         """Mirror schedules from source week to target week"""
-        source_schedules = self.get_week_schedules(source_week_start)
-        target_week_dates = self.get_week_dates(target_week_start)
-        
         print(f"\n🔄 MIRRORING {week_name}")
         print("=" * 60)
         print(f"📅 From: {source_week_start} to {source_week_start + timedelta(days=6)}")
         print(f"📅 To: {target_week_start} to {target_week_start + timedelta(days=6)}")
         
-        if not source_schedules:
+        if not self.get_week_schedules(source_week_start):
             print("❌ No source schedules found to mirror")
             return
         
-        # Get staff mapping
-        staff_list = self.db.get_all_staff()
-        staff_id_map = {name: staff_id for staff_id, name in staff_list}
-        
-        # Use direct database connection
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        copied_count = 0
-        failed_count = 0
-        
         try:
-            for schedule in source_schedules:
-                staff_name = schedule[1]
-                day = schedule[2]
-                is_working = schedule[4]
-                start_time = schedule[5]
-                end_time = schedule[6]
-                
-                staff_id = staff_id_map.get(staff_name)
-                if not staff_id:
-                    print(f"❌ Staff ID not found for {staff_name}")
-                    failed_count += 1
-                    continue
-                
-                # Calculate new date for target week
-                day_index = DAYS_OF_WEEK.index(day)
-                new_date = target_week_start + timedelta(days=day_index)
-                
-                try:
-                    # Insert schedule
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO schedules 
-                        (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
-                    ''', (staff_id, day, new_date.strftime('%Y-%m-%d'), is_working, start_time, end_time))
-                    
-                    copied_count += 1
-                    status = f"{start_time}-{end_time}" if is_working else "OFF"
-                    print(f"✅ {staff_name} - {day} ({new_date}): {status}")
-                    
-                except Exception as e:
-                    failed_count += 1
-                    print(f"❌ Error copying {staff_name} - {day}: {e}")
-            
-            # Commit all changes
-            conn.commit()
-            print(f"\n💾 All changes committed to database")
-            
+            result = self.db.mirror_week(source_week_start, target_week_start, changed_by="MIRROR")
         except Exception as e:
-            conn.rollback()
             print(f"❌ Error during mirror operation: {e}")
-        finally:
-            conn.close()
+            return
         
         print(f"\n📊 MIRROR SUMMARY:")
-        print(f"✅ Successfully copied: {copied_count}")
-        print(f"❌ Failed: {failed_count}")
-        print(f"📅 Total: {len(source_schedules)}")
+        print(f"✅ Successfully copied: {result['copied']}")
+        print(f"➕ Not Set for new staff: {result['added']}")
+        print(f"⏭️ Already up to date: {result['unchanged']}")
+        if result['removed_staff']:
+            print(f"❌ Skipped removed staff: {', '.join(result['removed_staff'])}")
         
-        if copied_count > 0:
+        if result['copied'] or result['added']:
             print(f"\n🎉 SUCCESS! {week_name} mirrored to next week!")
             print(f"📅 Next week: {target_week_start} to {target_week_start + timedelta(days=6)}")
+        return result
     
     def edit_day_schedule(self, target_week_start, day):
         """Edit schedules for a specific day in the target week"""
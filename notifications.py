@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Staff notifications - per-staff week deltas, coalesced and sent to linked staff by a rate-limited background job
+"""
+
+import json
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter, Forbidden, BadRequest, TelegramError
+
+from config import DAYS_OF_WEEK, NOTIFY_WINDOW_SECONDS, NOTIFY_RATE, NOTIFY_BATCH
+from outbound_queue import TokenBucket
+from schedule_lookup import format_shift
+from staff_portal import week_start_of, week_cells, format_week
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_ACTIONS = ('ADD_SCHEDULE', 'UPDATE_SCHEDULE', 'CREATE_SCHEDULE', 'DELETE_SCHEDULE')
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def changed_weeks(changes):
+    """{(staff_id, week_start 'YYYY-MM-DD')} touched by (staff_id, action, day, old_data, new_data, changed_by) audit rows"""
+    weeks = set()
+    for staff_id, action, _, old_data, new_data, _ in changes:
+        data = new_data if isinstance(new_data, dict) else old_data
+        if not isinstance(data, dict) or not data.get('schedule_date'):
+            continue
+        week_start = week_start_of(_as_date(data['schedule_date'])).strftime('%Y-%m-%d')
+        if action in SCHEDULE_ACTIONS and staff_id is not None:
+            weeks.add((staff_id, week_start))
+        elif action == 'MIRROR_WEEK':
+            weeks.update((int(mirrored), week_start) for mirrored in data.get('days', {}))
+    return weeks
+
+
+def format_digest(name, week_start, sent, current):
+    """Message for a staff member's week: every day the first time, then only the days that changed.
+
+    sent is the week as last delivered (None: never), current as it is now;
+    both are {day: (is_working, start_time, end_time)}. None when nothing changed.
+    """
+    if sent is None:
+        if not current:
+            return None
+        return ("🔔 *Your new schedule*\n\n" + format_week(name, week_start, current)
+                + "\n\nSend /myshifts to see your upcoming shifts.")
+    lines = []
+    for offset, day in enumerate(DAYS_OF_WEEK):
+        if sent.get(day) != current.get(day):
+            before = format_shift(sent[day]) if day in sent else '—'
+            after = format_shift(current[day]) if day in current else '—'
+            date_label = (week_start + timedelta(days=offset)).strftime('%b %d')
+            lines.append(f"{day[:3]} {date_label}: {before} → {after}")
+    if not lines:
+        return None
+    return (f"🔔 *Schedule update* · week of {week_start.strftime('%B %d')}\n\n" + "\n".join(lines)
+            + "\n\nSend /myshifts to see your upcoming shifts.")
+
+
+class StaffNotifier:
+    """Sends linked staff the changes to their weeks, from the staff_notifications queue.
+
+    Every schedule write marks a linked staff member's week pending in the same transaction.
+    A run picks up weeks with no change for window seconds - so a burst of
+    edits becomes one digest - and compares each with the state last
+    delivered, which is saved with the delivery. A restart therefore only
+    sends what was never delivered. Sends go through a TokenBucket below
+    Telegram's limits; a RetryAfter that outlasts the outbound queue's
+    retries slows the bucket and leaves the rest for the next run.
+    """
+
+    def __init__(self, db, window=NOTIFY_WINDOW_SECONDS, rate=NOTIFY_RATE, batch=NOTIFY_BATCH):
+        self.db = db
+        self.window = window
+        self.batch = batch
+        self.bucket = TokenBucket(rate, max(1, rate))
+        self.stats = {'runs': 0, 'sent': 0, 'unchanged': 0, 'undeliverable': 0, 'retry_after': 0, 'errors': 0}
+
+    async def run(self, bot, current_week_start):
+        """Deliver up to batch due notifications for this week and later ones"""
+        self.stats['runs'] += 1
+        due = await asyncio.to_thread(self.db.get_due_notifications, self.window, current_week_start, self.batch)
+        for staff_id, name, telegram_user_id, week_start, pending, sent_state in due:
+            week_start = _as_date(week_start)
+            rows = await asyncio.to_thread(self.db.get_week_schedules_for_staff, [staff_id], week_start)
+            current = week_cells(rows)
+            # Nothing delivered yet, or only an empty week: the next message is the full week
+            sent = json.loads(sent_state) if sent_state else None
+            sent = {day: tuple(cell) for day, cell in sent.items()} if sent else None
+            text = format_digest(name, week_start, sent, current)
+            if text is None:
+                self.stats['unchanged'] += 1
+                await asyncio.to_thread(self.db.finish_notification, staff_id, week_start, pending, json.dumps(current))
+                continue
+
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id=telegram_user_id, text=text, parse_mode=ParseMode.MARKDOWN)
+            except RetryAfter as e:
+                self.stats['retry_after'] += 1
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                self.bucket.back_off(retry_after)
+                logger.warning(f"⏳ Notifications paused for {retry_after:.0f}s by flood control")
+                return
+            except (Forbidden, BadRequest) as e:
+                # Blocked the bot or never opened a chat: retrying would fail the same way
+                self.stats['undeliverable'] += 1
+                logger.warning(f"⚠️ Notification to staff {staff_id} not deliverable: {e}")
+                await asyncio.to_thread(self.db.finish_notification, staff_id, week_start, pending)
+                continue
+            except TelegramError as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Notification to staff {staff_id} failed, will retry: {e}")
+                continue
+            self.stats['sent'] += 1
+            self.bucket.recover()
+            await asyncio.to_thread(self.db.finish_notification, staff_id, week_start, pending, json.dumps(current))
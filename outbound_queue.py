@@ -0,0 +1,286 @@
+"""
+Outgoing Bot API queue - per-chat ordering, edit coalescing and flood-control backoff
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+from telegram.error import RetryAfter, BadRequest
+from telegram.ext import BaseRateLimiter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Methods that count against Telegram's message limits; everything else
+# (answerCallbackQuery, getMe, ...) goes straight through.
+LIMITED_ENDPOINTS = {
+    'sendMessage', 'sendDocument', 'sendPhoto', 'copyMessage', 'forwardMessage',
+    'editMessageText', 'editMessageReplyMarkup', 'editMessageCaption',
+}
+# Edits where only the newest pending call for a message matters
+COALESCED_ENDPOINTS = {'editMessageText', 'editMessageReplyMarkup', 'editMessageCaption'}
+
+TEXT_FIELDS = ('text', 'parse_mode', 'entities', 'link_preview_options', 'disable_web_page_preview')
+MAX_TRACKED_MESSAGES = 10000
+
+
+class TokenBucket:
+    """Token bucket with a temporary block for RetryAfter and an adaptive rate.
+
+    A rate of 0 disables the limit (blocks from RetryAfter still apply).
+    """
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            if self.rate <= 0:
+                return
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def try_acquire(self):
+        """Take a token if one is ready, without waiting: False when limited"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return False
+        if self.rate <= 0:
+            return True
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def back_off(self, retry_after):
+        """Telegram said slow down: pause, empty the bucket and halve the rate"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.tokens = 0.0
+        if self.max_rate > 0:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def recover(self):
+        """A request went through: creep back towards the configured rate"""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+    def is_idle(self):
+        """Full and not blocked: a new bucket would let the same burst through"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return False
+        return self.rate <= 0 or self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class OutboundMessageQueue(BaseRateLimiter):
+    """Rate limiter for ExtBot that queues outgoing calls per chat.
+
+    - Calls for one chat are sent in order, one at a time.
+    - A pending edit of a message is dropped when a newer edit of the same
+      message is queued behind it (the caller gets True back).
+    - Edits whose text and keyboard match what was last sent are skipped
+      instead of failing with "message is not modified".
+    - Global and per-chat token buckets; on RetryAfter the bucket pauses,
+      its rate is halved and recovers gradually on success.
+    """
+
+    def __init__(self, global_rate=30.0, global_burst=30, chat_rate=3.0, chat_burst=10, max_retries=3):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets = OrderedDict()  # Least recently used first
+        self._chat_locks = {}
+        self._chat_waiting = {}
+        self._edit_generations = {}
+        self._sent = OrderedDict()
+        self.stats = {'sent': 0, 'coalesced': 0, 'noop_skipped': 0, 'retry_after': 0}
+
+    async def initialize(self):
+        """Publish queue metrics"""
+        metrics.register_gauge('outbound_queue', self.metrics)
+
+    async def shutdown(self):
+        """Withdraw queue metrics"""
+        metrics.unregister_gauge('outbound_queue')
+
+    def queue_depth(self):
+        """Requests waiting to be sent"""
+        return sum(self._chat_waiting.values())
+
+    def metrics(self):
+        """Queue depth and counters for /metrics"""
+        return {
+            'depth': self.queue_depth(),
+            'chats_waiting': len(self._chat_waiting),
+            'chat_buckets': len(self._chat_buckets),
+            'global_rate': round(self.global_bucket.rate, 2),
+            **self.stats,
+        }
+
+    # ------------------------------------------------------------ helpers
+
+    @staticmethod
+    def _fingerprint(data, fields):
+        """Short hash of the given request fields"""
+        values = {}
+        for field in fields:
+            value = data.get(field)
+            if hasattr(value, 'to_dict'):
+                value = value.to_dict()
+            elif isinstance(value, (list, tuple)):
+                value = [item.to_dict() if hasattr(item, 'to_dict') else item for item in value]
+            values[field] = value
+        encoded = json.dumps(values, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+    @staticmethod
+    def _target(data):
+        """Key of the message a call creates or edits"""
+        if data.get('inline_message_id'):
+            return ('inline', data['inline_message_id'])
+        if data.get('message_id') is not None:
+            return (str(data.get('chat_id')), int(data['message_id']))
+        return None
+
+    def _remember(self, target, text_fp, markup_fp):
+        """Record what a message looks like after a successful call"""
+        self._sent[target] = (text_fp, markup_fp)
+        self._sent.move_to_end(target)
+        while len(self._sent) > MAX_TRACKED_MESSAGES:
+            self._sent.popitem(last=False)
+
+    def _is_noop(self, endpoint, target, text_fp, markup_fp):
+        """True when an edit would not change the message"""
+        previous = self._sent.get(target)
+        if previous is None:
+            return False
+        if endpoint == 'editMessageText':
+            return previous == (text_fp, markup_fp)
+        if endpoint == 'editMessageReplyMarkup':
+            return previous[1] == markup_fp
+        return False
+
+    def _chat_bucket(self, chat_key):
+        """The chat's TokenBucket, dropping idle buckets of chats that went quiet"""
+        bucket = self._chat_buckets.get(chat_key)
+        if bucket is not None:
+            self._chat_buckets.move_to_end(chat_key)
+            return bucket
+        while self._chat_buckets:
+            oldest_key, oldest = next(iter(self._chat_buckets.items()))
+            if not oldest.is_idle() and len(self._chat_buckets) < MAX_TRACKED_MESSAGES:
+                break
+            del self._chat_buckets[oldest_key]
+        bucket = self._chat_buckets[chat_key] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    # ------------------------------------------------------------ queue
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        """Queue, coalesce, rate-limit and retry one Bot API call"""
+        if endpoint not in LIMITED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+
+        chat_key = str(data.get('chat_id') or data.get('inline_message_id') or '')
+        target = self._target(data)
+        generation = None
+        if endpoint in COALESCED_ENDPOINTS and target is not None:
+            edit_key = (endpoint, target)
+            generation = self._edit_generations.get(edit_key, 0) + 1
+            self._edit_generations[edit_key] = generation
+
+        lock = self._chat_locks.get(chat_key)
+        if lock is None:
+            lock = self._chat_locks[chat_key] = asyncio.Lock()
+        self._chat_waiting[chat_key] = self._chat_waiting.get(chat_key, 0) + 1
+        waiting = True
+        try:
+            async with lock:
+                self._chat_waiting[chat_key] -= 1
+                waiting = False
+                if generation is not None:
+                    if self._edit_generations.get(edit_key) != generation:
+                        # A newer edit of this message is queued; it wins
+                        self.stats['coalesced'] += 1
+                        return True
+                    del self._edit_generations[edit_key]
+                return await self._send(callback, args, kwargs, endpoint, data, rate_limit_args, chat_key, target)
+        finally:
+            if waiting:
+                self._chat_waiting[chat_key] -= 1
+            if not self._chat_waiting.get(chat_key):
+                self._chat_waiting.pop(chat_key, None)
+                if not lock.locked():
+                    self._chat_locks.pop(chat_key, None)
+
+    async def _send(self, callback, args, kwargs, endpoint, data, rate_limit_args, chat_key, target):
+        """Send one call, skipping no-op edits and backing off on RetryAfter"""
+        text_fp = self._fingerprint(data, TEXT_FIELDS)
+        markup_fp = self._fingerprint(data, ('reply_markup',))
+        if target is not None and self._is_noop(endpoint, target, text_fp, markup_fp):
+            self.stats['noop_skipped'] += 1
+            return True
+
+        chat_bucket = self._chat_bucket(chat_key)
+        max_retries = rate_limit_args if isinstance(rate_limit_args, int) else self.max_retries
+        for attempt in range(max_retries + 1):
+            await self.global_bucket.acquire()
+            await chat_bucket.acquire()
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.stats['retry_after'] += 1
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                chat_bucket.back_off(retry_after)
+                self.global_bucket.back_off(0)
+                if attempt == max_retries:
+                    logger.warning(f"⚠️ {endpoint} still rate limited after {max_retries} retries")
+                    raise
+                logger.info(f"⏳ {endpoint} hit flood control, retrying in {retry_after:.1f}s")
+                continue
+            except BadRequest as e:
+                if 'message is not modified' in str(e).lower():
+                    self.stats['noop_skipped'] += 1
+                    return True
+                raise
+
+            self.stats['sent'] += 1
+            chat_bucket.recover()
+            self.global_bucket.recover()
+            self._record(endpoint, target, text_fp, markup_fp, data, result)
+            return result
+
+    def _record(self, endpoint, target, text_fp, markup_fp, data, result):
+        """Update what we know about the message after a successful call"""
+        if endpoint == 'sendMessage' and isinstance(result, dict) and 'message_id' in result:
+            self._remember((str(data.get('chat_id')), int(result['message_id'])), text_fp, markup_fp)
+        elif target is None:
+            return
+        elif endpoint == 'editMessageText':
+            self._remember(target, text_fp, markup_fp)
+        elif endpoint == 'editMessageReplyMarkup' and target in self._sent:
+            self._remember(target, self._sent[target][0], markup_fp)
+        else:
+            self._sent.pop(target, None)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Inline schedule lookups - an in-memory index per week answering day, staff name and time queries
+"""
+
+import re
+import time
+import bisect
+import threading
+from datetime import timedelta
+
+from telegram.helpers import escape_markdown
+
+from config import DAYS_OF_WEEK, INLINE_RESULTS_LIMIT, SCHEDULE_VIEW_CACHE_SECONDS
+from validators import ScheduleValidator
+
+TIME_QUERY = re.compile(r'^(\d{1,2})(?::?(\d{2}))?$')
+NEXT_WEEK_WORDS = ('next', 'nextweek')
+
+
+def parse_query(text, today):
+    """(week_offset, days, times, name_prefixes) from a query such as 'fri', 'bea mon', '17:00 next'.
+
+    A word that starts a day name (two letters or more), 'today' or
+    'tomorrow' picks days; 'next' looks at next week; 9, 930 or 17:00 is a
+    time; anything else is the start of a staff name.
+    """
+    week_offset, days, times, names = 0, [], [], []
+    for word in text.lower().split():
+        match = TIME_QUERY.match(word)
+        if word in NEXT_WEEK_WORDS:
+            week_offset = 1
+        elif word in ('today', 'tomorrow'):
+            day = today + timedelta(days=1 if word == 'tomorrow' else 0)
+            if day.weekday() == 6 and day != today:
+                week_offset = 1  # Saturday's tomorrow starts the next week
+            days.append(DAYS_OF_WEEK[(day.weekday() + 1) % 7])
+        elif len(word) >= 2 and any(day.lower().startswith(word) for day in DAYS_OF_WEEK):
+            days.extend(day for day in DAYS_OF_WEEK if day.lower().startswith(word))
+        elif match and int(match.group(1)) < 24:
+            times.append(f"{int(match.group(1)):02d}:{match.group(2) or '00'}")
+        else:
+            names.append(word)
+    return week_offset, days, times, names
+
+
+def format_shift(cell):
+    """'10:00-18:00', 'Off' or 'Not Set'"""
+    is_working, start_time, end_time = cell
+    if not is_working:
+        return 'Off'
+    return f"{start_time}-{end_time}" if start_time and end_time else 'Not Set'
+
+
+class WeekIndex:
+    """One week's schedules laid out for lookups: by day, by staff name prefix and by start/end time"""
+
+    def __init__(self, week_start, staff, rows):
+        self.week_start = week_start
+        self.names = {staff_id: name for staff_id, name in staff}
+        self.days = {staff_id: {} for staff_id in self.names}
+        self.by_time = {}  # 'HH:MM' -> [(day, staff_id)] starting or finishing then
+        for name, staff_id, day, _, is_working, start_time, end_time in rows:
+            self.names.setdefault(staff_id, name)
+            cell = (bool(is_working), ScheduleValidator._format_time_value(start_time),
+                    ScheduleValidator._format_time_value(end_time))
+            self.days.setdefault(staff_id, {})[day] = cell
+            if cell[0]:
+                for moment in {cell[1], cell[2]} - {None}:
+                    self.by_time.setdefault(moment, []).append((day, staff_id))
+        # Every word of every name, sorted, so a prefix is one bisect away
+        self.words = sorted((word, staff_id) for staff_id, name in self.names.items()
+                            for word in set(name.lower().split()) | {name.lower()})
+
+    def staff_matching(self, prefix):
+        """Ids of staff with a name word starting with prefix, by name"""
+        found = set()
+        for word, staff_id in self.words[bisect.bisect_left(self.words, (prefix,)):]:
+            if not word.startswith(prefix):
+                break
+            found.add(staff_id)
+        return sorted(found, key=lambda staff_id: self.names[staff_id].lower())
+
+    def day_date(self, day):
+        return self.week_start + timedelta(days=DAYS_OF_WEEK.index(day))
+
+    def day_result(self, day):
+        """Who works a day, earliest start first, and who is off"""
+        working = sorted(((cell[1] or '', self.names[staff_id], cell) for staff_id, days in self.days.items()
+                          for d, cell in days.items() if d == day and cell[0]))
+        off = sorted(self.names[staff_id] for staff_id, days in self.days.items()
+                     if day in days and not days[day][0])
+        label = f"{day}, {self.day_date(day).strftime('%B %d')}"
+        text = f"📅 *{label}*\n\n"
+        text += "".join(f"✅ {escape_markdown(name)}: {format_shift(cell)}\n" for _, name, cell in working)
+        if off:
+            text += f"\n🔴 *Off:* {escape_markdown(', '.join(off))}\n"
+        if not working and not off:
+            text += "No schedules for this day.\n"
+        description = ', '.join(f"{name} {format_shift(cell)}" for _, name, cell in working[:6]) or 'Nobody working'
+        return f"{self.week_start}:day:{day}", f"{label} — {len(working)} working", description, text
+
+    def staff_result(self, staff_id, days=None):
+        """A staff member's week, or only the given days"""
+        name = self.names[staff_id]
+        shown = [day for day in DAYS_OF_WEEK if not days or day in days]
+        cells = self.days.get(staff_id, {})
+        lines = [f"{day[:3]} {self.day_date(day).strftime('%b %d')}: {format_shift(cells[day]) if day in cells else '—'}"
+                 for day in shown]
+        text = f"👤 *{escape_markdown(name)}* · week of {self.week_start.strftime('%B %d')}\n\n" + "\n".join(lines)
+        description = ' · '.join(f"{day[:3]} {format_shift(cells[day])}" for day in shown if day in cells) or 'No schedule'
+        return f"{self.week_start}:staff:{staff_id}:{''.join(day[:2] for day in shown)}", name, description, text
+
+    def time_result(self, moment, days=None):
+        """Who starts or finishes at a time, day by day"""
+        starts, ends = {}, {}
+        for day, staff_id in self.by_time.get(moment, []):
+            if days and day not in days:
+                continue
+            cell = self.days[staff_id][day]
+            target = starts if cell[1] == moment else ends
+            target.setdefault(day, []).append(self.names[staff_id])
+            if cell[1] == moment == cell[2]:
+                ends.setdefault(day, []).append(self.names[staff_id])
+        text = f"🕐 *{moment}* · week of {self.week_start.strftime('%B %d')}\n\n"
+        for day in DAYS_OF_WEEK:
+            if day in starts or day in ends:
+                text += f"*{day}*\n"
+                if day in starts:
+                    text += f"  🟩 Start: {escape_markdown(', '.join(sorted(starts[day])))}\n"
+                if day in ends:
+                    text += f"  🔺 End: {escape_markdown(', '.join(sorted(ends[day])))}\n"
+        starting, finishing = sum(map(len, starts.values())), sum(map(len, ends.values()))
+        if not starting and not finishing:
+            text += "Nobody starts or finishes then.\n"
+        title = f"{moment} · week of {self.week_start.strftime('%b %d')}"
+        result_id = f"{self.week_start}:time:{moment}:{''.join(day[:2] for day in days or [])}"
+        return result_id, title, f"{starting} starting, {finishing} finishing", text
+
+    def search(self, days, times, names, today_day=None, limit=INLINE_RESULTS_LIMIT):
+        """[(result_id, title, description, message_text)] for a parsed query"""
+        if names:
+            matches = None
+            for prefix in names:
+                found = self.staff_matching(prefix)
+                matches = found if matches is None else [staff_id for staff_id in matches if staff_id in found]
+            return [self.staff_result(staff_id, days) for staff_id in matches[:limit]]
+        if times:
+            return [self.time_result(moment, days) for moment in list(dict.fromkeys(times))[:limit]]
+        days = days or [today_day or DAYS_OF_WEEK[0]]
+        return [self.day_result(day) for day in dict.fromkeys(days)][:limit]
+
+
+class WeekIndexCache:
+    """WeekIndex by week start, rebuilt after any schedule change.
+
+    DB managers call invalidate() once a write commits, like the overview's
+    FragmentCache; max_age bounds how long writes made by other processes
+    go unseen. An index whose rows were read before a commit is either
+    refused by get() - the generation moved on - or cleared by the
+    invalidate() that follows the commit, so it never outlives it.
+    """
+
+    def __init__(self, max_weeks=4, max_age=SCHEDULE_VIEW_CACHE_SECONDS):
+        self.max_weeks = max_weeks
+        self.max_age = max_age
+        self.generation = 0
+        self.builds = 0
+        self._weeks = {}
+        self._lock = threading.Lock()
+
+    def get(self, db, week_start):
+        """The week's index, built with two queries when missing or stale"""
+        with self._lock:
+            entry = self._weeks.get(week_start)
+            if entry and time.monotonic() - entry[0] <= self.max_age:
+                return entry[1]
+            generation = self.generation
+        index = WeekIndex(week_start, db.get_all_staff(), db.get_current_week_schedules(week_start))
+        with self._lock:
+            self.builds += 1
+            if generation == self.generation:
+                self._weeks[week_start] = (time.monotonic(), index)
+                while len(self._weeks) > self.max_weeks:
+                    del self._weeks[min(self._weeks)]
+        return index
+
+    def invalidate(self, staff_ids=None):
+        """Drop every week: a change to anyone alters day and time answers too"""
+        with self._lock:
+            self.generation += 1
+            self._weeks.clear()
+
+
+def lookup(cache, db, text, today, week_start):
+    """Inline answers for a query typed on a given day; week_start is this week's Sunday"""
+    week_offset, days, times, names = parse_query(text, today)
+    index = cache.get(db, week_start + timedelta(days=7 * week_offset))
+    return index.search(days, times, names, DAYS_OF_WEEK[(today.weekday() + 1) % 7])
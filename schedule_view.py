@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Schedules overview pages - keyset-paged staff with cached per-staff text fragments
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+from config import DAYS_OF_WEEK, SCHEDULES_PAGE_SIZE, SCHEDULE_VIEW_CACHE_SECONDS
+from validators import ScheduleValidator
+
+
+def format_staff_fragment(name, days):
+    """One staff member's block of the overview: a line per day and a summary.
+
+    days is {day: (is_working, start_time, end_time)}; missing days are Not Set.
+    """
+    text = f"*{name}:*\n"
+    working_days = off_days = incomplete_days = 0
+    for day in DAYS_OF_WEEK:
+        is_working, start_time, end_time = days.get(day, (True, None, None))
+        start_time = ScheduleValidator._format_time_value(start_time)
+        end_time = ScheduleValidator._format_time_value(end_time)
+        if is_working and start_time and end_time:
+            text += f"  {day}: ✅ {start_time}-{end_time}\n"
+            working_days += 1
+        elif not is_working:
+            text += f"  {day}: 🔴 OFF\n"
+            off_days += 1
+        else:
+            text += f"  {day}: ⏰ Not Set\n"
+            incomplete_days += 1
+    text += f"  📊 *Summary:* {working_days} working, {off_days} off, {incomplete_days} incomplete\n\n"
+    return text
+
+
+class FragmentCache:
+    """Rendered staff fragments by (staff_id, week_start), dropped when that staff member changes.
+
+    DB managers call invalidate() once a write commits, so this process's
+    own writes show at once; a fragment rendered from rows read before that
+    commit carries an older generation and put() drops it. max_age bounds
+    how long writes made by other processes (webhook workers) can go unseen.
+    """
+
+    def __init__(self, max_entries=2000, max_age=SCHEDULE_VIEW_CACHE_SECONDS):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.generation = 0  # Bumped by every invalidation
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()  # Writes can come from worker threads
+
+    def get(self, staff_id, week_start):
+        """The cached fragment, or None"""
+        with self._lock:
+            entry = self._entries.get((staff_id, week_start))
+            if entry is None or time.monotonic() - entry[0] > self.max_age:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((staff_id, week_start))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, staff_id, week_start, fragment, generation):
+        """Cache a fragment read at generation, unless something changed since"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[(staff_id, week_start)] = (time.monotonic(), fragment)
+            self._entries.move_to_end((staff_id, week_start))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, staff_ids=None):
+        """Drop the fragments of these staff (None: everyone)"""
+        with self._lock:
+            self.generation += 1
+            if staff_ids is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in staff_ids]:
+                del self._entries[key]
+
+
+def render_page(db, cache, week_start, after=None, limit=SCHEDULES_PAGE_SIZE):
+    """One page of the overview: (staff [(id, name)], fragments, next_cursor).
+
+    Staff come from one keyset query, and only staff without a cached
+    fragment have their week read - in one query for the page - so a page
+    costs the same however long the roster is.
+    """
+    staff, next_cursor = db.get_staff_page(after, limit)
+    fragments = {staff_id: cache.get(staff_id, week_start) for staff_id, _ in staff}
+    missing = [staff_id for staff_id, fragment in fragments.items() if fragment is None]
+    if missing:
+        generation = cache.generation
+        days = {staff_id: {} for staff_id in missing}
+        for staff_id, day_of_week, is_working, start_time, end_time in db.get_week_schedules_for_staff(missing, week_start):
+            days[staff_id][day_of_week] = (is_working, start_time, end_time)
+        for staff_id, name in staff:
+            if staff_id in days:
+                fragments[staff_id] = format_staff_fragment(name, days[staff_id])
+                cache.put(staff_id, week_start, fragments[staff_id], generation)
+    return staff, [fragments[staff_id] for staff_id, _ in staff], next_cursor
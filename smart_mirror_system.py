@@ -5,7 +5,6 @@ Smart Mirror System for Telegram Bot - Handles adding/removing staff intelligent
 
 import sys
 import os
-import sqlite3
 from datetime import datetime, timedelta
 import pytz
 
@@ -13,7 +12,7 @@ import pytz
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database_factory import get_database_manager
-from config import DAYS_OF_WEEK, DATABASE_PATH
+from config import DAYS_OF_WEEK
 
 class SmartMirrorSystem:
     def __init__(self):
@@ -48,23 +47,8 @@ class SmartMirrorSystem:
     
     def get_week_staff(self, week_start):
         """Get all staff who have schedules in a specific week"""
-        week_end = week_start + timedelta(days=6)
-        
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT DISTINCT s.staff_id, st.name
-            FROM schedules s
-            JOIN staff st ON s.staff_id = st.id
-            WHERE s.schedule_date >= ? AND s.schedule_date <= ?
-            ORDER BY st.name
-        """, (week_start.strftime('%Y-%m-%d'), week_end.strftime('%Y-%m-%d')))
-        
-        staff_list = cursor.fetchall()
-        conn.close()
-        
-        return staff_list
+        staff = {(staff_id, name) for staff_id, name, *_ in self.get_week_schedules(week_start)}
+        return sorted(staff, key=lambda member: member[1])
     
     def get_current_staff(self):
         """Get all current staff members"""
@@ -72,176 +56,41 @@ class SmartMirrorSystem:
     
     def get_week_schedules(self, week_start):
         """Get all schedules for a specific week"""
-        week_end = week_start + timedelta(days=6)
-        
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT s.staff_id, st.name, s.day_of_week, s.schedule_date, 
-                   s.is_working, s.start_time, s.end_time
-            FROM schedules s
-            JOIN staff st ON s.staff_id = st.id
-            WHERE s.schedule_date >= ? AND s.schedule_date <= ?
-            ORDER BY s.schedule_date, st.name
-        """, (week_start.strftime('%Y-%m-%d'), week_end.strftime('%Y-%m-%d')))
-        
-        schedules = cursor.fetchall()
-        conn.close()
-        
-        return schedules
+        schedules = self.db.get_current_week_schedules(week_start)
+        return [(staff_id, name, day, schedule_date, is_working, start_time, end_time)
+                for name, staff_id, day, schedule_date, is_working, start_time, end_time in schedules]
     
     def smart_mirror_week(self, source_week_start, target_week_start, week_name):
-        """Smart mirror with add/remove staff handling"""
+        """Smart mirror with add/remove staff handling, as one set-based copy in the database"""
         print(f"\n🔄 SMART MIRRORING {week_name}")
         print("=" * 60)
         print(f"📅 From: {source_week_start} to {source_week_start + timedelta(days=6)}")
         print(f"📅 To: {target_week_start} to {target_week_start + timedelta(days=6)}")
         
-        # Get source week staff and schedules
-        source_staff = self.get_week_staff(source_week_start)
-        source_schedules = self.get_week_schedules(source_week_start)
-        
-        # Get current staff
-        current_staff = self.get_current_staff()
-        
-        # Create staff mappings
-        source_staff_names = {name for _, name in source_staff}
-        current_staff_names = {name for _, name in current_staff}
-        current_staff_id_map = {name: staff_id for staff_id, name in current_staff}
-        
-        # Calculate differences
-        added_staff = current_staff_names - source_staff_names
-        removed_staff = source_staff_names - current_staff_names
-        existing_staff = source_staff_names & current_staff_names
+        result = self.db.mirror_week(source_week_start, target_week_start, changed_by="SMART_MIRROR")
         
         print(f"\n📊 STAFF ANALYSIS:")
-        print(f"✅ Existing staff: {len(existing_staff)}")
-        print(f"➕ Added staff: {len(added_staff)}")
-        print(f"❌ Removed staff: {len(removed_staff)}")
-        
-        if existing_staff:
-            print(f"\n👥 Existing staff: {', '.join(sorted(existing_staff))}")
-        
-        if added_staff:
-            print(f"\n➕ Added staff: {', '.join(sorted(added_staff))}")
-        
-        if removed_staff:
-            print(f"\n❌ Removed staff: {', '.join(sorted(removed_staff))}")
-        
-        # Use direct database connection
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        copied_count = 0
-        added_count = 0
-        failed_count = 0
-        
-        try:
-            # 1. Copy existing staff schedules
-            if source_schedules:
-                print(f"\n🔄 Copying existing staff schedules...")
-                for schedule in source_schedules:
-                    staff_name = schedule[1]
-                    day = schedule[2]
-                    is_working = schedule[4]
-                    start_time = schedule[5]
-                    end_time = schedule[6]
-                    
-                    # Only copy if staff still exists
-                    if staff_name in existing_staff:
-                        staff_id = current_staff_id_map.get(staff_name)
-                        if not staff_id:
-                            print(f"❌ Staff ID not found for {staff_name}")
-                            failed_count += 1
-                            continue
-                        
-                        # Calculate new date for target week
-                        day_index = DAYS_OF_WEEK.index(day)
-                        new_date = target_week_start + timedelta(days=day_index)
-                        
-                        try:
-                            # Insert schedule
-                            cursor.execute('''
-                                INSERT OR REPLACE INTO schedules 
-                                (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, created_at, updated_at)
-                                VALUES (?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
-                            ''', (staff_id, day, new_date.strftime('%Y-%m-%d'), is_working, start_time, end_time))
-                            
-                            copied_count += 1
-                            status = f"{start_time}-{end_time}" if is_working else "OFF"
-                            print(f"✅ {staff_name} - {day} ({new_date}): {status}")
-                            
-                        except Exception as e:
-                            failed_count += 1
-                            print(f"❌ Error copying {staff_name} - {day}: {e}")
-            
-            # 2. Add new staff with "Not Set" for all days
-            if added_staff:
-                print(f"\n➕ Adding new staff with 'Not Set' schedules...")
-                for staff_name in added_staff:
-                    staff_id = current_staff_id_map.get(staff_name)
-                    if not staff_id:
-                        print(f"❌ Staff ID not found for {staff_name}")
-                        failed_count += 1
-                        continue
-                    
-                    # Add "Not Set" schedule for all days
-                    for day in DAYS_OF_WEEK:
-                        day_index = DAYS_OF_WEEK.index(day)
-                        new_date = target_week_start + timedelta(days=day_index)
-                        
-                        try:
-                            # Insert "Not Set" schedule (is_working=1, but no times)
-                            cursor.execute('''
-                                INSERT OR REPLACE INTO schedules 
-                                (staff_id, day_of_week, schedule_date, is_working, start_time, end_time, created_at, updated_at)
-                                VALUES (?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
-                            ''', (staff_id, day, new_date.strftime('%Y-%m-%d'), 1, '', ''))
-                            
-                            added_count += 1
-                            print(f"➕ {staff_name} - {day} ({new_date}): Not Set")
-                            
-                        except Exception as e:
-                            failed_count += 1
-                            print(f"❌ Error adding {staff_name} - {day}: {e}")
-            
-            # Commit all changes
-            conn.commit()
-            print(f"\n💾 All changes committed to database")
-            
-        except Exception as e:
-            conn.rollback()
-            print(f"❌ Error during smart mirror operation: {e}")
-        finally:
-            conn.close()
+        print(f"✅ Existing staff: {len(result['existing_staff'])}")
+        print(f"➕ Added staff: {len(result['added_staff'])}")
+        print(f"❌ Removed staff: {len(result['removed_staff'])}")
         
-        # Summary
         print(f"\n📊 SMART MIRROR SUMMARY:")
-        print(f"✅ Copied existing schedules: {copied_count}")
-        print(f"➕ Added new staff schedules: {added_count}")
-        print(f"❌ Failed operations: {failed_count}")
-        print(f"📅 Total operations: {copied_count + added_count + failed_count}")
+        print(f"✅ Copied existing schedules: {result['copied']}")
+        print(f"➕ Added new staff schedules: {result['added']}")
+        print(f"⏭️ Already up to date: {result['unchanged']}")
         
-        if added_staff or removed_staff:
+        if result['added_staff'] or result['removed_staff']:
             print(f"\n📋 STAFF CHANGES:")
-            if added_staff:
-                print(f"➕ Added: {', '.join(sorted(added_staff))}")
-            if removed_staff:
-                print(f"❌ Removed: {', '.join(sorted(removed_staff))}")
+            if result['added_staff']:
+                print(f"➕ Added: {', '.join(result['added_staff'])}")
+            if result['removed_staff']:
+                print(f"❌ Removed: {', '.join(result['removed_staff'])}")
         
-        if copied_count > 0 or added_count > 0:
+        if result['copied'] or result['added']:
             print(f"\n🎉 SUCCESS! {week_name} smart mirrored to next week!")
             print(f"📅 Next week: {target_week_start} to {target_week_start + timedelta(days=6)}")
         
-        return {
-            'copied': copied_count,
-            'added': added_count,
-            'failed': failed_count,
-            'added_staff': list(added_staff),
-            'removed_staff': list(removed_staff),
-            'existing_staff': list(existing_staff)
-        }
+        return result
     
     def get_mirror_summary_text(self, result):
         """Get formatted summary text for Telegram"""
@@ -249,7 +98,7 @@ class SmartMirrorSystem:
         
         text += f"✅ *Copied existing schedules:* {result['copied']}\n"
         text += f"➕ *Added new staff schedules:* {result['added']}\n"
-        text += f"❌ *Failed operations:* {result['failed']}\n\n"
+        text += f"⏭️ *Already up to date:* {result['unchanged']}\n\n"
         
         if result['added_staff']:
             text += f"➕ *Added staff:* {', '.join(result['added_staff'])}\n"
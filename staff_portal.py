@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Staff self-service - signed link codes, cached per-staff /myshifts and /week answers and per-user rate limits
+"""
+
+import hmac
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from telegram.helpers import escape_markdown
+
+from config import DAYS_OF_WEEK, STAFF_CACHE_SECONDS, STAFF_RATE, STAFF_BURST
+from outbound_queue import TokenBucket
+from schedule_lookup import format_shift
+from schedule_view import FragmentCache
+from validators import ScheduleValidator
+
+LINK_PREFIX = 'link-'
+
+
+def _link_mac(body, secret):
+    return hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def link_code(staff_id, secret, expires):
+    """/start payload that links whoever sends it first to staff_id until expires (unix time).
+
+    It is signed with secret (the bot token), so any process can check it
+    and nothing is stored until it is used. The DB managers then bind it to
+    that account, so a forwarded link cannot link a second one.
+    """
+    body = f"{staff_id}-{int(expires):x}"
+    return f"{LINK_PREFIX}{body}-{_link_mac(body, secret)}"
+
+
+def read_link_code(code, secret, now):
+    """The staff id of a link code, or None if it is mangled, forged or expired"""
+    parts = code[len(LINK_PREFIX):].split('-') if code.startswith(LINK_PREFIX) else []
+    if len(parts) != 3:
+        return None
+    staff_id, expires, mac = parts
+    if not hmac.compare_digest(mac, _link_mac(f"{staff_id}-{expires}", secret)):
+        return None
+    try:
+        return int(staff_id) if int(expires, 16) >= now else None
+    except ValueError:
+        return None
+
+
+def week_start_of(day):
+    """The Sunday a date's week starts on"""
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+
+def week_cells(rows):
+    """{day: (is_working, start_time, end_time)} from get_week_schedules_for_staff rows"""
+    return {day: (bool(is_working), ScheduleValidator._format_time_value(start_time),
+                  ScheduleValidator._format_time_value(end_time))
+            for _, day, is_working, start_time, end_time in rows}
+
+
+def format_week(name, week_start, cells):
+    """A staff member's week, a line per day"""
+    lines = []
+    for offset, day in enumerate(DAYS_OF_WEEK):
+        date = week_start + timedelta(days=offset)
+        lines.append(f"{day[:3]} {date.strftime('%b %d')}: {format_shift(cells[day]) if day in cells else '—'}")
+    return f"👤 *{escape_markdown(name)}* · week of {week_start.strftime('%B %d')}\n\n" + "\n".join(lines)
+
+
+def format_upcoming(name, today, weeks):
+    """Working days from today on, over weeks [(week_start, cells)]"""
+    lines = []
+    for week_start, cells in weeks:
+        for offset, day in enumerate(DAYS_OF_WEEK):
+            date = week_start + timedelta(days=offset)
+            if date >= today and day in cells and cells[day][0]:
+                marker = " (today)" if date == today else ""
+                lines.append(f"{day[:3]} {date.strftime('%b %d')}: {format_shift(cells[day])}{marker}")
+    text = f"🗓️ *Upcoming shifts for {escape_markdown(name)}*\n\n"
+    return text + ("\n".join(lines) if lines else "No shifts scheduled for the next two weeks.")
+
+
+class StaffPortal:
+    """Reads for linked staff: who a Telegram user is, their answers, and whether they may ask now.
+
+    Links and answers are kept per process and dropped when that staff
+    member changes - DB managers call invalidate() once a write commits,
+    and a read that raced the commit is refused by its generation - while
+    max_age bounds how long writes made by other processes go
+    unseen. Every user has a TokenBucket, so a flood of commands is
+    turned away before it reaches the database.
+    """
+
+    def __init__(self, max_age=STAFF_CACHE_SECONDS, rate=STAFF_RATE, burst=STAFF_BURST, max_users=10000):
+        self.max_age = max_age
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self.answers = FragmentCache(max_entries=max_users, max_age=max_age)  # By (staff_id, (kind, date))
+        self.generation = 0
+        self.link_reads = 0
+        self.limited = 0
+        self._links = OrderedDict()  # Telegram user id -> (checked_at, (staff_id, name) or None)
+        self._users = {}  # staff_id -> Telegram user id cached as linked to it
+        self._buckets = OrderedDict()  # Telegram user id -> [TokenBucket, warned since last allowed]
+        self._lock = threading.Lock()
+
+    def allow(self, user_id):
+        """(allowed, warn) for a command from user_id; warn is True only on the first refusal in a row"""
+        entry = self._buckets.get(user_id)
+        if entry is None:
+            entry = self._buckets[user_id] = [TokenBucket(self.rate, self.burst), False]
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        if entry[0].try_acquire():
+            entry[1] = False
+            return True, False
+        self.limited += 1
+        warn, entry[1] = not entry[1], True
+        return False, warn
+
+    def staff_for(self, db, user_id):
+        """(staff_id, name) linked to a Telegram user, or None"""
+        with self._lock:
+            entry = self._links.get(user_id)
+            if entry and time.monotonic() - entry[0] <= self.max_age:
+                return entry[1]
+            generation = self.generation
+        staff = db.get_linked_staff(user_id)
+        self.link_reads += 1
+        self.remember(user_id, staff, generation)
+        return staff
+
+    def remember(self, user_id, staff, generation=None):
+        """Cache a user's link, unless something changed since generation was read"""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._links[user_id] = (time.monotonic(), staff)
+            self._links.move_to_end(user_id)
+            if staff:
+                self._users[staff[0]] = user_id
+            while len(self._links) > self.max_users:
+                _, (_, dropped) = self._links.popitem(last=False)
+                if dropped and self._users.get(dropped[0]) not in self._links:
+                    self._users.pop(dropped[0], None)
+
+    def answer(self, db, staff, kind, day):
+        """Text of a 'myshifts' answer from day on, or of the 'week' starting on day"""
+        staff_id, name = staff
+        text = self.answers.get(staff_id, (kind, day))
+        if text is not None:
+            return text
+        generation = self.answers.generation
+        if kind == 'week':
+            text = format_week(name, day, week_cells(db.get_week_schedules_for_staff([staff_id], day)))
+        else:
+            weeks = [week_start_of(day), week_start_of(day) + timedelta(days=7)]
+            text = format_upcoming(name, day, [(week_start, week_cells(db.get_week_schedules_for_staff([staff_id], week_start)))
+                                               for week_start in weeks])
+        self.answers.put(staff_id, (kind, day), text, generation)
+        return text
+
+    def invalidate(self, staff_ids=None):
+        """Drop the answers and links of these staff (None: everyone)"""
+        self.answers.invalidate(staff_ids)
+        with self._lock:
+            self.generation += 1
+            if staff_ids is None:
+                self._links.clear()
+                self._users.clear()
+                return
+            for staff_id in staff_ids:
+                self._links.pop(self._users.pop(staff_id, None), None)
+
+    def metrics(self):
+        """Cache and limiter counters for /metrics"""
+        return {'answer_hits': self.answers.hits, 'answer_misses': self.answers.misses, 'link_reads': self.link_reads,
+                'limited': self.limited, 'users': len(self._buckets)}
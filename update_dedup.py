@@ -0,0 +1,70 @@
+"""
+Drop redelivered Telegram updates and run expensive write callbacks once
+"""
+
+import hashlib
+from collections import OrderedDict
+
+
+class UpdateDeduplicator:
+    """Bounded windows of recently seen update ids and idempotency keys.
+
+    Kept in bot_data, so with persistence enabled both windows survive a
+    restart - the case where Telegram redelivers updates the bot already
+    handled. Plain dicts and ints only, so it pickles and deep-copies cheaply.
+    """
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self._update_ids = OrderedDict()
+        self._keys = OrderedDict()
+        self.stats = {'duplicates_dropped': 0, 'idempotent_skips': 0}
+
+    @staticmethod
+    def _remember(window, key, capacity):
+        window[key] = True
+        while len(window) > capacity:
+            window.popitem(last=False)
+
+    def seen(self, update_id):
+        """True if update_id was already handled; otherwise remember it"""
+        if update_id in self._update_ids:
+            self.stats['duplicates_dropped'] += 1
+            return True
+        self._remember(self._update_ids, update_id, self.capacity)
+        return False
+
+    def claim(self, key):
+        """True the first time key is claimed, False for repeats"""
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            self.stats['idempotent_skips'] += 1
+            return False
+        self._remember(self._keys, key, self.capacity)
+        return True
+
+    def release(self, key):
+        """Forget key so the operation can be retried (after a failed write)"""
+        self._keys.pop(key, None)
+
+    def metrics(self):
+        """Window sizes and counters for /metrics"""
+        return {
+            'capacity': self.capacity,
+            'update_ids': len(self._update_ids),
+            'idempotency_keys': len(self._keys),
+            **self.stats,
+        }
+
+
+def idempotency_key(action, update):
+    """Key for a button tap: the same button on the same rendered screen gives the same key.
+
+    The bot edits one message through the whole wizard, so the screen text is
+    part of the key - a later save on the same message (next staff member,
+    another week) gets a new key.
+    """
+    message = update.callback_query.message
+    text = getattr(message, 'text', None) or ''
+    digest = hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+    return f"{action}:{message.chat.id}:{message.message_id}:{digest}"
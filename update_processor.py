@@ -0,0 +1,81 @@
+"""
+Update processor that runs updates concurrently while keeping each chat in order
+"""
+
+import logging
+from collections import deque
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Process up to max_concurrent_updates at once, one at a time per chat.
+
+    Conversation state lives in context.user_data and the ConversationHandler
+    state map, so two taps from the same admin must not interleave. Updates
+    without a chat or user (e.g. poll answers) are not serialized.
+
+    PTB takes a concurrency slot before calling do_process_update, so an
+    update of a busy chat is queued and its slot handed back at once; the
+    chat's running update drains the queue in its own slot. A chat with a
+    backlog therefore holds one slot, never all of them.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._chat_queues = {}  # ordering key -> deque of handler coroutines waiting behind the running one
+
+    @staticmethod
+    def _ordering_key(update):
+        """Chat id for chat updates, user id for inline queries and the like"""
+        effective_chat = getattr(update, 'effective_chat', None)
+        if effective_chat is not None:
+            return ('chat', effective_chat.id)
+        effective_user = getattr(update, 'effective_user', None)
+        if effective_user is not None:
+            return ('user', effective_user.id)
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        """Run the handlers now, or queue them behind the update the chat is already running"""
+        key = self._ordering_key(update)
+        if key is None:
+            await coroutine
+            return
+
+        queue = self._chat_queues.get(key)
+        if queue is not None:
+            queue.append(coroutine)
+            return
+
+        queue = self._chat_queues[key] = deque()
+        try:
+            while True:
+                try:
+                    await coroutine
+                except Exception as e:
+                    # Keep draining: later updates of the chat must still run
+                    logger.error(f"❌ Update processing failed for {key}: {e}")
+                if not queue:
+                    break
+                coroutine = queue.popleft()
+        finally:
+            del self._chat_queues[key]
+            for pending in queue:
+                pending.close()  # Only left over when cancelled at shutdown
+
+    def active_chats(self):
+        """Number of chats with an update running or queued"""
+        return len(self._chat_queues)
+
+    def queued_updates(self):
+        """Updates waiting behind their chat's running update"""
+        return sum(len(queue) for queue in self._chat_queues.values())
+
+    async def initialize(self):
+        """Nothing to set up"""
+
+    async def shutdown(self):
+        """Nothing to tear down"""
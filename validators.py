@@ -172,6 +172,16 @@ class ScheduleValidator:
         except Exception:
             return None
     
+    @staticmethod
+    def day_unchanged(stored, is_working, start_time, end_time):
+        """True if a stored day (as read from the database) already has these values"""
+        if bool(stored.get('is_working')) != bool(is_working):
+            return False
+        if not is_working:
+            return True
+        return (ScheduleValidator._format_time_value(stored.get('start_time')) == ScheduleValidator._format_time_value(start_time) and
+                ScheduleValidator._format_time_value(stored.get('end_time')) == ScheduleValidator._format_time_value(end_time))
+    
     @staticmethod
     def validate_schedule_data(schedule_data):
         """
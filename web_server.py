@@ -1,37 +1,101 @@
 #!/usr/bin/env python3
 """
-Simple web server for Railway health checks
+Web endpoints served next to the bot - Telegram webhook, health checks and metrics
 """
-from flask import Flask, jsonify
+import asyncio
+import logging
 import os
-import threading
 import time
 
-app = Flask(__name__)
-
-@app.route('/')
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "service": "Staff Scheduler Bot",
-        "timestamp": time.time()
-    })
-
-@app.route('/health')
-def health():
-    """Detailed health check"""
-    return jsonify({
-        "status": "healthy",
-        "service": "Staff Scheduler Bot",
-        "database": "MySQL",
-        "timestamp": time.time()
-    })
+from config import WEBHOOK_SECRET_TOKEN, HTTP_KEEP_ALIVE_TIMEOUT, HTTP_REQUEST_TIMEOUT
+from http_server import HTTPServer, Response, json_response
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "Staff Scheduler Bot v2.0"
+HEALTH_DB_TIMEOUT = 5.0  # seconds before /health reports the database as unresponsive
+
+
+def build_web_server(db=None, webhook_path=None, on_update=None, secret_token=WEBHOOK_SECRET_TOKEN):
+    """Create the HTTP server.
+
+    / and /health answer from the event loop without waiting on bot handlers
+    (the database check runs in a worker thread). When webhook_path is given,
+    POSTs to it are parsed and passed to on_update(dict).
+    """
+    server = HTTPServer(keep_alive_timeout=HTTP_KEEP_ALIVE_TIMEOUT, request_timeout=HTTP_REQUEST_TIMEOUT)
+
+    async def health_check(request):
+        """Health check endpoint for Railway"""
+        return json_response({
+            "status": "healthy",
+            "service": SERVICE_NAME,
+            "timestamp": time.time(),
+            "features": ["bulk_scheduling", "webhooks", "connection_pooling", "templates"]
+        })
+
+    async def detailed_health(request):
+        """Detailed health check"""
+        if db is None:
+            return json_response({"status": "healthy", "service": SERVICE_NAME, "timestamp": time.time()})
+        try:
+            staff = await asyncio.wait_for(asyncio.to_thread(db.get_all_staff), HEALTH_DB_TIMEOUT)
+            return json_response({
+                "status": "healthy",
+                "service": SERVICE_NAME,
+                "database": "connected",
+                "staff_count": len(staff),
+                "timestamp": time.time()
+            })
+        except Exception as e:
+            return json_response({
+                "status": "unhealthy",
+                "service": SERVICE_NAME,
+                "database": "error",
+                "error": str(e) or type(e).__name__,
+                "timestamp": time.time()
+            }, status=500)
+
+    async def metrics_endpoint(request):
+        """Runtime settings and gauges for tuning in production"""
+        snapshot = metrics.snapshot()
+        snapshot['http'] = {'requests_served': server.requests_served, 'open_connections': server.open_connections}
+        return json_response(snapshot)
+
+    async def telegram_webhook(request):
+        """Telegram webhook deliveries"""
+        if secret_token and request.headers.get('x-telegram-bot-api-secret-token') != secret_token:
+            return Response(403, 'Forbidden')
+        try:
+            update = request.json()
+        except ValueError:
+            return Response(400, 'Bad Request')
+        if not isinstance(update, dict):
+            return Response(400, 'Bad Request')
+        await on_update(update)
+        return Response(200, 'OK')
+
+    server.route('GET', '/', health_check)
+    server.route('GET', '/health', detailed_health)
+    server.route('GET', '/metrics', metrics_endpoint)
+    if webhook_path:
+        server.route('POST', webhook_path, telegram_webhook)
+    return server
+
+
+async def _serve_forever(port):
+    server = build_web_server()
+    await server.start('0.0.0.0', port)
+    logger.info(f"🌐 Web server listening on port {port}")
+    while True:
+        await asyncio.sleep(3600)
+
 
 def run_web_server():
-    """Run the web server"""
+    """Run the web server on its own (health endpoints only)"""
     port = int(os.environ.get('PORT', 8080))
-    app.run(host='0.0.0.0', port=port, debug=False)
+    asyncio.run(_serve_forever(port))
 
 if __name__ == "__main__":
-    run_web_server() 
\ No newline at end of file
+    run_web_server()
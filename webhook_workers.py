@@ -0,0 +1,232 @@
+"""
+Multi-process webhook mode - a thin receiver routes updates by chat to N bot worker processes
+"""
+
+import os
+import sys
+import zlib
+import asyncio
+import logging
+import warnings
+import threading
+import multiprocessing
+from urllib.parse import urlsplit
+
+from config import (
+    BOT_TOKEN, PORT, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_SECRET_TOKEN, DROP_PENDING_UPDATES, UPDATE_DEDUP_WINDOW,
+    ALLOWED_UPDATES
+)
+from update_dedup import UpdateDeduplicator
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ACK_GROUP = 1000  # runs after the ConversationHandler (group 0) has finished
+
+
+def chat_id_of(update):
+    """Chat an update belongs to (user id for chat-less updates like inline queries), or 0"""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        if isinstance(value.get('chat'), dict):
+            return value['chat'].get('id', 0)
+        message = value.get('message')
+        if isinstance(message, dict) and isinstance(message.get('chat'), dict):
+            return message['chat'].get('id', 0)
+        if isinstance(value.get('from'), dict):
+            return value['from'].get('id', 0)
+    return 0
+
+
+def worker_for(chat_id, workers):
+    """Stable worker index for a chat - every update of a chat goes to the same worker"""
+    return zlib.crc32(str(chat_id).encode()) % workers
+
+
+def run_worker(index, inbox, acks, token, base_url=None, quiet=False):
+    """Worker process: run the normal bot handlers on updates taken from inbox"""
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+        logging.basicConfig(level=logging.WARNING)
+        warnings.simplefilter('ignore')
+    asyncio.run(_worker_main(index, inbox, acks, token, base_url))
+
+
+async def _worker_main(index, inbox, acks, token, base_url):
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    from bot_async import StaffSchedulerBot
+
+    bot = StaffSchedulerBot()
+    application = bot.build_application(token=token, base_url=base_url, instance_name=f"worker-{index}")
+    errors = {}
+
+    async def on_error(update, context):
+        if isinstance(update, Update):
+            errors[update.update_id] = repr(context.error)
+        logger.error(f"❌ Worker {index} error: {context.error}")
+
+    async def on_processed(update, context):
+        acks.put((index, update.update_id, errors.pop(update.update_id, None)))
+
+    application.add_handler(TypeHandler(Update, on_processed), group=ACK_GROUP)
+    bot.dropped_update_hook = on_processed  # The router's dedup may let through what ours drops
+    application.add_error_handler(on_error)
+
+    await application.initialize()
+    await application.start()
+    acks.put((index, None, 'ready'))
+    logger.info(f"👷 Worker {index} ready (pid {os.getpid()})")
+    try:
+        while True:
+            payload = await asyncio.to_thread(inbox.get)
+            if payload is None:
+                break
+            await application.update_queue.put(Update.de_json(payload, application.bot))
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await bot.flush_audit_log()
+
+
+class WebhookRouter:
+    """Receives webhook updates and hands each one to the worker that owns its chat.
+
+    Workers are separate processes, so handlers (including PDF rendering) use
+    all cores, while a chat always lands on the same worker and its updates
+    stay in order. Redelivered updates are dropped here, before they are
+    queued on a worker.
+    """
+
+    def __init__(self, workers, token=BOT_TOKEN, base_url=None, secret_token=WEBHOOK_SECRET_TOKEN, quiet=False):
+        self.workers = workers
+        self.token = token
+        self.base_url = base_url
+        self.secret_token = secret_token
+        self.quiet = quiet
+        self.on_processed = None  # optional callback(update_id, error)
+        self.routed = [0] * workers
+        self.processed = [0] * workers
+        self.in_flight = [0] * workers
+        self.dedup = UpdateDeduplicator(UPDATE_DEDUP_WINDOW) if UPDATE_DEDUP_WINDOW else None
+        self._context = multiprocessing.get_context('spawn')
+        self._inboxes = []
+        self._acks = None
+        self._processes = []
+        self._ack_thread = None
+        self._loop = None
+        self._ready = None
+
+    async def start(self, ready_timeout=120):
+        """Spawn the workers and wait until every one has started its Application"""
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._ready_count = 0
+        self._acks = self._context.Queue()
+        for index in range(self.workers):
+            inbox = self._context.Queue()
+            process = self._context.Process(
+                target=run_worker,
+                args=(index, inbox, self._acks, self.token, self.base_url, self.quiet),
+                name=f"bot-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+        self._ack_thread = threading.Thread(target=self._read_acks, name="worker-acks", daemon=True)
+        self._ack_thread.start()
+        await asyncio.wait_for(self._ready.wait(), ready_timeout)
+        metrics.register_gauge('webhook_workers', self.metrics)
+        logger.info(f"🚀 {self.workers} webhook workers ready")
+
+    async def stop(self, timeout=30):
+        """Ask every worker to finish its queue and shut down"""
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                process.terminate()
+        self._acks.put(None)
+        metrics.unregister_gauge('webhook_workers')
+
+    def _read_acks(self):
+        """Thread: forward worker acknowledgements to the event loop"""
+        while True:
+            try:
+                message = self._acks.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._on_ack, *message)
+
+    def _on_ack(self, index, update_id, error):
+        if update_id is None:
+            self._ready_count += 1
+            if self._ready_count == self.workers:
+                self._ready.set()
+            return
+        self.in_flight[index] -= 1
+        self.processed[index] += 1
+        if self.on_processed:
+            self.on_processed(update_id, error)
+
+    def dispatch(self, update):
+        """Queue an update (as a dict) on the worker owning its chat; None for a redelivery"""
+        if self.dedup and 'update_id' in update and self.dedup.seen(update['update_id']):
+            return None
+        index = worker_for(chat_id_of(update), self.workers)
+        self.routed[index] += 1
+        self.in_flight[index] += 1
+        self._inboxes[index].put(update)
+        return index
+
+    def metrics(self):
+        """Per-worker counters for /metrics"""
+        return {
+            'workers': self.workers,
+            'alive': sum(1 for process in self._processes if process.is_alive()),
+            'routed': list(self.routed),
+            'processed': list(self.processed),
+            'in_flight': list(self.in_flight),
+            'duplicates_dropped': self.dedup.stats['duplicates_dropped'] if self.dedup else 0,
+        }
+
+
+async def run_webhook_workers(workers, webhook_url):
+    """Production entry point: webhook receiver on PORT in front of `workers` bot processes"""
+    from telegram import Bot
+    from database_factory import get_database_manager
+    from web_server import build_web_server
+
+    router = WebhookRouter(workers)
+    await router.start()
+
+    async def on_update(update):
+        router.dispatch(update)
+
+    webhook_path = urlsplit(webhook_url).path or '/'
+    server = build_web_server(get_database_manager(), webhook_path, on_update)
+    await server.start('0.0.0.0', PORT)
+    logger.info(f"🌐 Webhook receiver listening on port {PORT}, path {webhook_path}")
+
+    async with Bot(BOT_TOKEN) as bot:
+        await bot.set_webhook(
+            url=webhook_url,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            drop_pending_updates=DROP_PENDING_UPDATES,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+    logger.info(f"✅ Webhook set successfully (max_connections={WEBHOOK_MAX_CONNECTIONS})")
+
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+        await router.stop()
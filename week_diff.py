@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Week diffs - added, removed and changed days between two weeks of schedules
+"""
+
+from config import DAYS_OF_WEEK
+from validators import ScheduleValidator
+
+ADDED, REMOVED, CHANGED = 'added', 'removed', 'changed'
+DIFF_ICONS = {ADDED: "➕", REMOVED: "➖", CHANGED: "✏️"}
+
+
+def pack_cell(is_working, start_time=None, end_time=None):
+    """A day as a comparable (is_working, start, end) tuple; Off days carry no times"""
+    if not is_working:
+        return (False, '', '')
+    return (True, ScheduleValidator._format_time_value(start_time) or '',
+            ScheduleValidator._format_time_value(end_time) or '')
+
+
+def pack_days(staff_id, days):
+    """{(staff_id, day): cell} for one staff member's {day: {is_working, start_time, end_time}}"""
+    return {(staff_id, day): pack_cell(data.get('is_working', True), data.get('start_time'), data.get('end_time'))
+            for day, data in days.items() if day in DAYS_OF_WEEK}
+
+
+def pack_rows(rows):
+    """{(staff_id, day): cell} from get_current_week_schedules rows"""
+    return {(staff_id, day): pack_cell(is_working, start_time, end_time)
+            for _, staff_id, day, _, is_working, start_time, end_time in rows}
+
+
+def pack_editable(schedules):
+    """{(staff_id, day): cell} from the bot's {staff_name: {'staff_id', 'schedule'}} week"""
+    grid = {}
+    for data in schedules.values():
+        grid.update(pack_days(data['staff_id'], data.get('schedule', {})))
+    return grid
+
+
+def diff_grids(before, after):
+    """[(staff_id, day, kind, old, new)] for every day that differs, by staff then day.
+
+    A day only in after is ADDED (old None), only in before REMOVED (new None).
+    """
+    diff = []
+    for key in before.keys() | after.keys():
+        old, new = before.get(key), after.get(key)
+        if old == new:
+            continue
+        kind = ADDED if old is None else REMOVED if new is None else CHANGED
+        diff.append((key[0], key[1], kind, old, new))
+    diff.sort(key=lambda cell: (cell[0], DAYS_OF_WEEK.index(cell[1])))
+    return diff
+
+
+def diff_rows(rows):
+    """diff_grids' result from diff_weeks' joined rows: (staff_id, day, source is_working,
+    start, end, target id, target is_working, start, end), source columns NULL where
+    only the target has the day
+    """
+    diff = []
+    for staff_id, day, is_working, start_time, end_time, target_id, old_working, old_start, old_end in rows:
+        old = pack_cell(old_working, old_start, old_end) if target_id else None
+        new = pack_cell(is_working, start_time, end_time) if is_working is not None else None
+        if old != new:
+            diff.append((staff_id, day, ADDED if old is None else REMOVED if new is None else CHANGED, old, new))
+    diff.sort(key=lambda cell: (cell[0], DAYS_OF_WEEK.index(cell[1])))
+    return diff
+
+
+def format_cell(cell):
+    """'10:00-18:00', 'Off', 'Not Set' or '—' (no row)"""
+    if cell is None:
+        return '—'
+    is_working, start_time, end_time = cell
+    if not is_working:
+        return 'Off'
+    if not start_time or not end_time:
+        return 'Not Set'
+    return f"{start_time}-{end_time}"
+
+
+def format_diff(diff, names, limit=15):
+    """Compact change lines: '✏️ Asal Mon: Off → 10:00-18:00', at most limit of them"""
+    lines = []
+    for staff_id, day, kind, old, new in diff[:limit]:
+        name = names.get(staff_id, f"Staff {staff_id}")
+        if kind == CHANGED:
+            change = f"{format_cell(old)} → {format_cell(new)}"
+        else:
+            change = format_cell(new if kind == ADDED else old)
+        lines.append(f"{DIFF_ICONS[kind]} {name} {day[:3]}: {change}")
+    if len(diff) > limit:
+        lines.append(f"… and {len(diff) - limit} more")
+    return lines
+
+
+def changed_schedules(schedules, diff):
+    """The bot's week cut down to the days a diff adds or changes, as save_bulk_schedules takes it"""
+    wanted = {(staff_id, day) for staff_id, day, kind, _, _ in diff if kind != REMOVED}
+    schedules_data = []
+    for staff_name, data in schedules.items():
+        days = {day: day_data for day, day_data in data.get('schedule', {}).items() if (data['staff_id'], day) in wanted}
+        if days:
+            schedules_data.append((data['staff_id'], staff_name, days))
+    return schedules_data
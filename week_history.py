@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Point-in-time week reconstruction - replays schedule_changes on top of periodic week snapshots
+"""
+
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+import pytz
+
+from config import DAYS_OF_WEEK, WEEK_SNAPSHOT_EVERY
+from validators import ScheduleValidator
+from audit_archive import _as_text
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_ACTIONS = ('ADD_SCHEDULE', 'UPDATE_SCHEDULE', 'CREATE_SCHEDULE')
+DATED_ACTIONS = SCHEDULE_ACTIONS + ('DELETE_SCHEDULE', 'MIRROR_WEEK')
+WEEK_ACTIONS = ('REMOVE_STAFF', 'RESET_SCHEDULES')
+LOCAL_TZ = pytz.timezone('America/Toronto')
+
+
+def week_start_of(day):
+    """Sunday of the week a date falls in"""
+    if isinstance(day, str):
+        day = datetime.strptime(day, '%Y-%m-%d').date()
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+
+def parse_as_of(text):
+    """Local (Toronto) 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM' as the UTC text changed_at holds.
+
+    A bare date means the end of that day.
+    """
+    text = text.strip()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            moment = datetime.strptime(text, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Unrecognised time '{text}' (use YYYY-MM-DD or YYYY-MM-DD HH:MM)")
+    if fmt == '%Y-%m-%d':
+        moment += timedelta(days=1, seconds=-1)
+    return LOCAL_TZ.localize(moment).astimezone(pytz.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def mirrored_days(new_data):
+    """(staff_id, day, {is_working, start_time, end_time}) for each day a MIRROR_WEEK row wrote"""
+    data = json.loads(new_data) if isinstance(new_data, str) else new_data
+    for staff_id, days in (data or {}).get('days', {}).items():
+        for day_of_week, (is_working, start_time, end_time) in days.items():
+            yield int(staff_id), day_of_week, {'is_working': is_working, 'start_time': start_time, 'end_time': end_time}
+
+
+def apply_change(state, staff_id, action, day_of_week, new_data):
+    """Apply one audit row to a week state {staff_id: {day: {is_working, start_time, end_time}}}"""
+    if action == 'RESET_SCHEDULES':
+        state.clear()
+    elif action == 'MIRROR_WEEK':
+        for mirrored_staff, mirrored_day, data in mirrored_days(new_data):
+            apply_change(state, mirrored_staff, 'CREATE_SCHEDULE', mirrored_day, data)
+    elif action == 'REMOVE_STAFF':
+        state.pop(staff_id, None)
+    elif action == 'DELETE_SCHEDULE':
+        days = state.get(staff_id, {})
+        days.pop(day_of_week, None)
+        if not days:
+            state.pop(staff_id, None)
+    elif action in SCHEDULE_ACTIONS and day_of_week:
+        data = json.loads(new_data) if isinstance(new_data, str) else new_data
+        if not isinstance(data, dict):
+            return
+        is_working = bool(data.get('is_working'))
+        state.setdefault(staff_id, {})[day_of_week] = {
+            'is_working': is_working,
+            'start_time': ScheduleValidator._format_time_value(data.get('start_time')) if is_working else None,
+            'end_time': ScheduleValidator._format_time_value(data.get('end_time')) if is_working else None,
+        }
+
+
+def _archived_changes(archive, week_start, after_id, covers_until, as_of):
+    """The week's rows from the archive segments, in get_week_changes' shape"""
+    dates = {(week_start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(7)}
+    since_month = None
+    if covers_until:
+        # A day of slack: write-behind rows get their id a moment after their time
+        since_month = (datetime.strptime(covers_until, '%Y-%m-%d %H:%M:%S') - timedelta(days=1)).strftime('%Y-%m')
+
+    rows = []
+    for row in archive.iter_rows(since_month):
+        if row['id'] <= after_id or (as_of and row['changed_at'] > as_of):
+            continue
+        if row['action'] in DATED_ACTIONS:
+            data = row['new_data'] or row['old_data']
+            try:
+                data = json.loads(data) if isinstance(data, str) else data
+            except ValueError:
+                continue
+            if not isinstance(data, dict) or data.get('schedule_date') not in dates:
+                continue
+        elif row['action'] not in WEEK_ACTIONS:
+            continue
+        rows.append((row['id'], row['staff_id'], row['action'], row['day_of_week'], row['new_data'], row['changed_at']))
+    return rows
+
+
+def _replay(db, week_start, as_of=None):
+    """Week state as of as_of: nearest snapshot plus the changes after it.
+
+    Returns (state, last_change_id, covers_until, replayed). Changes moved to
+    the audit archive are read from its segments when the snapshot does not
+    already cover them.
+    """
+    if as_of is None and getattr(db, 'audit_write_behind', False):
+        db.flush_audit_log()  # Include changes still waiting in the outbox
+
+    state, last_change_id, covers_until = {}, 0, None
+    snapshot = db.get_week_snapshot(week_start, as_of)
+    if snapshot:
+        last_change_id, covers_until, raw_state = snapshot
+        covers_until = _as_text(covers_until)
+        state = {int(staff_id): days for staff_id, days in json.loads(raw_state).items()}
+
+    rows = []
+    archive = getattr(db, 'audit_archive', None)
+    months = archive.months() if archive else []
+    if months and (covers_until is None or months[0] >= covers_until[:7]):
+        rows = _archived_changes(archive, week_start, last_change_id, covers_until, as_of)
+    rows += db.get_week_changes(week_start, last_change_id, as_of)
+
+    # One copy per id: a crash while archiving can leave a row in the table and a segment
+    changes = sorted({row[0]: row for row in rows}.values(), key=lambda row: row[0])
+    if changes:
+        last_change_id = changes[-1][0]
+        newest = max(_as_text(row[5]) for row in changes)
+        covers_until = max(covers_until or newest, newest)
+
+    # Newest first: only the latest change to each staff/day counts, and nothing before a reset
+    latest, removed = {}, set()
+    for _, staff_id, action, day_of_week, new_data, _ in reversed(changes):
+        if action == 'RESET_SCHEDULES':
+            state = {}
+            break
+        if action == 'REMOVE_STAFF':
+            removed.add(staff_id)
+        elif action == 'MIRROR_WEEK':
+            for mirrored_staff, mirrored_day, data in mirrored_days(new_data):
+                if mirrored_staff not in removed:
+                    latest.setdefault((mirrored_staff, mirrored_day), ('CREATE_SCHEDULE', data))
+        elif staff_id not in removed:
+            latest.setdefault((staff_id, day_of_week), (action, new_data))
+    for staff_id in removed:
+        state.pop(staff_id, None)
+    for (staff_id, day_of_week), (action, new_data) in latest.items():
+        apply_change(state, staff_id, action, day_of_week, new_data)
+    replayed = len(changes)
+    return state, last_change_id, covers_until, replayed
+
+
+def reconstruct_week(db, week_start, as_of=None):
+    """A week's schedules as they were at as_of (UTC text or naive UTC datetime; None for now).
+
+    Returns {staff_id: {day: {'is_working', 'start_time', 'end_time'}}}.
+    """
+    state, _, _, replayed = _replay(db, week_start_of(week_start), _as_text(as_of))
+    logger.debug(f"Reconstructed week {week_start} as of {as_of or 'now'} from {replayed} changes")
+    return state
+
+
+def snapshot_weeks(db, min_changes=WEEK_SNAPSHOT_EVERY):
+    """Snapshot every week with at least min_changes changes since its last snapshot"""
+    snapshotted = 0
+    for week_start in db.get_weeks_to_snapshot(min_changes):
+        state, last_change_id, covers_until, _ = _replay(db, week_start)
+        if last_change_id:
+            db.save_week_snapshot(week_start, last_change_id, covers_until, state)
+            snapshotted += 1
+    if snapshotted:
+        logger.info(f"📸 Snapshotted {snapshotted} weeks")
+    return snapshotted
+
+
+def restore_week(db, week_start, as_of, changed_by="RESTORE", dry_run=False):
+    """Put a week back the way it was at as_of; returns (changes, skipped_staff_ids)"""
+    week_start = week_start_of(week_start)
+    target = reconstruct_week(db, week_start, as_of)
+    return db.restore_week_schedules(week_start, target, changed_by, dry_run)
+
+
+def format_day(day):
+    """'10:00-18:00', 'Off' or '—' (no schedule)"""
+    if not day:
+        return '—'
+    if not day.get('is_working'):
+        return 'Off'
+    return f"{day.get('start_time')}-{day.get('end_time')}"
+
+
+def format_change(change, names):
+    """One line per restore change: 'Asal Monday: 10:00-18:00 → Off'"""
+    staff_id, _, day_of_week, old_data, new_data, _ = change
+    return f"{names.get(staff_id, f'Staff {staff_id}')} {day_of_week}: {format_day(old_data)} → {format_day(new_data)}"
+
+
+def format_week(state, names):
+    """Plain text grid of a reconstructed week"""
+    lines = []
+    for staff_id, days in sorted(state.items(), key=lambda item: names.get(item[0], '')):
+        shifts = ', '.join(f"{day[:3]} {format_day(days.get(day))}" for day in DAYS_OF_WEEK if day in days)
+        lines.append(f"{names.get(staff_id, f'Staff {staff_id}')}: {shifts}")
+    return lines
+
+
+def main():
+    """CLI: show or restore a week as of a moment, or take snapshots now"""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('command', choices=['show', 'restore', 'snapshot'])
+    parser.add_argument('week', nargs='?', help='any date in the week (YYYY-MM-DD)')
+    parser.add_argument('--as-of', help='local time, YYYY-MM-DD [HH:MM] (default: now)')
+    parser.add_argument('--yes', action='store_true', help='restore: write the changes instead of listing them')
+    parser.add_argument('--min-changes', type=int, default=WEEK_SNAPSHOT_EVERY, help='snapshot: changes since the last snapshot')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from database_factory import get_database_manager
+    db = get_database_manager()
+    if not hasattr(db, 'get_week_changes'):
+        print(f"❌ {type(db).__name__} has no change log to replay")
+        sys.exit(1)
+
+    if args.command == 'snapshot':
+        print(f"📸 Snapshotted {snapshot_weeks(db, max(1, args.min_changes))} weeks")
+        return
+    if not args.week:
+        parser.error('a week date is needed')
+
+    week_start = week_start_of(args.week)
+    as_of = parse_as_of(args.as_of) if args.as_of else None
+    names = {staff_id: name for staff_id, name in db.get_all_staff()}
+    label = f"week of {week_start} as of {args.as_of or 'now'}"
+
+    if args.command == 'show':
+        print(f"📅 {label}")
+        for line in format_week(reconstruct_week(db, week_start, as_of), names) or ['(no schedules)']:
+            print(f"   {line}")
+        return
+
+    changes, skipped = restore_week(db, week_start, as_of, dry_run=not args.yes)
+    print(f"{'✅ Restored' if args.yes else '🔍 Restoring would change'} {len(changes)} days for the {label}")
+    for change in changes:
+        print(f"   {format_change(change, names)}")
+    if skipped:
+        print(f"⚠️ Skipped staff no longer on the roster: {', '.join(str(staff_id) for staff_id in skipped)}")
+    if changes and not args.yes:
+        print("   Run again with --yes to write these changes")
+
+
+if __name__ == "__main__":
+    main()